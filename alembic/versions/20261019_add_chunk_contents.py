@@ -0,0 +1,50 @@
+"""add chunk_contents table for slim vector payloads
+
+Revision ID: add_chunk_contents
+Revises: add_kb_vector_collection
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_chunk_contents'
+down_revision: Union[str, None] = 'add_kb_vector_collection'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：创建 chunk_contents 表
+
+    启用 RAG_SLIM_PAYLOADS 后文本块正文按向量点 ID 存放在此表，
+    Qdrant 载荷只保留 knowledge_base_id / document_id 等过滤字段。
+    """
+    op.create_table(
+        'chunk_contents',
+        sa.Column('point_id', sa.String(length=36), nullable=False),
+        sa.Column('knowledge_base_id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('extra', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('point_id'),
+    )
+    op.create_index('ix_chunk_contents_knowledge_base_id', 'chunk_contents', ['knowledge_base_id'], unique=False)
+    op.create_index('ix_chunk_contents_document_id', 'chunk_contents', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级：删除 chunk_contents 表
+    """
+    op.drop_index('ix_chunk_contents_document_id', table_name='chunk_contents')
+    op.drop_index('ix_chunk_contents_knowledge_base_id', table_name='chunk_contents')
+    op.drop_table('chunk_contents')
@@ -0,0 +1,48 @@
+"""add indexing status columns to documents
+
+Revision ID: add_document_status
+Revises: add_config_tables
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_document_status'
+down_revision: Union[str, None] = 'add_config_tables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：为 documents 表添加索引状态字段
+
+    - status: 异步索引状态（pending/processing/completed/failed）
+    - error_message: 最近一次索引失败的原因
+
+    已有文档在上线前均已同步索引，默认标记为 completed。
+    """
+    op.add_column(
+        'documents',
+        sa.Column('status', sa.String(length=50), nullable=False, server_default='completed')
+    )
+    op.add_column(
+        'documents',
+        sa.Column('error_message', sa.Text(), nullable=True)
+    )
+    op.alter_column('documents', 'status', server_default='pending')
+    op.create_index('ix_documents_status', 'documents', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级：删除 documents 表的索引状态字段
+    """
+    op.drop_index('ix_documents_status', table_name='documents')
+    op.drop_column('documents', 'error_message')
+    op.drop_column('documents', 'status')
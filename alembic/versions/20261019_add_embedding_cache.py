@@ -0,0 +1,48 @@
+"""add content-addressed embedding cache table
+
+Revision ID: add_embedding_cache
+Revises: add_document_status
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_embedding_cache'
+down_revision: Union[str, None] = 'add_document_status'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：创建 embedding_cache 表
+
+    按 (model, text_hash) 唯一存储 float32 向量，
+    跨文档复用页眉、免责声明等重复文本块的向量。
+    """
+    op.create_table(
+        'embedding_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('dimension', sa.Integer(), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('model', 'text_hash', name='uq_embedding_cache_model_hash'),
+    )
+    op.create_index('ix_embedding_cache_id', 'embedding_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级：删除 embedding_cache 表
+    """
+    op.drop_index('ix_embedding_cache_id', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
@@ -0,0 +1,37 @@
+"""add retrieval_config column to knowledge_bases
+
+Revision ID: add_kb_retrieval_config
+Revises: add_embedding_cache
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_kb_retrieval_config'
+down_revision: Union[str, None] = 'add_embedding_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：为 knowledge_bases 表添加检索配置字段
+
+    - retrieval_config: 知识库级检索配置（重排序方式、MMR 参数等），为空时使用全局默认值
+    """
+    op.add_column(
+        'knowledge_bases',
+        sa.Column('retrieval_config', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """
+    降级：删除 knowledge_bases 表的检索配置字段
+    """
+    op.drop_column('knowledge_bases', 'retrieval_config')
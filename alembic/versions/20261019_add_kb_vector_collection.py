@@ -0,0 +1,37 @@
+"""add vector_collection column to knowledge_bases
+
+Revision ID: add_kb_vector_collection
+Revises: add_kb_retrieval_config
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_kb_vector_collection'
+down_revision: Union[str, None] = 'add_kb_retrieval_config'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：为 knowledge_bases 表添加向量集合路由字段
+
+    - vector_collection: 知识库专属 Qdrant 集合，为空时使用共享集合
+    """
+    op.add_column(
+        'knowledge_bases',
+        sa.Column('vector_collection', sa.String(length=100), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """
+    降级：删除 knowledge_bases 表的向量集合路由字段
+    """
+    op.drop_column('knowledge_bases', 'vector_collection')
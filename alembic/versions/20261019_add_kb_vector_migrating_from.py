@@ -0,0 +1,37 @@
+"""add vector_migrating_from column to knowledge_bases
+
+Revision ID: add_kb_vector_migrating_from
+Revises: add_chunk_contents
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_kb_vector_migrating_from'
+down_revision: Union[str, None] = 'add_chunk_contents'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    升级：为 knowledge_bases 表添加集合迁移标记字段
+
+    - vector_migrating_from: 迁移中的源集合，非空时暂停向该知识库写入
+    """
+    op.add_column(
+        'knowledge_bases',
+        sa.Column('vector_migrating_from', sa.String(length=100), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """
+    降级：删除 knowledge_bases 表的集合迁移标记字段
+    """
+    op.drop_column('knowledge_bases', 'vector_migrating_from')
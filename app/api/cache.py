@@ -20,6 +20,8 @@ router = APIRouter(prefix="/cache", tags=["缓存管理"])
 class CacheStatsResponse(BaseModel):
     """缓存统计响应"""
     hits: int
+    l1_hits: int = 0
+    l2_hits: int = 0
     misses: int
     sets: int
     deletes: int
@@ -27,6 +29,8 @@ class CacheStatsResponse(BaseModel):
     hit_rate: float
     memory_cache_size: int
     redis_connected: bool
+    invalidation: Dict[str, Any] = {}
+    scenarios: Dict[str, Dict[str, Any]] = {}
 
 
 class CacheConfigResponse(BaseModel):
@@ -50,6 +54,14 @@ class CacheKeysResponse(BaseModel):
     scenario: Optional[str] = None
 
 
+class HotKeyResponse(BaseModel):
+    """热点键"""
+    key: str
+    scenario: str
+    estimated_count: int
+    error: int
+
+
 # ========== 缓存监控接口 ==========
 
 
@@ -61,12 +73,28 @@ async def get_cache_stats(
     """
     获取缓存统计信息
 
-    返回缓存命中、未命中、设置、删除等统计数据
+    返回缓存命中、未命中、设置、删除等统计数据，
+    以及各场景的一级/二级缓存命中、平均查找耗时和平均值大小
     """
     stats = cache.get_stats()
     return CacheStatsResponse(**stats)
 
 
+@router.get("/hot-keys", response_model=List[HotKeyResponse])
+async def get_hot_keys(
+    limit: int = Query(20, ge=1, le=200, description="返回的最大键数"),
+    cache: CacheService = Depends(get_cache_service),
+    current_user: get_current_active_user = Depends(get_current_active_user),
+):
+    """
+    获取热点键
+
+    按抽样（CACHE_HOT_KEYS_SAMPLE_RATE）统计的访问次数倒序返回，
+    estimated_count 已按抽样比例换算，error 为估算误差上界。统计仅限当前进程。
+    """
+    return [HotKeyResponse(**item) for item in cache.get_hot_keys(limit)]
+
+
 @router.get("/scenarios", response_model=List[CacheConfigResponse])
 async def get_cache_scenarios(
     cache: CacheService = Depends(get_cache_service),
@@ -110,7 +138,7 @@ async def get_cache_keys(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"未知的缓存场景: {scenario}",
                 )
-            pattern = cache.CACHE_SCENARIOS[scenario]["prefix"]
+            pattern = cache.scenario_namespace(scenario)
         elif prefix:
             pattern = prefix
         else:
@@ -269,31 +297,13 @@ async def invalidate_by_scenario(
                 detail=f"未知的缓存场景: {scenario}",
             )
 
-        # 获取该场景的所有键
-        pattern = cache.CACHE_SCENARIOS[scenario]["prefix"]
-        keys = []
-        if cache._connected and cache._async_redis_client:
-            async for key in cache._async_redis_client.scan_iter(match=f"{pattern}:*"):
-                keys.append(key)
-
-        # 批量删除
-        if keys:
-            from app.services.cache_service import _memory_cache, _memory_lock
-            import asyncio
-
-            # 删除内存缓存
-            async with _memory_lock:
-                for key in keys:
-                    if key in _memory_cache:
-                        del _memory_cache[key]
-
-            # 删除 Redis 缓存
-            await cache._async_redis_client.delete(*keys)
+        # 递增场景版本号，旧版本的键由 TTL 过期
+        generation = await cache.invalidate_scenario(scenario)
 
         return CacheOperationResponse(
             success=True,
-            message=f"已失效场景 {scenario} 的 {len(keys)} 个缓存",
-            data={"invalidated_count": len(keys)},
+            message=f"已失效场景 {scenario} 的缓存（当前版本 v{generation}）",
+            data={"generation": generation},
         )
     except HTTPException:
         raise
@@ -4,6 +4,7 @@
 """
 
 from typing import List, Optional
+from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 import asyncio
@@ -18,17 +19,49 @@ from app.schemas.knowledge import (
     DocumentResponse,
     DocumentListResponse,
 )
-from app.models import KnowledgeBase, Document, User
+from app.models import KnowledgeBase, Document, DocumentStatus, User
 from app.api.auth import get_current_user
 from app.services.rag_service import create_rag_service
 from app.services.document_parser import document_parser_service
 from app.utils.file_upload import file_uploader
+from app.tasks.knowledge_tasks import vectorize_document
 from app.core.logger import logger
 
 
 router = APIRouter()
 
 
+def _enqueue_indexing(
+    db: Session,
+    document: Document,
+    file_path: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> None:
+    """
+    提交文档索引任务
+
+    任务提交失败时将文档标记为 failed，不影响接口返回。
+
+    Args:
+        db: 数据库会话
+        document: 文档
+        file_path: 上传文件路径（为空时索引文档内容）
+        user_id: 用户 ID
+    """
+    try:
+        vectorize_document.delay(
+            document_id=document.id,
+            file_path=file_path,
+            user_id=str(user_id) if user_id is not None else None,
+        )
+    except Exception as e:
+        logger.error(f"⚠️ 提交文档索引任务失败: {e}")
+        document.status = DocumentStatus.FAILED
+        document.error_message = f"提交索引任务失败: {e}"
+        db.commit()
+        db.refresh(document)
+
+
 # ====================
 # 知识库管理
 # ====================
@@ -56,12 +89,18 @@ async def create_knowledge_base(
         name=knowledge_base_data.name,
         description=knowledge_base_data.description,
         embedding_model=knowledge_base_data.embedding_model,
+        retrieval_config=(
+            knowledge_base_data.retrieval_config.model_dump(exclude_none=True)
+            if knowledge_base_data.retrieval_config else None
+        ),
     )
 
     db.add(knowledge_base)
     db.commit()
     db.refresh(knowledge_base)
 
+    create_rag_service(db).invalidate_user_knowledge_bases(current_user.id)
+
     return knowledge_base
 
 
@@ -103,6 +142,7 @@ async def get_knowledge_bases(
             "name": kb.name,
             "description": kb.description,
             "embedding_model": kb.embedding_model,
+            "retrieval_config": kb.retrieval_config,
             "created_at": kb.created_at,
             "updated_at": kb.updated_at,
             "document_count": doc_count,
@@ -155,6 +195,7 @@ async def get_knowledge_base(
         name=knowledge_base.name,
         description=knowledge_base.description,
         embedding_model=knowledge_base.embedding_model,
+        retrieval_config=knowledge_base.retrieval_config,
         created_at=knowledge_base.created_at,
         updated_at=knowledge_base.updated_at,
         document_count=len(documents),
@@ -198,6 +239,8 @@ async def update_knowledge_base(
         knowledge_base.name = update_data.name
     if update_data.description is not None:
         knowledge_base.description = update_data.description
+    if update_data.retrieval_config is not None:
+        knowledge_base.retrieval_config = update_data.retrieval_config.model_dump(exclude_none=True)
 
     db.commit()
     db.refresh(knowledge_base)
@@ -211,6 +254,7 @@ async def update_knowledge_base(
         name=knowledge_base.name,
         description=knowledge_base.description,
         embedding_model=knowledge_base.embedding_model,
+        retrieval_config=knowledge_base.retrieval_config,
         created_at=knowledge_base.created_at,
         updated_at=knowledge_base.updated_at,
         document_count=doc_count,
@@ -254,6 +298,8 @@ async def delete_knowledge_base(
     db.delete(knowledge_base)
     db.commit()
 
+    rag_service.invalidate_user_knowledge_bases(current_user.id)
+
     return {"message": "知识库删除成功"}
 
 
@@ -270,7 +316,7 @@ async def create_document(
     current_user: User = Depends(get_current_user),
 ):
     """
-    创建文档（并索引到向量数据库）
+    创建文档（立即返回 pending 状态，后台任务完成向量索引）
 
     Args:
         knowledge_base_id: 知识库 ID
@@ -294,34 +340,21 @@ async def create_document(
     if not knowledge_base:
         raise HTTPException(status_code=404, detail="知识库不存在")
 
-    # 创建文档
+    # 创建文档（索引在后台任务中完成）
     document = Document(
         knowledge_base_id=knowledge_base_id,
         title=document_data.title,
         content=document_data.content,
         file_url=document_data.file_url,
         file_type=document_data.file_type,
+        status=DocumentStatus.PENDING,
     )
 
     db.add(document)
     db.commit()
     db.refresh(document)
 
-    # 索引到向量数据库
-    try:
-        rag_service = create_rag_service(db)
-        index_result = await rag_service.index_document(
-            knowledge_base_id=knowledge_base_id,
-            document_id=document.id,
-            text=document.content,
-        )
-
-        if index_result["success"]:
-            document.chunk_count = index_result["chunk_count"]
-            db.commit()
-
-    except Exception as e:
-        logger.error(f"⚠️ 文档索引失败: {e}")
+    _enqueue_indexing(db, document, user_id=current_user.id)
 
     return document
 
@@ -335,7 +368,10 @@ async def upload_document(
     current_user: User = Depends(get_current_user),
 ):
     """
-    上传文档文件（支持 PDF/TXT/Markdown）并自动解析和索引
+    上传文档文件（支持 PDF/TXT/Markdown）
+
+    立即返回 pending 状态的文档，解析和向量索引由后台任务完成，
+    可通过文档详情的 status 字段查询进度。
 
     Args:
         knowledge_base_id: 知识库 ID
@@ -360,50 +396,34 @@ async def upload_document(
     if not knowledge_base:
         raise HTTPException(status_code=404, detail="知识库不存在")
 
+    # 检查文件格式
+    file_extension = Path(file.filename or "").suffix
+    if not document_parser_service.factory.supports_format(file_extension):
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的文件格式: {file_extension}。支持的格式: {', '.join(document_parser_service.factory.get_supported_formats())}",
+        )
+
     # 保存上传的文件
     upload_result = await file_uploader.save_file(file, knowledge_base_id)
 
-    # 解析文档
-    parse_result = await document_parser_service.parse_file(upload_result["file_path"])
-
-    if not parse_result["success"]:
-        # 删除已上传的文件
-        file_uploader.delete_file(upload_result["file_path"])
-        raise HTTPException(status_code=400, detail=f"文档解析失败: {parse_result.get('error')}")
-
-    # 创建文档记录
+    # 创建文档记录（内容和索引在后台任务中完成）
     document = Document(
         knowledge_base_id=knowledge_base_id,
         title=title or upload_result["file_name"],
-        content=parse_result["text"],
+        content="",
         file_url=upload_result["relative_path"],
         file_type=upload_result["file_extension"].lstrip('.'),
         file_size=upload_result["file_size"],
-        metadata=parse_result.get("metadata"),
+        status=DocumentStatus.PENDING,
+        metadata={"file_name": upload_result["file_name"]},
     )
 
     db.add(document)
     db.commit()
     db.refresh(document)
 
-    # 索引到向量数据库
-    try:
-        rag_service = create_rag_service(db)
-        index_result = await rag_service.index_document(
-            knowledge_base_id=knowledge_base_id,
-            document_id=document.id,
-            text=document.content,
-        )
-
-        if index_result["success"]:
-            document.chunk_count = index_result["chunk_count"]
-            db.commit()
-            logger.info(f"✅ 文档上传并索引成功: {document.title}")
-        else:
-            logger.warning(f"⚠️ 文档索引失败: {index_result.get('error')}")
-
-    except Exception as e:
-        logger.error(f"⚠️ 文档索引失败: {e}")
+    _enqueue_indexing(db, document, file_path=upload_result["file_path"], user_id=current_user.id)
 
     return document
 
@@ -553,7 +573,7 @@ async def delete_document(
     # 删除向量索引
     try:
         rag_service = create_rag_service(db)
-        await rag_service.delete_document_index(document_id)
+        await rag_service.delete_document_index(document_id, knowledge_base_id)
     except Exception as e:
         print(f"⚠️ 删除向量索引失败: {e}")
 
@@ -624,6 +644,8 @@ async def rag_query_all(
     """
     使用用户的所有知识库进行 RAG 查询
 
+    只在当前用户拥有的知识库中检索（按集合分组并发检索后合并）。
+
     Args:
         question: 用户问题
         top_k: 返回最相似的前 K 个文档片段
@@ -633,12 +655,14 @@ async def rag_query_all(
     Returns:
         dict: RAG 查询结果
     """
-    # 执行 RAG 查询（不指定 knowledge_base_id，会搜索全部）
     rag_service = create_rag_service(db)
+    knowledge_base_ids = rag_service.get_user_knowledge_base_ids(current_user.id)
+
+    # 执行 RAG 查询（用户没有知识库时检索结果为空，直接生成回答）
     result = await rag_service.query(
         question=question,
-        knowledge_base_id=None,
         top_k=top_k,
+        knowledge_base_ids=knowledge_base_ids,
     )
 
     return result
@@ -3,12 +3,15 @@
 提供便捷的缓存注解，用于装饰器模式实现缓存功能
 """
 
+import asyncio
 import functools
 import hashlib
 import json
+import time
 from typing import Any, Optional, List, Callable, Union
 from functools import wraps
 
+from app.core.config import settings
 from app.services.cache_service import cache_service
 
 
@@ -120,9 +123,9 @@ def cache_invalidate(scenario: str, pattern: Optional[str] = None):
             # 先调用原函数
             result = await func(*args, **kwargs)
 
-            # 失效相关缓存
-            # 这里简化处理，实际应用中可以根据参数构建更精确的键
-            # 或者使用缓存标签批量失效
+            # 失效相关缓存：未指定 pattern 时递增场景版本号，整个场景失效
+            if pattern is None:
+                await cache_service.invalidate_scenario(scenario)
 
             return result
 
@@ -213,8 +216,8 @@ def rate_limit(max_requests: int, window: int = 60):
 
             # 构建限流键
             rate_limit_key = cache_service._generate_key(
-                scenario="rate_limit",
-                identifier=user_id,
+                "rate_limit",
+                user_id,
                 func.__name__,
             )
 
@@ -279,7 +282,10 @@ def _build_cache_key(
 
     # 获取场景默认前缀
     if key_prefix is None:
-        key_prefix = cache_service.CACHE_SCENARIOS.get(scenario, {}).get("prefix", "cache")
+        if scenario in cache_service.CACHE_SCENARIOS:
+            key_prefix = cache_service.scenario_namespace(scenario)
+        else:
+            key_prefix = "cache"
 
     # 过滤不需要参与键生成的参数（如 self, db session 等）
     filtered_args = []
@@ -335,57 +341,75 @@ def _hash_args(args: tuple, kwargs: dict) -> str:
     return hashlib.md5(hash_input.encode()).hexdigest()[:12]
 
 
-import asyncio
-
-
 # 缓存预热器
 class CacheWarmer:
     """缓存预热器 - 预加载热点数据"""
 
-    def __init__(self):
+    def __init__(self, concurrency: Optional[int] = None):
         self._warmup_tasks = []
+        self.concurrency = concurrency or settings.CACHE_WARMUP_CONCURRENCY
 
     def register_task(self, name: str, func: Callable, interval: int = None):
         """
-        注册预热任务
+        注册预热任务（同名任务只注册一次）
 
         Args:
             name: 任务名称
             func: 预热函数
             interval: 预热间隔（秒），None 表示只执行一次
         """
+        if any(task["name"] == name for task in self._warmup_tasks):
+            return
         self._warmup_tasks.append({
             "name": name,
             "func": func,
             "interval": interval,
         })
 
-    async def warmup_all(self):
-        """执行所有预热任务"""
-        for task in self._warmup_tasks:
+    async def _run_task(self, task: dict, semaphore: asyncio.Semaphore) -> bool:
+        """执行单个预热任务（受并发上限约束）"""
+        async with semaphore:
             try:
                 if asyncio.iscoroutinefunction(task["func"]):
                     await task["func"]()
                 else:
-                    task["func"]()
+                    await asyncio.to_thread(task["func"])
                 print(f"缓存预热成功: {task['name']}")
+                return True
             except Exception as e:
                 print(f"缓存预热失败: {task['name']}, 错误: {e}")
+                return False
+
+    async def _run_tasks(self, tasks: List[dict]):
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        await asyncio.gather(*(self._run_task(task, semaphore) for task in tasks))
+
+    async def warmup_all(self):
+        """并发执行所有预热任务（同时运行的任务数不超过 concurrency）"""
+        await self._run_tasks(self._warmup_tasks)
 
     async def start_periodic_warmup(self):
-        """启动周期性预热（后台任务）"""
-        while True:
-            await self.warmup_all()
-            # 计算最小间隔
-            intervals = [
-                t["interval"] for t in self._warmup_tasks
-                if t["interval"] is not None
-            ]
-            if intervals:
-                min_interval = min(intervals)
-                await asyncio.sleep(min_interval)
-            else:
-                break
+        """
+        启动周期性预热（后台任务）
+
+        每个任务按自己的间隔执行；interval 为 None 的任务只执行一次，
+        全部任务都只执行一次时返回。
+        """
+        next_run = {task["name"]: time.monotonic() for task in self._warmup_tasks}
+        while next_run:
+            now = time.monotonic()
+            due = [task for task in self._warmup_tasks if next_run.get(task["name"], float("inf")) <= now]
+            await self._run_tasks(due)
+
+            finished = time.monotonic()
+            for task in due:
+                if task["interval"] is None:
+                    next_run.pop(task["name"])
+                else:
+                    next_run[task["name"]] = finished + task["interval"]
+
+            if next_run:
+                await asyncio.sleep(max(0.0, min(next_run.values()) - time.monotonic()))
 
 
 # 全局预热器实例
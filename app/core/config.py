@@ -4,7 +4,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict
 
 
 class Settings(BaseSettings):
@@ -40,6 +40,7 @@ class Settings(BaseSettings):
     # Zhipu AI 配置
     ZHIPUAI_API_KEY: str = ""
     ZHIPUAI_MODEL: str = "glm-4"
+    ZHIPUAI_BASE_URL: str = ""  # API 地址（为空时使用 SDK 默认地址；压测时指向本地模拟服务）
 
     # Qdrant 向量数据库配置
     QDRANT_HOST: str = "localhost"
@@ -48,6 +49,27 @@ class Settings(BaseSettings):
     QDRANT_COLLECTION_NAME: str = "knowledge_vectors"
     QDRANT_VECTOR_SIZE: int = 1024  # Zhipu AI embedding 维度
     QDRANT_DISTANCE: str = "Cosine"  # 距离度量：Cosine, Euclid, Dot
+    QDRANT_LOCATION: str = ""  # 本地模式：":memory:" 或磁盘路径（为空时连接 QDRANT_HOST）
+    QDRANT_ROUTE_CACHE_TTL: int = 30  # 知识库 -> 集合路由的进程内缓存时间（秒）
+    QDRANT_QUANTIZATION: str = "none"  # 向量量化：none / scalar（int8，约 4 倍压缩）/ product（PQ）
+    QDRANT_SCALAR_QUANTILE: float = 0.99  # int8 量化的分位数截断（排除离群值）
+    QDRANT_PQ_COMPRESSION: str = "x16"  # PQ 压缩比：x4 / x8 / x16 / x32 / x64
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True  # 量化向量常驻内存
+    QDRANT_VECTORS_ON_DISK: bool = False  # 原始向量存放在磁盘（启用量化时配合使用以节省内存）
+    QDRANT_RESCORE_OVERSAMPLING: float = 2.0  # 量化检索的过采样倍数（候选用原始向量重新打分后取 top_k）
+    QDRANT_UPSERT_PAGE_SIZE: int = 64  # 每次 upsert 请求的点数（避免超出请求大小限制）
+    QDRANT_UPSERT_CONCURRENCY: int = 4  # 同一批次内并发写入的分页数
+    QDRANT_UPSERT_MAX_RETRIES: int = 3  # 单个分页写入失败后的重试次数
+    QDRANT_UPSERT_RETRY_BACKOFF: float = 0.5  # 重试退避基数（秒），按 2 的幂递增
+    QDRANT_UPSERT_WAIT: bool = True  # 是否等待写入完成；False 时异步索引，吞吐更高但写入后不能立即检索到
+
+    # 向量存储后端
+    VECTOR_STORE_BACKEND: str = "qdrant"  # qdrant / local（嵌入式，无需 Qdrant 服务）
+    RAG_LOCAL_VECTOR_PATH: str = "data/vectors"  # 本地向量存储目录
+    RAG_LOCAL_HNSW_THRESHOLD: int = 20000  # 集合点数达到该值且安装了 hnswlib 时使用 HNSW，否则暴力检索
+    RAG_LOCAL_HNSW_M: int = 16  # HNSW 每个节点的邻居数
+    RAG_LOCAL_HNSW_EF_CONSTRUCTION: int = 200  # HNSW 构建时的候选列表大小
+    RAG_LOCAL_HNSW_EF: int = 64  # HNSW 检索时的候选列表大小（越大召回越高）
 
     # Milvus 向量数据库配置（保留用于兼容）
     MILVUS_HOST: str = "localhost"
@@ -64,8 +86,39 @@ class Settings(BaseSettings):
     RAG_TOP_K: int = 5  # 检索最相似的 K 个文档片段
     RAG_CHUNK_SIZE: int = 500  # 文档分块大小（字符数）
     RAG_CHUNK_OVERLAP: int = 50  # 分块重叠大小
+    RAG_CHUNKER: str = "structured"  # 分块方式：structured（按 Token、标题与句子边界）, lines（按行与字符数）
+    RAG_CHUNK_TOKENS: int = 300  # structured 分块的块大小（Token 数）
+    RAG_CHUNK_OVERLAP_TOKENS: int = 40  # structured 分块的重叠 Token 数
     RAG_REDIS_CACHE_TTL: int = 3600  # Redis 缓存时间（秒）
     RAG_ENABLE_CACHE: bool = True  # 是否启用向量缓存
+    RAG_EMBED_BATCH_SIZE: int = 16  # 流式索引时每批向量化并写入的块数
+    RAG_EMBED_API_BATCH_SIZE: int = 16  # 每次 Embedding API 调用最多提交的文本数
+    RAG_EMBEDDING_MODEL: str = "embedding-2"  # Zhipu AI embedding 模型
+    RAG_EMBEDDING_STORE_ENABLED: bool = True  # 是否启用持久化向量存储（按内容去重）
+    RAG_EMBEDDING_LRU_SIZE: int = 10000  # 进程内向量 LRU 缓存条数
+    RAG_HYBRID_ENABLED: bool = False  # 是否启用混合检索（向量 + BM25 词法）；需 API 与 Celery worker 共享词法索引文件
+    RAG_LEXICAL_INDEX_PATH: str = "data/lexical_index.db"  # 本地词法索引（SQLite FTS5）路径，须位于 API 与 worker 同一主机的共享目录
+    RAG_RRF_K: int = 60  # 倒数排名融合的平滑常数
+    RAG_RERANK_MODE: str = "none"  # 默认重排序方式：none, mmr（可按知识库覆盖）
+    RAG_MMR_LAMBDA: float = 0.7  # MMR 相关性权重（1 为纯相关性，0 为纯多样性）
+    RAG_MMR_FETCH_MULTIPLIER: int = 4  # MMR 重排序前的候选倍数
+    RAG_DEDUP_THRESHOLD: float = 0.95  # 近重复阈值（与已选块的余弦相似度）
+    RAG_MODEL_CONTEXT_WINDOWS: Dict[str, int] = {  # 各模型上下文窗口（Token）
+        "glm-4": 128000,
+        "glm-4-air": 128000,
+        "glm-4-flash": 128000,
+        "glm-3-turbo": 128000,
+        "default": 8192,
+    }
+    RAG_MODEL_CONTEXT_BUDGETS: Dict[str, int] = {  # 各模型检索上下文 Token 上限
+        "default": 3000,
+    }
+    RAG_COMPLETION_RESERVE_TOKENS: int = 1024  # 为回答预留的 Token 数
+    RAG_RETRIEVAL_CACHE_ENABLED: bool = True  # 是否缓存检索结果（点 ID 与得分）
+    RAG_RETRIEVAL_CACHE_TTL: int = 60  # 检索结果缓存时间（秒）
+    RAG_SEARCH_TIMEOUT: float = 5.0  # 单次检索的截止时间（秒），超时的集合被放弃并返回部分结果
+    RAG_USER_KB_CACHE_TTL: int = 300  # 用户知识库 ID 列表的缓存时间（秒）
+    RAG_SLIM_PAYLOADS: bool = False  # 精简向量载荷：正文存放在 chunk_contents 表，检索后只为最终结果回填
 
     # CORS 配置
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://openspark.online"]
@@ -78,6 +131,12 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     UPLOAD_DIR: str = "uploads"
 
+    # 文档解析配置
+    DOCUMENT_PARSER_MAX_WORKERS: int = 4  # 解析进程池大小
+    DOCUMENT_PARSER_PDF_PAGES_PER_TASK: int = 50  # PDF 每个并行任务提取的页数
+    DOCUMENT_PARSER_TIMEOUT: int = 120  # 单个文档解析超时（秒）
+    DOCUMENT_STREAM_BLOCK_SIZE: int = 65536  # 流式解析时每个文本块的最大字符数
+
     # 安全配置
     ALLOWED_HOSTS: List[str] = ["openspark.online", "www.openspark.online"]
 
@@ -85,6 +144,31 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
 
+    # 服务初始化与就绪检查
+    READINESS_REQUIRED_SERVICES: List[str] = ["database", "vector_store"]  # 全部就绪前 /ready 返回 503
+    SERVICE_INIT_TIMEOUT: float = 10.0  # 单个服务初始化超时（秒）
+    SERVICE_INIT_RETRY_INTERVAL: float = 5.0  # 初始化失败的服务在后台重试的间隔（秒）
+
+    # 缓存预热配置
+    CACHE_WARMUP_CONCURRENCY: int = 3  # 同时执行的预热任务数
+
+    # 跨进程缓存失效（Redis pub/sub）
+    CACHE_INVALIDATION_ENABLED: bool = True  # 是否向其他进程广播一级缓存失效
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"  # 广播频道
+    CACHE_INVALIDATION_BATCH_INTERVAL: float = 0.01  # 失效键合并发送的等待时间（秒）
+    CACHE_INVALIDATION_BATCH_SIZE: int = 500  # 单条广播消息的最大键数
+    CACHE_L1_TTL_WITHOUT_BUS: int = 60  # 未订阅失效广播时一级缓存的最长保留时间（秒）
+
+    # 场景/标签版本号（按命名空间整体失效）
+    CACHE_GENERATION_REFRESH_INTERVAL: float = 5.0  # 未订阅失效广播时从 Redis 刷新版本号的间隔（秒）
+    CACHE_GENERATION_CLEANUP_ENABLED: bool = False  # 失效后是否在后台删除旧版本的键（否则等待 TTL 过期）
+    CACHE_CLEANUP_BATCH_SIZE: int = 500  # 后台清理每批 SCAN / UNLINK 的键数
+    CACHE_TAG_COMPACTION_INTERVAL: int = 900  # 标签索引压缩（移除已过期的键）的执行间隔（秒，Celery Beat）
+
+    # 缓存分析
+    CACHE_HOT_KEYS_SAMPLE_RATE: float = 0.1  # 热点键统计的抽样比例（0 表示关闭）
+    CACHE_HOT_KEYS_CAPACITY: int = 200  # 热点键统计保留的计数器数量（Space-Saving）
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
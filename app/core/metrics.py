@@ -19,6 +19,8 @@ from fastapi import Request, Response
 from fastapi.responses import Response as FastAPIResponse
 import logging
 
+from app.core.startup_profiler import startup_profiler
+
 logger = logging.getLogger(__name__)
 
 
@@ -85,6 +87,19 @@ vector_db_operation_duration_seconds = Histogram(
     buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
 )
 
+# 业务指标 - 向量查找来源（lru / store / api）
+embedding_lookups_total = Counter(
+    'claw_ai_embedding_lookups_total',
+    '文本向量查找次数',
+    ['source']
+)
+
+# 业务指标 - 向量去重率（命中 LRU 或持久化存储的比例）
+embedding_dedupe_ratio = Gauge(
+    'claw_ai_embedding_dedupe_ratio',
+    '文本向量去重率'
+)
+
 # 数据库连接池状态
 db_pool_connections = Gauge(
     'claw_ai_db_pool_connections',
@@ -100,6 +115,36 @@ redis_operation_duration_seconds = Histogram(
     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, float('inf'))
 )
 
+# 缓存查找次数（按场景，result: l1_hit / l2_hit / miss）
+cache_requests_total = Counter(
+    'claw_ai_cache_requests_total',
+    '缓存查找次数',
+    ['scenario', 'result']
+)
+
+# 缓存查找耗时（一级缓存命中为微秒级，按 result 区分）
+cache_get_duration_seconds = Histogram(
+    'claw_ai_cache_get_duration_seconds',
+    '缓存查找耗时',
+    ['scenario', 'result'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, float('inf'))
+)
+
+# 缓存值大小（序列化后的字节数）
+cache_value_size_bytes = Histogram(
+    'claw_ai_cache_value_size_bytes',
+    '缓存值大小',
+    ['scenario'],
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+)
+
+# 启动耗时（phase: import / lifespan:<步骤> / ready / first_request）
+startup_duration_seconds = Gauge(
+    'claw_ai_startup_duration_seconds',
+    '应用启动各阶段耗时',
+    ['phase']
+)
+
 # 应用信息
 app_info = Info(
     'claw_ai_app_info',
@@ -175,6 +220,8 @@ class PrometheusMiddleware:
             # 减少活跃连接数
             http_active_connections.dec()
 
+            startup_profiler.record_first_request()
+
     def _get_path(self, request: Request) -> str:
         """获取请求路径，去除动态参数"""
         path = request.url.path
@@ -324,6 +371,17 @@ def update_db_pool_stats(active: int, idle: int):
     db_pool_connections.labels(state='idle').set(idle)
 
 
+def track_cache_get(scenario: str, result: str, duration: float):
+    """追踪缓存查找（result: l1_hit / l2_hit / miss）"""
+    cache_requests_total.labels(scenario=scenario, result=result).inc()
+    cache_get_duration_seconds.labels(scenario=scenario, result=result).observe(duration)
+
+
+def track_cache_set(scenario: str, size_bytes: int):
+    """追踪缓存写入的值大小"""
+    cache_value_size_bytes.labels(scenario=scenario).observe(size_bytes)
+
+
 # ====================
 # FastAPI 端点
 # ====================
@@ -353,3 +411,6 @@ if __name__ == "__main__":
     print("- claw_ai_ai_response_duration_seconds")
     print("- claw_ai_vector_db_operation_duration_seconds")
     print("- claw_ai_redis_operation_duration_seconds")
+    print("- claw_ai_cache_requests_total")
+    print("- claw_ai_cache_get_duration_seconds")
+    print("- claw_ai_cache_value_size_bytes")
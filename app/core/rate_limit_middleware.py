@@ -17,13 +17,20 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
     def __init__(self, app, limiter: Optional[RateLimiter] = None):
         super().__init__(app)
-        self.limiter = limiter or get_rate_limiter()
+        self._limiter = limiter
+
+    @property
+    def limiter(self) -> RateLimiter:
+        """限流器（未指定时在首次使用时取全局实例）"""
+        if self._limiter is None:
+            self._limiter = get_rate_limiter()
+        return self._limiter
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """处理请求"""
 
-        # 跳过健康检查和 metrics 端点
-        if request.url.path in ["/health", "/metrics"]:
+        # 跳过健康检查、就绪检查和 metrics 端点
+        if request.url.path in ["/health", "/ready", "/metrics"]:
             return await call_next(request)
 
         try:
@@ -0,0 +1,176 @@
+"""
+服务初始化与就绪检查
+
+外部服务（数据库、Redis 缓存、向量存储、AI 客户端、限流器）不在导入时连接，
+而是在 FastAPI lifespan 或 Celery worker 子进程启动时初始化：
+- 导入 app.main、CLI 脚本和测试不会阻塞在网络上，也不会因 Qdrant 不可用而失败
+- 初始化失败的服务记录错误，并在后台按间隔重试
+- /health 只表示进程存活；/ready 在 READINESS_REQUIRED_SERVICES 全部就绪前返回 503
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+# ==================== 各服务的初始化 ====================
+
+async def _init_database():
+    """执行 SELECT 1 确认数据库可连接"""
+    from app.db.database import engine
+
+    def ping():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    await asyncio.to_thread(ping)
+
+
+async def _init_cache():
+    """连接 Redis 缓存（失败时缓存服务降级为不缓存）"""
+    from app.services.cache_service import cache_service
+
+    if not cache_service._connected and not await cache_service.connect():
+        raise ConnectionError("Redis 缓存连接失败")
+
+
+async def _init_vector_store():
+    """连接向量存储并确保集合存在"""
+    from app.services.vector_service import init_vector_service
+
+    await init_vector_service()
+
+
+async def _init_ai():
+    """创建 Zhipu AI 客户端"""
+    from app.services.ai_service import get_ai_service
+
+    get_ai_service()
+
+
+async def _init_rate_limiter():
+    """创建限流器并确认 Redis 可用"""
+    from app.core.rate_limit import get_rate_limiter
+
+    limiter = get_rate_limiter()
+    await asyncio.to_thread(limiter.redis.ping)
+
+
+SERVICE_INITIALIZERS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "database": _init_database,
+    "cache": _init_cache,
+    "vector_store": _init_vector_store,
+    "ai": _init_ai,
+    "rate_limiter": _init_rate_limiter,
+}
+
+
+# ==================== 就绪状态 ====================
+
+class ServiceReadiness:
+    """记录各服务的初始化状态，并在后台重试失败的服务"""
+
+    def __init__(self, initializers: Optional[Dict[str, Callable[[], Awaitable[None]]]] = None):
+        self.initializers = initializers if initializers is not None else SERVICE_INITIALIZERS
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"ready": False, "error": None, "attempts": 0, "elapsed_ms": None}
+            for name in self.initializers
+        }
+        self._retry_task: Optional[asyncio.Task] = None
+
+    @property
+    def required(self) -> List[str]:
+        return [name for name in settings.READINESS_REQUIRED_SERVICES if name in self.initializers]
+
+    def is_ready(self, name: str) -> bool:
+        return self._status.get(name, {}).get("ready", False)
+
+    @property
+    def ready(self) -> bool:
+        """必需服务是否全部就绪"""
+        return all(self.is_ready(name) for name in self.required)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """就绪状态（/ready 的响应内容）"""
+        return {
+            "ready": self.ready,
+            "required": self.required,
+            "services": {name: dict(status) for name, status in self._status.items()},
+        }
+
+    async def _init_one(self, name: str) -> bool:
+        """初始化单个服务，记录结果"""
+        status = self._status[name]
+        status["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.initializers[name](), timeout=settings.SERVICE_INIT_TIMEOUT)
+        except Exception as e:
+            status.update(ready=False, error=str(e) or type(e).__name__)
+            if name in self.required:
+                logger.error(f"❌ 服务初始化失败: {name}: {status['error']}")
+            else:
+                logger.warning(f"⚠️ 服务初始化失败（降级运行）: {name}: {status['error']}")
+            return False
+        finally:
+            status["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        status.update(ready=True, error=None)
+        logger.info(f"✅ 服务已就绪: {name}（{status['elapsed_ms']} ms）")
+        return True
+
+    async def initialize(self) -> bool:
+        """
+        并发初始化全部服务，失败的服务在后台按间隔重试
+
+        Returns:
+            bool: 必需服务是否全部就绪
+        """
+        await asyncio.gather(*(self._init_one(name) for name in self.initializers))
+        pending = [name for name in self.initializers if not self.is_ready(name)]
+        if pending and self._retry_task is None:
+            self._retry_task = asyncio.create_task(self._retry(pending))
+        return self.ready
+
+    async def _retry(self, pending: List[str]):
+        while pending:
+            await asyncio.sleep(settings.SERVICE_INIT_RETRY_INTERVAL)
+            results = await asyncio.gather(*(self._init_one(name) for name in pending))
+            pending = [name for name, ok in zip(pending, results) if not ok]
+        self._retry_task = None
+
+    async def shutdown(self):
+        """停止后台重试并断开缓存连接"""
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            self._retry_task = None
+        if self.is_ready("cache"):
+            from app.services.cache_service import cache_service
+
+            await cache_service.disconnect()
+
+
+# 全局就绪状态实例
+service_readiness = ServiceReadiness()
+
+
+def init_worker_services():
+    """
+    Celery worker 子进程启动时初始化任务用到的服务
+
+    连接不能跨 fork 共享，所以在子进程中（worker_process_init）而不是主进程中创建；
+    失败时只记录日志，任务执行时会通过 get_* 重新尝试。
+    """
+    from app.services.ai_service import get_ai_service
+    from app.services.vector_service import get_vector_service
+
+    for name, init in (("vector_store", get_vector_service), ("ai", get_ai_service)):
+        try:
+            init()
+        except Exception as e:
+            logger.warning(f"⚠️ worker 服务初始化失败: {name}: {e}")
@@ -0,0 +1,86 @@
+"""
+启动耗时分析
+
+记录应用冷启动各阶段的耗时（从导入 app.main 开始计时）：
+- import：app.main 模块导入完成（路由、中间件注册完毕）
+- lifespan:<步骤>：lifespan 中每个启动步骤的耗时
+- ready：lifespan 启动完成，开始接受请求
+- first_request：第一个请求处理完成
+
+各阶段通过 Prometheus 指标 claw_ai_startup_duration_seconds{phase} 导出；
+各模块的导入耗时由 scripts/profile_startup.py 用 python -X importtime 统计。
+
+本模块只依赖标准库，以便在 app.main 的第一行导入、尽早开始计时。
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class StartupProfiler:
+    """启动耗时记录器"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: Dict[str, float] = {}  # 阶段 -> 距计时起点的秒数
+        self.steps: Dict[str, float] = {}  # 启动步骤 -> 耗时（秒）
+
+    def _export(self, phase: str, seconds: float):
+        from app.core import metrics
+
+        metrics.startup_duration_seconds.labels(phase=phase).set(seconds)
+
+    def mark(self, phase: str) -> float:
+        """
+        记录一个阶段完成的时刻
+
+        Args:
+            phase: 阶段名称（import / ready / first_request）
+
+        Returns:
+            float: 距计时起点的秒数
+        """
+        elapsed = time.perf_counter() - self.origin
+        self.phases[phase] = elapsed
+        self._export(phase, elapsed)
+        return elapsed
+
+    def record_step(self, name: str, seconds: float):
+        """记录一个启动步骤的耗时"""
+        self.steps[name] = seconds
+        self._export(f"lifespan:{name}", seconds)
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """计时一个启动步骤（出错时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_step(name, time.perf_counter() - start)
+
+    def record_first_request(self):
+        """记录第一个请求完成的时刻（之后的调用直接返回）"""
+        if "first_request" not in self.phases:
+            self.mark("first_request")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各阶段耗时（毫秒）"""
+        return {
+            "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in self.phases.items()},
+            "steps_ms": {name: round(seconds * 1000, 2) for name, seconds in self.steps.items()},
+        }
+
+    def summary(self) -> Optional[str]:
+        """一行启动耗时摘要（未记录 ready 时返回 None）"""
+        if "ready" not in self.phases:
+            return None
+        parts = [f"导入 {self.phases.get('import', 0) * 1000:.0f} ms"]
+        parts += [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.steps.items()]
+        parts.append(f"就绪 {self.phases['ready'] * 1000:.0f} ms")
+        return "，".join(parts)
+
+
+# 全局启动耗时记录器（导入本模块时开始计时）
+startup_profiler = StartupProfiler()
@@ -3,6 +3,9 @@ CLAW.AI - Backend Application
 主应用程序入口
 """
 
+from app.core.startup_profiler import startup_profiler  # 最先导入：启动耗时从这里开始计时
+
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -11,10 +14,21 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.core import metrics
 from app.core.rate_limit_middleware import RateLimitMiddleware
-from app.core.rate_limit import get_rate_limiter
+from app.core.readiness import service_readiness
 from app.api import auth, users, conversations, knowledge, consulting, ws, configs, rate_limit, tasks, cache
 
 
+async def warmup_caches():
+    """后台执行缓存预热（应用无需等待预热完成即可接受请求）"""
+    try:
+        with startup_profiler.step("cache_warmup"):
+            from app.services.cache_warmup import cache_warmup_initializer
+            await cache_warmup_initializer.warmup_all()
+        print("🔥 缓存预热完成")
+    except Exception as e:
+        print(f"⚠️  缓存预热失败: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
@@ -22,31 +36,38 @@ async def lifespan(app: FastAPI):
     print(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} 启动中...")
 
     # 初始化应用信息指标
-    metrics.init_app_metrics(
-        app_name=settings.APP_NAME,
-        app_version=settings.APP_VERSION
-    )
+    with startup_profiler.step("init_metrics"):
+        metrics.init_app_metrics(
+            app_name=settings.APP_NAME,
+            app_version=settings.APP_VERSION
+        )
 
     print("📊 Prometheus metrics initialized")
 
-    # 连接缓存服务
-    from app.services.cache_service import cache_service
-    cache_connected = await cache_service.connect()
-    if cache_connected:
-        print("💾 缓存服务已连接")
+    # 初始化外部服务（数据库、缓存、向量存储、AI、限流器），失败的服务在后台重试
+    with startup_profiler.step("init_services"):
+        services_ready = await service_readiness.initialize()
+    for name, status in service_readiness.snapshot()["services"].items():
+        startup_profiler.record_step(f"service:{name}", status["elapsed_ms"] / 1000)
+    if services_ready:
+        print("✅ 服务初始化完成")
     else:
-        print("⚠️  缓存服务连接失败，将使用内存缓存")
+        print(f"⚠️  必需服务未就绪，/ready 将返回 503: {service_readiness.snapshot()['services']}")
 
-    # 执行缓存预热
-    from app.services.cache_warmup import cache_warmup_initializer
-    try:
-        await cache_warmup_initializer.warmup_all()
-        print("🔥 缓存预热完成")
-    except Exception as e:
-        print(f"⚠️  缓存预热失败: {e}")
+    # 缓存预热在后台执行
+    warmup_task = asyncio.create_task(warmup_caches())
+
+    startup_profiler.mark("ready")
+    print(f"⏱️  启动耗时: {startup_profiler.summary()}")
 
     yield
     # 关闭时执行
+    warmup_task.cancel()
+    await service_readiness.shutdown()
+
+    from app.services.document_parser import shutdown_parser_pool
+    shutdown_parser_pool()
+
     print(f"👋 {settings.APP_NAME} 已关闭")
 
 
@@ -72,8 +93,9 @@ app.add_middleware(
 # 添加 Prometheus 监控中间件
 app.add_middleware(metrics.PrometheusMiddleware)
 
-# 添加限流中间件
-app.add_middleware(RateLimitMiddleware, limiter=get_rate_limiter())
+# 添加限流中间件（限流器在首个请求时创建，导入时不连接 Redis）
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
 
 # 健康检查
@@ -89,6 +111,20 @@ async def health_check():
         }
     )
 
+# 就绪检查（必需服务全部初始化成功后才返回 200）
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查接口"""
+    snapshot = service_readiness.snapshot()
+    return JSONResponse(
+        status_code=200 if snapshot["ready"] else 503,
+        content={
+            "status": "ready" if snapshot["ready"] else "not_ready",
+            **snapshot,
+        }
+    )
+
+
 # Prometheus 指标端点
 @app.get("/metrics")
 async def metrics_endpoint():
@@ -121,6 +157,10 @@ async def root():
     }
 
 
+# app.main 导入完成（路由与中间件已注册）
+startup_profiler.mark("import")
+
+
 if __name__ == "__main__":
     import uvicorn
 
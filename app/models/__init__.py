@@ -4,8 +4,10 @@ from app.models.user import User, SubscriptionTier
 from app.models.conversation import Conversation, ConversationStatus, ConversationType
 from app.models.message import Message, MessageRole
 from app.models.knowledge_base import KnowledgeBase
-from app.models.document import Document
+from app.models.document import Document, DocumentStatus
 from app.models.config import Config, ConfigHistory
+from app.models.embedding import EmbeddingCache
+from app.models.chunk_content import ChunkContent
 
 __all__ = [
     "User",
@@ -17,6 +19,9 @@ __all__ = [
     "MessageRole",
     "KnowledgeBase",
     "Document",
+    "DocumentStatus",
     "Config",
     "ConfigHistory",
+    "EmbeddingCache",
+    "ChunkContent",
 ]
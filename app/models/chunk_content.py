@@ -0,0 +1,25 @@
+"""
+文本块内容模型
+启用精简载荷时，文本块正文存放在这里，向量库载荷只保留过滤字段
+"""
+
+from sqlalchemy import String, Integer, Text, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ChunkContent(Base):
+    """文本块内容表：向量点 ID -> 正文与附加载荷"""
+
+    __tablename__ = "chunk_contents"
+
+    point_id: Mapped[str] = mapped_column(String(36), primary_key=True)  # 向量点 ID（uuid5）
+    knowledge_base_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    document_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    extra: Mapped[dict | None] = mapped_column(JSON)  # 不参与过滤的载荷（长度、创建时间、文档元数据等）
+
+    def __repr__(self):
+        return f"<ChunkContent(point_id={self.point_id}, document_id={self.document_id}, chunk_index={self.chunk_index})>"
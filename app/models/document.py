@@ -3,11 +3,20 @@
 """
 
 from sqlalchemy import String, Text, ForeignKey, Integer
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+import enum
 
 from app.db.base import Base
 
 
+class DocumentStatus(str, enum.Enum):
+    """文档索引状态"""
+    PENDING = "pending"  # 等待索引
+    PROCESSING = "processing"  # 索引中
+    COMPLETED = "completed"  # 索引完成
+    FAILED = "failed"  # 索引失败
+
+
 class Document(Base):
     """文档表"""
 
@@ -21,6 +30,8 @@ class Document(Base):
     file_type: Mapped[str | None] = mapped_column(String(50))  # 文件类型（pdf/txt/md 等）
     file_size: Mapped[int | None] = mapped_column(Integer)  # 文件大小（字节）
     chunk_count: Mapped[int] = mapped_column(default=0)  # 分片数量
+    status: Mapped[str] = mapped_column(String(50), default=DocumentStatus.PENDING, index=True)  # 索引状态
+    error_message: Mapped[str | None] = mapped_column(Text)  # 最近一次索引失败的原因
     embedding_vector: Mapped[str | None] = mapped_column(String(500))  # 向量 ID（如 Pinecone vector ID）
     metadata: Mapped[dict | None] = mapped_column(default=None)
 
@@ -28,4 +39,4 @@ class Document(Base):
     knowledge_base: Mapped["KnowledgeBase"] = relationship("KnowledgeBase", back_populates="documents")
 
     def __repr__(self):
-        return f"<Document(id={self.id}, title={self.title})>"
+        return f"<Document(id={self.id}, title={self.title}, status={self.status})>"
@@ -0,0 +1,29 @@
+"""
+向量存储模型
+按内容寻址持久化保存文本向量，跨文档复用
+"""
+
+from sqlalchemy import String, Integer, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class EmbeddingCache(Base):
+    """向量存储表：(模型, 规范化文本哈希) -> float32 向量"""
+
+    __tablename__ = "embedding_cache"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    model: Mapped[str] = mapped_column(String(64), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # 规范化文本的 sha256
+    dimension: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # float32 小端字节
+
+    # 索引
+    __table_args__ = (
+        UniqueConstraint("model", "text_hash", name="uq_embedding_cache_model_hash"),
+    )
+
+    def __repr__(self):
+        return f"<EmbeddingCache(id={self.id}, model={self.model}, text_hash={self.text_hash[:12]})>"
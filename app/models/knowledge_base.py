@@ -2,7 +2,7 @@
 知识库模型
 """
 
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy import String, Text, ForeignKey, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -19,6 +19,9 @@ class KnowledgeBase(Base):
     description: Mapped[str | None] = mapped_column(Text)
     embedding_model: Mapped[str] = mapped_column(String(100), default="text-embedding-ada-002")
     metadata: Mapped[dict | None] = mapped_column(default=None)
+    retrieval_config: Mapped[dict | None] = mapped_column(JSON, default=None)  # 检索配置（重排序等），覆盖全局默认值
+    vector_collection: Mapped[str | None] = mapped_column(String(100))  # 专属 Qdrant 集合（为空时使用共享集合）
+    vector_migrating_from: Mapped[str | None] = mapped_column(String(100))  # 集合迁移中的源集合（非空时暂停写入，清理源集合后清空）
 
     # 关系
     user: Mapped["User"] = relationship("User", back_populates="knowledge_bases")
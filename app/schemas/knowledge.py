@@ -3,15 +3,24 @@
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 
+class RetrievalConfig(BaseModel):
+    """知识库检索配置（未设置的字段使用全局默认值）"""
+    rerank: Optional[Literal["none", "mmr"]] = None  # 重排序方式
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1)  # MMR 相关性权重
+    fetch_multiplier: Optional[int] = Field(None, ge=1, le=10)  # 重排序前的候选倍数
+    dedup_threshold: Optional[float] = Field(None, gt=0, le=1)  # 近重复阈值
+
+
 class KnowledgeBaseBase(BaseModel):
     """知识库基础模型"""
     name: str = Field(..., max_length=200)
     description: Optional[str] = None
     embedding_model: Optional[str] = "text-embedding-ada-002"
+    retrieval_config: Optional[RetrievalConfig] = None
 
 
 class KnowledgeBaseCreate(KnowledgeBaseBase):
@@ -23,6 +32,7 @@ class KnowledgeBaseUpdate(BaseModel):
     """更新知识库模型"""
     name: Optional[str] = None
     description: Optional[str] = None
+    retrieval_config: Optional[RetrievalConfig] = None
 
 
 class KnowledgeBaseResponse(KnowledgeBaseBase):
@@ -58,6 +68,8 @@ class DocumentResponse(DocumentBase):
     knowledge_base_id: int
     file_size: Optional[int] = None
     chunk_count: int
+    status: str = "pending"  # 索引状态：pending/processing/completed/failed
+    error_message: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
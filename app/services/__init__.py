@@ -1,7 +1,7 @@
 """Services package"""
 
-from app.services.ai_service import AIService, ai_service
+from app.services.ai_service import AIService, get_ai_service
 from app.services.conversation_service import ConversationService
 from app.services.config_service import ConfigService
 
-__all__ = ["AIService", "ai_service", "ConversationService", "ConfigService"]
+__all__ = ["AIService", "get_ai_service", "ConversationService", "ConfigService"]
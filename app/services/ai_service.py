@@ -9,6 +9,7 @@ import json
 import time
 
 from app.core.config import settings
+from app.services.context_packer import estimate_tokens
 
 
 class AIService:
@@ -16,7 +17,10 @@ class AIService:
 
     def __init__(self):
         """初始化 AI 服务"""
-        self.client = ZhipuAI(api_key=settings.ZHIPUAI_API_KEY)
+        self.client = ZhipuAI(
+            api_key=settings.ZHIPUAI_API_KEY,
+            base_url=settings.ZHIPUAI_BASE_URL or None,
+        )
         self.model = settings.ZHIPUAI_MODEL
 
     async def chat(
@@ -145,11 +149,16 @@ class AIService:
         Returns:
             int: 估算的 Token 数量
         """
-        # 粗略估算：中文字符约 1 token，英文单词约 0.75 token
-        chinese_chars = len([c for c in text if '\u4e00' <= c <= '\u9fff'])
-        other_chars = len(text) - chinese_chars
-        return int(chinese_chars + other_chars * 0.75)
+        return estimate_tokens(text)
 
 
-# 创建全局 AI 服务实例
-ai_service = AIService()
+# 全局 AI 服务实例（延迟初始化）
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """获取 AI 服务实例（首次调用时创建客户端）"""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
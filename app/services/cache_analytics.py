@@ -0,0 +1,196 @@
+"""
+缓存分析
+
+按场景统计缓存命中情况，用于按数据调整各场景的 TTL：
+- 一级缓存（进程内存）命中、二级缓存（Redis）命中、未命中的次数与查找耗时
+- 写入次数与值大小
+- 抽样的热点键 Top-K（Space-Saving 算法，内存占用固定为 capacity 个计数器）
+
+计数同时导出为 Prometheus 指标（claw_ai_cache_*，见 app/core/metrics.py）。
+"""
+
+import random
+from typing import Any, Dict, List, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+
+# 不属于任何场景的键（直接用 set 写入的自定义键）
+OTHER_SCENARIO = "other"
+
+
+class SpaceSavingSketch:
+    """
+    Space-Saving 热点统计（Stream-Summary 结构）
+
+    最多保留 capacity 个计数器。新键到来且计数器已满时，替换计数最小的键，
+    新键继承其计数（记为误差上界）。真实频率高于 N / capacity 的键一定在结果中。
+
+    计数相同的键放在同一个桶中，并记录最小计数，计数加一与淘汰都是 O(1)。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._counters: Dict[str, List[int]] = {}  # 键 -> [计数, 误差上界]
+        self._buckets: Dict[int, Dict[str, None]] = {}  # 计数 -> 该计数的键（按到达顺序）
+        self._min_count = 0
+
+    def _remove_from_bucket(self, key: str, count: int):
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if count == self._min_count:
+                # 被移除的键计数变为 count + 1（或被淘汰的键由 count + 1 的新键接替），
+                # 不存在更小的计数
+                self._min_count = count + 1
+
+    def offer(self, key: str):
+        """记录一次访问"""
+        counter = self._counters.get(key)
+        if counter is not None:
+            self._remove_from_bucket(key, counter[0])
+            counter[0] += 1
+            self._buckets.setdefault(counter[0], {})[key] = None
+            return
+
+        if len(self._counters) < self.capacity:
+            self._counters[key] = [1, 0]
+            self._buckets.setdefault(1, {})[key] = None
+            self._min_count = 1
+            return
+
+        # 淘汰计数最小的桶中最早到达的键
+        floor = self._min_count
+        evicted = next(iter(self._buckets[floor]))
+        self._remove_from_bucket(evicted, floor)
+        del self._counters[evicted]
+        self._counters[key] = [floor + 1, floor]
+        self._buckets.setdefault(floor + 1, {})[key] = None
+
+    def top(self, limit: int) -> List[Tuple[str, int, int]]:
+        """计数最高的键：[(键, 计数, 误差上界)]"""
+        ranked = sorted(self._counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:limit]]
+
+    def clear(self):
+        self._counters.clear()
+        self._buckets.clear()
+        self._min_count = 0
+
+
+class CacheAnalytics:
+    """按场景的缓存统计与热点键检测"""
+
+    def __init__(self, scenarios: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            scenarios: 缓存场景配置（CacheService.CACHE_SCENARIOS）
+        """
+        self.scenarios = scenarios
+        # 按前缀长度倒序匹配，避免短前缀抢先命中
+        self._prefixes = sorted(
+            ((config["prefix"] + ":", name) for name, config in scenarios.items()),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.sample_rate = settings.CACHE_HOT_KEYS_SAMPLE_RATE
+        self.hot_keys = SpaceSavingSketch(settings.CACHE_HOT_KEYS_CAPACITY)
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def scenario_of(self, key: str) -> str:
+        """根据键前缀识别缓存场景"""
+        for prefix, name in self._prefixes:
+            if key.startswith(prefix):
+                return name
+        return OTHER_SCENARIO
+
+    def _scenario_stats(self, scenario: str) -> Dict[str, float]:
+        stats = self._stats.get(scenario)
+        if stats is None:
+            stats = self._stats[scenario] = {
+                "l1_hits": 0,
+                "l2_hits": 0,
+                "misses": 0,
+                "get_seconds": 0.0,
+                "sets": 0,
+                "set_bytes": 0,
+            }
+        return stats
+
+    def record_get(self, key: str, result: str, duration: float):
+        """
+        记录一次缓存查找
+
+        Args:
+            key: 缓存键
+            result: l1_hit / l2_hit / miss
+            duration: 查找耗时（秒）
+        """
+        scenario = self.scenario_of(key)
+        stats = self._scenario_stats(scenario)
+        stats[{"l1_hit": "l1_hits", "l2_hit": "l2_hits"}.get(result, "misses")] += 1
+        stats["get_seconds"] += duration
+        metrics.track_cache_get(scenario, result, duration)
+
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            self.hot_keys.offer(key)
+
+    def record_set(self, key: str, size_bytes: int):
+        """记录一次缓存写入"""
+        scenario = self.scenario_of(key)
+        stats = self._scenario_stats(scenario)
+        stats["sets"] += 1
+        stats["set_bytes"] += size_bytes
+        metrics.track_cache_set(scenario, size_bytes)
+
+    def scenario_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各场景的统计
+
+        Returns:
+            Dict: {场景: {命中/未命中次数、命中率、一级缓存命中占比、平均查找耗时、平均值大小、TTL}}
+        """
+        result = {}
+        for scenario, stats in sorted(self._stats.items()):
+            hits = stats["l1_hits"] + stats["l2_hits"]
+            lookups = hits + stats["misses"]
+            result[scenario] = {
+                "l1_hits": int(stats["l1_hits"]),
+                "l2_hits": int(stats["l2_hits"]),
+                "misses": int(stats["misses"]),
+                "hit_rate": round(hits / lookups * 100, 2) if lookups else 0,
+                "l1_hit_ratio": round(stats["l1_hits"] / hits * 100, 2) if hits else 0,
+                "avg_get_ms": round(stats["get_seconds"] / lookups * 1000, 3) if lookups else 0,
+                "sets": int(stats["sets"]),
+                "avg_value_bytes": int(stats["set_bytes"] / stats["sets"]) if stats["sets"] else 0,
+                "ttl": self.scenarios.get(scenario, {}).get("ttl"),
+            }
+        return result
+
+    def top_keys(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        抽样统计的热点键
+
+        Args:
+            limit: 返回的键数
+
+        Returns:
+            List[Dict]: 键、所属场景、估算访问次数（已按抽样率换算）及误差上界
+        """
+        scale = 1 / self.sample_rate if self.sample_rate > 0 else 0
+        return [
+            {
+                "key": key,
+                "scenario": self.scenario_of(key),
+                "estimated_count": round(count * scale),
+                "error": round(error * scale),
+            }
+            for key, count, error in self.hot_keys.top(limit)
+        ]
+
+    def reset(self):
+        """重置统计（Prometheus 计数器不受影响）"""
+        self._stats.clear()
+        self.hot_keys.clear()
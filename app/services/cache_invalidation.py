@@ -0,0 +1,202 @@
+"""
+跨进程缓存失效广播
+
+每个 uvicorn worker 各有一份进程内一级缓存（_memory_cache）。
+某个 worker 删除或改写缓存后，通过 Redis pub/sub 把失效的键广播给其他 worker，
+其他 worker 从各自的一级缓存中移除这些键，下次读取时回源 Redis。
+
+- 合并发送：短时间内的失效键合并为一条消息（最多 CACHE_INVALIDATION_BATCH_SIZE 个键）
+- 场景/标签的版本号（generation）递增后广播新版本号，其他进程据此切换键命名空间
+- 订阅连接断开期间可能错过消息，(重新)订阅成功后清空整个一级缓存
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class CacheInvalidationBus:
+    """基于 Redis pub/sub 的一级缓存失效广播"""
+
+    def __init__(
+        self,
+        redis_client,
+        on_invalidate: Callable[[List[str]], Awaitable[None]],
+        on_flush: Callable[[], Awaitable[None]],
+        channel: Optional[str] = None,
+        on_generations: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None,
+    ):
+        """
+        Args:
+            redis_client: 异步 Redis 客户端（订阅使用连接池中的独立连接）
+            on_invalidate: 收到其他进程的失效键时调用
+            on_flush: 收到清空广播、或订阅（重新）建立时调用
+            channel: 频道名称（默认 CACHE_INVALIDATION_CHANNEL）
+            on_generations: 收到其他进程递增的版本号时调用
+        """
+        self.redis = redis_client
+        self.on_invalidate = on_invalidate
+        self.on_flush = on_flush
+        self.on_generations = on_generations
+        self.channel = channel or settings.CACHE_INVALIDATION_CHANNEL
+        self.origin = uuid.uuid4().hex  # 忽略自己发出的消息
+
+        self._pending: Set[str] = set()
+        self._pending_flush = False
+        self._pending_generations: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._subscribed = False
+        self.stats: Dict[str, int] = {
+            "keys_published": 0,
+            "messages_published": 0,
+            "messages_received": 0,
+            "keys_invalidated": 0,
+            "flushes": 0,
+            "generations_received": 0,
+            "reconnects": 0,
+            "errors": 0,
+        }
+
+    @property
+    def connected(self) -> bool:
+        """是否已订阅频道（未订阅时可能错过其他进程的失效消息）"""
+        return self._subscribed
+
+    # ==================== 发布 ====================
+
+    def publish(self, keys: Iterable[str]):
+        """广播失效的键（合并后异步发送，不阻塞调用方）"""
+        if not self._tasks:
+            return
+        self._pending.update(keys)
+        self._wakeup.set()
+
+    def publish_flush(self):
+        """广播清空全部一级缓存"""
+        if not self._tasks:
+            return
+        self._pending_flush = True
+        self._pending.clear()
+        self._wakeup.set()
+
+    def publish_generations(self, generations: Dict[str, int]):
+        """广播递增后的版本号（{"scenario:<场景>" / "tag:<标签>": 版本号}）"""
+        if not self._tasks:
+            return
+        for name, generation in generations.items():
+            self._pending_generations[name] = max(generation, self._pending_generations.get(name, 0))
+        self._wakeup.set()
+
+    async def _send(self, message: Dict):
+        message["origin"] = self.origin
+        await self.redis.publish(self.channel, json.dumps(message, ensure_ascii=False))
+        self.stats["messages_published"] += 1
+
+    async def _publisher(self):
+        batch_size = max(1, settings.CACHE_INVALIDATION_BATCH_SIZE)
+        while True:
+            await self._wakeup.wait()
+            # 等待一个合并窗口，收集这段时间内的其他失效键
+            if len(self._pending) < batch_size:
+                await asyncio.sleep(settings.CACHE_INVALIDATION_BATCH_INTERVAL)
+            self._wakeup.clear()
+
+            flush, self._pending_flush = self._pending_flush, False
+            generations, self._pending_generations = self._pending_generations, {}
+            keys, self._pending = list(self._pending), set()
+            try:
+                if flush:
+                    await self._send({"flush": True})
+                if generations:
+                    await self._send({"generations": generations})
+                for start in range(0, len(keys), batch_size):
+                    await self._send({"keys": keys[start:start + batch_size]})
+                self.stats["keys_published"] += len(keys)
+            except Exception as e:
+                # 发送失败时其他进程的一级缓存最多保留到 TTL 过期
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ 缓存失效广播发送失败（{len(keys)} 个键）: {e}")
+
+    # ==================== 订阅 ====================
+
+    async def _handle(self, data):
+        message = json.loads(data)
+        if message.get("origin") == self.origin:
+            return
+        self.stats["messages_received"] += 1
+        if message.get("flush"):
+            self.stats["flushes"] += 1
+            await self.on_flush()
+        generations = message.get("generations")
+        if generations and self.on_generations:
+            self.stats["generations_received"] += len(generations)
+            await self.on_generations(generations)
+        keys = message.get("keys") or []
+        if keys:
+            self.stats["keys_invalidated"] += len(keys)
+            await self.on_invalidate(keys)
+
+    async def _subscriber(self):
+        backoff = 0.5
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._subscribed = True
+                backoff = 0.5
+                # 断开期间可能错过了失效消息，清空一级缓存
+                await self.on_flush()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self._handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ 缓存失效订阅中断，{backoff:.1f}s 后重连: {e}")
+            finally:
+                self._subscribed = False
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """启动订阅与发送任务"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._subscriber()),
+            asyncio.create_task(self._publisher()),
+        ]
+        logger.info(f"✅ 缓存失效广播已启动: {self.channel}")
+
+    async def stop(self):
+        """停止任务，尽力发送尚未发出的失效键"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._subscribed = False
+
+        try:
+            if self._pending_flush:
+                await self._send({"flush": True})
+            if self._pending_generations:
+                await self._send({"generations": self._pending_generations})
+            if self._pending:
+                await self._send({"keys": list(self._pending)})
+        except Exception as e:
+            logger.warning(f"⚠️ 缓存失效广播发送失败（{len(self._pending)} 个键）: {e}")
+        self._pending, self._pending_flush, self._pending_generations = set(), False, {}
@@ -6,7 +6,7 @@
 import json
 import hashlib
 import time
-from typing import Any, Optional, List, Dict, Union, Callable
+from typing import Any, Optional, List, Dict, Set, Tuple, Union, Callable
 from functools import wraps
 from datetime import timedelta
 import asyncio
@@ -16,13 +16,22 @@ from redis.asyncio import Redis as AsyncRedis
 from redis.connection import ConnectionPool
 
 from app.core.config import settings
+from app.services.cache_analytics import CacheAnalytics
+from app.services.cache_invalidation import CacheInvalidationBus
 
 
 # 内存缓存存储（一级缓存）
 _memory_cache: Dict[str, Dict[str, Any]] = {}
 _memory_lock = asyncio.Lock()
 
-# 缓存统计
+# 一级缓存失效计数（键 -> 移除次数，_FLUSH_COUNTER 记录整体清空次数）：
+# 从二级缓存回填前后计数不同，说明期间键被移除（如收到失效广播），放弃回填。
+# 只在有回填进行中时计数，回填全部结束后清空
+_invalidation_counts: Dict[str, int] = {}
+_FLUSH_COUNTER = "\0flush"
+_fills_in_flight = 0
+
+# 缓存统计（重置时原地清零，保持引用不变）
 _cache_stats = {
     "hits": 0,
     "misses": 0,
@@ -31,6 +40,63 @@ _cache_stats = {
     "errors": 0,
 }
 
+# 场景/标签版本号（generation）的 Redis 哈希，字段为 "scenario:<场景>" / "tag:<标签>"
+GENERATIONS_KEY = "cache:generations"
+
+# 带标签的缓存值在 Redis 中的包装字段：{"__cache_tags__": {标签: 版本号}, "value": 值}
+_TAGS_FIELD = "__cache_tags__"
+
+
+async def _unlink_in_batches(redis_client, keys: List[str], batch_size: int) -> int:
+    """分批 UNLINK（内存在后台线程释放，单条命令的键数有上限）"""
+    batch_size = max(1, batch_size)
+    removed = 0
+    for start in range(0, len(keys), batch_size):
+        removed += await redis_client.unlink(*keys[start:start + batch_size])
+    return removed
+
+
+async def compact_tag_indexes(redis_client, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    移除标签索引（tag:* 集合）中已过期的键
+
+    写入时标签集合只增不减，成员键过期后仍留在集合中。
+    逐个集合 SSCAN，每批用一次流水线 EXISTS 检查，SREM 掉已不存在的键（集合为空时 Redis 自动删除）。
+
+    Args:
+        redis_client: 异步 Redis 客户端
+        batch_size: 每批检查的键数（默认 CACHE_CLEANUP_BATCH_SIZE）
+
+    Returns:
+        Dict[str, int]: {"tag_sets": 扫描的集合数, "scanned": 检查的键数, "removed": 移除的键数}
+    """
+    batch_size = max(1, batch_size or settings.CACHE_CLEANUP_BATCH_SIZE)
+    stats = {"tag_sets": 0, "scanned": 0, "removed": 0}
+
+    async def prune(tag_key: str, members: List[str]):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.exists(member)
+            exists = await pipe.execute()
+        dead = [member for member, alive in zip(members, exists) if not alive]
+        if dead:
+            await redis_client.srem(tag_key, *dead)
+        stats["scanned"] += len(members)
+        stats["removed"] += len(dead)
+
+    async for tag_key in redis_client.scan_iter(match="tag:*", count=batch_size, _type="set"):
+        stats["tag_sets"] += 1
+        batch = []
+        async for member in redis_client.sscan_iter(tag_key, count=batch_size):
+            batch.append(member)
+            if len(batch) >= batch_size:
+                await prune(tag_key, batch)
+                batch = []
+        if batch:
+            await prune(tag_key, batch)
+
+    return stats
+
 
 class CacheService:
     """缓存服务类 - 支持多级缓存和缓存标签"""
@@ -70,6 +136,10 @@ class CacheService:
         self._async_redis_pool = None
         self._async_redis_client = None
         self._connected = False
+        self._invalidation_bus: Optional[CacheInvalidationBus] = None
+        self._generations: Dict[str, int] = {}  # 本进程已知的场景/标签版本号
+        self._generations_loaded_at = 0.0
+        self._cleanup_tasks: Set[asyncio.Task] = set()
 
     async def connect(self):
         """连接到 Redis"""
@@ -91,6 +161,17 @@ class CacheService:
             # 测试连接
             await self._async_redis_client.ping()
             self._connected = True
+            await self._load_generations()
+
+            # 跨进程一级缓存失效广播
+            if settings.CACHE_INVALIDATION_ENABLED and self._invalidation_bus is None:
+                self._invalidation_bus = CacheInvalidationBus(
+                    self._async_redis_client,
+                    on_invalidate=self._evict_local,
+                    on_flush=self._flush_local,
+                    on_generations=self._apply_generations,
+                )
+                await self._invalidation_bus.start()
             return True
         except Exception as e:
             print(f"Redis 连接失败: {e}")
@@ -99,6 +180,12 @@ class CacheService:
 
     async def disconnect(self):
         """断开 Redis 连接"""
+        for task in list(self._cleanup_tasks):
+            task.cancel()
+        await asyncio.gather(*self._cleanup_tasks, return_exceptions=True)
+        if self._invalidation_bus:
+            await self._invalidation_bus.stop()
+            self._invalidation_bus = None
         if self._async_redis_client:
             await self._async_redis_client.close()
         if self._redis_client:
@@ -119,7 +206,7 @@ class CacheService:
         if scenario not in self.CACHE_SCENARIOS:
             raise ValueError(f"未知的缓存场景: {scenario}")
 
-        prefix = self.CACHE_SCENARIOS[scenario]["prefix"]
+        prefix = self.scenario_namespace(scenario)
 
         # 如果有额外参数，使用 hash 简化
         if args:
@@ -139,40 +226,72 @@ class CacheService:
         Returns:
             缓存值，如果不存在返回 None
         """
+        start = time.perf_counter()
+        value, result = await self._lookup(key)
+        if result:
+            cache_analytics.record_get(key, result, time.perf_counter() - start)
+        return value
+
+    async def _lookup(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        依次查找一级、二级缓存
+
+        Returns:
+            Tuple: (缓存值, 命中来源 l1_hit / l2_hit / miss，出错时为 None)
+        """
         try:
+            if self._generations_stale():
+                await self._load_generations()
+
             # 1. 先从内存缓存获取（一级缓存）
             async with _memory_lock:
                 if key in _memory_cache:
                     entry = _memory_cache[key]
-                    # 检查是否过期
-                    if entry["expires_at"] > time.time():
+                    # 检查是否过期（包括所属标签是否已失效）
+                    if entry["expires_at"] > time.time() and self._tags_current(entry.get("tags")):
                         _cache_stats["hits"] += 1
-                        return entry["value"]
+                        return entry["value"], "l1_hit"
                     else:
                         # 内存缓存过期，删除
                         del _memory_cache[key]
 
             # 2. 从 Redis 获取（二级缓存）
             if self._connected and self._async_redis_client:
-                value = await self._async_redis_client.get(key)
-                if value is not None:
-                    try:
-                        parsed_value = json.loads(value)
+                # 读取前记下失效计数，回填时计数已变化则不写入一级缓存
+                token = self._begin_fill(key)
+                try:
+                    value = await self._async_redis_client.get(key)
+                    if value is not None:
+                        try:
+                            parsed_value = json.loads(value)
+                        except json.JSONDecodeError:
+                            _cache_stats["hits"] += 1
+                            return value, "l2_hit"
+
+                        tags = None
+                        if isinstance(parsed_value, dict) and _TAGS_FIELD in parsed_value:
+                            tags = parsed_value[_TAGS_FIELD]
+                            await self._tag_generations(list(tags))
+                            if not self._tags_current(tags):
+                                # 标签已失效，旧值等待 TTL 过期
+                                _cache_stats["misses"] += 1
+                                return None, "miss"
+                            parsed_value = parsed_value["value"]
+
                         # 回填到内存缓存
                         ttl = await self._async_redis_client.ttl(key)
-                        await self._set_memory_cache(key, parsed_value, ttl)
+                        await self._set_memory_cache(key, parsed_value, ttl, tags, token=token)
                         _cache_stats["hits"] += 1
-                        return parsed_value
-                    except json.JSONDecodeError:
-                        _cache_stats["hits"] += 1
-                        return value
+                        return parsed_value, "l2_hit"
+                finally:
+                    self._end_fill()
 
             _cache_stats["misses"] += 1
-            return None
+            return None, "miss"
         except Exception as e:
             _cache_stats["errors"] += 1
             print(f"缓存获取错误: {e}")
-            return None
+            return None, None
 
     async def set(
         self,
@@ -194,40 +313,355 @@ class CacheService:
             bool: 是否设置成功
         """
         try:
-            # 序列化值
-            serialized_value = json.dumps(value, ensure_ascii=False)
+            # 序列化值（带标签时记录各标签的当前版本号）
+            tag_generations = await self._tag_generations(tags) if tags else None
+            serialized_value = self._serialize(value, tag_generations)
 
             # 1. 设置内存缓存（一级缓存）
             if ttl is None:
                 ttl = 3600  # 默认 1 小时
-            await self._set_memory_cache(key, value, ttl)
+            await self._set_memory_cache(key, value, ttl, tag_generations)
 
-            # 2. 设置 Redis 缓存（二级缓存）
+            # 2. 设置 Redis 缓存（二级缓存），值与标签索引在一次流水线往返中写入
             if self._connected and self._async_redis_client:
-                await self._async_redis_client.setex(key, ttl, serialized_value)
+                async with self._async_redis_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(key, ttl, serialized_value)
+                    for tag, generation in (tag_generations or {}).items():
+                        tag_key = self._tag_index_key(tag, generation)
+                        pipe.sadd(tag_key, key)
+                        pipe.expire(tag_key, ttl + 60)
+                    await pipe.execute()
 
-                # 设置缓存标签
-                if tags:
-                    for tag in tags:
-                        tag_key = f"tag:{tag}"
-                        await self._async_redis_client.sadd(tag_key, key)
-                        await self._async_redis_client.expire(tag_key, ttl + 60)
+                # 其他进程一级缓存中的旧值失效
+                self._broadcast_invalidation([key])
 
             _cache_stats["sets"] += 1
+            cache_analytics.record_set(key, len(serialized_value))
             return True
         except Exception as e:
             _cache_stats["errors"] += 1
             print(f"缓存设置错误: {e}")
             return False
 
-    async def _set_memory_cache(self, key: str, value: Any, ttl: int):
-        """设置内存缓存"""
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+    ) -> int:
+        """
+        批量设置缓存（Redis 写入合并为一次流水线往返）
+
+        Args:
+            items: {缓存键: 缓存值}
+            ttl: 过期时间（秒），None 表示默认 1 小时
+            tags: 缓存标签列表（所有键共用）
+
+        Returns:
+            int: 设置成功的数量
+        """
+        if not items:
+            return 0
+
+        try:
+            if ttl is None:
+                ttl = 3600
+            tag_generations = await self._tag_generations(tags) if tags else None
+            serialized = {key: self._serialize(value, tag_generations) for key, value in items.items()}
+
+            # 1. 设置内存缓存（一级缓存，一次加锁）
+            expires_at = time.time() + self._l1_ttl(ttl)
+            async with _memory_lock:
+                for key, value in items.items():
+                    _memory_cache[key] = {"value": value, "expires_at": expires_at, "tags": tag_generations}
+
+            # 2. 设置 Redis 缓存（二级缓存）
+            if self._connected and self._async_redis_client:
+                async with self._async_redis_client.pipeline(transaction=False) as pipe:
+                    for key, value in serialized.items():
+                        pipe.setex(key, ttl, value)
+                    for tag, generation in (tag_generations or {}).items():
+                        tag_key = self._tag_index_key(tag, generation)
+                        pipe.sadd(tag_key, *serialized)
+                        pipe.expire(tag_key, ttl + 60)
+                    await pipe.execute()
+
+                self._broadcast_invalidation(serialized)
+
+            _cache_stats["sets"] += len(items)
+            for key, value in serialized.items():
+                cache_analytics.record_set(key, len(value))
+            return len(items)
+        except Exception as e:
+            _cache_stats["errors"] += 1
+            print(f"批量设置缓存错误: {e}")
+            return 0
+
+    async def _set_memory_cache(
+        self,
+        key: str,
+        value: Any,
+        ttl: int,
+        tags: Optional[Dict[str, int]] = None,
+        token: Optional[Tuple[int, int]] = None,
+    ):
+        """设置内存缓存（传入 token 时，键在 _begin_fill 之后被移除过则不写入）"""
         async with _memory_lock:
+            if token is not None and token != self._invalidation_token(key):
+                return
             _memory_cache[key] = {
                 "value": value,
-                "expires_at": time.time() + ttl,
+                "expires_at": time.time() + self._l1_ttl(ttl),
+                "tags": tags,
             }
 
+    @staticmethod
+    def _serialize(value: Any, tag_generations: Optional[Dict[str, int]] = None) -> bytes:
+        """序列化缓存值为 UTF-8 字节（带标签时连同标签版本号一起包装），字节数即写入 Redis 的值大小"""
+        if tag_generations:
+            value = {_TAGS_FIELD: tag_generations, "value": value}
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    # ==================== 跨进程一级缓存失效 ====================
+
+    def _l1_ttl(self, ttl: int) -> int:
+        """
+        一级缓存的过期时间
+
+        失效广播已订阅时与 Redis 一致；否则其他进程的修改无法通知到本进程，
+        最多缓存 CACHE_L1_TTL_WITHOUT_BUS 秒。
+        """
+        if ttl is None or ttl <= 0:
+            # Redis 中没有过期时间（-1）或键已不存在（-2）
+            ttl = settings.CACHE_L1_TTL_WITHOUT_BUS
+        if self._invalidation_bus and self._invalidation_bus.connected:
+            return ttl
+        return min(ttl, settings.CACHE_L1_TTL_WITHOUT_BUS)
+
+    def _broadcast_invalidation(self, keys):
+        """通知其他进程从一级缓存中移除这些键"""
+        if self._invalidation_bus:
+            self._invalidation_bus.publish(keys)
+
+    async def _evict_local(self, keys: List[str]):
+        """从本进程的一级缓存中移除键（收到其他进程的失效广播时调用）"""
+        async with _memory_lock:
+            for key in keys:
+                _memory_cache.pop(key, None)
+            self._count_invalidation(keys)
+
+    async def _flush_local(self):
+        """清空本进程的一级缓存（并重新加载版本号，订阅重建时可能错过了版本号广播）"""
+        async with _memory_lock:
+            _memory_cache.clear()
+            self._count_invalidation([_FLUSH_COUNTER])
+        await self._load_generations()
+
+    @staticmethod
+    def _invalidation_token(key: str) -> Tuple[int, int]:
+        """键的失效计数与整体清空计数"""
+        return _invalidation_counts.get(key, 0), _invalidation_counts.get(_FLUSH_COUNTER, 0)
+
+    @staticmethod
+    def _count_invalidation(keys: List[str]):
+        """记录一级缓存中的键被移除（需持有 _memory_lock；没有进行中的回填时无需记录）"""
+        if _fills_in_flight:
+            for key in keys:
+                _invalidation_counts[key] = _invalidation_counts.get(key, 0) + 1
+
+    def _begin_fill(self, key: str) -> Tuple[int, int]:
+        """开始从二级缓存回填：登记进行中的回填并返回当前失效计数"""
+        global _fills_in_flight
+        _fills_in_flight += 1
+        return self._invalidation_token(key)
+
+    def _end_fill(self):
+        """结束回填；没有进行中的回填时清空失效计数"""
+        global _fills_in_flight
+        _fills_in_flight -= 1
+        if not _fills_in_flight:
+            _invalidation_counts.clear()
+
+    # ==================== 场景/标签版本号 ====================
+    #
+    # 场景键形如 "<前缀>:v<版本号>:<标识>"，带标签的缓存值记录写入时各标签的版本号。
+    # 失效一个场景或标签只需递增版本号（O(1)），旧版本的键不再被读取，由 TTL 自然过期。
+
+    def scenario_namespace(self, scenario: str) -> str:
+        """
+        场景当前的键命名空间
+
+        Args:
+            scenario: 缓存场景
+
+        Returns:
+            str: 键前缀，如 "user:profile:v3"
+        """
+        prefix = self.CACHE_SCENARIOS[scenario]["prefix"]
+        return f"{prefix}:v{self._generations.get(f'scenario:{scenario}', 0)}"
+
+    @staticmethod
+    def _tag_index_key(tag: str, generation: int) -> str:
+        """标签索引（该版本下关联的缓存键集合）"""
+        return f"tag:{tag}:v{generation}"
+
+    def _tags_current(self, tags: Optional[Dict[str, int]]) -> bool:
+        """缓存值记录的标签版本号是否都未过期"""
+        if not tags:
+            return True
+        return all(generation >= self._generations.get(f"tag:{tag}", 0) for tag, generation in tags.items())
+
+    def _generations_stale(self) -> bool:
+        """未订阅失效广播时，按 CACHE_GENERATION_REFRESH_INTERVAL 定期从 Redis 刷新版本号"""
+        if not self._connected or (self._invalidation_bus and self._invalidation_bus.connected):
+            return False
+        return time.time() - self._generations_loaded_at > settings.CACHE_GENERATION_REFRESH_INTERVAL
+
+    async def _load_generations(self):
+        """从 Redis 重新加载所有场景及本进程已知标签的版本号"""
+        if not self._connected or not self._async_redis_client:
+            return
+
+        fields = [f"scenario:{name}" for name in self.CACHE_SCENARIOS]
+        fields += [field for field in self._generations if field.startswith("tag:")]
+        try:
+            values = await self._async_redis_client.hmget(GENERATIONS_KEY, fields)
+        except Exception as e:
+            _cache_stats["errors"] += 1
+            print(f"加载缓存版本号错误: {e}")
+            return
+
+        await self._apply_generations({field: int(value or 0) for field, value in zip(fields, values)})
+        self._generations_loaded_at = time.time()
+
+    async def _tag_generations(self, tags: List[str]) -> Dict[str, int]:
+        """标签的当前版本号（本进程未知的标签从 Redis 加载）"""
+        missing = [f"tag:{tag}" for tag in tags if f"tag:{tag}" not in self._generations]
+        if missing and self._connected and self._async_redis_client:
+            values = await self._async_redis_client.hmget(GENERATIONS_KEY, missing)
+            await self._apply_generations({field: int(value or 0) for field, value in zip(missing, values)})
+        return {tag: self._generations.get(f"tag:{tag}", 0) for tag in tags}
+
+    async def _apply_generations(self, generations: Dict[str, int]):
+        """更新本进程的版本号（只增不减），并移除一级缓存中旧版本场景的键"""
+        stale_prefixes = []
+        for field, generation in generations.items():
+            generation = int(generation)
+            previous = self._generations.get(field)
+            if previous is not None and generation <= previous:
+                continue
+            self._generations[field] = generation
+
+            scenario = field.split(":", 1)[1] if field.startswith("scenario:") else None
+            if previous is not None and scenario in self.CACHE_SCENARIOS:
+                stale_prefixes.append(f"{self.CACHE_SCENARIOS[scenario]['prefix']}:v{previous}:")
+
+        if stale_prefixes:
+            prefixes = tuple(stale_prefixes)
+            async with _memory_lock:
+                for key in [key for key in _memory_cache if key.startswith(prefixes)]:
+                    del _memory_cache[key]
+
+    async def _bump_generations(self, fields: List[str], cleanup: Optional[bool] = None) -> Dict[str, int]:
+        """
+        递增版本号并通知其他进程
+
+        Args:
+            fields: 版本号字段（"scenario:<场景>" / "tag:<标签>"）
+            cleanup: 是否在后台删除旧版本的键（默认 CACHE_GENERATION_CLEANUP_ENABLED）
+
+        Returns:
+            Dict[str, int]: 递增后的版本号
+        """
+        if not self._connected or not self._async_redis_client:
+            # 只有一级缓存可用，直接清空
+            async with _memory_lock:
+                _memory_cache.clear()
+                self._count_invalidation([_FLUSH_COUNTER])
+            return {field: self._generations.get(field, 0) for field in fields}
+
+        async with self._async_redis_client.pipeline(transaction=False) as pipe:
+            for field in fields:
+                pipe.hincrby(GENERATIONS_KEY, field, 1)
+            values = await pipe.execute()
+        generations = dict(zip(fields, values))
+
+        await self._apply_generations(generations)
+        if self._invalidation_bus:
+            self._invalidation_bus.publish_generations(generations)
+
+        if cleanup is None:
+            cleanup = settings.CACHE_GENERATION_CLEANUP_ENABLED
+        if cleanup:
+            for field, generation in generations.items():
+                task = asyncio.create_task(self._cleanup_generation(field, generation - 1))
+                self._cleanup_tasks.add(task)
+                task.add_done_callback(self._cleanup_tasks.discard)
+
+        return generations
+
+    async def _cleanup_generation(self, field: str, generation: int):
+        """后台删除旧版本的键（SCAN/SSCAN 分批 UNLINK，不阻塞 Redis）"""
+        kind, name = field.split(":", 1)
+        batch_size = settings.CACHE_CLEANUP_BATCH_SIZE
+        redis_client = self._async_redis_client
+
+        if kind == "scenario":
+            prefix = self.CACHE_SCENARIOS[name]["prefix"]
+            index_key = None
+            keys = redis_client.scan_iter(match=f"{prefix}:v{generation}:*", count=batch_size)
+        else:
+            index_key = self._tag_index_key(name, generation)
+            keys = redis_client.sscan_iter(index_key, count=batch_size)
+
+        removed = 0
+        batch = []
+        try:
+            async for key in keys:
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    removed += await _unlink_in_batches(redis_client, batch, batch_size)
+                    batch = []
+            removed += await _unlink_in_batches(redis_client, batch, batch_size)
+            if index_key:
+                await redis_client.unlink(index_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _cache_stats["errors"] += 1
+            print(f"清理旧版本缓存错误（{field} v{generation}）: {e}")
+            return
+        print(f"🧹 已清理 {field} v{generation} 的 {removed} 个缓存")
+
+    async def invalidate_scenario(self, scenario: str) -> int:
+        """
+        失效场景下的所有缓存（递增场景版本号）
+
+        Args:
+            scenario: 缓存场景
+
+        Returns:
+            int: 场景的新版本号
+        """
+        if scenario not in self.CACHE_SCENARIOS:
+            raise ValueError(f"未知的缓存场景: {scenario}")
+        field = f"scenario:{scenario}"
+        generations = await self._bump_generations([field])
+        return generations[field]
+
+    async def invalidate_tags(self, tags: List[str]) -> Dict[str, int]:
+        """
+        失效标签关联的所有缓存（递增标签版本号）
+
+        Args:
+            tags: 标签列表
+
+        Returns:
+            Dict[str, int]: {标签: 新版本号}
+        """
+        generations = await self._bump_generations([f"tag:{tag}" for tag in tags])
+        return {field.split(":", 1)[1]: generation for field, generation in generations.items()}
+
     async def delete(self, key: str) -> bool:
         """
         删除缓存
@@ -243,10 +677,12 @@ class CacheService:
             async with _memory_lock:
                 if key in _memory_cache:
                     del _memory_cache[key]
+                self._count_invalidation([key])
 
             # 删除 Redis 缓存
             if self._connected and self._async_redis_client:
                 await self._async_redis_client.delete(key)
+                self._broadcast_invalidation([key])
 
             _cache_stats["deletes"] += 1
             return True
@@ -255,45 +691,60 @@ class CacheService:
             print(f"缓存删除错误: {e}")
             return False
 
+    async def delete_many(self, keys: List[str]) -> int:
+        """
+        批量删除缓存（并通知其他进程失效一级缓存）
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            int: 删除的缓存数量
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+
+        try:
+            await self._evict_local(keys)
+
+            if self._connected and self._async_redis_client:
+                await _unlink_in_batches(self._async_redis_client, keys, settings.CACHE_CLEANUP_BATCH_SIZE)
+                self._broadcast_invalidation(keys)
+
+            _cache_stats["deletes"] += len(keys)
+            return len(keys)
+        except Exception as e:
+            _cache_stats["errors"] += 1
+            print(f"批量删除缓存错误: {e}")
+            return 0
+
     async def delete_by_tags(self, tags: List[str]) -> int:
         """
         根据标签批量删除缓存
 
+        递增标签版本号（旧值在读取时立即视为未命中），
+        再在后台按标签索引分批 UNLINK 旧版本的键，大标签也不会阻塞 Redis。
+
         Args:
             tags: 标签列表
 
         Returns:
-            int: 删除的缓存数量
+            int: 失效的缓存数量（标签索引中的键数，可能包含已过期的键）
         """
         if not self._connected or not self._async_redis_client:
             return 0
 
         try:
-            keys_to_delete = set()
-
-            # 收集所有标签关联的键
-            for tag in tags:
-                tag_key = f"tag:{tag}"
-                keys = await self._async_redis_client.smembers(tag_key)
-                keys_to_delete.update(keys)
-                # 删除标签集合
-                await self._async_redis_client.delete(tag_key)
-
-            # 批量删除缓存
-            if keys_to_delete:
-                # 从内存缓存删除
-                async with _memory_lock:
-                    for key in keys_to_delete:
-                        if key in _memory_cache:
-                            del _memory_cache[key]
-
-                # 从 Redis 删除
-                await self._async_redis_client.delete(*keys_to_delete)
-
-                _cache_stats["deletes"] += len(keys_to_delete)
-                return len(keys_to_delete)
-
-            return 0
+            current = await self._tag_generations(tags)
+            async with self._async_redis_client.pipeline(transaction=False) as pipe:
+                for tag, generation in current.items():
+                    pipe.scard(self._tag_index_key(tag, generation))
+                counts = await pipe.execute()
+
+            await self._bump_generations([f"tag:{tag}" for tag in tags], cleanup=True)
+            _cache_stats["deletes"] += sum(counts)
+            return sum(counts)
         except Exception as e:
             _cache_stats["errors"] += 1
             print(f"批量删除缓存错误: {e}")
@@ -336,22 +787,21 @@ class CacheService:
         """
         清空所有缓存
 
+        清空各进程的一级缓存，并递增所有场景的版本号使 Redis 中的场景缓存整体失效。
+        不属于任何场景的自定义键由 TTL 过期。
+
         Returns:
             bool: 是否清空成功
         """
         try:
             # 清空内存缓存
-            async with _memory_lock:
-                _memory_cache.clear()
+            await self._flush_local()
+            if self._invalidation_bus:
+                self._invalidation_bus.publish_flush()
 
-            # 清空 Redis 缓存
+            # Redis 缓存：切换到新的命名空间（Redis 可能与其他组件共用，不做 FLUSHDB）
             if self._connected and self._async_redis_client:
-                pattern = f"{settings.REDIS_URL.split('/')[-1]}:*"
-                keys = []
-                async for key in self._async_redis_client.scan_iter(match=pattern):
-                    keys.append(key)
-                if keys:
-                    await self._async_redis_client.delete(*keys)
+                await self._bump_generations([f"scenario:{name}" for name in self.CACHE_SCENARIOS])
 
             return True
         except Exception as e:
@@ -359,6 +809,17 @@ class CacheService:
             print(f"清空缓存错误: {e}")
             return False
 
+    async def compact_tag_indexes(self) -> Dict[str, int]:
+        """
+        压缩标签索引：移除 tag:* 集合中已过期的键
+
+        Returns:
+            Dict[str, int]: 压缩统计
+        """
+        if not self._connected or not self._async_redis_client:
+            return {"tag_sets": 0, "scanned": 0, "removed": 0}
+        return await compact_tag_indexes(self._async_redis_client)
+
     def get_stats(self) -> Dict[str, Any]:
         """
         获取缓存统计信息
@@ -372,9 +833,12 @@ class CacheService:
             if total_requests > 0
             else 0
         )
+        scenarios = cache_analytics.scenario_stats()
 
         return {
             "hits": _cache_stats["hits"],
+            "l1_hits": sum(stats["l1_hits"] for stats in scenarios.values()),
+            "l2_hits": sum(stats["l2_hits"] for stats in scenarios.values()),
             "misses": _cache_stats["misses"],
             "sets": _cache_stats["sets"],
             "deletes": _cache_stats["deletes"],
@@ -382,19 +846,35 @@ class CacheService:
             "hit_rate": round(hit_rate, 2),
             "memory_cache_size": len(_memory_cache),
             "redis_connected": self._connected,
+            "invalidation": {
+                "enabled": self._invalidation_bus is not None,
+                "connected": bool(self._invalidation_bus and self._invalidation_bus.connected),
+                **(self._invalidation_bus.stats if self._invalidation_bus else {}),
+            },
+            "scenarios": scenarios,
         }
 
+    def get_hot_keys(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        获取抽样统计的热点键
+
+        Args:
+            limit: 返回的键数
+
+        Returns:
+            List[Dict]: 按估算访问次数倒序的热点键
+        """
+        return cache_analytics.top_keys(limit)
+
     def reset_stats(self):
         """重置缓存统计"""
-        global _cache_stats
-        _cache_stats = {
-            "hits": 0,
-            "misses": 0,
-            "sets": 0,
-            "deletes": 0,
-            "errors": 0,
-        }
+        for name in _cache_stats:
+            _cache_stats[name] = 0
+        cache_analytics.reset()
+
 
+# 按场景的缓存统计与热点键
+cache_analytics = CacheAnalytics(CacheService.CACHE_SCENARIOS)
 
 # 全局缓存服务实例
 cache_service = CacheService()
@@ -4,7 +4,8 @@
 """
 
 import asyncio
-from typing import List, Callable, Optional
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
 from sqlalchemy.orm import Session
 
 from app.services.cache_service import cache_service
@@ -13,10 +14,20 @@ from app.db.session import SessionLocal
 
 
 class CacheWarmupInitializer:
-    """缓存预热初始化器"""
+    """
+    缓存预热初始化器
 
-    def __init__(self):
-        self.db: Optional[Session] = None
+    每类热点数据用一次查询批量加载（查询在线程中执行，每次使用独立的会话），
+    再用 set_many 一次写入缓存。
+    """
+
+    # 每类数据预热的数量上限
+    ACTIVE_USERS_LIMIT = 100
+    POPULAR_CONVERSATIONS_LIMIT = 50
+    POPULAR_DOCUMENTS_LIMIT = 100
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
 
     async def initialize(self):
         """初始化缓存预热任务"""
@@ -51,172 +62,134 @@ class CacheWarmupInitializer:
             interval=3600,  # 每小时预热一次
         )
 
-    async def warmup_active_users(self):
-        """预热活跃用户信息"""
-        print("🔥 开始预热活跃用户信息...")
+    async def _load(self, query: Callable[[Session], Dict[str, Any]]) -> Dict[str, Any]:
+        """在线程中用独立的会话执行查询，返回 {缓存键: 缓存值}"""
 
-        try:
-            if not self.db:
-                self.db = SessionLocal()
+        def run():
+            db = self.session_factory()
+            try:
+                return query(db)
+            finally:
+                db.close()
 
-            # 查询最近活跃的用户（最近24小时有对话的用户）
-            from app.models import Conversation
-            from datetime import datetime, timedelta
+        return await asyncio.to_thread(run)
 
-            yesterday = datetime.now() - timedelta(days=1)
+    async def warmup_active_users(self) -> int:
+        """预热活跃用户信息（最近24小时有对话的用户）"""
+        print("🔥 开始预热活跃用户信息...")
 
-            active_user_ids = (
-                self.db.query(Conversation.user_id)
-                .distinct()
+        def query(db: Session) -> Dict[str, Any]:
+            from app.models import Conversation, User
+
+            yesterday = datetime.now() - timedelta(days=1)
+            active_users = (
+                db.query(Conversation.user_id)
                 .filter(Conversation.updated_at >= yesterday)
-                .limit(100)
-                .all()
+                .distinct()
+                .limit(self.ACTIVE_USERS_LIMIT)
+                .subquery()
             )
+            users = db.query(User).join(active_users, User.id == active_users.c.user_id).all()
+            return {
+                cache_service._generate_key("user_profile", str(user.id)): self._user_profile(user)
+                for user in users
+            }
 
-            for (user_id,) in active_user_ids:
-                # 获取用户信息（会自动缓存）
-                await cache_service.get_or_set(
-                    key=cache_service._generate_key(
-                        scenario="user_profile",
-                        identifier=str(user_id),
-                    ),
-                    factory=lambda: self._get_user_profile(user_id),
-                    ttl=3600,
-                )
-
-            print(f"✅ 已预热 {len(active_user_ids)} 个活跃用户")
-
+        try:
+            count = await cache_service.set_many(await self._load(query), ttl=3600)
+            print(f"✅ 已预热 {count} 个活跃用户")
+            return count
         except Exception as e:
             print(f"❌ 预热活跃用户失败: {e}")
-        finally:
-            if self.db:
-                self.db.close()
-                self.db = None
+            return 0
 
-    async def warmup_popular_conversations(self):
-        """预热热门对话历史"""
+    async def warmup_popular_conversations(self) -> int:
+        """预热热门对话历史（最近更新的对话）"""
         print("🔥 开始预热热门对话历史...")
 
-        try:
-            if not self.db:
-                self.db = SessionLocal()
-
+        def query(db: Session) -> Dict[str, Any]:
             from app.models import Conversation
-            from datetime import datetime, timedelta
 
-            # 查询最近更新的对话
-            recent_conversations = (
-                self.db.query(Conversation)
+            conversations = (
+                db.query(Conversation)
                 .order_by(Conversation.updated_at.desc())
-                .limit(50)
+                .limit(self.POPULAR_CONVERSATIONS_LIMIT)
                 .all()
             )
+            return {
+                cache_service._generate_key("conversation_history", str(conv.id), conv.user_id): {
+                    "id": conv.id,
+                    "user_id": conv.user_id,
+                    "title": conv.title,
+                    "status": conv.status,
+                }
+                for conv in conversations
+            }
 
-            for conv in recent_conversations:
-                # 缓存对话信息
-                await cache_service.set(
-                    key=cache_service._generate_key(
-                        scenario="conversation_history",
-                        identifier=f"{conv.id}",
-                        args=(conv.user_id,),
-                    ),
-                    value={
-                        "id": conv.id,
-                        "user_id": conv.user_id,
-                        "title": conv.title,
-                        "status": conv.status,
-                    },
-                    ttl=1800,
-                )
-
-            print(f"✅ 已预热 {len(recent_conversations)} 个热门对话")
-
+        try:
+            count = await cache_service.set_many(await self._load(query), ttl=1800)
+            print(f"✅ 已预热 {count} 个热门对话")
+            return count
         except Exception as e:
             print(f"❌ 预热热门对话失败: {e}")
-        finally:
-            if self.db:
-                self.db.close()
-                self.db = None
+            return 0
 
-    async def warmup_popular_documents(self):
-        """预热常用知识库文档"""
+    async def warmup_popular_documents(self) -> int:
+        """预热常用知识库文档（最近更新的文档）"""
         print("🔥 开始预热常用知识库文档...")
 
-        try:
-            if not self.db:
-                self.db = SessionLocal()
-
+        def query(db: Session) -> Dict[str, Any]:
             from app.models import Document
 
-            # 查询最近更新的文档
-            recent_documents = (
-                self.db.query(Document)
+            documents = (
+                db.query(Document)
                 .order_by(Document.updated_at.desc())
-                .limit(100)
+                .limit(self.POPULAR_DOCUMENTS_LIMIT)
                 .all()
             )
+            return {
+                cache_service._generate_key("document_content", str(doc.id)): {
+                    "id": doc.id,
+                    "title": doc.title,
+                    "content": doc.content,
+                    "knowledge_base_id": doc.knowledge_base_id,
+                }
+                for doc in documents
+            }
 
-            for doc in recent_documents:
-                # 缓存文档内容
-                await cache_service.set(
-                    key=cache_service._generate_key(
-                        scenario="document_content",
-                        identifier=str(doc.id),
-                    ),
-                    value={
-                        "id": doc.id,
-                        "title": doc.title,
-                        "content": doc.content,
-                        "knowledge_base_id": doc.knowledge_base_id,
-                    },
-                    ttl=3600,
-                )
-
-            print(f"✅ 已预热 {len(recent_documents)} 个文档")
-
+        try:
+            count = await cache_service.set_many(await self._load(query), ttl=3600)
+            print(f"✅ 已预热 {count} 个文档")
+            return count
         except Exception as e:
             print(f"❌ 预热文档失败: {e}")
-        finally:
-            if self.db:
-                self.db.close()
-                self.db = None
-
-    def _get_user_profile(self, user_id: int) -> dict:
-        """获取用户配置文件（用于缓存工厂函数）"""
-        if not self.db:
-            self.db = SessionLocal()
-
-        from app.models import User
-
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return None
+            return 0
 
+    @staticmethod
+    def _user_profile(user) -> dict:
+        """用户配置文件的缓存内容"""
         return {
             "id": user.id,
-            "username": user.username,
+            "name": user.name,
             "email": user.email,
             "is_active": user.is_active,
         }
 
     async def warmup_all(self):
-        """执行所有预热任务"""
+        """并发执行所有预热任务"""
         print("🔥 开始执行缓存预热...")
 
-        await self.warmup_active_users()
-        await self.warmup_popular_conversations()
-        await self.warmup_popular_documents()
+        self.register_warmup_tasks()
+        await cache_warmer.warmup_all()
 
         print("✅ 缓存预热完成")
 
     async def start_periodic_warmup(self):
-        """启动周期性预热（后台任务）"""
+        """启动周期性预热（后台任务，每个任务按自己的间隔执行）"""
         print("⏰ 启动周期性缓存预热...")
 
-        while True:
-            await self.warmup_all()
-            # 每5分钟执行一次预热
-            await asyncio.sleep(300)
+        self.register_warmup_tasks()
+        await cache_warmer.start_periodic_warmup()
 
 
 # 全局预热器实例
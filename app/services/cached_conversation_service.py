@@ -18,7 +18,7 @@ from app.schemas import (
     ConversationUpdate,
     MessageCreate,
 )
-from app.services.ai_service import ai_service
+from app.services.ai_service import get_ai_service
 from app.core.cache import cached
 from app.services.cache_service import cache_service
 
@@ -309,7 +309,7 @@ class CachedConversationService:
             }
 
         # 调用 AI 服务
-        ai_response = await ai_service.chat(
+        ai_response = await get_ai_service().chat(
             messages=message_history,
             system_prompt=conversation.system_prompt,
         )
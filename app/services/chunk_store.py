@@ -0,0 +1,140 @@
+"""
+文本块内容存储
+启用精简载荷（RAG_SLIM_PAYLOADS）时按向量点 ID 保存文本块正文，
+检索只返回点 ID 与得分，最终选中的文本块一次批量回填正文
+"""
+
+import asyncio
+from typing import List, Dict, Any, Optional, Callable
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.db.session import SessionLocal
+from app.models.chunk_content import ChunkContent
+
+
+class ChunkStore:
+    """
+    文本块内容存储（PostgreSQL chunk_contents 表）
+
+    点 ID 由 (文档 ID, 文本块哈希) 生成，同一 ID 的内容始终相同，
+    因此写入时只插入不存在的 ID，不做更新（开发与测试使用的 SQLite 同样支持）。
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self.session_factory = session_factory or SessionLocal
+
+    # ==================== 数据库操作 ====================
+
+    def _save(self, knowledge_base_id: int, document_id: int, chunks: List[Dict[str, Any]]) -> int:
+        """插入不存在的文本块（INSERT ... ON CONFLICT DO NOTHING，并发写入同一 ID 时逐行忽略）"""
+        rows = {
+            str(chunk["point_id"]): {
+                "point_id": str(chunk["point_id"]),
+                "knowledge_base_id": knowledge_base_id,
+                "document_id": document_id,
+                "chunk_index": chunk["index"],
+                "text": chunk["text"],
+                "extra": chunk.get("extra"),
+            }
+            for chunk in chunks
+        }
+        db = self.session_factory()
+        try:
+            insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+            statement = (
+                insert(ChunkContent)
+                .values(list(rows.values()))
+                .on_conflict_do_nothing(index_elements=[ChunkContent.point_id])
+                .returning(ChunkContent.point_id)
+            )
+            inserted = len(db.execute(statement).fetchall())
+            db.commit()
+            return inserted
+        finally:
+            db.close()
+
+    def _load(self, point_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按点 ID 批量读取"""
+        db = self.session_factory()
+        try:
+            rows = db.query(ChunkContent).filter(ChunkContent.point_id.in_(point_ids)).all()
+            return {
+                row.point_id: {
+                    "knowledge_base_id": row.knowledge_base_id,
+                    "document_id": row.document_id,
+                    "chunk_index": row.chunk_index,
+                    "text": row.text,
+                    "extra": row.extra or {},
+                }
+                for row in rows
+            }
+        finally:
+            db.close()
+
+    def _delete(self, *criteria) -> int:
+        db = self.session_factory()
+        try:
+            deleted = db.query(ChunkContent).filter(*criteria).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    # ==================== 对外接口 ====================
+
+    async def put_many(self, knowledge_base_id: int, document_id: int, chunks: List[Dict[str, Any]]) -> int:
+        """
+        保存文本块正文
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            document_id: 文档 ID
+            chunks: 文本块列表，需包含 point_id、index、text，可选 extra
+
+        Returns:
+            int: 新写入的数量
+        """
+        if not chunks:
+            return 0
+        return await asyncio.to_thread(self._save, knowledge_base_id, document_id, chunks)
+
+    async def get_many(self, point_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        按点 ID 批量获取文本块正文（一次查询）
+
+        Args:
+            point_ids: 点 ID 列表
+
+        Returns:
+            Dict[str, Dict]: 点 ID -> {knowledge_base_id, document_id, chunk_index, text, extra}
+        """
+        point_ids = list(dict.fromkeys(str(point_id) for point_id in point_ids))
+        if not point_ids:
+            return {}
+        return await asyncio.to_thread(self._load, point_ids)
+
+    async def delete_points(self, point_ids: List[str]) -> int:
+        """按点 ID 删除"""
+        if not point_ids:
+            return 0
+        return await asyncio.to_thread(
+            self._delete, ChunkContent.point_id.in_([str(point_id) for point_id in point_ids])
+        )
+
+    async def delete_document(self, document_id: int) -> int:
+        """删除文档的全部文本块"""
+        return await asyncio.to_thread(self._delete, ChunkContent.document_id == document_id)
+
+    async def delete_knowledge_base(self, knowledge_base_id: int) -> int:
+        """删除知识库的全部文本块"""
+        deleted = await asyncio.to_thread(self._delete, ChunkContent.knowledge_base_id == knowledge_base_id)
+        logger.info(f"✅ 已删除知识库 {knowledge_base_id} 的 {deleted} 个文本块正文")
+        return deleted
+
+
+# 全局文本块内容存储实例
+chunk_store = ChunkStore()
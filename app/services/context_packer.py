@@ -0,0 +1,193 @@
+"""
+上下文打包
+按模型的 Token 预算把检索结果装入提示词：
+按得分贪心装入，放不下的块在句子边界截断
+"""
+
+import re
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterator
+
+from app.core.config import settings
+
+
+# CJK 字符 / ASCII 词 / 数字串 / 其他非空白字符
+_TOKEN_RE = re.compile(
+    r"([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af])"
+    r"|([A-Za-z]+)"
+    r"|(\d+)"
+    r"|\S"
+)
+# 与 _TOKEN_RE 计数一致的计数模式：英文词每 4 个字母、数字串每 3 位计为一个匹配，
+# 其余非空白字符（含 CJK）各计一个，可以直接用匹配数量计数而无需逐个计算
+_TOKEN_COUNT_RE = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d]")
+# 句子结束位置（中英文句末标点或换行之后）
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？!?；;\n])|(?<=\.\s)")
+
+# 每条消息的格式开销（role、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _match_tokens(match: re.Match) -> int:
+    """单个匹配项的 Token 数量"""
+    word, number = match.group(2), match.group(3)
+    if word:
+        return (len(word) + 3) // 4
+    if number:
+        return (len(number) + 2) // 3
+    return 1
+
+
+def iter_token_spans(text: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    逐个产出文本中的 Token 片段（与 estimate_tokens 的计数一致）
+
+    Args:
+        text: 输入文本
+
+    Yields:
+        Tuple[int, int, int]: (起始位置, 结束位置, Token 数量)
+    """
+    for match in _TOKEN_RE.finditer(text):
+        yield match.start(), match.end(), _match_tokens(match)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    快速估算 Token 数量（偏保守）
+
+    - CJK 字符：1 token
+    - 英文单词：约每 4 个字母 1 token
+    - 数字串：约每 3 位 1 token
+    - 标点等其他字符：1 token
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        int: 估算的 Token 数量
+    """
+    if not text:
+        return 0
+
+    return len(_TOKEN_COUNT_RE.findall(text))
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    在句子边界截断文本，使其不超过 Token 预算
+
+    Args:
+        text: 输入文本
+        max_tokens: Token 预算
+
+    Returns:
+        str: 截断后的文本（一句都放不下时返回空字符串）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END_RE.split(text):
+        if not sentence:
+            continue
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+
+    return "".join(kept).rstrip()
+
+
+def get_model_budget(model: str) -> Tuple[int, int]:
+    """
+    获取模型的上下文窗口和检索上下文上限
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        Tuple[int, int]: (上下文窗口, 检索上下文 Token 上限)
+    """
+    windows = settings.RAG_MODEL_CONTEXT_WINDOWS
+    budgets = settings.RAG_MODEL_CONTEXT_BUDGETS
+    window = windows.get(model, windows.get("default", 8192))
+    budget = budgets.get(model, budgets.get("default", 3000))
+    return window, budget
+
+
+def compute_context_budget(
+    model: str,
+    prompt_texts: List[str],
+    history: Optional[List[Dict[str, str]]] = None,
+    completion_tokens: Optional[int] = None,
+) -> int:
+    """
+    计算可用于检索上下文的 Token 数量
+
+    上下文窗口减去系统提示词、问题模板、对话历史和预留的回答长度，
+    再不超过该模型配置的检索上下文上限。
+
+    Args:
+        model: 模型名称
+        prompt_texts: 固定提示词文本（系统提示词、问题与模板）
+        history: 对话历史（可选）
+        completion_tokens: 预留的回答 Token 数
+
+    Returns:
+        int: 检索上下文 Token 预算
+    """
+    window, cap = get_model_budget(model)
+    completion_tokens = completion_tokens or settings.RAG_COMPLETION_RESERVE_TOKENS
+    history = history or []
+
+    used = sum(estimate_tokens(text) for text in prompt_texts)
+    used += sum(estimate_tokens(m.get("content")) for m in history)
+    used += MESSAGE_OVERHEAD_TOKENS * (len(history) + 2)
+
+    return max(0, min(cap, window - used - completion_tokens))
+
+
+def pack_context(
+    results: List[Dict[str, Any]],
+    max_tokens: int,
+    format_header: Callable[[int, Dict[str, Any]], str],
+    min_partial_tokens: int = 64,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    按得分贪心装入检索结果
+
+    放不下的块在剩余预算不少于 min_partial_tokens 时按句子截断后装入，
+    否则跳过并继续尝试更短的块。
+
+    Args:
+        results: 检索结果（包含 text、score）
+        max_tokens: Token 预算
+        format_header: 生成来源标题的函数，参数为 (序号, 结果)
+        min_partial_tokens: 截断装入的最小剩余预算
+
+    Returns:
+        Tuple[str, List[Dict]]: (上下文字符串, 实际装入的结果)
+    """
+    parts = []
+    packed = []
+    remaining = max_tokens
+
+    for result in sorted(results, key=lambda r: r.get("score") or 0, reverse=True):
+        header = format_header(len(packed) + 1, result)
+        header_cost = estimate_tokens(header)
+        text = result["text"] or ""
+
+        if header_cost + estimate_tokens(text) > remaining:
+            if remaining - header_cost < min_partial_tokens:
+                continue
+            text = trim_to_tokens(text, remaining - header_cost)
+            if not text:
+                continue
+
+        parts.append(f"\n{header}\n{text}\n")
+        packed.append(result)
+        remaining -= header_cost + estimate_tokens(text)
+
+    return "".join(parts), packed
@@ -18,7 +18,7 @@ from app.schemas import (
     ConversationUpdate,
     MessageCreate,
 )
-from app.services.ai_service import ai_service
+from app.services.ai_service import get_ai_service
 from app.services.rag_service import create_rag_service
 from app.core.cache import cached, cache_by_tags
 
@@ -257,7 +257,7 @@ class ConversationService:
         ]
 
         # 调用 AI 服务
-        ai_response = await ai_service.chat(
+        ai_response = await get_ai_service().chat(
             messages=message_history,
             system_prompt=conversation.system_prompt,
         )
@@ -319,6 +319,15 @@ class ConversationService:
                 "error": "对话不存在",
             }
 
+        # 只在用户自己的知识库中检索
+        rag_service = create_rag_service(self.db)
+        user_knowledge_base_ids = rag_service.get_user_knowledge_base_ids(user_id)
+        if knowledge_base_id is not None and knowledge_base_id not in user_knowledge_base_ids:
+            return {
+                "success": False,
+                "error": "知识库不存在",
+            }
+
         # 添加用户消息
         self.add_message(
             conversation_id=conversation_id,
@@ -328,13 +337,13 @@ class ConversationService:
             ),
         )
 
-        # 执行 RAG 查询
-        rag_service = create_rag_service(self.db)
+        # 执行 RAG 查询（未指定知识库时检索用户的全部知识库）
         rag_result = await rag_service.query(
             question=user_message,
             knowledge_base_id=knowledge_base_id,
             top_k=top_k,
             system_prompt=conversation.system_prompt,
+            knowledge_base_ids=user_knowledge_base_ids if knowledge_base_id is None else None,
         )
 
         if rag_result["success"]:
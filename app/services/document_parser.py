@@ -1,16 +1,260 @@
 """
 文档解析服务
 支持 PDF、TXT、Markdown 等格式的文档解析
+
+解析工作在进程池中执行，避免阻塞事件循环；
+PDF 按页码区间拆分后并行提取，再按顺序合并。
+iter_blocks 以页/章节为单位流式产出文本块，供流式索引管道使用。
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterator, AsyncIterator
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import codecs
+import multiprocessing
 import re
 from abc import ABC, abstractmethod
 
+from app.core.config import settings
 from app.core.logger import logger
 
 
+# ====================
+# 进程池管理
+# ====================
+
+_parser_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    """获取文档解析进程池（首次调用时创建）"""
+    global _parser_pool
+    if _parser_pool is None:
+        _parser_pool = ProcessPoolExecutor(max_workers=settings.DOCUMENT_PARSER_MAX_WORKERS)
+    return _parser_pool
+
+
+def shutdown_parser_pool():
+    """关闭文档解析进程池"""
+    global _parser_pool
+    if _parser_pool is not None:
+        _parser_pool.shutdown(wait=False, cancel_futures=True)
+        _parser_pool = None
+
+
+async def _run_in_pool(func: Callable, *args) -> Any:
+    """在解析进程池中执行同步函数"""
+    # 守护进程（如 Celery prefork worker）不能创建子进程，改用线程执行
+    if multiprocessing.current_process().daemon:
+        return await asyncio.to_thread(func, *args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parser_pool(), func, *args)
+
+
+async def _iterate_in_thread(iterator: Iterator) -> AsyncIterator:
+    """在线程中逐项消费同步迭代器（避免阻塞事件循环）"""
+    sentinel = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+
+# ====================
+# 进程池工作函数（必须定义在模块顶层以便序列化）
+# ====================
+
+
+def _read_text_file(file_path: str) -> Tuple[str, Optional[str]]:
+    """
+    读取文本文件，UTF-8 失败时回退到 GBK
+
+    Returns:
+        Tuple: (文本内容, 回退使用的编码；UTF-8 时为 None)
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read(), None
+    except UnicodeDecodeError:
+        with open(file_path, 'r', encoding='gbk') as f:
+            return f.read(), "gbk"
+
+
+def _detect_text_encoding(file_path: str) -> str:
+    """以增量方式检测文本编码（UTF-8 失败时回退到 GBK），不整体读入内存"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as f:
+            for raw in iter(lambda: f.read(1 << 20), b''):
+                decoder.decode(raw)
+        decoder.decode(b'', final=True)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "gbk"
+
+
+def _iter_text_sections(
+    file_path: str,
+    encoding: str,
+    block_size: int,
+    split_on_headings: bool = False,
+) -> Iterator[str]:
+    """
+    按行读取文本文件，产出不超过 block_size 字符的文本块
+
+    Args:
+        file_path: 文件路径
+        encoding: 文件编码
+        block_size: 文本块最大字符数（单行超长时按整行产出）
+        split_on_headings: 是否在 Markdown 标题处切分，使每个块从标题开始
+
+    Yields:
+        str: 文本块（不含结尾换行）
+    """
+    buffer = []
+    size = 0
+    with open(file_path, 'r', encoding=encoding) as f:
+        for line in f:
+            if split_on_headings and buffer and line.startswith('#'):
+                yield ''.join(buffer).removesuffix('\n')
+                buffer = []
+                size = 0
+
+            buffer.append(line)
+            size += len(line)
+
+            if size >= block_size:
+                yield ''.join(buffer).removesuffix('\n')
+                buffer = []
+                size = 0
+
+    if buffer:
+        yield ''.join(buffer).removesuffix('\n')
+
+
+def _parse_text_file(file_path: str) -> Dict[str, Any]:
+    """解析 TXT 文件（在工作进程中执行）"""
+    text, encoding = _read_text_file(file_path)
+
+    metadata = {
+        "file_type": "txt",
+        "char_count": len(text),
+        "line_count": text.count('\n') + 1,
+    }
+    if encoding:
+        metadata["encoding"] = encoding
+
+    return {
+        "success": True,
+        "text": text,
+        "metadata": metadata,
+    }
+
+
+def _build_markdown_result(text: str) -> Dict[str, Any]:
+    """分析 Markdown 文本结构（在工作进程中执行）"""
+    # 提取标题结构
+    headings = []
+    for line in text.split('\n'):
+        if line.startswith('#'):
+            level = len(line) - len(line.lstrip('#'))
+            title = line.lstrip('#').strip()
+            headings.append({
+                "level": level,
+                "title": title,
+            })
+
+    # 提取代码块
+    code_pattern = r'```[\s\S]*?```'
+    code_block_count = sum(1 for _ in re.finditer(code_pattern, text))
+
+    # 提取链接
+    link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
+    link_count = sum(1 for _ in re.finditer(link_pattern, text))
+
+    return {
+        "success": True,
+        "text": text,
+        "metadata": {
+            "file_type": "markdown",
+            "char_count": len(text),
+            "line_count": text.count('\n') + 1,
+            "heading_count": len(headings),
+            "headings": headings[:10],  # 只保留前 10 个标题
+            "code_block_count": code_block_count,
+            "link_count": link_count,
+        },
+    }
+
+
+def _parse_markdown_file(file_path: str) -> Dict[str, Any]:
+    """解析 Markdown 文件（在工作进程中执行）"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return _build_markdown_result(text)
+
+
+def _get_pdf_page_count(file_path: str) -> int:
+    """获取 PDF 页数（在工作进程中执行）"""
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(file_path) as doc:
+            return len(doc)
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+        return len(PdfReader(file_path).pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """
+    提取 PDF 指定页码区间的文本（在工作进程中执行）
+
+    Args:
+        file_path: 文件路径
+        start: 起始页（从 0 开始，包含）
+        end: 结束页（不包含）
+
+    Returns:
+        List[str]: 每页的文本
+    """
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(file_path) as doc:
+            return [doc[page_num].get_text() for page_num in range(start, end)]
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(file_path)
+        return [reader.pages[page_num].extract_text() for page_num in range(start, end)]
+
+
+# ====================
+# 解析器
+# ====================
+
+
+async def _with_block_timeout(blocks: AsyncIterator[Dict[str, Any]], file_path: str) -> AsyncIterator[Dict[str, Any]]:
+    """为每个文本块的解析应用 DOCUMENT_PARSER_TIMEOUT（与 parse_file 的整体超时一致）"""
+    try:
+        while True:
+            try:
+                block = await asyncio.wait_for(blocks.__anext__(), timeout=settings.DOCUMENT_PARSER_TIMEOUT)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                logger.error(f"❌ 文档解析超时: {Path(file_path).name}")
+                raise TimeoutError(f"文档解析超时（单个文本块超过 {settings.DOCUMENT_PARSER_TIMEOUT} 秒）")
+            yield block
+    finally:
+        await blocks.aclose()
+
+
 class DocumentParser(ABC):
     """文档解析器基类"""
 
@@ -27,6 +271,26 @@ class DocumentParser(ABC):
         """
         pass
 
+    async def iter_blocks(self, file_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式解析文档，逐个产出文本块
+
+        默认实现整体解析后一次性产出，子类可按页或章节覆盖。
+
+        Args:
+            file_path: 文件路径
+
+        Yields:
+            Dict: 包含 text 字段，PDF 额外包含 page 字段
+
+        Raises:
+            ValueError: 解析失败
+        """
+        result = await self.parse(file_path)
+        if not result["success"]:
+            raise ValueError(result.get("error"))
+        yield {"text": result["text"]}
+
 
 class TextParser(DocumentParser):
     """TXT 文本文件解析器"""
@@ -34,40 +298,7 @@ class TextParser(DocumentParser):
     async def parse(self, file_path: str) -> Dict[str, Any]:
         """解析 TXT 文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-
-            return {
-                "success": True,
-                "text": text,
-                "metadata": {
-                    "file_type": "txt",
-                    "char_count": len(text),
-                    "line_count": text.count('\n') + 1,
-                },
-            }
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            try:
-                with open(file_path, 'r', encoding='gbk') as f:
-                    text = f.read()
-
-                return {
-                    "success": True,
-                    "text": text,
-                    "metadata": {
-                        "file_type": "txt",
-                        "char_count": len(text),
-                        "line_count": text.count('\n') + 1,
-                        "encoding": "gbk",
-                    },
-                }
-            except Exception as e:
-                logger.error(f"❌ TXT 文件解析失败: {e}")
-                return {
-                    "success": False,
-                    "error": str(e),
-                }
+            return await _run_in_pool(_parse_text_file, file_path)
         except Exception as e:
             logger.error(f"❌ TXT 文件解析失败: {e}")
             return {
@@ -75,6 +306,13 @@ class TextParser(DocumentParser):
                 "error": str(e),
             }
 
+    async def iter_blocks(self, file_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """按固定大小的行块流式读取 TXT 文件"""
+        encoding = await asyncio.to_thread(_detect_text_encoding, file_path)
+        sections = _iter_text_sections(file_path, encoding, settings.DOCUMENT_STREAM_BLOCK_SIZE)
+        async for text in _iterate_in_thread(sections):
+            yield {"text": text}
+
 
 class MarkdownParser(DocumentParser):
     """Markdown 文件解析器"""
@@ -82,50 +320,31 @@ class MarkdownParser(DocumentParser):
     async def parse(self, file_path: str) -> Dict[str, Any]:
         """解析 Markdown 文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-
-            # 提取标题结构
-            headings = []
-            for line in text.split('\n'):
-                if line.startswith('#'):
-                    level = len(line) - len(line.lstrip('#'))
-                    title = line.lstrip('#').strip()
-                    headings.append({
-                        "level": level,
-                        "title": title,
-                    })
-
-            # 提取代码块
-            code_blocks = []
-            code_pattern = r'```[\s\S]*?```'
-            for match in re.finditer(code_pattern, text):
-                code_blocks.append(match.group())
-
-            # 提取链接
-            links = []
-            link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
-            for match in re.finditer(link_pattern, text):
-                links.append({
-                    "text": match.group(1),
-                    "url": match.group(2),
-                })
-
+            return await _run_in_pool(_parse_markdown_file, file_path)
+        except Exception as e:
+            logger.error(f"❌ Markdown 文件解析失败: {e}")
             return {
-                "success": True,
-                "text": text,
-                "metadata": {
-                    "file_type": "markdown",
-                    "char_count": len(text),
-                    "line_count": text.count('\n') + 1,
-                    "heading_count": len(headings),
-                    "headings": headings[:10],  # 只保留前 10 个标题
-                    "code_block_count": len(code_blocks),
-                    "link_count": len(links),
-                },
+                "success": False,
+                "error": str(e),
             }
+
+    async def iter_blocks(self, file_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """按标题章节流式读取 Markdown 文件"""
+        sections = _iter_text_sections(
+            file_path,
+            "utf-8",
+            settings.DOCUMENT_STREAM_BLOCK_SIZE,
+            split_on_headings=True,
+        )
+        async for text in _iterate_in_thread(sections):
+            yield {"text": text}
+
+    async def parse_text(self, text: str) -> Dict[str, Any]:
+        """解析 Markdown 文本内容"""
+        try:
+            return await _run_in_pool(_build_markdown_result, text)
         except Exception as e:
-            logger.error(f"❌ Markdown 文件解析失败: {e}")
+            logger.error(f"❌ Markdown 内容解析失败: {e}")
             return {
                 "success": False,
                 "error": str(e),
@@ -133,69 +352,53 @@ class MarkdownParser(DocumentParser):
 
 
 class PDFParser(DocumentParser):
-    """PDF 文件解析器"""
+    """PDF 文件解析器（按页码区间并行提取）"""
+
+    @staticmethod
+    def _split_page_ranges(page_count: int) -> List[Tuple[int, int]]:
+        """按配置的页数将 PDF 拆分为页码区间"""
+        pages_per_task = max(1, settings.DOCUMENT_PARSER_PDF_PAGES_PER_TASK)
+        return [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
 
     async def parse(self, file_path: str) -> Dict[str, Any]:
         """解析 PDF 文件"""
         try:
-            # 尝试使用 PyMuPDF (fitz)
-            try:
-                import fitz  # PyMuPDF
-
-                doc = fitz.open(file_path)
-                text_parts = []
-                page_count = len(doc)
-
-                for page_num in range(page_count):
-                    page = doc[page_num]
-                    text = page.get_text()
-                    text_parts.append(f"[第 {page_num + 1} 页]\n{text}")
-
-                full_text = '\n\n'.join(text_parts)
-                doc.close()
-
-                return {
-                    "success": True,
-                    "text": full_text,
-                    "metadata": {
-                        "file_type": "pdf",
-                        "page_count": page_count,
-                        "char_count": len(full_text),
-                    },
-                }
-
-            except ImportError:
-                # 如果没有 PyMuPDF，尝试使用 PyPDF2
-                try:
-                    from PyPDF2 import PdfReader
-
-                    reader = PdfReader(file_path)
-                    text_parts = []
-                    page_count = len(reader.pages)
-
-                    for page_num, page in enumerate(reader.pages):
-                        text = page.extract_text()
-                        text_parts.append(f"[第 {page_num + 1} 页]\n{text}")
-
-                    full_text = '\n\n'.join(text_parts)
-
-                    return {
-                        "success": True,
-                        "text": full_text,
-                        "metadata": {
-                            "file_type": "pdf",
-                            "page_count": page_count,
-                            "char_count": len(full_text),
-                        },
-                    }
-
-                except ImportError:
-                    logger.error("❌ 需要安装 PyMuPDF 或 PyPDF2 库来解析 PDF")
-                    return {
-                        "success": False,
-                        "error": "需要安装 PyMuPDF (pip install pymupdf) 或 PyPDF2 (pip install PyPDF2)",
-                    }
+            page_count = await _run_in_pool(_get_pdf_page_count, file_path)
 
+            # 按页码区间拆分，并行提取
+            page_ranges = self._split_page_ranges(page_count)
+            range_texts = await asyncio.gather(*[
+                _run_in_pool(_extract_pdf_pages, file_path, start, end)
+                for start, end in page_ranges
+            ])
+
+            # 按页码顺序合并
+            text_parts = []
+            for (start, _), page_texts in zip(page_ranges, range_texts):
+                for offset, text in enumerate(page_texts):
+                    text_parts.append(f"[第 {start + offset + 1} 页]\n{text}")
+
+            full_text = '\n\n'.join(text_parts)
+
+            return {
+                "success": True,
+                "text": full_text,
+                "metadata": {
+                    "file_type": "pdf",
+                    "page_count": page_count,
+                    "char_count": len(full_text),
+                },
+            }
+
+        except ImportError:
+            logger.error("❌ 需要安装 PyMuPDF 或 PyPDF2 库来解析 PDF")
+            return {
+                "success": False,
+                "error": "需要安装 PyMuPDF (pip install pymupdf) 或 PyPDF2 (pip install PyPDF2)",
+            }
         except Exception as e:
             logger.error(f"❌ PDF 文件解析失败: {e}")
             return {
@@ -203,6 +406,36 @@ class PDFParser(DocumentParser):
                 "error": str(e),
             }
 
+    async def iter_blocks(self, file_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐页流式产出 PDF 文本
+
+        当前区间被消费时预取下一个区间，内存中最多保留两个区间的文本。
+        """
+        page_count = await _run_in_pool(_get_pdf_page_count, file_path)
+        page_ranges = self._split_page_ranges(page_count)
+
+        next_future = None
+        try:
+            for i, (start, end) in enumerate(page_ranges):
+                current = next_future or asyncio.ensure_future(
+                    _run_in_pool(_extract_pdf_pages, file_path, start, end)
+                )
+                next_future = None
+                if i + 1 < len(page_ranges):
+                    next_start, next_end = page_ranges[i + 1]
+                    next_future = asyncio.ensure_future(
+                        _run_in_pool(_extract_pdf_pages, file_path, next_start, next_end)
+                    )
+
+                page_texts = await current
+                for offset, text in enumerate(page_texts):
+                    page_num = start + offset + 1
+                    yield {"text": f"[第 {page_num} 页]\n{text}", "page": page_num}
+        finally:
+            if next_future is not None:
+                next_future.cancel()
+
 
 class DocumentParserFactory:
     """文档解析器工厂"""
@@ -275,8 +508,18 @@ class DocumentParserService:
         # 获取解析器
         parser = self.factory.get_parser(file_extension)
 
-        # 解析文件
-        result = await parser.parse(file_path)
+        # 解析文件（超时后放弃等待，工作进程中的任务会自然结束）
+        try:
+            result = await asyncio.wait_for(
+                parser.parse(file_path),
+                timeout=settings.DOCUMENT_PARSER_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"❌ 文档解析超时: {path.name}")
+            return {
+                "success": False,
+                "error": f"文档解析超时（超过 {settings.DOCUMENT_PARSER_TIMEOUT} 秒）",
+            }
 
         # 添加文件信息
         if result["success"]:
@@ -285,6 +528,28 @@ class DocumentParserService:
 
         return result
 
+    def iter_file_blocks(self, file_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式解析文件，逐个产出页/章节文本块
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            AsyncIterator[Dict]: 文本块异步迭代器
+
+        Raises:
+            ValueError: 不支持的文件格式
+            TimeoutError: 单个文本块的解析超过 DOCUMENT_PARSER_TIMEOUT 秒（迭代时抛出）
+        """
+        file_extension = Path(file_path).suffix
+        if not self.factory.supports_format(file_extension):
+            raise ValueError(
+                f"不支持的文件格式: {file_extension}。支持的格式: {', '.join(self.factory.get_supported_formats())}"
+            )
+
+        return _with_block_timeout(self.factory.get_parser(file_extension).iter_blocks(file_path), file_path)
+
     async def parse_content(
         self,
         content: str,
@@ -311,19 +576,7 @@ class DocumentParserService:
                 },
             }
         elif file_type in ["md", "markdown"]:
-            parser = MarkdownParser()
-            # 创建临时文件
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-                f.write(content)
-                temp_path = f.name
-
-            try:
-                result = await parser.parse(temp_path)
-                return result
-            finally:
-                # 删除临时文件
-                Path(temp_path).unlink(missing_ok=True)
+            return await MarkdownParser().parse_text(content)
         else:
             return {
                 "success": False,
@@ -0,0 +1,250 @@
+"""
+向量存储服务
+按 (模型, 规范化文本哈希) 持久化保存文本向量，进程内 LRU 在前
+"""
+
+import asyncio
+import hashlib
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import embedding_lookups_total, embedding_dedupe_ratio
+from app.db.session import SessionLocal
+from app.models.embedding import EmbeddingCache
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：NFKC + 折叠空白
+
+    仅全角/半角、空白差异的文本视为同一内容，共享同一个向量。
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    """规范化文本的 sha256"""
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    """向量编码为 float32 小端字节"""
+    data = array("f", vector)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """float32 小端字节解码为向量"""
+    vector = array("f")
+    vector.frombytes(data)
+    if sys.byteorder != "little":
+        vector.byteswap()
+    return vector.tolist()
+
+
+class EmbeddingStore:
+    """
+    内容寻址的向量存储
+
+    查找顺序：进程内 LRU → PostgreSQL embedding_cache 表。
+    向量不过期，页眉、免责声明、重复 FAQ 等跨文档的文本块只需生成一次。
+    """
+
+    # 单条 IN 查询的最大键数（低于 SQLite 绑定参数上限）
+    LOAD_BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        lru_size: Optional[int] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
+        self.model = model or settings.RAG_EMBEDDING_MODEL
+        self.session_factory = session_factory or SessionLocal
+        self.lru_size = lru_size or settings.RAG_EMBEDDING_LRU_SIZE
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"lru": 0, "store": 0, "api": 0}
+
+    # ==================== LRU ====================
+
+    def _lru_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    # ==================== 持久化存储 ====================
+
+    def _load_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """按文本哈希批量读取向量（WHERE model = ? AND text_hash IN (...)）"""
+        vectors: Dict[str, List[float]] = {}
+        db = self.session_factory()
+        try:
+            for start in range(0, len(keys), self.LOAD_BATCH_SIZE):
+                rows = (
+                    db.query(EmbeddingCache.text_hash, EmbeddingCache.vector)
+                    .filter(
+                        EmbeddingCache.model == self.model,
+                        EmbeddingCache.text_hash.in_(keys[start:start + self.LOAD_BATCH_SIZE]),
+                    )
+                    .all()
+                )
+                vectors.update((row.text_hash, unpack_vector(row.vector)) for row in rows)
+            return vectors
+        finally:
+            db.close()
+
+    def _save_many(self, vectors: Dict[str, List[float]]) -> int:
+        """批量插入向量（INSERT ... ON CONFLICT DO NOTHING，并发写入同一键时逐行忽略）"""
+        db = self.session_factory()
+        try:
+            insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+            statement = (
+                insert(EmbeddingCache)
+                .values([
+                    {
+                        "model": self.model,
+                        "text_hash": key,
+                        "dimension": len(vector),
+                        "vector": pack_vector(vector),
+                    }
+                    for key, vector in vectors.items()
+                ])
+                .on_conflict_do_nothing(index_elements=[EmbeddingCache.model, EmbeddingCache.text_hash])
+                .returning(EmbeddingCache.id)
+            )
+            inserted = len(db.execute(statement).fetchall())
+            db.commit()
+            return inserted
+        finally:
+            db.close()
+
+    # ==================== 对外接口 ====================
+
+    def _record(self, source: str):
+        """记录查找来源并更新去重率"""
+        self.stats[source] += 1
+        embedding_lookups_total.labels(source=source).inc()
+        total = sum(self.stats.values())
+        embedding_dedupe_ratio.set((self.stats["lru"] + self.stats["store"]) / total)
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        批量查找文本向量：LRU 未命中的键合并为一次数据库查询
+
+        Args:
+            texts: 输入文本列表
+
+        Returns:
+            List[Optional[List[float]]]: 与输入顺序一致，未命中的位置为 None
+        """
+        keys = [text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            vector = self._lru_get(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing.append(key)
+
+        loaded: Dict[str, List[float]] = {}
+        if missing:
+            try:
+                loaded = await asyncio.to_thread(self._load_many, missing)
+            except Exception as e:
+                logger.warning(f"⚠️ 向量存储读取失败: {e}")
+            for key, vector in loaded.items():
+                self._lru_put(key, vector)
+            found.update(loaded)
+
+        for key in keys:
+            if key in loaded:
+                self._record("store")
+                loaded.pop(key)
+            elif key in found:
+                self._record("lru")
+        return [found.get(key) for key in keys]
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        """
+        查找文本向量
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            Optional[List[float]]: 命中时返回向量，否则返回 None
+        """
+        return (await self.get_many([text]))[0]
+
+    async def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """
+        批量保存新生成的文本向量（一次批量插入）
+
+        Args:
+            texts: 输入文本列表
+            vectors: 与 texts 一一对应的向量
+        """
+        rows: Dict[str, List[float]] = {}
+        for text, vector in zip(texts, vectors):
+            key = text_hash(text)
+            self._record("api")
+            self._lru_put(key, vector)
+            rows[key] = vector
+
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self._save_many, rows)
+        except Exception as e:
+            logger.warning(f"⚠️ 向量存储写入失败: {e}")
+
+    async def put(self, text: str, vector: List[float]):
+        """
+        保存新生成的文本向量
+
+        Args:
+            text: 输入文本
+            vector: 向量
+        """
+        await self.put_many([text], [vector])
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取查找统计"""
+        total = sum(self.stats.values())
+        hits = self.stats["lru"] + self.stats["store"]
+        return {
+            **self.stats,
+            "lru_size": len(self._lru),
+            "dedupe_ratio": hits / total if total else 0.0,
+        }
+
+
+# 全局向量存储实例
+embedding_store = EmbeddingStore()
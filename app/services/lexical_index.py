@@ -0,0 +1,287 @@
+"""
+词法索引服务 - 基于 SQLite FTS5
+为文本块维护本地倒排索引（BM25），与向量检索互补：
+产品编号、错误码、人名等精确词在向量检索中容易丢失
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterable
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+# ASCII 词（保留 ERR-1042、v2.1、user_id 这类编号的连接符）
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+# 连续的 CJK 字符
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK 感知的分词
+
+    - ASCII 词转小写；带连接符的编号同时保留整体和各部分
+    - CJK 连续字符切分为字符二元组（单字保留为一元组）
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        List[str]: 词元列表
+    """
+    if not text:
+        return []
+
+    text = text.lower()
+    tokens: List[str] = []
+
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        tokens.append(word)
+        parts = re.split(r"[-_.]", word)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+
+    for match in _CJK_RE.finditer(text):
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+
+    return tokens
+
+
+class LexicalIndex:
+    """
+    文本块倒排索引
+
+    文本块存放在普通表 chunks 中（point_id 唯一，document_id、knowledge_base_id 有索引），
+    chunks_fts 是以其为外部内容的 FTS5 表，由触发器按 rowid 同步。
+    按 ID 删除走 B 树索引，不扫描全文索引。
+
+    词元在写入前由 tokenize 预先切分，FTS5 只按空白拆分，
+    排序使用 FTS5 内置的 bm25()。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.RAG_LEXICAL_INDEX_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """建表；旧版（ID 存在 FTS5 UNINDEXED 列中）的索引会被丢弃，需重新回填"""
+        tables = {
+            row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        if "chunks_fts" in tables and "chunks" not in tables:
+            logger.warning("⚠️ 词法索引为旧版结构，已重建为空索引，请运行 scripts/backfill_lexical_index.py 回填")
+            self._conn.execute("DROP TABLE chunks_fts")
+
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                point_id TEXT NOT NULL UNIQUE,
+                knowledge_base_id INTEGER NOT NULL,
+                document_id INTEGER NOT NULL,
+                chunk_index INTEGER,
+                text TEXT,
+                tokens TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks (document_id);
+            CREATE INDEX IF NOT EXISTS idx_chunks_knowledge_base_id ON chunks (knowledge_base_id);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                tokens,
+                content = 'chunks',
+                content_rowid = 'id',
+                tokenize = "unicode61 remove_diacritics 0 tokenchars '-_.'"
+            );
+
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, tokens) VALUES (new.id, new.tokens);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+                INSERT INTO chunks_fts (rowid, tokens) VALUES (new.id, new.tokens);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    def add_chunks(
+        self,
+        knowledge_base_id: int,
+        document_id: int,
+        chunks: Iterable[Dict[str, Any]],
+    ) -> int:
+        """
+        写入文本块（同一 point_id 覆盖写入）
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            document_id: 文档 ID
+            chunks: 文本块列表，需包含 point_id、index、text
+
+        Returns:
+            int: 写入数量
+        """
+        rows = [
+            (
+                str(chunk["point_id"]),
+                knowledge_base_id,
+                document_id,
+                chunk["index"],
+                chunk["text"],
+                " ".join(tokenize(chunk["text"])),
+            )
+            for chunk in chunks
+        ]
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (point_id, knowledge_base_id, document_id, chunk_index, text, tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (point_id) DO UPDATE SET "
+                "knowledge_base_id = excluded.knowledge_base_id, document_id = excluded.document_id, "
+                "chunk_index = excluded.chunk_index, text = excluded.text, tokens = excluded.tokens",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def delete_points(self, point_ids: List[str]):
+        """按点 ID 删除"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE point_id = ?",
+                [(str(point_id),) for point_id in point_ids],
+            )
+            self._conn.commit()
+
+    def delete_document(self, document_id: int):
+        """删除文档的全部文本块"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._conn.commit()
+
+    def delete_knowledge_base(self, knowledge_base_id: int):
+        """删除知识库的全部文本块"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE knowledge_base_id = ?", (knowledge_base_id,))
+            self._conn.commit()
+
+    def search(
+        self,
+        query: str,
+        knowledge_base_id: Optional[int] = None,
+        top_k: int = 10,
+        knowledge_base_ids: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            knowledge_base_id: 知识库 ID（可选，用于过滤）
+            top_k: 返回前 K 个结果
+            knowledge_base_ids: 知识库 ID 列表（可选，用于过滤；空列表返回空结果）
+
+        Returns:
+            List[Dict]: 检索结果，score 越大越相关
+        """
+        if knowledge_base_id is not None:
+            knowledge_base_ids = [knowledge_base_id]
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or knowledge_base_ids == []:
+            return []
+
+        match = " OR ".join('"' + token.replace('"', '""') + '"' for token in tokens)
+        sql = (
+            "SELECT c.point_id, c.knowledge_base_id, c.document_id, c.chunk_index, c.text, "
+            "bm25(chunks_fts) AS rank "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid WHERE chunks_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if knowledge_base_ids is not None:
+            sql += f" AND c.knowledge_base_id IN ({', '.join('?' * len(knowledge_base_ids))})"
+            params.extend(knowledge_base_ids)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(top_k)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                "point_id": point_id,
+                "knowledge_base_id": kb_id,
+                "document_id": document_id,
+                "chunk_index": chunk_index,
+                "text": text,
+                "score": -rank,  # bm25() 越小越相关
+            }
+            for point_id, kb_id, document_id, chunk_index, text, rank in rows
+        ]
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]],
+    k: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    倒数排名融合（RRF）
+
+    每个结果的融合得分为各路排名的 1 / (k + rank) 之和，
+    再按所有路都排第一时的理论最大值归一化到 [0, 1]。
+
+    Args:
+        result_lists: 各路检索结果（按相关度降序），需包含 point_id
+        k: RRF 平滑常数
+
+    Returns:
+        List[Dict]: 融合后的结果（按 score 降序）
+    """
+    k = k or settings.RAG_RRF_K
+    max_score = len(result_lists) / (k + 1)
+    fused: Dict[str, Dict[str, Any]] = {}
+
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            point_id = str(result["point_id"])
+            entry = fused.setdefault(point_id, {**result, "rrf_score": 0.0})
+            entry["rrf_score"] += 1.0 / (k + rank)
+
+    merged = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)
+    for entry in merged:
+        entry["score"] = entry["rrf_score"] / max_score
+    return merged
+
+
+# 全局词法索引实例（延迟初始化）
+_lexical_index: Optional[LexicalIndex] = None
+
+
+def get_lexical_index() -> LexicalIndex:
+    """获取词法索引实例"""
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = LexicalIndex()
+        logger.info(f"✅ 词法索引已打开: {_lexical_index.path}")
+    return _lexical_index
@@ -0,0 +1,623 @@
+"""
+本地向量存储 - 嵌入式向量索引
+不依赖 Qdrant 服务，用于开发、CI、单机小规模部署和可复现的检索基准：
+向量以 float32 存放在内存映射文件中，载荷与过滤字段存放在 SQLite 中，
+点数较多时使用 HNSW 近似索引（需要 hnswlib），否则使用 NumPy 暴力检索
+
+实现了 VectorService 使用到的 QdrantClient 接口子集，
+过滤条件同样使用 qdrant_client.models 中的 Filter / FieldCondition
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    PointIdsList,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    MatchAny,
+    ScoredPoint,
+    Record,
+    CollectionStatus,
+)
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+# 以独立列存储并建立索引的过滤字段，其余字段通过 json_extract 过滤
+_INDEXED_FIELDS = ("knowledge_base_id", "document_id")
+# 集合名称只允许用作目录名的字符
+_COLLECTION_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+PointId = Union[str, int]
+
+
+class LocalCollection:
+    """
+    单个本地集合
+
+    目录结构：
+        vectors.f32   float32 向量矩阵（内存映射，按槽位存放，容量翻倍扩展）
+        points.db     SQLite：点 ID、槽位、过滤字段与 JSON 载荷，以及槽位分配状态
+
+    同一主机上的多个进程（API 与 Worker）可以共享同一目录：
+    - 槽位分配（meta.next_slot、free_slots 表）与写入都在 SQLite 写事务（BEGIN IMMEDIATE）中完成，
+      向量先写入文件再提交点记录，读到的点一定有向量
+    - 向量文件只增不减；读取到超出本进程映射范围的槽位时重新映射
+    - 每个写事务递增 meta.row_version，并把它记录到写入的点（points.row_version）和
+      释放的槽位（free_slots.row_version）上；其他进程提交写入后（PRAGMA data_version 变化），
+      检索前只把行版本号更新过的点增量应用到本进程的 HNSW 索引，不整体重建
+    """
+
+    def __init__(self, path: str, size: Optional[int] = None, distance: Optional[Distance] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(path, "points.db"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS points (
+                point_id TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                knowledge_base_id INTEGER,
+                document_id INTEGER,
+                payload TEXT
+            )
+            """
+        )
+        for field_name in _INDEXED_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_points_{field_name} ON points ({field_name})")
+
+        self._conn.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+        self._conn.commit()
+
+        with self._write_transaction():
+            for table in ("points", "free_slots"):
+                columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if "row_version" not in columns:
+                    # 旧版目录：已有行视为版本 0
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_points_row_version ON points (row_version)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_free_slots_row_version ON free_slots (row_version)")
+
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+            if meta:
+                self.size = int(meta["size"])
+                self.distance = Distance(meta["distance"])
+            else:
+                self.size = size
+                self.distance = distance or Distance.COSINE
+                self._conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    [("size", str(self.size)), ("distance", self.distance.value)],
+                )
+            if "next_slot" not in meta:
+                # 旧版目录：从已有点推算槽位分配状态
+                used = {row[0] for row in self._conn.execute("SELECT slot FROM points")}
+                next_slot = max(used) + 1 if used else 0
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO free_slots (slot) VALUES (?)",
+                    [(slot,) for slot in range(next_slot) if slot not in used],
+                )
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('next_slot', ?)", (str(next_slot),)
+                )
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('row_version', '0')")
+
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._vectors: Optional[np.memmap] = None
+        self._open_vectors()
+
+        self._hnsw = None  # 近似索引（延迟构建，写入后增量更新）
+        self._hnsw_data_version: Optional[int] = None  # 上次同步 HNSW 时的 data_version
+        self._hnsw_row_version = 0  # HNSW 已包含的行版本号
+
+    @contextmanager
+    def _write_transaction(self):
+        """SQLite 写事务：立即获取写锁，跨进程串行化槽位分配与写入"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _data_version(self) -> int:
+        """其他连接每提交一次写入该值就会变化（本连接的写入不影响）"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _row_version(self) -> int:
+        """已提交的最新行版本号"""
+        return int(self._conn.execute("SELECT value FROM meta WHERE key = 'row_version'").fetchone()[0])
+
+    def _next_row_version(self) -> int:
+        """递增并返回行版本号（需在写事务中调用）"""
+        self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'row_version'")
+        return self._row_version()
+
+    # ==================== 向量文件 ====================
+
+    def _capacity(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _open_vectors(self):
+        """打开向量文件（文件不存在或为空时不映射）"""
+        if not os.path.exists(self._vectors_path):
+            open(self._vectors_path, "wb").close()
+        rows = os.path.getsize(self._vectors_path) // (4 * self.size)
+        self._vectors = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.size))
+            if rows else None
+        )
+
+    def _grow(self, required: int):
+        """按容量翻倍扩展向量文件（需在写事务中调用；文件可能已被其他进程扩展）"""
+        if required <= self._capacity():
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        rows = os.path.getsize(self._vectors_path) // (4 * self.size)
+        if required > rows:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(max(required, rows * 2, 1024) * 4 * self.size)
+        self._open_vectors()
+
+    def _vectors_at(self, slots) -> np.ndarray:
+        """读取槽位的向量；槽位超出本进程的映射范围（其他进程扩展了文件）时重新映射"""
+        if len(slots) and max(slots) >= self._capacity():
+            self._open_vectors()
+        return self._vectors[slots]
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """余弦距离下存储归一化向量（与 Qdrant 行为一致）"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.size)
+        if self.distance == Distance.COSINE:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+        return vectors
+
+    # ==================== 过滤条件 ====================
+
+    @staticmethod
+    def _condition_sql(condition: FieldCondition) -> Tuple[str, List[Any]]:
+        column = condition.key if condition.key in _INDEXED_FIELDS else "json_extract(payload, ?)"
+        params: List[Any] = [] if condition.key in _INDEXED_FIELDS else [f"$.{condition.key}"]
+
+        if isinstance(condition.match, MatchValue):
+            return f"{column} = ?", params + [condition.match.value]
+        if isinstance(condition.match, MatchAny):
+            values = list(condition.match.any)
+            if not values:
+                return "0", []
+            return f"{column} IN ({', '.join('?' * len(values))})", params + values
+        raise ValueError(f"本地向量存储不支持的过滤条件: {condition}")
+
+    @classmethod
+    def _filter_sql(cls, query_filter: Optional[Filter]) -> Tuple[str, List[Any]]:
+        """把 Filter（must / must_not 中的 FieldCondition）转换为 SQL 条件"""
+        if query_filter is None:
+            return "1", []
+
+        clauses, params = [], []
+        for condition in query_filter.must or []:
+            sql, values = cls._condition_sql(condition)
+            clauses.append(sql)
+            params.extend(values)
+        for condition in query_filter.must_not or []:
+            sql, values = cls._condition_sql(condition)
+            clauses.append(f"NOT ({sql})")
+            params.extend(values)
+        if query_filter.should:
+            should = [cls._condition_sql(condition) for condition in query_filter.should]
+            clauses.append("(" + " OR ".join(sql for sql, _ in should) + ")")
+            for _, values in should:
+                params.extend(values)
+        return " AND ".join(clauses) or "1", params
+
+    # ==================== 写入 / 删除 ====================
+
+    def upsert(self, points: List[PointStruct]):
+        if not points:
+            return
+        vectors = self._prepare([point.vector for point in points])
+        ids = [str(point.id) for point in points]
+
+        placeholders = ", ".join("?" * len(ids))
+        with self._write_transaction():
+            existing = dict(
+                self._conn.execute(f"SELECT point_id, slot FROM points WHERE point_id IN ({placeholders})", ids)
+            )
+
+            # 分配槽位：优先复用已删除点的槽位
+            new_ids = [point_id for point_id in dict.fromkeys(ids) if point_id not in existing]
+            free = [
+                row[0] for row in
+                self._conn.execute("SELECT slot FROM free_slots ORDER BY slot LIMIT ?", (len(new_ids),))
+            ]
+            self._conn.executemany("DELETE FROM free_slots WHERE slot = ?", [(slot,) for slot in free])
+            next_slot = int(self._conn.execute("SELECT value FROM meta WHERE key = 'next_slot'").fetchone()[0])
+            for point_id in new_ids:
+                if free:
+                    existing[point_id] = free.pop(0)
+                else:
+                    existing[point_id] = next_slot
+                    next_slot += 1
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'next_slot'", (str(next_slot),))
+            slots = [existing[point_id] for point_id in ids]
+            row_version = self._next_row_version()
+
+            self._grow(next_slot)
+            self._vectors[slots] = vectors
+            self._vectors.flush()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (point_id, slot, knowledge_base_id, document_id, payload, row_version) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        point_id,
+                        slot,
+                        (point.payload or {}).get("knowledge_base_id"),
+                        (point.payload or {}).get("document_id"),
+                        json.dumps(point.payload or {}, ensure_ascii=False),
+                        row_version,
+                    )
+                    for point_id, slot, point in zip(ids, slots, points)
+                ],
+            )
+
+        if self._hnsw is not None:
+            self._hnsw_add(slots, vectors)
+
+    def delete(self, points_selector: Union[PointIdsList, Filter]):
+        if isinstance(points_selector, PointIdsList):
+            ids = [str(point_id) for point_id in points_selector.points]
+            if not ids:
+                return
+            where = f"point_id IN ({', '.join('?' * len(ids))})"
+            params: List[Any] = ids
+        else:
+            where, params = self._filter_sql(points_selector)
+
+        with self._write_transaction():
+            slots = [row[0] for row in self._conn.execute(f"SELECT slot FROM points WHERE {where}", params)]
+            if slots:
+                row_version = self._next_row_version()
+                self._conn.execute(f"DELETE FROM points WHERE {where}", params)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO free_slots (slot, row_version) VALUES (?, ?)",
+                    [(slot, row_version) for slot in slots],
+                )
+        if not slots:
+            return
+
+        if self._hnsw is not None:
+            self._hnsw_mark_deleted(slots)
+
+    # ==================== 读取 ====================
+
+    def _record(self, row: Tuple, with_payload: bool, with_vectors: bool) -> Dict[str, Any]:
+        point_id, slot, payload = row
+        return {
+            "id": point_id,
+            "payload": json.loads(payload) if with_payload else None,
+            "vector": self._vectors_at([slot])[0].tolist() if with_vectors else None,
+        }
+
+    def retrieve(self, ids: List[PointId], with_payload: bool = True, with_vectors: bool = False) -> List[Record]:
+        ids = [str(point_id) for point_id in ids]
+        if not ids:
+            return []
+        rows = self._conn.execute(
+            f"SELECT point_id, slot, payload FROM points WHERE point_id IN ({', '.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+        return [Record(**self._record(row, with_payload, with_vectors)) for row in rows]
+
+    def scroll(
+        self,
+        scroll_filter: Optional[Filter] = None,
+        limit: int = 10,
+        offset: Optional[PointId] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+    ) -> Tuple[List[Record], Optional[str]]:
+        where, params = self._filter_sql(scroll_filter)
+        if offset is not None:
+            where += " AND point_id >= ?"
+            params = params + [str(offset)]
+        rows = self._conn.execute(
+            f"SELECT point_id, slot, payload FROM points WHERE {where} ORDER BY point_id LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+
+        next_offset = rows[limit][0] if len(rows) > limit else None
+        return [Record(**self._record(row, with_payload, with_vectors)) for row in rows[:limit]], next_offset
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+
+    # ==================== 检索 ====================
+
+    def _scores(self, query: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        vectors = self._vectors_at(slots)
+        if self.distance == Distance.EUCLID:
+            return np.linalg.norm(vectors - query, axis=1)
+        return vectors @ query
+
+    def _hnsw_add(self, slots: List[int], vectors: np.ndarray):
+        required = max(slots) + 1
+        if self._hnsw.get_max_elements() < required:
+            self._hnsw.resize_index(max(required, self._hnsw.get_max_elements() * 2))
+        self._hnsw.add_items(vectors, slots, replace_deleted=False)
+        for slot in slots:
+            try:
+                self._hnsw.unmark_deleted(slot)
+            except RuntimeError:
+                pass
+
+    def _hnsw_mark_deleted(self, slots: List[int]):
+        for slot in slots:
+            try:
+                self._hnsw.mark_deleted(slot)
+            except RuntimeError:
+                pass
+
+    def _sync_hnsw(self):
+        """
+        把其他进程提交的写入应用到本进程的 HNSW 索引
+
+        先读取行版本号再读取变化的行：两次读取之间提交的行会在下次同步时重复应用，
+        重复添加同一槽位只会覆盖向量，结果不变。
+        """
+        data_version = self._data_version()
+        if data_version == self._hnsw_data_version:
+            return
+        row_version = self._row_version()
+        if row_version != self._hnsw_row_version:
+            changed = [
+                row[0] for row in
+                self._conn.execute("SELECT slot FROM points WHERE row_version > ?", (self._hnsw_row_version,))
+            ]
+            freed = [
+                row[0] for row in
+                self._conn.execute("SELECT slot FROM free_slots WHERE row_version > ?", (self._hnsw_row_version,))
+            ]
+            if changed:
+                self._hnsw_add(changed, self._vectors_at(changed))
+            self._hnsw_mark_deleted(freed)
+            logger.debug(f"🔄 本地向量索引增量同步 HNSW: {self.path} (+{len(changed)} / -{len(freed)})")
+        self._hnsw_data_version = data_version
+        self._hnsw_row_version = row_version
+
+    def _build_hnsw(self):
+        """从向量文件构建 HNSW 索引（已删除的槽位标记为删除）"""
+        space = {Distance.COSINE: "cosine", Distance.DOT: "ip", Distance.EUCLID: "l2"}[self.distance]
+        self._hnsw_data_version = self._data_version()
+        self._hnsw_row_version = self._row_version()
+        slots = [row[0] for row in self._conn.execute("SELECT slot FROM points")]
+        index = hnswlib.Index(space=space, dim=self.size)
+        index.init_index(
+            max_elements=max(max(slots, default=0) + 1, 1024),
+            ef_construction=settings.RAG_LOCAL_HNSW_EF_CONSTRUCTION,
+            M=settings.RAG_LOCAL_HNSW_M,
+        )
+        if slots:
+            index.add_items(self._vectors_at(slots), slots)
+        self._hnsw = index
+        logger.info(f"✅ 本地向量索引已构建 HNSW: {self.path} ({len(slots)} 个点)")
+
+    def _search_hnsw(self, query: np.ndarray, allowed: Optional[set], k: int) -> List[Tuple[int, float]]:
+        self._hnsw.set_ef(max(settings.RAG_LOCAL_HNSW_EF, k))
+        labels, distances = self._hnsw.knn_query(
+            query,
+            k=k,
+            filter=(lambda slot: slot in allowed) if allowed is not None else None,
+        )
+        hits = []
+        for slot, dist in zip(labels[0], distances[0]):
+            if self.distance == Distance.EUCLID:
+                score = float(np.sqrt(dist))
+            else:
+                score = float(1.0 - dist)  # cosine / ip 距离为 1 - 内积
+            hits.append((int(slot), score))
+        return hits
+
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int = 10,
+        query_filter: Optional[Filter] = None,
+        score_threshold: Optional[float] = None,
+        with_vectors: bool = False,
+        with_payload: bool = True,
+        search_params: Optional[Any] = None,
+    ) -> List[ScoredPoint]:
+        query = self._prepare(query_vector)[0]
+        where, params = self._filter_sql(query_filter)
+        candidates = dict(self._conn.execute(f"SELECT slot, point_id FROM points WHERE {where}", params))
+        if not candidates:
+            return []
+
+        use_hnsw = hnswlib is not None and self.count() >= settings.RAG_LOCAL_HNSW_THRESHOLD
+        if use_hnsw:
+            if self._hnsw is None:
+                self._build_hnsw()
+            else:
+                self._sync_hnsw()
+            allowed = set(candidates) if query_filter is not None else None
+            try:
+                hits = self._search_hnsw(query, allowed, min(limit, len(candidates)))
+            except RuntimeError:
+                # 过滤后候选过少时 HNSW 可能凑不满 k 个结果，回退到暴力检索
+                use_hnsw = False
+        if not use_hnsw:
+            slots = np.fromiter(candidates.keys(), dtype=np.int64, count=len(candidates))
+            scores = self._scores(query, slots)
+            if self.distance == Distance.EUCLID:
+                order = np.argsort(scores)[:limit]
+            else:
+                order = np.argsort(-scores)[:limit]
+            hits = [(int(slots[i]), float(scores[i])) for i in order]
+
+        if score_threshold is not None:
+            if self.distance == Distance.EUCLID:
+                hits = [(slot, score) for slot, score in hits if score <= score_threshold]
+            else:
+                hits = [(slot, score) for slot, score in hits if score >= score_threshold]
+
+        payloads = {}
+        if with_payload and hits:
+            ids = [candidates[slot] for slot, _ in hits]
+            payloads = dict(
+                self._conn.execute(
+                    f"SELECT point_id, payload FROM points WHERE point_id IN ({', '.join('?' * len(ids))})",
+                    ids,
+                )
+            )
+
+        return [
+            ScoredPoint(
+                id=candidates[slot],
+                version=0,
+                score=score,
+                payload=json.loads(payloads[candidates[slot]]) if with_payload else None,
+                vector=self._vectors_at([slot])[0].tolist() if with_vectors else None,
+            )
+            for slot, score in hits
+        ]
+
+    def close(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._conn.close()
+
+
+class LocalVectorStore:
+    """
+    嵌入式向量存储（QdrantClient 接口子集）
+
+    每个集合一个子目录，进程重启后从磁盘恢复；
+    同一主机上的多个进程可共享目录读写（见 LocalCollection）。
+    删除集合不在进程间同步：删除后其他进程需重启才能重新打开同名集合。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.RAG_LOCAL_VECTOR_PATH
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._collections: Dict[str, LocalCollection] = {}
+
+    def _collection_path(self, collection_name: str) -> str:
+        if not _COLLECTION_NAME_RE.match(collection_name):
+            raise ValueError(f"无效的集合名称: {collection_name}")
+        return os.path.join(self.path, collection_name)
+
+    def _get(self, collection_name: str) -> LocalCollection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            path = self._collection_path(collection_name)
+            if not os.path.exists(os.path.join(path, "points.db")):
+                raise ValueError(f"集合不存在: {collection_name}")
+            collection = self._collections[collection_name] = LocalCollection(path)
+        return collection
+
+    # ==================== 集合管理 ====================
+
+    def get_collections(self) -> SimpleNamespace:
+        with self._lock:
+            names = sorted(
+                name for name in os.listdir(self.path)
+                if os.path.exists(os.path.join(self.path, name, "points.db"))
+            )
+        return SimpleNamespace(collections=[SimpleNamespace(name=name) for name in names])
+
+    def create_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs):
+        with self._lock:
+            self._collections[collection_name] = LocalCollection(
+                self._collection_path(collection_name),
+                size=vectors_config.size,
+                distance=vectors_config.distance,
+            )
+        return True
+
+    def get_collection(self, collection_name: str) -> SimpleNamespace:
+        with self._lock:
+            collection = self._get(collection_name)
+            count = collection.count()
+        return SimpleNamespace(
+            status=CollectionStatus.GREEN,
+            optimizer_status="ok",
+            points_count=count,
+            vectors_count=count,
+            payload_schema={field_name: "integer" for field_name in _INDEXED_FIELDS},
+        )
+
+    def update_collection(self, collection_name: str, **kwargs):
+        """本地存储不做量化，向量始终以 float32 存放在内存映射文件中"""
+        self._get(collection_name)
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, **kwargs):
+        """knowledge_base_id / document_id 已建立 SQLite 索引，其他字段通过 json_extract 过滤"""
+        return True
+
+    def delete_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+            path = self._collection_path(collection_name)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        return True
+
+    # ==================== 点操作 ====================
+
+    def upsert(self, collection_name: str, points: List[PointStruct], **kwargs):
+        with self._lock:
+            self._get(collection_name).upsert(points)
+
+    def delete(self, collection_name: str, points_selector: Union[PointIdsList, Filter], **kwargs):
+        with self._lock:
+            self._get(collection_name).delete(points_selector)
+
+    def retrieve(self, collection_name: str, ids: List[PointId], **kwargs) -> List[Record]:
+        with self._lock:
+            return self._get(collection_name).retrieve(ids, **kwargs)
+
+    def scroll(self, collection_name: str, **kwargs) -> Tuple[List[Record], Optional[str]]:
+        with self._lock:
+            return self._get(collection_name).scroll(**kwargs)
+
+    def search(self, collection_name: str, query_vector: List[float], **kwargs) -> List[ScoredPoint]:
+        with self._lock:
+            return self._get(collection_name).search(query_vector, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
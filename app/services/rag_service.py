@@ -3,22 +3,81 @@ RAG 服务（检索增强生成）
 实现向量检索 + 上下文增强 + 生成回答的完整流程
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
+import json
 from sqlalchemy.orm import Session
 
-from app.services.vector_service import vector_service
-from app.services.ai_service import ai_service
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.vector_service import VectorService, get_vector_service
+from app.services.reranker import resolve_retrieval_config
+from app.services.context_packer import compute_context_budget, get_model_budget, pack_context
+from app.services.ai_service import AIService, get_ai_service
 from app.models import Document, KnowledgeBase
 
 
+# 默认 RAG 系统提示词
+DEFAULT_RAG_SYSTEM_PROMPT = """你是一个智能助手，擅长基于提供的知识库内容回答用户问题。
+
+请遵循以下原则：
+1. 优先使用提供的上下文信息回答问题
+2. 如果上下文中没有相关信息，请诚实告知用户
+3. 引用具体的来源（文档标题）
+4. 回答要准确、简洁、有逻辑
+5. 如果问题涉及多个方面，请分点回答"""
+
+# 用户知识库 ID 列表的缓存键前缀
+USER_KNOWLEDGE_BASES_CACHE_PREFIX = "rag:user_kbs"
+
+# RAG 用户消息模板
+RAG_USER_MESSAGE_TEMPLATE = """参考信息：
+{context}
+
+问题：{query}
+
+请根据参考信息回答上述问题。"""
+
+
 class RAGService:
     """RAG 服务类"""
 
-    def __init__(self, db: Session):
-        """初始化服务"""
+    def __init__(
+        self,
+        db: Session,
+        vector_service: Optional[VectorService] = None,
+        ai_service: Optional[AIService] = None,
+    ):
+        """
+        初始化服务
+
+        Args:
+            db: 数据库会话
+            vector_service: 向量服务（默认在首次使用时取全局实例）
+            ai_service: AI 服务（默认在首次使用时取全局实例）
+        """
         self.db = db
-        self.vector_service = vector_service
-        self.ai_service = ai_service
+        self._vector_service = vector_service
+        self._ai_service = ai_service
+
+    @property
+    def vector_service(self) -> VectorService:
+        if self._vector_service is None:
+            self._vector_service = get_vector_service()
+        return self._vector_service
+
+    @vector_service.setter
+    def vector_service(self, service: VectorService):
+        self._vector_service = service
+
+    @property
+    def ai_service(self) -> AIService:
+        if self._ai_service is None:
+            self._ai_service = get_ai_service()
+        return self._ai_service
+
+    @ai_service.setter
+    def ai_service(self, service: AIService):
+        self._ai_service = service
 
     def _extract_keywords(self, query: str) -> List[str]:
         """
@@ -45,35 +104,177 @@ class RAGService:
         query: str,
         knowledge_base_id: Optional[int] = None,
         top_k: Optional[int] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
     ) -> List[Dict[str, Any]]:
         """
-        向量检索
+        检索（启用混合检索时融合向量与词法结果）
+
+        知识库配置了 MMR 重排序时，先按倍数扩大候选集，
+        再做多样性重排序和近重复抑制。
+        结果的点 ID 与得分会短时缓存，命中时只需按 ID 回填文本。
+        启用精简载荷时，正文在最终结果确定后一次批量回填。
 
         Args:
             query: 用户查询
             knowledge_base_id: 知识库 ID（可选）
             top_k: 返回前 K 个结果
+            knowledge_base_ids: 知识库 ID 列表（可选，跨多个知识库检索）
 
         Returns:
             List[Dict]: 检索结果
         """
-        return await self.vector_service.search(
+        top_k = top_k or settings.RAG_TOP_K
+        config = resolve_retrieval_config(self._get_retrieval_overrides(knowledge_base_id))
+
+        # 检索结果缓存：键包含检索方式，知识库变化时按代数整体失效
+        cache = self.vector_service.retrieval_cache
+        variant = json.dumps(
+            {
+                "hybrid": settings.RAG_HYBRID_ENABLED,
+                "knowledge_base_ids": sorted(knowledge_base_ids) if knowledge_base_ids is not None else None,
+                **config,
+            },
+            sort_keys=True,
+        )
+        if cache:
+            cached = cache.get(knowledge_base_id, query, top_k, variant=variant)
+            if cached is not None:
+                results = await self._hydrate_cached_results(cached)
+                if results is not None:
+                    return await self.vector_service.hydrate_texts(results)
+
+        results = await self._retrieve(query, knowledge_base_id, top_k, config, knowledge_base_ids)
+
+        # 空结果可能来自检索失败，不缓存
+        if cache and results:
+            cache.set(knowledge_base_id, query, top_k, results, variant=variant)
+
+        # 精简载荷时只为最终选中的结果回填正文
+        return await self.vector_service.hydrate_texts(results)
+
+    async def _retrieve(
+        self,
+        query: str,
+        knowledge_base_id: Optional[int],
+        top_k: int,
+        config: Dict[str, Any],
+        knowledge_base_ids: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """执行检索（混合检索 + 可选的 MMR 重排序）"""
+        if config["rerank"] != "mmr":
+            return await self.vector_service.hybrid_search(
+                query=query,
+                knowledge_base_id=knowledge_base_id,
+                top_k=top_k,
+                knowledge_base_ids=knowledge_base_ids,
+            )
+
+        candidates = await self.vector_service.hybrid_search(
             query=query,
             knowledge_base_id=knowledge_base_id,
-            top_k=top_k,
+            top_k=top_k * config["fetch_multiplier"],
+            with_vectors=True,
+            knowledge_base_ids=knowledge_base_ids,
+        )
+        return await self.vector_service.rerank_mmr(
+            query,
+            candidates,
+            top_k,
+            lambda_mult=config["mmr_lambda"],
+            dedup_threshold=config["dedup_threshold"],
         )
 
+    async def _hydrate_cached_results(
+        self,
+        cached: List[Dict[str, Any]],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        按缓存的点 ID 回填文本块
+
+        Returns:
+            Optional[List[Dict]]: 检索结果；有点已被删除时返回 None（回退为实时检索）
+        """
+        by_collection: Dict[Optional[str], List[str]] = {}
+        for entry in cached:
+            by_collection.setdefault(entry.get("collection"), []).append(entry["point_id"])
+
+        try:
+            chunks = {}
+            for collection_name, point_ids in by_collection.items():
+                chunks.update(await self.vector_service.get_chunks(point_ids, collection_name))
+        except Exception as e:
+            logger.warning(f"⚠️ 检索缓存回填失败: {e}")
+            return None
+
+        results = []
+        for entry in cached:
+            chunk = chunks.get(str(entry["point_id"]))
+            if chunk is None:
+                return None
+            results.append({**chunk, **entry})
+        return results
+
+    def get_user_knowledge_base_ids(self, user_id: int) -> List[int]:
+        """
+        获取用户拥有的知识库 ID（Redis 缓存 RAG_USER_KB_CACHE_TTL 秒）
+
+        Args:
+            user_id: 用户 ID
+
+        Returns:
+            List[int]: 知识库 ID 列表
+        """
+        redis_client = self.vector_service.redis_client
+        cache_key = f"{USER_KNOWLEDGE_BASES_CACHE_PREFIX}:{user_id}"
+        if redis_client:
+            try:
+                cached = redis_client.get(cache_key)
+                if cached is not None:
+                    return json.loads(cached)
+            except Exception as e:
+                logger.warning(f"⚠️ 读取用户知识库缓存失败: {e}")
+
+        knowledge_base_ids = [
+            row.id
+            for row in self.db.query(KnowledgeBase.id).filter(KnowledgeBase.user_id == user_id).all()
+        ]
+
+        if redis_client:
+            try:
+                redis_client.setex(cache_key, settings.RAG_USER_KB_CACHE_TTL, json.dumps(knowledge_base_ids))
+            except Exception as e:
+                logger.warning(f"⚠️ 写入用户知识库缓存失败: {e}")
+        return knowledge_base_ids
+
+    def invalidate_user_knowledge_bases(self, user_id: int):
+        """用户创建或删除知识库后清除缓存"""
+        redis_client = self.vector_service.redis_client
+        if redis_client:
+            try:
+                redis_client.delete(f"{USER_KNOWLEDGE_BASES_CACHE_PREFIX}:{user_id}")
+            except Exception as e:
+                logger.warning(f"⚠️ 清除用户知识库缓存失败: {e}")
+
+    def _get_retrieval_overrides(self, knowledge_base_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """获取知识库级检索配置"""
+        if knowledge_base_id is None:
+            return None
+        knowledge_base = self.db.query(KnowledgeBase).filter(KnowledgeBase.id == knowledge_base_id).first()
+        return knowledge_base.retrieval_config if knowledge_base else None
+
     def _build_context(
         self,
         search_results: List[Dict[str, Any]],
-        max_context_length: int = 3000,
+        max_tokens: Optional[int] = None,
     ) -> str:
         """
         构建上下文
 
+        按得分贪心装入检索结果，放不下的块在句子边界截断。
+
         Args:
-            search_results: 向量搜索结果
-            max_context_length: 最大上下文长度（字符数）
+            search_results: 检索结果
+            max_tokens: 上下文 Token 预算（默认为当前模型的检索上下文上限）
 
         Returns:
             str: 构建的上下文字符串
@@ -81,35 +282,54 @@ class RAGService:
         if not search_results:
             return ""
 
-        context_parts = []
-        current_length = 0
+        if max_tokens is None:
+            _, max_tokens = get_model_budget(self.ai_service.model)
 
-        for idx, result in enumerate(search_results):
-            text = result["text"]
-            score = result["score"]
-            document_id = result["document_id"]
+        titles: Dict[int, str] = {}
 
-            # 获取文档标题
-            document = self.db.query(Document).filter(Document.id == document_id).first()
-            title = document.title if document else "未知文档"
+        def format_header(idx: int, result: Dict[str, Any]) -> str:
+            document_id = result["document_id"]
+            if document_id not in titles:
+                # 获取文档标题
+                document = self.db.query(Document).filter(Document.id == document_id).first()
+                titles[document_id] = document.title if document else "未知文档"
+            return f"【来源 {idx}】{titles[document_id]} (相似度: {result['score']:.3f})"
 
-            # 构建上下文片段
-            context_part = f"\n【来源 {idx + 1}】{title} (相似度: {score:.3f})\n{text}\n"
+        context, _ = pack_context(search_results, max_tokens, format_header)
+        return context
 
-            # 检查长度
-            if current_length + len(context_part) > max_context_length:
-                break
+    def _context_budget(
+        self,
+        query: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> int:
+        """
+        计算本次查询可用于检索上下文的 Token 数量
 
-            context_parts.append(context_part)
-            current_length += len(context_part)
+        Args:
+            query: 用户查询
+            system_prompt: 系统提示词（可选）
+            history: 对话历史（可选）
 
-        return "".join(context_parts)
+        Returns:
+            int: 上下文 Token 预算
+        """
+        return compute_context_budget(
+            model=self.ai_service.model,
+            prompt_texts=[
+                system_prompt or DEFAULT_RAG_SYSTEM_PROMPT,
+                RAG_USER_MESSAGE_TEMPLATE.format(context="", query=query),
+            ],
+            history=history,
+        )
 
     async def _generate_answer(
         self,
         query: str,
         context: str,
         system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
     ) -> Dict[str, Any]:
         """
         增强生成
@@ -118,34 +338,24 @@ class RAGService:
             query: 用户查询
             context: 检索到的上下文
             system_prompt: 系统提示词（可选）
+            history: 对话历史（可选）
 
         Returns:
             Dict: 生成结果
         """
         # 默认系统提示词
         if system_prompt is None:
-            system_prompt = """你是一个智能助手，擅长基于提供的知识库内容回答用户问题。
-
-请遵循以下原则：
-1. 优先使用提供的上下文信息回答问题
-2. 如果上下文中没有相关信息，请诚实告知用户
-3. 引用具体的来源（文档标题）
-4. 回答要准确、简洁、有逻辑
-5. 如果问题涉及多个方面，请分点回答"""
+            system_prompt = DEFAULT_RAG_SYSTEM_PROMPT
 
         # 构建用户消息
-        user_message = f"""参考信息：
-{context}
-
-问题：{query}
-
-请根据参考信息回答上述问题。"""
+        user_message = RAG_USER_MESSAGE_TEMPLATE.format(context=context, query=query)
 
-        # 调用 AI 生成
+        # 调用 AI 生成（回答长度与上下文预算中预留的一致）
         ai_response = await self.ai_service.chat(
-            messages=[{"role": "user", "content": user_message}],
+            messages=[*(history or []), {"role": "user", "content": user_message}],
             system_prompt=system_prompt,
             temperature=0.7,
+            max_tokens=settings.RAG_COMPLETION_RESERVE_TOKENS,
         )
 
         return ai_response
@@ -156,15 +366,20 @@ class RAGService:
         knowledge_base_id: Optional[int] = None,
         top_k: Optional[int] = None,
         system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
     ) -> Dict[str, Any]:
         """
         完整的 RAG 查询流程
 
         Args:
             question: 用户问题
-            knowledge_base_id: 知识库 ID（可选，不指定则搜索全部）
+            knowledge_base_id: 知识库 ID（可选）
             top_k: 返回最相似的前 K 个文档片段
             system_prompt: 自定义系统提示词
+            history: 对话历史（可选，计入上下文预算）
+            knowledge_base_ids: 知识库 ID 列表（可选，在这些知识库中检索；
+                与 knowledge_base_id 都不指定时不检索，直接生成回答）
 
         Returns:
             Dict: RAG 查询结果，包含：
@@ -186,6 +401,7 @@ class RAGService:
                 query=question,
                 knowledge_base_id=knowledge_base_id,
                 top_k=top_k,
+                knowledge_base_ids=knowledge_base_ids,
             )
 
             print(f"🔍 检索到 {len(search_results)} 个相关文档片段")
@@ -210,7 +426,10 @@ class RAGService:
 
             # Step 3: 构建上下文
             print("🔍 构建上下文...")
-            context = self._build_context(search_results)
+            context = self._build_context(
+                search_results,
+                max_tokens=self._context_budget(question, system_prompt, history),
+            )
 
             # Step 4: 增强生成
             print("🔍 增强生成中...")
@@ -218,6 +437,7 @@ class RAGService:
                 query=question,
                 context=context,
                 system_prompt=system_prompt,
+                history=history,
             )
 
             # Step 5: 构建返回结果
@@ -286,17 +506,45 @@ class RAGService:
             text=text,
         )
 
-    async def delete_document_index(self, document_id: int) -> bool:
+    async def index_document_stream(
+        self,
+        knowledge_base_id: int,
+        document_id: int,
+        blocks: AsyncIterator[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        流式索引文档（边解析边向量化写入）
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            document_id: 文档 ID
+            blocks: 解析器产出的文本块异步迭代器
+
+        Returns:
+            Dict: 索引结果
+        """
+        return await self.vector_service.add_document_stream(
+            knowledge_base_id=knowledge_base_id,
+            document_id=document_id,
+            blocks=blocks,
+        )
+
+    async def delete_document_index(
+        self,
+        document_id: int,
+        knowledge_base_id: Optional[int] = None,
+    ) -> bool:
         """
         删除文档的向量索引
 
         Args:
             document_id: 文档 ID
+            knowledge_base_id: 所属知识库 ID（用于使检索缓存失效）
 
         Returns:
             bool: 是否成功
         """
-        return await self.vector_service.delete_document_chunks(document_id)
+        return await self.vector_service.delete_document_chunks(document_id, knowledge_base_id)
 
     async def delete_knowledge_base_index(self, knowledge_base_id: int) -> bool:
         """
@@ -0,0 +1,96 @@
+"""
+检索结果重排序
+最大边际相关（MMR）与近重复抑制，让有限的上下文容纳更多不同的信息
+"""
+
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def resolve_retrieval_config(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    合并全局默认值与知识库级检索配置
+
+    Args:
+        overrides: KnowledgeBase.retrieval_config（可选）
+
+    Returns:
+        Dict: 检索配置，包含：
+            - rerank: 重排序方式（none / mmr）
+            - mmr_lambda: 相关性权重（1 为纯相关性，0 为纯多样性）
+            - fetch_multiplier: 重排序前的候选倍数
+            - dedup_threshold: 与已选结果的相似度达到该值即视为近重复并丢弃
+    """
+    config = {
+        "rerank": settings.RAG_RERANK_MODE,
+        "mmr_lambda": settings.RAG_MMR_LAMBDA,
+        "fetch_multiplier": settings.RAG_MMR_FETCH_MULTIPLIER,
+        "dedup_threshold": settings.RAG_DEDUP_THRESHOLD,
+    }
+    if overrides:
+        config.update({k: v for k, v in overrides.items() if k in config and v is not None})
+    return config
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """按行 L2 归一化（零向量保持为零）"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_select(
+    query_vector: List[float],
+    candidate_vectors: List[List[float]],
+    top_k: int,
+    lambda_mult: float = 0.7,
+    dedup_threshold: Optional[float] = None,
+) -> List[int]:
+    """
+    最大边际相关（MMR）选择
+
+    一次矩阵乘法算出全部候选两两之间的余弦相似度，
+    之后每轮贪心选择只做向量化的 O(n) 更新。
+
+    Args:
+        query_vector: 查询向量
+        candidate_vectors: 候选向量（按原始相关度降序）
+        top_k: 选择数量
+        lambda_mult: 相关性权重（1 为纯相关性，0 为纯多样性）
+        dedup_threshold: 近重复阈值（可选）
+
+    Returns:
+        List[int]: 选中的候选下标（按选择顺序）
+    """
+    if not candidate_vectors or top_k <= 0:
+        return []
+
+    vectors = _normalize_rows(np.asarray(candidate_vectors, dtype=np.float32))
+    query = _normalize_rows(np.asarray(query_vector, dtype=np.float32))
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    n = len(vectors)
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    selected: List[int] = []
+
+    while len(selected) < top_k and available.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+
+        if dedup_threshold is not None:
+            available &= similarity[best] < dedup_threshold
+
+    return selected
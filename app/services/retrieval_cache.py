@@ -0,0 +1,138 @@
+"""
+检索结果缓存
+按 (知识库, 规范化查询, top_k, 阈值) 缓存检索到的点 ID 和得分，
+知识库代数（generation）在每次索引/删除时递增，旧缓存在 O(1) 内失效
+"""
+
+import hashlib
+import json
+from typing import List, Dict, Any, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.embedding_store import normalize_text
+
+
+# 缓存的结果字段（文本等载荷在命中后按点 ID 回填）
+_CACHED_FIELDS = ("point_id", "collection", "score", "rrf_score", "vector_score", "lexical_score")
+
+
+class RetrievalCache:
+    """
+    短 TTL 检索结果缓存
+
+    缓存键包含知识库当前代数，索引或删除时只需 INCR 代数，
+    不需要扫描删除旧键；旧键由 TTL 自然过期。
+    不指定知识库的查询使用全局代数，任何知识库变化都会使其失效。
+    """
+
+    GENERATION_PREFIX = "rag:gen"
+    RESULT_PREFIX = "rag:retrieval"
+    ALL_SCOPE = "all"
+
+    def __init__(self, redis_client: redis.Redis, ttl: Optional[int] = None):
+        self.redis_client = redis_client
+        self.ttl = ttl or settings.RAG_RETRIEVAL_CACHE_TTL
+
+    def _scope(self, knowledge_base_id: Optional[int]) -> str:
+        return self.ALL_SCOPE if knowledge_base_id is None else str(knowledge_base_id)
+
+    def _generation(self, scope: str) -> int:
+        value = self.redis_client.get(f"{self.GENERATION_PREFIX}:{scope}")
+        return int(value) if value else 0
+
+    def _key(
+        self,
+        knowledge_base_id: Optional[int],
+        query: str,
+        top_k: int,
+        score_threshold: Optional[float],
+        variant: str,
+    ) -> str:
+        scope = self._scope(knowledge_base_id)
+        digest = hashlib.sha256(
+            json.dumps(
+                [normalize_text(query), top_k, score_threshold, variant],
+                ensure_ascii=False,
+            ).encode()
+        ).hexdigest()
+        return f"{self.RESULT_PREFIX}:{scope}:{self._generation(scope)}:{digest}"
+
+    def get(
+        self,
+        knowledge_base_id: Optional[int],
+        query: str,
+        top_k: int,
+        score_threshold: Optional[float] = None,
+        variant: str = "",
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        读取缓存的检索结果
+
+        Args:
+            knowledge_base_id: 知识库 ID（可选）
+            query: 查询文本
+            top_k: 返回数量
+            score_threshold: 相似度阈值
+            variant: 检索方式标识（混合检索、重排序配置等）
+
+        Returns:
+            Optional[List[Dict]]: 命中时返回点 ID 与得分列表，否则返回 None
+        """
+        try:
+            cached = self.redis_client.get(self._key(knowledge_base_id, query, top_k, score_threshold, variant))
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            logger.warning(f"⚠️ 检索缓存读取失败: {e}")
+            return None
+
+    def set(
+        self,
+        knowledge_base_id: Optional[int],
+        query: str,
+        top_k: int,
+        results: List[Dict[str, Any]],
+        score_threshold: Optional[float] = None,
+        variant: str = "",
+    ):
+        """
+        写入检索结果（只保存点 ID 与得分）
+
+        Args:
+            knowledge_base_id: 知识库 ID（可选）
+            query: 查询文本
+            top_k: 返回数量
+            results: 检索结果
+            score_threshold: 相似度阈值
+            variant: 检索方式标识
+        """
+        entries = [
+            {field: result[field] for field in _CACHED_FIELDS if field in result}
+            for result in results
+        ]
+        try:
+            self.redis_client.setex(
+                self._key(knowledge_base_id, query, top_k, score_threshold, variant),
+                self.ttl,
+                json.dumps(entries),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 检索缓存写入失败: {e}")
+
+    def bump(self, knowledge_base_id: Optional[int] = None):
+        """
+        递增知识库代数，使其全部检索缓存失效
+
+        Args:
+            knowledge_base_id: 知识库 ID（为空时只递增全局代数）
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if knowledge_base_id is not None:
+                pipe.incr(f"{self.GENERATION_PREFIX}:{knowledge_base_id}")
+            pipe.incr(f"{self.GENERATION_PREFIX}:{self.ALL_SCOPE}")
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ 检索缓存失效失败: {e}")
@@ -0,0 +1,366 @@
+"""
+文本分块
+TextChunker 为结构感知的分块器（默认），StreamingChunker 为按行与字符数的分块器（RAG_CHUNKER=lines）。
+
+TextChunker 按 Token 数量切分文本：在 Markdown 标题处开始新块，在句子边界切分，
+超长句子在 Token 边界切分（不会截断单词或字符），块之间按 Token 精确重叠。
+每个块附带所在章节的标题路径与 PDF 页码。
+
+分块是单遍增量的：每行只扫描一次，每个块只拼接一次，
+重叠部分以单元列表保留而不是反复拼接字符串，整体耗时与文本长度成线性关系。
+"""
+
+import hashlib
+import re
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Deque, Iterator, Union
+
+from app.core.config import settings
+from app.services.context_packer import estimate_tokens, iter_token_spans
+
+
+# Markdown 标题（# 至 ######，标题后可带闭合的 #）
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+# PDFParser 在每页开头插入的页码标记
+_PAGE_MARKER_RE = re.compile(r"^\[第 (\d+) 页\]$")
+# 代码块围栏（代码块内的 # 不是标题，也不按句子切分）
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# 句子：到中英文句末标点（含紧随的引号/括号）或英文句点加空白为止，末句到行尾
+# （非句末字符整段匹配，避免逐字符的惰性回溯）
+_SENTENCE_RE = re.compile(r"(?:[^。！？!?；;….]+|\.(?!\s))*(?:[。！？!?；;…]+[”’」』）)\"']*|\.(?=\s)|\.?$)\s*")
+
+# 分块单元：(文本, Token 数量, 页码)
+_Unit = Tuple[str, int, Optional[int]]
+
+
+class StreamingChunker:
+    """
+    增量文本分块器（按行与字符数，RAG_CHUNKER=lines 时使用）
+
+    按行累积文本，超过块大小时产出文本块；可以逐段喂入文本，
+    无需先拼接出完整文档。
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, overlap: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.RAG_CHUNK_SIZE
+        self.overlap = overlap or settings.RAG_CHUNK_OVERLAP
+        self._current_chunk: List[str] = []
+        self._current_length = 0
+        self._chunk_index = 0
+
+    def _emit(self, chunk_text: str) -> Dict[str, Any]:
+        """生成一个文本块"""
+        chunk = {
+            'text': chunk_text,
+            'index': self._chunk_index,
+            'length': len(chunk_text),
+            'hash': hashlib.sha256(chunk_text.encode()).hexdigest(),
+        }
+        self._chunk_index += 1
+        return chunk
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        喂入一段文本
+
+        Args:
+            text: 文本片段（按行处理，与上一段之间视为换行）
+
+        Returns:
+            List[Dict]: 本次产出的完整文本块
+        """
+        chunks = []
+        chunk_size = self.chunk_size
+        overlap = self.overlap
+
+        for line in text.split('\n'):
+            line_length = len(line)
+
+            # 如果当前行超过块大小，需要拆分
+            if line_length > chunk_size:
+                # 先保存当前块
+                if self._current_chunk:
+                    chunks.append(self._emit('\n'.join(self._current_chunk)))
+                    self._current_chunk = []
+                    self._current_length = 0
+
+                # 拆分长行
+                for i in range(0, line_length, chunk_size - overlap):
+                    chunks.append(self._emit(line[i:i + chunk_size]))
+            else:
+                # 检查是否需要创建新块
+                if self._current_length + line_length + 1 > chunk_size and self._current_chunk:
+                    # 保存当前块
+                    chunks.append(self._emit('\n'.join(self._current_chunk)))
+
+                    # 保留末尾最多 2 行、总长不超过 overlap 的行作为重叠内容
+                    # （逐行保留而不是拼接成一个字符串，否则重叠内容会随每个块增长）
+                    tail: List[str] = []
+                    tail_length = 0
+                    for previous in reversed(self._current_chunk[-2:]):
+                        if tail_length + len(previous) + 1 > overlap:
+                            break
+                        tail.insert(0, previous)
+                        tail_length += len(previous) + 1
+                    self._current_chunk = tail
+                    self._current_length = tail_length
+
+                # 添加行到当前块
+                self._current_chunk.append(line)
+                self._current_length += line_length + 1  # +1 for newline
+
+        return chunks
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """产出剩余的最后一个块"""
+        if not self._current_chunk:
+            return []
+
+        chunk = self._emit('\n'.join(self._current_chunk))
+        self._current_chunk = []
+        self._current_length = 0
+        return [chunk]
+
+
+def _bounded_token_spans(text: str, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    """同 iter_token_spans，但把 Token 数超过 max_tokens 的片段按字符切成不超过 max_tokens 的子片段"""
+    for span_start, span_end, cost in iter_token_spans(text):
+        if cost <= max_tokens:
+            yield span_start, span_end, cost
+            continue
+        # 字母串每 4 个、数字串每 3 个字符计一个 Token，按比例取步长不会超过上限
+        step = max(1, (span_end - span_start) * max_tokens // cost)
+        for piece_start in range(span_start, span_end, step):
+            piece_end = min(piece_start + step, span_end)
+            yield piece_start, piece_end, estimate_tokens(text[piece_start:piece_end])
+
+
+class TextChunker:
+    """
+    增量文本分块器（按 Token 计数）
+
+    与 StreamingChunker 接口一致：可以逐段喂入文本（段与段之间视为换行），
+    flush 产出最后一个块；整体分块与逐段喂入的结果相同。
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, overlap: Optional[int] = None):
+        """
+        Args:
+            chunk_size: 块大小（Token 数）
+            overlap: 相邻块的重叠 Token 数（不超过块大小的一半）
+        """
+        self.chunk_size = max(1, chunk_size or settings.RAG_CHUNK_TOKENS)
+        overlap = settings.RAG_CHUNK_OVERLAP_TOKENS if overlap is None else overlap
+        self.overlap = max(0, min(overlap, self.chunk_size // 2))
+
+        self._units: Deque[_Unit] = deque()
+        self._tokens = 0
+        self._fresh = 0  # 当前块中不属于重叠部分的单元数
+        self._headings: List[Tuple[int, str]] = []
+        self._chunk_headings: List[str] = []
+        self._page: Optional[int] = None
+        self._in_code = False
+        self._chunk_index = 0
+
+    # ==================== 对外接口 ====================
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        喂入一段文本
+
+        Args:
+            text: 文本片段（按行处理，与上一段之间视为换行）
+
+        Returns:
+            List[Dict]: 本次产出的完整文本块
+        """
+        chunks: List[Dict[str, Any]] = []
+        for line in text.split('\n'):
+            self._feed_line(line, chunks)
+        return chunks
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """产出剩余的最后一个块"""
+        chunks: List[Dict[str, Any]] = []
+        self._emit(chunks, carry_overlap=False)
+        return chunks
+
+    # ==================== 行与单元 ====================
+
+    def _feed_line(self, line: str, chunks: List[Dict[str, Any]]):
+        """按行识别页码标记、代码块、标题和句子"""
+        if _FENCE_RE.match(line):
+            self._in_code = not self._in_code
+            self._add_unit(line + '\n', chunks)
+            return
+
+        if self._in_code:
+            self._add_unit(line + '\n', chunks)
+            return
+
+        page_match = _PAGE_MARKER_RE.match(line.strip())
+        if page_match:
+            self._page = int(page_match.group(1))
+            return
+
+        heading_match = _HEADING_RE.match(line)
+        if heading_match:
+            # 新章节从新块开始，不与上一章节重叠
+            self._emit(chunks, carry_overlap=False)
+            level = len(heading_match.group(1))
+            while self._headings and self._headings[-1][0] >= level:
+                self._headings.pop()
+            self._headings.append((level, heading_match.group(2)))
+            self._chunk_headings = [title for _, title in self._headings]
+            self._add_unit(line + '\n', chunks)
+            return
+
+        if not line.strip():
+            if self._units:
+                self._append('\n', 0)
+            return
+
+        sentences = [sentence for sentence in _SENTENCE_RE.findall(line) if sentence]
+        sentences[-1] += '\n'
+        for sentence in sentences:
+            self._add_unit(sentence, chunks)
+
+    def _add_unit(self, text: str, chunks: List[Dict[str, Any]]):
+        """加入一个单元（句子或行），超过块大小时先产出当前块"""
+        tokens = estimate_tokens(text)
+        if tokens > self.chunk_size:
+            for piece, piece_tokens in self._split_by_tokens(text, self.chunk_size):
+                self._add_sized_unit(piece, piece_tokens, chunks)
+        else:
+            self._add_sized_unit(text, tokens, chunks)
+
+    def _add_sized_unit(self, text: str, tokens: int, chunks: List[Dict[str, Any]]):
+        if self._fresh and self._tokens + tokens > self.chunk_size:
+            self._emit(chunks, carry_overlap=True)
+
+        # 重叠部分加上新单元超出块大小时，从最早的重叠单元开始丢弃
+        while not self._fresh and self._units and self._tokens + tokens > self.chunk_size:
+            self._tokens -= self._units.popleft()[1]
+
+        self._append(text, tokens)
+        self._fresh += 1
+
+    def _append(self, text: str, tokens: int):
+        self._units.append((text, tokens, self._page))
+        self._tokens += tokens
+
+    @staticmethod
+    def _split_by_tokens(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+        """
+        把超长文本切成不超过 max_tokens 的片段
+
+        优先在空白、标点或 CJK 字符之后切分，避免把 word0021 这类字母数字串拆开；
+        找不到这样的位置时才在任意 Token 边界切分；单个 Token 片段（如没有空白的超长
+        字母或数字串）本身超过 max_tokens 时按字符硬切。
+        """
+        pieces = []
+        start = 0
+        used = 0
+        safe, safe_used = 0, 0
+        for span_start, _, cost in _bounded_token_spans(text, max_tokens):
+            previous = text[span_start - 1] if span_start else ' '
+            if span_start > start and not (previous.isascii() and previous.isalnum()):
+                safe, safe_used = span_start, used
+
+            while used and used + cost > max_tokens:
+                if safe > start:
+                    cut, cut_used = safe, safe_used
+                else:
+                    cut, cut_used = span_start, used
+                pieces.append((text[start:cut], cut_used))
+                start = cut
+                used -= cut_used
+                safe, safe_used = start, 0
+            used += cost
+        pieces.append((text[start:], used))
+        return pieces
+
+    # ==================== 产出与重叠 ====================
+
+    def _emit(self, chunks: List[Dict[str, Any]], carry_overlap: bool):
+        """产出当前块；carry_overlap 时保留末尾 overlap 个 Token 作为下一块的开头"""
+        if not self._fresh:
+            self._reset()
+            return
+
+        chunk_text = ''.join(unit[0] for unit in self._units).strip()
+        if chunk_text:
+            chunks.append(self._build_chunk(chunk_text))
+
+        if carry_overlap and self.overlap:
+            self._units = self._overlap_tail()
+            self._tokens = sum(unit[1] for unit in self._units)
+            self._fresh = 0
+        else:
+            self._reset()
+
+    def _reset(self):
+        self._units = deque()
+        self._tokens = 0
+        self._fresh = 0
+
+    def _overlap_tail(self) -> Deque[_Unit]:
+        """取末尾恰好 overlap 个 Token：整单元优先，不足部分从前一个单元的尾部按 Token 截取"""
+        tail: Deque[_Unit] = deque()
+        remaining = self.overlap
+        for text, tokens, page in reversed(self._units):
+            if tokens <= remaining:
+                tail.appendleft((text, tokens, page))
+                remaining -= tokens
+                if not remaining:
+                    break
+                continue
+
+            spans = list(iter_token_spans(text))
+            used = 0
+            start = len(text)
+            for span_start, _, cost in reversed(spans):
+                if used + cost > remaining:
+                    break
+                used += cost
+                start = span_start
+            if used:
+                tail.appendleft((text[start:], used, page))
+            break
+        return tail
+
+    def _build_chunk(self, chunk_text: str) -> Dict[str, Any]:
+        """生成一个文本块"""
+        pages = [unit[2] for unit in self._units if unit[2] is not None]
+        chunk = {
+            'text': chunk_text,
+            'index': self._chunk_index,
+            'length': len(chunk_text),
+            'tokens': self._tokens,
+            'hash': hashlib.sha256(chunk_text.encode()).hexdigest(),
+            'headings': list(self._chunk_headings),
+            'page': pages[0] if pages else None,
+        }
+        if pages and pages[-1] != pages[0]:
+            chunk['page_end'] = pages[-1]
+        self._chunk_index += 1
+        return chunk
+
+
+def create_chunker(
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+) -> Union[TextChunker, StreamingChunker]:
+    """
+    按 RAG_CHUNKER 配置创建分块器
+
+    Args:
+        chunk_size: 块大小（structured 为 Token 数，lines 为字符数）
+        overlap: 重叠大小（单位同 chunk_size）
+
+    Returns:
+        TextChunker 或 StreamingChunker
+    """
+    if settings.RAG_CHUNKER == "lines":
+        return StreamingChunker(chunk_size, overlap)
+    return TextChunker(chunk_size, overlap)
@@ -1,29 +1,62 @@
 """
 向量服务 - 基于 Qdrant
-处理 Qdrant 向量数据库和文档向量化
+处理 Qdrant 向量数据库和文档向量化（也可切换为嵌入式本地向量存储）
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Union, Callable, Set
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
     PointStruct,
+    PointIdsList,
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
     OptimizersConfigDiff,
+    PayloadSchemaType,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    CompressionRatio,
+    QuantizationSearchParams,
+    SearchParams,
+    VectorParamsDiff,
+    Disabled,
 )
 from qdrant_client.http.exceptions import UnexpectedResponse
 from zhipuai import ZhipuAI
 import redis
+import asyncio
 import json
 import hashlib
+import threading
+import time
 import uuid
 from datetime import datetime
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.db.session import SessionLocal
+from app.models.knowledge_base import KnowledgeBase
+from app.services.chunk_store import chunk_store
+from app.services.embedding_store import embedding_store
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.services.local_vector_store import LocalVectorStore
+from app.services.reranker import mmr_select
+from app.services.retrieval_cache import RetrievalCache
+# 分块器原先定义在本模块，保留导入以兼容 from app.services.vector_service import StreamingChunker
+from app.services.text_chunker import StreamingChunker, TextChunker, create_chunker  # noqa: F401
+
+
+# 文档块点 ID 的命名空间（uuid5）
+CHUNK_POINT_NAMESPACE = uuid.UUID("6f1c2a0e-5b7d-4c1a-9e3f-2d8b7a6c4e10")
+
+# 需要建立载荷索引的过滤字段
+PAYLOAD_INDEX_FIELDS = ("knowledge_base_id", "document_id")
 
 
 class VectorService:
@@ -36,11 +69,29 @@ class VectorService:
         self.qdrant_port = settings.QDRANT_PORT
         self.qdrant_api_key = settings.QDRANT_API_KEY if settings.QDRANT_API_KEY else None
         self.collection_name = settings.QDRANT_COLLECTION_NAME
+
+        # 知识库 -> 集合路由缓存：{knowledge_base_id: (collection_name, expires_at)}
+        self._collection_routes: Dict[int, tuple] = {}
+        # 本进程已确认存在的集合（删除集合时移除）
+        self._ready_collections: Set[str] = set()
         self.vector_size = settings.QDRANT_VECTOR_SIZE
         self.distance = Distance.COSINE if settings.QDRANT_DISTANCE == "Cosine" else Distance.EUCLID
 
         # Zhipu AI Embedding API
-        self.embedding_client = ZhipuAI(api_key=settings.ZHIPUAI_API_KEY)
+        self.embedding_client = ZhipuAI(
+            api_key=settings.ZHIPUAI_API_KEY,
+            base_url=settings.ZHIPUAI_BASE_URL or None,
+        )
+        self.embedding_model = settings.RAG_EMBEDDING_MODEL
+
+        # 持久化向量存储（按内容去重，优先于 Redis 缓存）
+        self.embedding_store = embedding_store if settings.RAG_EMBEDDING_STORE_ENABLED else None
+
+        # 文本块正文存储（精简载荷）
+        self.chunk_store = chunk_store if settings.RAG_SLIM_PAYLOADS else None
+
+        # 词法索引（混合检索）
+        self.lexical_index = get_lexical_index() if settings.RAG_HYBRID_ENABLED else None
 
         # Redis 缓存
         try:
@@ -50,6 +101,12 @@ class VectorService:
             logger.warning(f"⚠️ Redis 连接失败，将禁用缓存: {e}")
             self.redis_client = None
 
+        # 检索结果缓存（按知识库代数失效）
+        self.retrieval_cache = (
+            RetrievalCache(self.redis_client)
+            if settings.RAG_RETRIEVAL_CACHE_ENABLED and self.redis_client else None
+        )
+
         # 连接 Qdrant
         self._connect_qdrant()
 
@@ -57,63 +114,278 @@ class VectorService:
         self._ensure_collection()
 
     def _connect_qdrant(self):
-        """连接到 Qdrant"""
+        """
+        连接向量存储
+
+        VECTOR_STORE_BACKEND=local 时使用嵌入式本地向量存储；
+        否则连接 Qdrant（配置 QDRANT_LOCATION 时使用本地内存/磁盘模式）
+        """
         try:
-            self.client = QdrantClient(
-                host=self.qdrant_host,
-                port=self.qdrant_port,
-                api_key=self.qdrant_api_key,
+            if settings.VECTOR_STORE_BACKEND == "local":
+                self.client = LocalVectorStore(settings.RAG_LOCAL_VECTOR_PATH)
+                logger.info(f"✅ 使用本地向量存储: {settings.RAG_LOCAL_VECTOR_PATH}")
+                return
+            if settings.QDRANT_LOCATION == ":memory:":
+                self.client = QdrantClient(location=":memory:")
+            elif settings.QDRANT_LOCATION:
+                self.client = QdrantClient(path=settings.QDRANT_LOCATION)
+            else:
+                self.client = QdrantClient(
+                    host=self.qdrant_host,
+                    port=self.qdrant_port,
+                    api_key=self.qdrant_api_key,
+                )
+            logger.info(
+                f"✅ 已连接到 Qdrant: "
+                f"{settings.QDRANT_LOCATION or f'{self.qdrant_host}:{self.qdrant_port}'}"
             )
-            logger.info(f"✅ 已连接到 Qdrant: {self.qdrant_host}:{self.qdrant_port}")
         except Exception as e:
             logger.error(f"❌ 连接 Qdrant 失败: {e}")
             raise
 
-    def _ensure_collection(self):
-        """确保向量集合存在"""
+    def _ensure_collection(self, collection_name: Optional[str] = None):
+        """
+        确保向量集合存在，并为过滤字段建立载荷索引
+
+        Args:
+            collection_name: 集合名称（默认为共享集合）
+        """
+        collection_name = collection_name or self.collection_name
         try:
             # 检查集合是否存在
             collections = self.client.get_collections().collections
             collection_names = [c.name for c in collections]
 
-            if self.collection_name not in collection_names:
+            if collection_name not in collection_names:
                 # 创建集合
                 self.client.create_collection(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
                         distance=self.distance,
+                        on_disk=settings.QDRANT_VECTORS_ON_DISK,
                     ),
                     optimizers_config=OptimizersConfigDiff(
                         indexing_threshold=10000,  # 10000 个点后开始索引
                     ),
+                    quantization_config=self._quantization_config(),
                 )
-                logger.info(f"✅ 创建 Qdrant 集合: {self.collection_name}")
+                logger.info(f"✅ 创建 Qdrant 集合: {collection_name}")
             else:
-                logger.info(f"✅ Qdrant 集合已存在: {self.collection_name}")
+                logger.info(f"✅ Qdrant 集合已存在: {collection_name}")
+
+            self._ensure_payload_indexes(collection_name)
+            self._ready_collections.add(collection_name)
 
         except Exception as e:
             logger.error(f"❌ 确保 Qdrant 集合失败: {e}")
             raise
 
-    async def get_embedding(self, text: str) -> List[float]:
+    def _ensure_payload_indexes(self, collection_name: str):
         """
-        获取文本的向量表示
+        为 knowledge_base_id / document_id 建立整数载荷索引
+
+        没有载荷索引时，按知识库过滤的检索和按文档删除都需要扫描全部点。
+        """
+        try:
+            existing = self.client.get_collection(collection_name).payload_schema or {}
+        except Exception:
+            existing = {}
+
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            if field_name in existing:
+                continue
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.INTEGER,
+                )
+                logger.info(f"✅ 创建载荷索引: {collection_name}.{field_name}")
+            except Exception as e:
+                logger.warning(f"⚠️ 创建载荷索引失败: {collection_name}.{field_name}: {e}")
+
+    # ==================== 向量量化 ====================
+
+    def _quantization_config(self) -> Optional[Union[ScalarQuantization, ProductQuantization]]:
+        """
+        根据 QDRANT_QUANTIZATION 生成量化配置
+
+        Returns:
+            scalar 为 int8 标量量化，product 为乘积量化，none 返回 None
+        """
+        mode = settings.QDRANT_QUANTIZATION
+        if mode == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=settings.QDRANT_SCALAR_QUANTILE,
+                    always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+                )
+            )
+        if mode == "product":
+            return ProductQuantization(
+                product=ProductQuantizationConfig(
+                    compression=CompressionRatio(settings.QDRANT_PQ_COMPRESSION),
+                    always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+                )
+            )
+        if mode != "none":
+            logger.warning(f"⚠️ 未知的量化方式 {mode}，不启用量化")
+        return None
+
+    def _search_params(self) -> Optional[SearchParams]:
+        """量化检索参数：先用量化向量取 top_k × 过采样倍数个候选，再用原始向量重新打分"""
+        if settings.QDRANT_QUANTIZATION == "none":
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=settings.QDRANT_RESCORE_OVERSAMPLING,
+            )
+        )
+
+    def apply_quantization(self, collection_name: Optional[str] = None):
+        """
+        把当前量化配置应用到已有集合
+
+        Qdrant 会在后台由优化器重建量化索引，期间检索照常可用；
+        QDRANT_QUANTIZATION=none 时关闭量化。
 
         Args:
-            text: 输入文本
+            collection_name: 集合名称（默认为共享集合）
+        """
+        collection_name = collection_name or self.collection_name
+        self.client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=settings.QDRANT_VECTORS_ON_DISK)},
+            quantization_config=self._quantization_config() or Disabled.DISABLED,
+        )
+        logger.info(f"✅ 集合 {collection_name} 已应用量化配置: {settings.QDRANT_QUANTIZATION}")
+
+    # ==================== 集合路由 ====================
+
+    def dedicated_collection_name(self, knowledge_base_id: int) -> str:
+        """知识库专属集合名称"""
+        return f"{settings.QDRANT_COLLECTION_NAME}_kb_{knowledge_base_id}"
+
+    def _lookup_collection(self, knowledge_base_id: int) -> str:
+        """从数据库读取知识库所在集合（未设置时为共享集合）"""
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(KnowledgeBase.vector_collection)
+                .filter(KnowledgeBase.id == knowledge_base_id)
+                .first()
+            )
+            return (row.vector_collection if row else None) or self.collection_name
+        finally:
+            db.close()
+
+    def collection_for(self, knowledge_base_id: Optional[int]) -> str:
+        """
+        获取知识库的向量集合
+
+        路由结果在进程内缓存 QDRANT_ROUTE_CACHE_TTL 秒；
+        读取失败时回退到共享集合。
+
+        Args:
+            knowledge_base_id: 知识库 ID
 
         Returns:
-            List[float]: 向量表示
+            str: 集合名称
         """
-        if not text or not text.strip():
-            raise ValueError("文本不能为空")
+        if knowledge_base_id is None:
+            return self.collection_name
+
+        cached = self._cached_route(knowledge_base_id)
+        if cached is not None:
+            return cached
+
+        try:
+            collection_name = self._lookup_collection(knowledge_base_id)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取知识库集合路由失败，使用共享集合: {e}")
+            return self.collection_name
+
+        self._collection_routes[knowledge_base_id] = (
+            collection_name,
+            time.monotonic() + settings.QDRANT_ROUTE_CACHE_TTL,
+        )
+        return collection_name
+
+    def _cached_route(self, knowledge_base_id: int) -> Optional[str]:
+        """未过期的路由缓存"""
+        route = self._collection_routes.get(knowledge_base_id)
+        if route and route[1] > time.monotonic():
+            return route[0]
+        return None
+
+    async def collection_for_async(self, knowledge_base_id: Optional[int]) -> str:
+        """collection_for 的异步版本：缓存命中时直接返回，未命中时在线程中查库，不阻塞事件循环"""
+        if knowledge_base_id is None:
+            return self.collection_name
+        cached = self._cached_route(knowledge_base_id)
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(self.collection_for, knowledge_base_id)
+
+    def invalidate_route(self, knowledge_base_id: int):
+        """清除知识库的路由缓存"""
+        self._collection_routes.pop(knowledge_base_id, None)
+
+    def _migration_source(self, knowledge_base_id: int) -> Optional[str]:
+        """
+        读取知识库正在迁出的源集合（不缓存，每次写入前查库）
+
+        读取失败时视为未在迁移，与 collection_for 的回退方式一致。
+        """
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(KnowledgeBase.vector_migrating_from)
+                .filter(KnowledgeBase.id == knowledge_base_id)
+                .first()
+            )
+            return row.vector_migrating_from if row else None
+        except Exception as e:
+            logger.warning(f"⚠️ 读取知识库迁移状态失败: {e}")
+            return None
+        finally:
+            db.close()
+
+    async def _ensure_not_migrating(self, knowledge_base_id: int):
+        """知识库正在迁移集合时拒绝写入（由任务重试在迁移完成后写入）"""
+        source = await asyncio.to_thread(self._migration_source, knowledge_base_id)
+        if source is not None:
+            raise RuntimeError(f"知识库 {knowledge_base_id} 正在从集合 {source} 迁移，暂停写入")
+
+    def _all_collections(self) -> List[str]:
+        """共享集合 + 所有知识库专属集合"""
+        collections = [self.collection_name]
+        try:
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(KnowledgeBase.vector_collection)
+                    .filter(KnowledgeBase.vector_collection.isnot(None))
+                    .distinct()
+                    .all()
+                )
+            finally:
+                db.close()
+            collections.extend(row.vector_collection for row in rows if row.vector_collection)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取专属集合列表失败: {e}")
+        return list(dict.fromkeys(collections))
 
-        # 生成缓存键
-        cache_key = f"embedding:{hashlib.md5(text.encode()).hexdigest()}"
+    async def _cached_embedding(self, text: str) -> Optional[List[float]]:
+        """查找已有的文本向量：持久化向量存储（LRU → PostgreSQL），未启用时查 Redis 缓存"""
+        if self.embedding_store:
+            return await self.embedding_store.get(text)
 
-        # 尝试从缓存获取
         if settings.RAG_ENABLE_CACHE and self.redis_client:
+            cache_key = f"embedding:{hashlib.md5(text.encode()).hexdigest()}"
             try:
                 cached = self.redis_client.get(cache_key)
                 if cached:
@@ -121,33 +393,123 @@ class VectorService:
                     return json.loads(cached)
             except Exception as e:
                 logger.warning(f"⚠️ Redis 缓存读取失败: {e}")
+        return None
+
+    async def _cache_embedding(self, text: str, embedding: List[float]):
+        """缓存新生成的向量：优先写入持久化向量存储，未启用时写入 Redis"""
+        if self.embedding_store:
+            await self.embedding_store.put(text, embedding)
+        elif settings.RAG_ENABLE_CACHE and self.redis_client:
+            cache_key = f"embedding:{hashlib.md5(text.encode()).hexdigest()}"
+            try:
+                self.redis_client.setex(
+                    cache_key,
+                    settings.RAG_REDIS_CACHE_TTL,
+                    json.dumps(embedding),
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 缓存写入失败: {e}")
 
-        try:
-            # 调用 Zhipu AI Embedding API
-            response = self.embedding_client.embeddings.create(
-                model="embedding-2",
-                input=text,
-            )
+    async def _cached_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量查找已有的文本向量：持久化向量存储一次批量查询，未启用时 Redis MGET"""
+        if self.embedding_store:
+            return await self.embedding_store.get_many(texts)
 
-            embedding = response.data[0].embedding
+        if settings.RAG_ENABLE_CACHE and self.redis_client:
+            cache_keys = [f"embedding:{hashlib.md5(text.encode()).hexdigest()}" for text in texts]
+            try:
+                return [json.loads(cached) if cached else None for cached in self.redis_client.mget(cache_keys)]
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 缓存读取失败: {e}")
+        return [None] * len(texts)
 
-            # 缓存结果
-            if settings.RAG_ENABLE_CACHE and self.redis_client:
-                try:
-                    self.redis_client.setex(
-                        cache_key,
+    async def _cache_embeddings(self, texts: List[str], embeddings: List[List[float]]):
+        """批量缓存新生成的向量：持久化向量存储一次批量插入，未启用时 Redis 管道写入"""
+        if self.embedding_store:
+            await self.embedding_store.put_many(texts, embeddings)
+        elif settings.RAG_ENABLE_CACHE and self.redis_client:
+            try:
+                pipeline = self.redis_client.pipeline()
+                for text, embedding in zip(texts, embeddings):
+                    pipeline.setex(
+                        f"embedding:{hashlib.md5(text.encode()).hexdigest()}",
                         settings.RAG_REDIS_CACHE_TTL,
                         json.dumps(embedding),
                     )
-                except Exception as e:
-                    logger.warning(f"⚠️ Redis 缓存写入失败: {e}")
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 缓存写入失败: {e}")
 
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """调用 Zhipu AI Embedding API（阻塞调用，需在线程中执行），按输入顺序返回向量"""
+        response = self.embedding_client.embeddings.create(
+            model=self.embedding_model,
+            input=texts[0] if len(texts) == 1 else texts,
+        )
+        data = sorted(response.data, key=lambda item: getattr(item, "index", 0) or 0)
+        return [item.embedding for item in data]
+
+    async def get_embedding(self, text: str) -> List[float]:
+        """
+        获取文本的向量表示
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            List[float]: 向量表示
+        """
+        if not text or not text.strip():
+            raise ValueError("文本不能为空")
+
+        embedding = await self._cached_embedding(text)
+        if embedding is not None:
+            return embedding
+
+        try:
+            embedding = (await asyncio.to_thread(self._create_embeddings, [text]))[0]
+            await self._cache_embedding(text, embedding)
             return embedding
 
         except Exception as e:
             logger.error(f"❌ 获取 Embedding 失败: {e}")
             raise
 
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量获取文本的向量表示
+
+        先一次批量查找已有向量，未命中的文本（去重后）按 RAG_EMBED_API_BATCH_SIZE
+        分组，每组一次 Embedding API 调用并一次批量写入向量存储。
+
+        Args:
+            texts: 输入文本列表
+
+        Returns:
+            List[List[float]]: 与输入顺序一致的向量列表
+        """
+        if any(not text or not text.strip() for text in texts):
+            raise ValueError("文本不能为空")
+
+        cached = await self._cached_embeddings(texts)
+        embeddings: Dict[str, List[float]] = {
+            text: embedding for text, embedding in zip(texts, cached) if embedding is not None
+        }
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+
+        try:
+            batch_size = max(1, settings.RAG_EMBED_API_BATCH_SIZE)
+            for start in range(0, len(missing), batch_size):
+                group = missing[start:start + batch_size]
+                vectors = await asyncio.to_thread(self._create_embeddings, group)
+                embeddings.update(zip(group, vectors))
+                await self._cache_embeddings(group, vectors)
+        except Exception as e:
+            logger.error(f"❌ 批量获取 Embedding 失败: {e}")
+            raise
+
+        return [embeddings[text] for text in texts]
+
     def chunk_text(
         self,
         text: str,
@@ -159,254 +521,832 @@ class VectorService:
 
         Args:
             text: 输入文本
-            chunk_size: 块大小（字符数）
-            overlap: 重叠大小
+            chunk_size: 块大小（默认按 Token 数，RAG_CHUNKER=lines 时为字符数）
+            overlap: 重叠大小（单位同 chunk_size）
 
         Returns:
-            List[Dict]: 文本块列表，包含文本和元数据
+            List[Dict]: 文本块列表，包含文本和元数据（标题路径、页码）
         """
         if not text or not text.strip():
             return []
 
-        chunk_size = chunk_size or settings.RAG_CHUNK_SIZE
-        overlap = overlap or settings.RAG_CHUNK_OVERLAP
-
-        chunks = []
-        lines = text.split('\n')
-        current_chunk = []
-        current_length = 0
-        chunk_index = 0
-
-        for line in lines:
-            line_length = len(line)
-
-            # 如果当前行超过块大小，需要拆分
-            if line_length > chunk_size:
-                # 先保存当前块
-                if current_chunk:
-                    chunk_text = '\n'.join(current_chunk)
-                    chunks.append({
-                        'text': chunk_text,
-                        'index': chunk_index,
-                        'length': len(chunk_text),
-                    })
-                    chunk_index += 1
-                    current_chunk = []
-                    current_length = 0
-
-                # 拆分长行
-                for i in range(0, line_length, chunk_size - overlap):
-                    chunk_text = line[i:i + chunk_size]
-                    chunks.append({
-                        'text': chunk_text,
-                        'index': chunk_index,
-                        'length': len(chunk_text),
-                    })
-                    chunk_index += 1
-            else:
-                # 检查是否需要创建新块
-                if current_length + line_length + 1 > chunk_size and current_chunk:
-                    # 保存当前块
-                    chunk_text = '\n'.join(current_chunk)
-                    chunks.append({
-                        'text': chunk_text,
-                        'index': chunk_index,
-                        'length': len(chunk_text),
-                    })
-                    chunk_index += 1
-
-                    # 保留部分重叠内容
-                    if overlap > 0 and len(current_chunk) > 1:
-                        overlap_text = '\n'.join(current_chunk[-2:])  # 保留最后 2 行
-                        current_chunk = [overlap_text]
-                        current_length = len(overlap_text)
-                    else:
-                        current_chunk = []
-                        current_length = 0
-
-                # 添加行到当前块
-                current_chunk.append(line)
-                current_length += line_length + 1  # +1 for newline
-
-        # 保存最后一个块
-        if current_chunk:
-            chunk_text = '\n'.join(current_chunk)
-            chunks.append({
-                'text': chunk_text,
-                'index': chunk_index,
-                'length': len(chunk_text),
-            })
+        chunker = create_chunker(chunk_size, overlap)
+        chunks = chunker.feed(text) + chunker.flush()
 
         logger.info(f"📄 文本分块完成: {len(chunks)} 个块")
         return chunks
 
-    async def add_document_chunks(
+    @staticmethod
+    def chunk_point_id(document_id: int, chunk_hash: str) -> str:
+        """
+        根据（文档 ID, 块内容哈希）生成确定性的点 ID
+
+        同一文档中内容未变的块在重新索引时得到相同的 ID，可直接复用。
+        """
+        return str(uuid.uuid5(CHUNK_POINT_NAMESPACE, f"{document_id}:{chunk_hash}"))
+
+    def _get_document_point_ids(self, document_id: int, collection_name: str) -> Set[str]:
+        """
+        获取文档在 Qdrant 中已有的全部点 ID（不返回向量和载荷）
+
+        Args:
+            document_id: 文档 ID
+            collection_name: 集合名称
+
+        Returns:
+            Set[str]: 点 ID 集合
+        """
+        return self._scroll_point_ids(collection_name, "document_id", document_id)
+
+    def _scroll_point_ids(self, collection_name: str, key: str, value: int) -> Set[str]:
+        """分页读取载荷字段 key 等于 value 的全部点 ID"""
+        point_ids: Set[str] = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key=key,
+                            match=MatchValue(value=value),
+                        )
+                    ]
+                ),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return point_ids
+
+    def _delete_points(self, point_ids: List[str], collection_name: str, page_size: int = 1000):
+        """按 ID 分页删除点"""
+        for start in range(0, len(point_ids), page_size):
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=point_ids[start:start + page_size]),
+            )
+
+    async def _index_chunk_batch(
         self,
         knowledge_base_id: int,
         document_id: int,
-        text: str,
+        chunks: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+        collection_name: Optional[str] = None,
+    ) -> List[str]:
+        """
+        向量化一批文本块并写入 Qdrant
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            document_id: 文档 ID
+            chunks: 文本块列表
+            metadata: 额外元数据
+            collection_name: 目标集合（默认按知识库路由）
+
+        Returns:
+            List[str]: 成功写入的点 ID 列表（重试后仍失败的分页不包含在内）
+        """
+        points = []
+        contents = []
+        # 整批生成向量（未命中缓存的块合并为一次 API 调用）
+        embeddings = await self.get_embeddings([chunk['text'] for chunk in chunks]) if chunks else []
+        for chunk, embedding in zip(chunks, embeddings):
+            point_id = self.chunk_point_id(document_id, chunk['hash'])
+
+            # 准备元数据（过滤字段始终保留在载荷中）
+            point_metadata = {
+                "knowledge_base_id": knowledge_base_id,
+                "document_id": document_id,
+                "chunk_index": chunk['index'],
+                "chunk_hash": chunk['hash'],
+            }
+            extra = {
+                "length": chunk['length'],
+                "created_at": datetime.utcnow().isoformat(),
+                **(metadata or {}),
+            }
+            # 结构化分块附带的标题路径与页码
+            for key in ("tokens", "headings", "page", "page_end"):
+                if chunk.get(key):
+                    extra[key] = chunk[key]
+            if self.chunk_store:
+                contents.append({
+                    "point_id": point_id,
+                    "index": chunk['index'],
+                    "text": chunk['text'],
+                    "extra": extra,
+                })
+            else:
+                point_metadata.update({"text": chunk['text'], **extra})
+
+            points.append(PointStruct(
+                id=point_id,
+                vector=embedding,
+                payload=point_metadata,
+            ))
+
+        # 先写正文再写向量，检索到的点总能回填正文
+        if contents:
+            await self.chunk_store.put_many(knowledge_base_id, document_id, contents)
+
+        failed_ids: Set[str] = set()
+        if points:
+            failed_ids = set(
+                await self._upsert_points(
+                    collection_name or await self.collection_for_async(knowledge_base_id), points
+                )
+            )
+
+        return [p.id for p in points if p.id not in failed_ids]
+
+    async def _upsert_page(self, collection_name: str, page: List[PointStruct]):
+        """写入一页点，失败时按指数退避重试（向量已生成，重试不会重新调用 Embedding API）"""
+        max_retries = settings.QDRANT_UPSERT_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            try:
+                await asyncio.to_thread(
+                    self.client.upsert,
+                    collection_name=collection_name,
+                    points=page,
+                    wait=settings.QDRANT_UPSERT_WAIT,
+                )
+                return
+            except Exception as e:
+                if attempt >= max_retries:
+                    raise
+                delay = settings.QDRANT_UPSERT_RETRY_BACKOFF * (2 ** attempt)
+                logger.warning(
+                    f"⚠️ 写入 {len(page)} 个点失败，{delay:.1f} 秒后重试 "
+                    f"({attempt + 1}/{max_retries}): {e}"
+                )
+                await asyncio.sleep(delay)
+
+    async def _upsert_points(self, collection_name: str, points: List[PointStruct]) -> List[str]:
+        """
+        分页并发写入点
+
+        每页独立重试，一页失败不影响其他分页；
+        已成功的分页保留在集合中，任务重试时按点 ID 跳过（见 add_document_stream）。
+
+        Args:
+            collection_name: 集合名称
+            points: 待写入的点
+
+        Returns:
+            List[str]: 重试后仍写入失败的点 ID
+        """
+        page_size = settings.QDRANT_UPSERT_PAGE_SIZE
+        pages = [points[start:start + page_size] for start in range(0, len(points), page_size)]
+        semaphore = asyncio.Semaphore(settings.QDRANT_UPSERT_CONCURRENCY)
+
+        async def run(page: List[PointStruct]):
+            async with semaphore:
+                await self._upsert_page(collection_name, page)
+
+        outcomes = await asyncio.gather(*(run(page) for page in pages), return_exceptions=True)
+        failed_ids = []
+        for page, outcome in zip(pages, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"❌ 分页写入失败（{len(page)} 个点）: {outcome}")
+                failed_ids.extend(point.id for point in page)
+        return failed_ids
+
+    async def add_document_stream(
+        self,
+        knowledge_base_id: int,
+        document_id: int,
+        blocks: AsyncIterator[Union[str, Dict[str, Any]]],
         metadata: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+        is_current: Optional[Callable[[], bool]] = None,
     ) -> Dict[str, Any]:
         """
-        添加文档的文本块到向量数据库
+        流式增量索引文档：边解析边分块、边向量化边写入
+
+        内存中最多保留一个解析块和一批待写入的文本块，
+        前面的块在后续页面解析完成之前即可被检索到。
+
+        点 ID 由（文档 ID, 块内容哈希）确定：已存在的块直接复用，
+        只为新增的块生成向量；全部完成后删除不再出现的旧块。
+        因此重新索引和任务重试都是幂等的。
+
+        写入按分页并发、逐页重试；重试后仍失败的分页不会中断索引，
+        其余分页照常写入，最终返回 success=False 交由任务重试，
+        重试时已写入的块被跳过，向量从向量存储中取回而不会重新生成。
+
+        知识库正在迁移集合时（见 migrate_knowledge_base）不写入，返回 success=False
+        交由任务重试。
 
         Args:
             knowledge_base_id: 知识库 ID
             document_id: 文档 ID
-            text: 文档内容
+            blocks: 文本块异步迭代器（字符串或包含 text 字段的字典）
             metadata: 额外元数据
+            batch_size: 每批向量化并写入的块数
+            on_progress: 每批处理后的回调，参数为已处理的块数
+            is_current: 文档是否仍存在的检查（阻塞调用，在线程中执行）；每批写入前和
+                清理旧块前调用，返回 False 时中止索引并删除该文档已写入的全部数据，
+                结果中 removed=True
 
         Returns:
-            Dict: 包含添加的块数量等信息
+            Dict: 包含块数量、新增/复用/删除数量等信息
         """
+        batch_size = batch_size or settings.RAG_EMBED_BATCH_SIZE
+        chunker = create_chunker()
+        pending: List[Dict[str, Any]] = []
+        seen_ids: Set[str] = set()
+        embedded_count = 0
+        failed_count = 0
+
         try:
-            # 分割文本
-            chunks = self.chunk_text(text)
+            await self._ensure_not_migrating(knowledge_base_id)
+            collection_name = await self.collection_for_async(knowledge_base_id)
+            # 专属集合可能尚未创建或已被删除（如删除知识库后重新导入）
+            if collection_name not in self._ready_collections:
+                await asyncio.to_thread(self._ensure_collection, collection_name)
+            existing_ids = await asyncio.to_thread(self._get_document_point_ids, document_id, collection_name)
+
+            async def flush_batch(batch: List[Dict[str, Any]]):
+                nonlocal embedded_count, failed_count
+                # 写入期间开始迁移时中止：已写入源集合的点由迁移清理前的核对补齐
+                await self._ensure_not_migrating(knowledge_base_id)
+                unique_chunks = []
+                new_chunks = []
+                for chunk in batch:
+                    point_id = self.chunk_point_id(document_id, chunk['hash'])
+                    if point_id in seen_ids:
+                        continue
+                    seen_ids.add(point_id)
+                    unique_chunks.append({**chunk, "point_id": point_id})
+                    if point_id not in existing_ids:
+                        new_chunks.append(chunk)
+
+                written = await self._index_chunk_batch(
+                    knowledge_base_id, document_id, new_chunks, metadata, collection_name
+                )
+                embedded_count += len(written)
+                failed_count += len(new_chunks) - len(written)
+                if len(written) < len(new_chunks):
+                    written_ids = set(written)
+                    new_ids = {self.chunk_point_id(document_id, c['hash']) for c in new_chunks}
+                    unique_chunks = [
+                        c for c in unique_chunks
+                        if c["point_id"] not in new_ids or c["point_id"] in written_ids
+                    ]
+
+                # 词法索引写入整批（含复用的块，不含写入失败的块），覆盖写入是幂等的
+                if self.lexical_index:
+                    await asyncio.to_thread(
+                        self.lexical_index.add_chunks, knowledge_base_id, document_id, unique_chunks
+                    )
+                if on_progress:
+                    on_progress(len(seen_ids))
+
+            async def document_removed() -> bool:
+                return is_current is not None and not await asyncio.to_thread(is_current)
+
+            async for block in blocks:
+                text = block["text"] if isinstance(block, dict) else block
+                pending.extend(chunker.feed(text))
 
-            if not chunks:
+                while len(pending) >= batch_size:
+                    if await document_removed():
+                        return await self._discard_removed_document(knowledge_base_id, document_id)
+                    batch, pending = pending[:batch_size], pending[batch_size:]
+                    await flush_batch(batch)
+
+            pending.extend(chunker.flush())
+            if pending:
+                if await document_removed():
+                    return await self._discard_removed_document(knowledge_base_id, document_id)
+                await flush_batch(pending)
+
+            if seen_ids and await document_removed():
+                return await self._discard_removed_document(knowledge_base_id, document_id)
+
+            if not seen_ids:
                 return {
                     "success": False,
                     "error": "文本为空或无法分割",
                 }
 
-            # 为每个块生成向量和点
-            points = []
-            for chunk in chunks:
-                # 生成向量
-                embedding = await self.get_embedding(chunk['text'])
-
-                # 创建唯一 ID
-                point_id = str(uuid.uuid4())
-
-                # 准备元数据
-                point_metadata = {
-                    "knowledge_base_id": knowledge_base_id,
-                    "document_id": document_id,
-                    "chunk_index": chunk['index'],
-                    "text": chunk['text'],
-                    "length": chunk['length'],
-                    "created_at": datetime.utcnow().isoformat(),
-                    **(metadata or {}),
+            if failed_count:
+                # 保留旧块，避免部分写入时文档内容缺失；重试时从已写入的位置继续
+                if embedded_count:
+                    self._invalidate_retrieval_cache(knowledge_base_id)
+                logger.error(f"❌ 文档 {document_id} 有 {failed_count} 个块写入失败，已写入 {embedded_count} 个")
+                return {
+                    "success": False,
+                    "error": f"{failed_count} 个块写入向量库失败",
+                    "chunk_count": len(seen_ids),
+                    "embedded_count": embedded_count,
+                    "failed_count": failed_count,
                 }
 
-                # 创建点结构
-                point = PointStruct(
-                    id=point_id,
-                    vector=embedding,
-                    payload=point_metadata,
-                )
-                points.append(point)
-
-            # 批量插入到 Qdrant
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points,
+            # 删除新版本中不再出现的块
+            await self._ensure_not_migrating(knowledge_base_id)
+            stale_ids = sorted(existing_ids - seen_ids)
+            await asyncio.to_thread(self._delete_points, stale_ids, collection_name)
+            if self.lexical_index and stale_ids:
+                await asyncio.to_thread(self.lexical_index.delete_points, stale_ids)
+            if self.chunk_store and stale_ids:
+                await self.chunk_store.delete_points(stale_ids)
+            if embedded_count or stale_ids:
+                self._invalidate_retrieval_cache(knowledge_base_id)
+
+            logger.info(
+                f"✅ 文档 {document_id} 索引完成: {len(seen_ids)} 个块，"
+                f"新增 {embedded_count}，复用 {len(seen_ids) - embedded_count}，删除 {len(stale_ids)}"
             )
 
-            logger.info(f"✅ 添加了 {len(chunks)} 个文档块到 Qdrant")
-
             return {
                 "success": True,
-                "chunk_count": len(chunks),
-                "point_ids": [p.id for p in points],
+                "chunk_count": len(seen_ids),
+                "embedded_count": embedded_count,
+                "reused_count": len(seen_ids) - embedded_count,
+                "deleted_count": len(stale_ids),
+                "point_ids": list(seen_ids),
             }
 
         except Exception as e:
             logger.error(f"❌ 添加文档块失败: {e}")
+            if embedded_count:
+                self._invalidate_retrieval_cache(knowledge_base_id)
             return {
                 "success": False,
                 "error": str(e),
+                "chunk_count": len(seen_ids),
+                "embedded_count": embedded_count,
             }
 
+    async def _discard_removed_document(self, knowledge_base_id: int, document_id: int) -> Dict[str, Any]:
+        """索引期间文档被删除：删除本次（及之前）为其写入的点、词法索引和正文"""
+        logger.warning(f"⚠️ 文档 {document_id} 已在索引期间删除，清理已写入的数据")
+        await self.delete_document_chunks(document_id, knowledge_base_id)
+        return {
+            "success": False,
+            "removed": True,
+            "error": "文档已删除",
+        }
+
+    async def add_document_chunks(
+        self,
+        knowledge_base_id: int,
+        document_id: int,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        添加文档的文本块到向量数据库
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            document_id: 文档 ID
+            text: 文档内容
+            metadata: 额外元数据
+
+        Returns:
+            Dict: 包含添加的块数量等信息
+        """
+        if not text or not text.strip():
+            return {
+                "success": False,
+                "error": "文本为空或无法分割",
+            }
+
+        async def single_block():
+            yield text
+
+        return await self.add_document_stream(
+            knowledge_base_id=knowledge_base_id,
+            document_id=document_id,
+            blocks=single_block(),
+            metadata=metadata,
+        )
+
+    async def _search_targets(
+        self,
+        knowledge_base_id: Optional[int] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
+    ) -> List[tuple]:
+        """
+        确定检索范围：按所在集合分组知识库
+
+        必须指定知识库：两者都未指定时不检索任何集合，避免跨知识库（跨用户）返回结果。
+
+        Returns:
+            List[tuple]: (集合名称, 过滤条件) 列表；未指定知识库或 knowledge_base_ids 为空列表时为空
+        """
+        if knowledge_base_id is not None:
+            knowledge_base_ids = [knowledge_base_id]
+        elif knowledge_base_ids is None:
+            logger.warning("⚠️ 检索未指定知识库，返回空结果")
+            return []
+
+        groups: Dict[str, List[int]] = {}
+        for kb_id in dict.fromkeys(knowledge_base_ids):
+            groups.setdefault(await self.collection_for_async(kb_id), []).append(kb_id)
+
+        return [
+            (
+                collection_name,
+                Filter(
+                    must=[
+                        FieldCondition(
+                            key="knowledge_base_id",
+                            match=MatchValue(value=kb_ids[0]) if len(kb_ids) == 1 else MatchAny(any=kb_ids),
+                        )
+                    ]
+                ),
+            )
+            for collection_name, kb_ids in groups.items()
+        ]
+
+    def _search_collection(
+        self,
+        collection_name: str,
+        query_filter: Optional[Filter],
+        query_embedding: List[float],
+        top_k: int,
+        score_threshold: Optional[float],
+        with_vectors: bool,
+    ) -> List[Dict[str, Any]]:
+        """在单个集合中检索并解析结果"""
+        search_result = self.client.search(
+            collection_name=collection_name,
+            query_vector=query_embedding,
+            limit=top_k,
+            query_filter=query_filter,
+            score_threshold=score_threshold,
+            with_vectors=with_vectors,
+            search_params=self._search_params(),
+        )
+
+        results = []
+        for hit in search_result:
+            result = {
+                "point_id": hit.id,
+                "collection": collection_name,
+                "knowledge_base_id": hit.payload.get("knowledge_base_id"),
+                "document_id": hit.payload.get("document_id"),
+                "chunk_index": hit.payload.get("chunk_index"),
+                "text": hit.payload.get("text"),
+                "score": hit.score,
+                "metadata": hit.payload,
+            }
+            if with_vectors:
+                result["vector"] = hit.vector
+            results.append(result)
+        return results
+
     async def search(
         self,
         query: str,
         knowledge_base_id: Optional[int] = None,
         top_k: Optional[int] = None,
         score_threshold: Optional[float] = None,
+        with_vectors: bool = False,
+        knowledge_base_ids: Optional[List[int]] = None,
+        timeout: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
         """
         向量相似度搜索
 
+        多个知识库按所在集合分组：同一集合内的知识库用一次 MatchAny 过滤检索，
+        各集合并发检索后按得分合并。超过截止时间仍未返回的集合被放弃，
+        只返回已完成的部分结果。
+
         Args:
             query: 查询文本
-            knowledge_base_id: 知识库 ID（可选，用于过滤）
+            knowledge_base_id: 知识库 ID（与 knowledge_base_ids 至少指定一个，否则返回空结果）
             top_k: 返回最相似的前 K 个结果
             score_threshold: 相似度阈值（0-1）
+            with_vectors: 是否返回点的向量（用于重排序）
+            knowledge_base_ids: 知识库 ID 列表（跨多个知识库检索；空列表返回空结果）
+            timeout: 本次检索的截止时间（秒，默认 RAG_SEARCH_TIMEOUT）
 
         Returns:
             List[Dict]: 搜索结果列表
         """
         if top_k is None:
             top_k = settings.RAG_TOP_K
+        deadline = time.monotonic() + (timeout or settings.RAG_SEARCH_TIMEOUT)
 
         try:
+            targets = await self._search_targets(knowledge_base_id, knowledge_base_ids)
+            if not targets:
+                return []
+
             # 获取查询向量
             query_embedding = await self.get_embedding(query)
 
-            # 构建过滤条件
-            query_filter = None
-            if knowledge_base_id is not None:
-                query_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="knowledge_base_id",
-                            match=MatchValue(value=knowledge_base_id),
-                        )
-                    ]
-                )
-
-            # 执行搜索
-            search_result = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=top_k,
-                query_filter=query_filter,
-                score_threshold=score_threshold,
-            )
+            # 各集合并发检索
+            tasks = [
+                asyncio.create_task(asyncio.to_thread(
+                    self._search_collection,
+                    collection_name,
+                    query_filter,
+                    query_embedding,
+                    top_k,
+                    score_threshold,
+                    with_vectors,
+                ))
+                for collection_name, query_filter in targets
+            ]
+            done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"⚠️ {len(pending)}/{len(tasks)} 个集合检索超时，返回部分结果")
 
-            # 解析结果
             results = []
-            for hit in search_result:
-                results.append({
-                    "point_id": hit.id,
-                    "document_id": hit.payload.get("document_id"),
-                    "chunk_index": hit.payload.get("chunk_index"),
-                    "text": hit.payload.get("text"),
-                    "score": hit.score,
-                    "metadata": hit.payload,
-                })
-
-            logger.info(f"🔍 向量搜索完成: {len(results)} 个结果")
+            for task in tasks:
+                if task not in done:
+                    continue
+                if task.exception() is not None:
+                    logger.warning(f"⚠️ 集合检索失败: {task.exception()}")
+                    continue
+                results.extend(task.result())
+
+            if len(tasks) > 1:
+                results = sorted(results, key=lambda r: r["score"], reverse=True)[:top_k]
+
+            logger.info(f"🔍 向量搜索完成: {len(results)} 个结果（{len(tasks)} 个集合）")
             return results
 
         except Exception as e:
             logger.error(f"❌ 向量搜索失败: {e}")
             return []
 
-    async def delete_document_chunks(self, document_id: int) -> bool:
+    def _invalidate_retrieval_cache(self, knowledge_base_id: Optional[int] = None):
+        """知识库内容变化后使其检索缓存失效"""
+        if self.retrieval_cache:
+            self.retrieval_cache.bump(knowledge_base_id)
+
+    async def get_chunks(
+        self,
+        point_ids: List[str],
+        collection_name: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        按点 ID 批量获取文本块
+
+        Args:
+            point_ids: 点 ID 列表
+            collection_name: 集合名称（默认为共享集合）
+
+        Returns:
+            Dict[str, Dict]: 点 ID -> 文本块（字段与 search 结果一致，不含 score）
+        """
+        if not point_ids:
+            return {}
+
+        collection_name = collection_name or self.collection_name
+        points = await asyncio.to_thread(
+            self.client.retrieve,
+            collection_name=collection_name,
+            ids=point_ids,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return {
+            str(point.id): {
+                "point_id": point.id,
+                "collection": collection_name,
+                "document_id": point.payload.get("document_id"),
+                "chunk_index": point.payload.get("chunk_index"),
+                "text": point.payload.get("text"),
+                "metadata": point.payload,
+            }
+            for point in points
+        }
+
+    async def hydrate_texts(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        为缺少正文的检索结果批量回填正文（精简载荷）
+
+        只应对最终选中的结果调用：一次查询取回全部正文，
+        附加载荷合并到 metadata 中。找不到正文的结果会被丢弃。
+
+        Args:
+            results: 检索结果
+
+        Returns:
+            List[Dict]: 回填正文后的检索结果
+        """
+        missing = [str(r["point_id"]) for r in results if r.get("text") is None]
+        if not missing or not self.chunk_store:
+            return results
+
+        try:
+            contents = await self.chunk_store.get_many(missing)
+        except Exception as e:
+            logger.error(f"❌ 回填文本块正文失败: {e}")
+            contents = {}
+
+        hydrated = []
+        for result in results:
+            if result.get("text") is None:
+                content = contents.get(str(result["point_id"]))
+                if content is None:
+                    continue
+                result = {
+                    **result,
+                    "text": content["text"],
+                    "metadata": {**(result.get("metadata") or {}), **content["extra"]},
+                }
+            hydrated.append(result)
+        return hydrated
+
+    async def hybrid_search(
+        self,
+        query: str,
+        knowledge_base_id: Optional[int] = None,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        with_vectors: bool = False,
+        knowledge_base_ids: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        混合检索：向量检索 + BM25 词法检索，倒数排名融合（RRF）
+
+        两路检索并发执行，各取 2 * top_k 个候选后融合。
+        未启用词法索引时退化为纯向量检索。
+
+        Args:
+            query: 查询文本
+            knowledge_base_id: 知识库 ID（与 knowledge_base_ids 至少指定一个，否则返回空结果）
+            top_k: 返回前 K 个结果
+            score_threshold: 向量检索的相似度阈值（0-1）
+            with_vectors: 是否返回向量检索命中的点向量（用于重排序）
+            knowledge_base_ids: 知识库 ID 列表（跨多个知识库检索）
+
+        Returns:
+            List[Dict]: 融合后的结果，score 为归一化的 RRF 得分，
+                vector_score / lexical_score 为各路原始得分
+        """
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+
+        if knowledge_base_id is None and knowledge_base_ids is None:
+            logger.warning("⚠️ 混合检索未指定知识库，返回空结果")
+            return []
+
+        if not self.lexical_index:
+            return await self.search(
+                query, knowledge_base_id, top_k, score_threshold, with_vectors,
+                knowledge_base_ids=knowledge_base_ids,
+            )
+
+        candidate_k = top_k * 2
+        vector_results, lexical_results = await asyncio.gather(
+            self.search(
+                query, knowledge_base_id, candidate_k, score_threshold, with_vectors,
+                knowledge_base_ids=knowledge_base_ids,
+            ),
+            asyncio.to_thread(
+                self.lexical_index.search, query, knowledge_base_id, candidate_k, knowledge_base_ids
+            ),
+            return_exceptions=True,
+        )
+
+        if isinstance(lexical_results, BaseException):
+            logger.warning(f"⚠️ 词法检索失败，仅使用向量检索: {lexical_results}")
+            lexical_results = []
+        if isinstance(vector_results, BaseException):
+            logger.error(f"❌ 向量检索失败: {vector_results}")
+            vector_results = []
+
+        vector_scores = {str(r["point_id"]): r["score"] for r in vector_results}
+        lexical_scores = {str(r["point_id"]): r["score"] for r in lexical_results}
+
+        results = reciprocal_rank_fusion([vector_results, lexical_results])[:top_k]
+        for result in results:
+            point_id = str(result["point_id"])
+            result["vector_score"] = vector_scores.get(point_id)
+            result["lexical_score"] = lexical_scores.get(point_id)
+            if "collection" not in result:
+                result["collection"] = await self.collection_for_async(result.get("knowledge_base_id"))
+
+        logger.info(
+            f"🔍 混合检索完成: 向量 {len(vector_results)}，词法 {len(lexical_results)}，"
+            f"融合后 {len(results)} 个结果"
+        )
+        return results
+
+    async def rerank_mmr(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        lambda_mult: float = 0.7,
+        dedup_threshold: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        MMR 重排序：在相关性与多样性之间取舍，并抑制近重复块
+
+        缺少向量的候选（如仅词法命中）按点 ID 批量取回向量。
+
+        Args:
+            query: 查询文本
+            results: 候选结果（按相关度降序）
+            top_k: 返回数量
+            lambda_mult: 相关性权重（1 为纯相关性，0 为纯多样性）
+            dedup_threshold: 近重复阈值（可选）
+
+        Returns:
+            List[Dict]: 重排序后的结果（不含向量）
+        """
+        if len(results) <= 1:
+            return [{k: v for k, v in r.items() if k != "vector"} for r in results[:top_k]]
+
+        try:
+            missing: Dict[str, List[str]] = {}
+            for r in results:
+                if r.get("vector") is None:
+                    collection_name = r.get("collection") or await self.collection_for_async(r.get("knowledge_base_id"))
+                    missing.setdefault(collection_name, []).append(r["point_id"])
+            if missing:
+                vectors = {}
+                for collection_name, ids in missing.items():
+                    points = await asyncio.to_thread(
+                        self.client.retrieve,
+                        collection_name=collection_name,
+                        ids=ids,
+                        with_payload=False,
+                        with_vectors=True,
+                    )
+                    vectors.update({str(p.id): p.vector for p in points})
+                results = [
+                    {**r, "vector": vectors.get(str(r["point_id"]))} if r.get("vector") is None else r
+                    for r in results
+                ]
+                results = [r for r in results if r["vector"] is not None]
+
+            query_embedding = await self.get_embedding(query)
+            selected = mmr_select(
+                query_embedding,
+                [r["vector"] for r in results],
+                top_k,
+                lambda_mult=lambda_mult,
+                dedup_threshold=dedup_threshold,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ MMR 重排序失败，使用原始排序: {e}")
+            selected = list(range(min(top_k, len(results))))
+
+        return [{k: v for k, v in results[i].items() if k != "vector"} for i in selected]
+
+    async def delete_document_chunks(
+        self,
+        document_id: int,
+        knowledge_base_id: Optional[int] = None,
+    ) -> bool:
         """
         删除文档的所有文本块
 
         Args:
             document_id: 文档 ID
+            knowledge_base_id: 所属知识库 ID（用于路由集合和使检索缓存失效；为空时检查所有集合）
 
         Returns:
             bool: 是否删除成功
         """
         try:
-            # 使用过滤条件删除
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=Filter(
-                    must=[
-                        FieldCondition(
-                            key="document_id",
-                            match=MatchValue(value=document_id),
-                        )
-                    ]
-                ),
-            )
+            if knowledge_base_id is not None:
+                collections = [await self.collection_for_async(knowledge_base_id)]
+                # 迁移期间同时从源集合删除，避免清理前的核对把已删除的点复制回目标集合
+                source = await asyncio.to_thread(self._migration_source, knowledge_base_id)
+                if source is not None and source not in collections:
+                    collections.append(source)
+            else:
+                collections = await asyncio.to_thread(self._all_collections)
+
+            # 使用过滤条件删除（document_id 有载荷索引）
+            for collection_name in collections:
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=Filter(
+                        must=[
+                            FieldCondition(
+                                key="document_id",
+                                match=MatchValue(value=document_id),
+                            )
+                        ]
+                    ),
+                )
+
+            if self.lexical_index:
+                await asyncio.to_thread(self.lexical_index.delete_document, document_id)
+            if self.chunk_store:
+                await self.chunk_store.delete_document(document_id)
+            self._invalidate_retrieval_cache(knowledge_base_id)
 
             logger.info(f"✅ 删除了文档 {document_id} 的所有文本块")
             return True
@@ -415,21 +1355,86 @@ class VectorService:
             logger.error(f"❌ 删除文档块失败: {e}")
             return False
 
-    async def delete_knowledge_base_chunks(self, knowledge_base_id: int) -> bool:
+    async def delete_knowledge_base_chunks(self, knowledge_base_id: int, keep_collection: bool = False) -> bool:
         """
         删除知识库的所有文本块
 
+        专属集合默认直接删除整个集合；共享集合按 knowledge_base_id 过滤删除。
+
         Args:
             knowledge_base_id: 知识库 ID
+            keep_collection: 保留专属集合只删除其中的点（重建知识库时使用）
 
         Returns:
             bool: 是否删除成功
         """
         try:
-            # 使用过滤条件删除
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=Filter(
+            collections = [await self.collection_for_async(knowledge_base_id)]
+            # 迁移期间源集合中的点同样属于该知识库
+            source = await asyncio.to_thread(self._migration_source, knowledge_base_id)
+            if source is not None and source not in collections:
+                collections.append(source)
+            for collection_name in collections:
+                self._purge_knowledge_base_points(
+                    knowledge_base_id, collection_name, drop_dedicated=not keep_collection
+                )
+
+            if self.lexical_index:
+                await asyncio.to_thread(self.lexical_index.delete_knowledge_base, knowledge_base_id)
+            if self.chunk_store:
+                await self.chunk_store.delete_knowledge_base(knowledge_base_id)
+            self._invalidate_retrieval_cache(knowledge_base_id)
+
+            logger.info(f"✅ 删除了知识库 {knowledge_base_id} 的所有文本块")
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ 删除知识库块失败: {e}")
+            return False
+
+    def _purge_knowledge_base_points(
+        self,
+        knowledge_base_id: int,
+        collection_name: str,
+        drop_dedicated: bool = True,
+    ):
+        """删除知识库在指定集合中的全部点（专属集合默认整个删除）"""
+        if drop_dedicated and collection_name == self.dedicated_collection_name(knowledge_base_id):
+            self.client.delete_collection(collection_name=collection_name)
+            self._ready_collections.discard(collection_name)
+            return
+
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=Filter(
+                must=[
+                    FieldCondition(
+                        key="knowledge_base_id",
+                        match=MatchValue(value=knowledge_base_id),
+                    )
+                ]
+            ),
+        )
+
+    def _copy_knowledge_base_points(
+        self,
+        knowledge_base_id: int,
+        source: str,
+        target: str,
+        page_size: int = 256,
+    ) -> int:
+        """
+        分页复制知识库的点（含向量和载荷），点 ID 不变，重复复制是幂等的
+
+        Returns:
+            int: 复制的点数
+        """
+        copied = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=source,
+                scroll_filter=Filter(
                     must=[
                         FieldCondition(
                             key="knowledge_base_id",
@@ -437,15 +1442,189 @@ class VectorService:
                         )
                     ]
                 ),
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
             )
+            if points:
+                self.client.upsert(
+                    collection_name=target,
+                    points=[
+                        PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                        for point in points
+                    ],
+                )
+                copied += len(points)
+            if offset is None:
+                return copied
 
-            logger.info(f"✅ 删除了知识库 {knowledge_base_id} 的所有文本块")
-            return True
+    def _sync_knowledge_base_points(
+        self,
+        knowledge_base_id: int,
+        source: str,
+        target: str,
+        page_size: int = 256,
+    ) -> Dict[str, int]:
+        """
+        双向核对源集合与目标集合中知识库的点 ID
 
-        except Exception as e:
-            logger.error(f"❌ 删除知识库块失败: {e}")
+        复制目标集合缺少的点；删除目标集合中源集合已不存在的点
+        （迁移期间被删除、但被并发的复制写回目标集合的点）。
+
+        Returns:
+            Dict[str, int]: 包含 copied_count、deleted_count
+        """
+        source_ids = self._scroll_point_ids(source, "knowledge_base_id", knowledge_base_id)
+        target_ids = self._scroll_point_ids(target, "knowledge_base_id", knowledge_base_id)
+
+        missing = sorted(source_ids - target_ids)
+        for start in range(0, len(missing), page_size):
+            points = self.client.retrieve(
+                collection_name=source,
+                ids=missing[start:start + page_size],
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                self.client.upsert(
+                    collection_name=target,
+                    points=[
+                        PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                        for point in points
+                    ],
+                )
+
+        extra = sorted(target_ids - source_ids)
+        self._delete_points(extra, target)
+        return {"copied_count": len(missing), "deleted_count": len(extra)}
+
+    def _save_route(self, knowledge_base_id: int, collection_name: Optional[str]):
+        """持久化知识库所在集合（None 表示共享集合）"""
+        db = SessionLocal()
+        try:
+            knowledge_base = db.query(KnowledgeBase).filter(KnowledgeBase.id == knowledge_base_id).first()
+            if knowledge_base is None:
+                raise ValueError(f"知识库不存在: {knowledge_base_id}")
+            knowledge_base.vector_collection = collection_name
+            db.commit()
+        finally:
+            db.close()
+
+    def _set_migration_source(self, knowledge_base_id: int, source: str):
+        """标记知识库正在从 source 迁出（标记期间暂停写入）"""
+        db = SessionLocal()
+        try:
+            updated = (
+                db.query(KnowledgeBase)
+                .filter(KnowledgeBase.id == knowledge_base_id)
+                .update({KnowledgeBase.vector_migrating_from: source})
+            )
+            if not updated:
+                raise ValueError(f"知识库不存在: {knowledge_base_id}")
+            db.commit()
+        finally:
+            db.close()
+
+    def _clear_migration_source(self, knowledge_base_id: int, source: str):
+        """清除迁移标记（仅当标记的源集合仍为 source 时）"""
+        db = SessionLocal()
+        try:
+            (
+                db.query(KnowledgeBase)
+                .filter(
+                    KnowledgeBase.id == knowledge_base_id,
+                    KnowledgeBase.vector_migrating_from == source,
+                )
+                .update({KnowledgeBase.vector_migrating_from: None})
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def migrate_knowledge_base(
+        self,
+        knowledge_base_id: int,
+        dedicated: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        在共享集合与专属集合之间迁移知识库
+
+        流程：标记迁移（暂停写入）→ 复制到目标集合 → 切换路由 → 再复制一次。
+        源集合中的旧点不在这里删除：其他进程的路由缓存最长
+        QDRANT_ROUTE_CACHE_TTL 秒后才会切换，需在此之后调用
+        purge_knowledge_base_points 核对并清理，同时清除迁移标记、恢复写入。
+
+        迁移标记保存在数据库中，写入方每次写入前都会读取，不受路由缓存影响。
+        未完成的迁移（标记未清除）再次调用时从标记的源集合继续。
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            dedicated: True 迁入专属集合，False 迁回共享集合
+
+        Returns:
+            Dict: 包含 source、target、copied_count
+
+        Raises:
+            ValueError: 知识库正在迁出目标集合（上一次反方向迁移尚未清理）
+        """
+        self.invalidate_route(knowledge_base_id)
+        target = self.dedicated_collection_name(knowledge_base_id) if dedicated else self.collection_name
+        source = await asyncio.to_thread(self._migration_source, knowledge_base_id)
+
+        if source is None:
+            source = await self.collection_for_async(knowledge_base_id)
+            if source == target:
+                return {"source": source, "target": target, "copied_count": 0}
+            await asyncio.to_thread(self._set_migration_source, knowledge_base_id, source)
+        elif source == target:
+            raise ValueError(f"知识库 {knowledge_base_id} 正在从集合 {target} 迁出，需等待清理完成")
+
+        self._ensure_collection(target)
+        copied = self._copy_knowledge_base_points(knowledge_base_id, source, target)
+
+        self._save_route(knowledge_base_id, target if dedicated else None)
+        self.invalidate_route(knowledge_base_id)
+        self._invalidate_retrieval_cache(knowledge_base_id)
+
+        copied += self._copy_knowledge_base_points(knowledge_base_id, source, target)
+
+        logger.info(f"✅ 知识库 {knowledge_base_id} 已迁移: {source} → {target}，复制 {copied} 个点")
+        return {"source": source, "target": target, "copied_count": copied}
+
+    async def purge_knowledge_base_points(self, knowledge_base_id: int, collection_name: str) -> bool:
+        """
+        迁移完成后清理源集合中的旧点
+
+        清理前双向核对源集合与目标集合，然后删除源集合中的点并清除迁移标记。
+        若知识库当前仍路由到该集合（例如已迁回），则跳过。
+
+        Args:
+            knowledge_base_id: 知识库 ID
+            collection_name: 源集合名称
+
+        Returns:
+            bool: 是否执行了清理
+        """
+        self.invalidate_route(knowledge_base_id)
+        target = await self.collection_for_async(knowledge_base_id)
+        if target == collection_name:
+            logger.warning(f"⚠️ 知识库 {knowledge_base_id} 仍使用集合 {collection_name}，跳过清理")
             return False
 
+        synced = await asyncio.to_thread(
+            self._sync_knowledge_base_points, knowledge_base_id, collection_name, target
+        )
+        self._purge_knowledge_base_points(knowledge_base_id, collection_name)
+        await asyncio.to_thread(self._clear_migration_source, knowledge_base_id, collection_name)
+        self._invalidate_retrieval_cache(knowledge_base_id)
+
+        logger.info(
+            f"✅ 已清理知识库 {knowledge_base_id} 在 {collection_name} 中的旧点"
+            f"（核对补复制 {synced['copied_count']}，删除 {synced['deleted_count']}）"
+        )
+        return True
+
     async def get_collection_stats(self) -> Dict[str, Any]:
         """
         获取集合统计信息
@@ -466,5 +1645,28 @@ class VectorService:
             return {}
 
 
-# 创建全局向量服务实例
-vector_service = VectorService()
+# 全局向量服务实例（延迟初始化：导入模块时不连接 Qdrant）
+_vector_service: Optional[VectorService] = None
+_vector_service_lock = threading.Lock()
+
+
+def get_vector_service() -> VectorService:
+    """
+    获取向量服务实例（首次调用时连接向量存储并确保集合存在）
+
+    连接失败时抛出异常且不缓存实例，下次调用会重新尝试连接。
+
+    Returns:
+        VectorService: 向量服务实例
+    """
+    global _vector_service
+    if _vector_service is None:
+        with _vector_service_lock:
+            if _vector_service is None:
+                _vector_service = VectorService()
+    return _vector_service
+
+
+async def init_vector_service() -> VectorService:
+    """在线程中初始化向量服务（连接与建集合是阻塞调用，不能占用事件循环）"""
+    return await asyncio.to_thread(get_vector_service)
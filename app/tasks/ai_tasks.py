@@ -3,6 +3,7 @@ AI 相关异步任务
 处理 AI 响应生成、通知发送等任务
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -12,7 +13,7 @@ from celery import Task
 from celery.exceptions import Retry, Ignore
 
 from app.tasks.celery_app import celery_app
-from app.services.ai_service import ai_service
+from app.services.ai_service import get_ai_service
 from app.core.config import settings
 
 
@@ -99,12 +100,12 @@ def generate_ai_response(
         messages.append({"role": "user", "content": user_message})
 
         # 调用 AI 服务
-        result = await ai_service.chat(
+        result = asyncio.run(get_ai_service().chat(
             messages=messages,
             system_prompt=system_prompt,
             temperature=temperature,
             max_tokens=max_tokens,
-        )
+        ))
 
         if not result["success"]:
             raise Exception(f"AI 调用失败: {result['error']}")
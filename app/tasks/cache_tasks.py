@@ -0,0 +1,67 @@
+"""
+缓存维护异步任务
+定期压缩标签索引等缓存维护工作
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any
+from datetime import datetime
+import traceback
+
+from redis.asyncio import Redis as AsyncRedis
+
+from app.tasks.celery_app import celery_app
+from app.core.config import settings
+from app.services.cache_service import compact_tag_indexes
+
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+async def _compact_tag_indexes() -> Dict[str, int]:
+    # 每次执行使用独立的客户端（asyncio.run 每次创建新的事件循环）
+    redis_client = AsyncRedis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        return await compact_tag_indexes(redis_client)
+    finally:
+        await redis_client.close()
+
+
+@celery_app.task(
+    name="app.tasks.cache_tasks.compact_tag_indexes",
+    bind=True,
+)
+def compact_tag_indexes_task(self) -> Dict[str, Any]:
+    """
+    压缩标签索引，移除 tag:* 集合中已过期的缓存键
+
+    Returns:
+        dict: 压缩结果
+    """
+    try:
+        logger.info("开始压缩缓存标签索引")
+
+        stats = asyncio.run(_compact_tag_indexes())
+
+        logger.info(
+            f"标签索引压缩完成: 集合数={stats['tag_sets']}, "
+            f"检查键数={stats['scanned']}, 移除键数={stats['removed']}"
+        )
+
+        return {
+            **stats,
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "SUCCESS",
+        }
+
+    except Exception as exc:
+        logger.error(f"压缩标签索引失败: error={exc}, traceback={traceback.format_exc()}")
+        raise
+
+
+# 导出所有任务
+__all__ = [
+    "compact_tag_indexes_task",
+]
@@ -5,6 +5,7 @@ Celery 应用配置
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 
 from app.core.config import settings
 
@@ -16,6 +17,7 @@ celery_app = Celery(
     include=[
         "app.tasks.ai_tasks",
         "app.tasks.knowledge_tasks",
+        "app.tasks.cache_tasks",
     ]
 )
 
@@ -41,6 +43,7 @@ celery_app.conf.update(
     result_serializer="json",
     compression="gzip",  # 使用 gzip 压缩消息
     worker_prefetch_multiplier=4,  # 每个 worker 预取任务数
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,  # 测试/开发环境可同步执行任务
 
     # ==================== 任务重试配置 ====================
     task_acks_late=True,  # 任务执行成功后才确认
@@ -60,6 +63,14 @@ celery_app.conf.update(
             "queue": "knowledge_default",
             "routing_key": "knowledge.default",
         },
+        "app.tasks.knowledge_tasks.migrate_knowledge_base_collection": {
+            "queue": "knowledge_default",
+            "routing_key": "knowledge.default",
+        },
+        "app.tasks.knowledge_tasks.purge_knowledge_base_points": {
+            "queue": "knowledge_default",
+            "routing_key": "knowledge.default",
+        },
         "app.tasks.ai_tasks.send_notification": {
             "queue": "notification_default",
             "routing_key": "notification.default",
@@ -76,9 +87,7 @@ celery_app.conf.update(
         "app.tasks.ai_tasks.generate_ai_response": {
             "rate_limit": "10/m",  # 限制每分钟最多 10 个任务
         },
-        "app.tasks.knowledge_tasks.vectorize_document": {
-            "rate_limit": "5/m",  # 限制每分钟最多 5 个任务（文档向量化资源密集）
-        },
+        # 文档向量化不限流：吞吐由 knowledge_default 队列的 worker 并发数控制
     },
 
     # ==================== 任务超时配置 ====================
@@ -113,9 +122,22 @@ celery_app.conf.update(
             "task": "app.tasks.ai_tasks.check_task_health",
             "schedule": crontab(minute="*/30"),
         },
+        # 定期移除标签索引中已过期的缓存键
+        "compact-cache-tag-indexes": {
+            "task": "app.tasks.cache_tasks.compact_tag_indexes",
+            "schedule": settings.CACHE_TAG_COMPACTION_INTERVAL,
+        },
     },
 )
 
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """worker 子进程启动时初始化向量存储与 AI 客户端（导入任务模块时不连接外部服务）"""
+    from app.core.readiness import init_worker_services
+
+    init_worker_services()
+
+
 # 导出 Celery 应用实例
 __all__ = ["celery_app"]
@@ -1,20 +1,28 @@
 """
 知识库相关异步任务
-处理文档向量化、知识库更新等任务
+处理文档索引、知识库更新等任务
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import traceback
 import os
+import tempfile
 
 from celery import Task
 from celery.exceptions import Retry
+from sqlalchemy import update
+from sqlalchemy.orm import Session, defer
 
 from app.tasks.celery_app import celery_app
 from app.tasks.ai_tasks import BaseTaskWithRetry
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import Document, DocumentStatus
+from app.services.document_parser import document_parser_service
+from app.services.vector_service import get_vector_service
 
 
 # 配置日志
@@ -26,83 +34,102 @@ logger = logging.getLogger(__name__)
     base=BaseTaskWithRetry,
     bind=True,
     max_retries=3,
-    soft_time_limit=300,  # 5 分钟软超时
-    time_limit=600,  # 10 分钟硬超时
+    soft_time_limit=1800,  # 30 分钟软超时（大文档流式索引）
+    time_limit=2100,  # 35 分钟硬超时
 )
 def vectorize_document(
     self,
-    document_id: str,
-    file_path: str,
-    chunk_size: int = 512,
-    chunk_overlap: int = 50,
-    knowledge_base_id: Optional[str] = None,
+    document_id: int,
+    file_path: Optional[str] = None,
     user_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    异步文档向量化
+    异步文档索引：解析 → 分块 → 向量化 → 写入 Qdrant
+
+    文档状态流转：pending → processing → completed / failed。
+    向量点 ID 由块内容哈希确定，只为新增的块生成向量，重试是幂等的。
+    索引期间文档被删除时中止，并清理已为其写入的向量、词法索引和正文。
 
     Args:
-        self: 任务实例（用于重试）
+        self: 任务实例（用于重试和进度上报）
         document_id: 文档 ID
-        file_path: 文件路径
-        chunk_size: 文本分块大小
-        chunk_overlap: 分块重叠大小
-        knowledge_base_id: 知识库 ID
+        file_path: 上传文件路径（为空时索引 Document.content）
         user_id: 用户 ID（可选）
 
     Returns:
-        dict: 向量化结果，包含向量数量、处理时间等
+        dict: 索引结果，包含块数量、处理时间等
 
     Raises:
-        Exception: 向量化失败时抛出异常
+        Exception: 索引失败时抛出异常
     """
+    db = SessionLocal()
     try:
+        # 不加载正文：文件解析出的正文由索引管道分段追加写入，避免整篇驻留内存
+        document = (
+            db.query(Document)
+            .options(defer(Document.content))
+            .filter(Document.id == document_id)
+            .first()
+        )
+        if document is None:
+            logger.warning(f"文档不存在，跳过索引: document_id={document_id}")
+            return {
+                "document_id": document_id,
+                "status": "SKIPPED",
+                "reason": "文档不存在",
+            }
+
+        if file_path and not os.path.exists(file_path):
+            # 文件缺失无法通过重试恢复，直接标记失败
+            logger.error(f"文件不存在: document_id={document_id}, file_path={file_path}")
+            _update_document_status(db, document, DocumentStatus.FAILED, f"文件不存在: {file_path}")
+            return {
+                "document_id": document_id,
+                "status": "FAILURE",
+                "reason": "文件不存在",
+            }
+
         logger.info(
-            f"开始文档向量化: document_id={document_id}, "
-            f"file_path={file_path}, user_id={user_id}"
+            f"开始文档索引: document_id={document_id}, "
+            f"file_path={file_path}, user_id={user_id}, retries={self.request.retries}"
         )
 
         start_time = datetime.utcnow()
+        _update_document_status(db, document, DocumentStatus.PROCESSING)
+        self.update_state(
+            state="PROGRESS",
+            meta={"document_id": document_id, "stage": "indexing", "chunk_count": 0},
+        )
 
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-
-        # 读取文件内容
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        logger.info(f"文件读取成功: document_id={document_id}, size={len(content)} 字符")
-
-        # 文本分块（实际实现应该使用 LangChain 的文本分割器）
-        chunks = _split_text(content, chunk_size, chunk_overlap)
-        logger.info(f"文本分块完成: document_id={document_id}, chunks={len(chunks)}")
-
-        # 生成向量（实际实现应该调用向量模型）
-        vectors = _generate_vectors(chunks)
-        logger.info(f"向量生成完成: document_id={document_id}, vectors={len(vectors)}")
+        result = asyncio.run(_index_document(self, document, file_path))
+        if result.get("removed"):
+            logger.warning(f"文档已在索引期间删除，已清理写入的数据: document_id={document_id}")
+            return {
+                "document_id": document_id,
+                "status": "SKIPPED",
+                "reason": "文档已删除",
+            }
+        if not result["success"]:
+            raise Exception(f"文档索引失败: {result.get('error')}")
 
-        # 存储向量到 Pinecone 或其他向量数据库
-        # 这里应该是实际的向量存储逻辑
-        storage_result = _store_vectors(
-            document_id=document_id,
-            vectors=vectors,
-            knowledge_base_id=knowledge_base_id,
-        )
-        logger.info(f"向量存储完成: document_id={document_id}")
+        document.chunk_count = result["chunk_count"]
+        _update_document_status(db, document, DocumentStatus.COMPLETED)
 
         end_time = datetime.utcnow()
         processing_time = (end_time - start_time).total_seconds()
 
+        logger.info(
+            f"文档索引完成: document_id={document_id}, "
+            f"chunks={result['chunk_count']}, time={processing_time:.2f}s"
+        )
+
         return {
             "document_id": document_id,
-            "knowledge_base_id": knowledge_base_id,
+            "knowledge_base_id": document.knowledge_base_id,
             "user_id": user_id,
             "file_path": file_path,
-            "chunk_count": len(chunks),
-            "vector_count": len(vectors),
+            "chunk_count": result["chunk_count"],
             "processing_time": processing_time,
-            "storage_result": storage_result,
             "start_time": start_time.isoformat(),
             "end_time": end_time.isoformat(),
             "status": "SUCCESS",
@@ -110,26 +137,40 @@ def vectorize_document(
 
     except Exception as exc:
         logger.error(
-            f"文档向量化失败: document_id={document_id}, "
+            f"文档索引失败: document_id={document_id}, "
             f"error={exc}, traceback={traceback.format_exc()}"
         )
 
-        if self.request.retries < self.max_retries:
-            # 文档向量化失败后，等待更长时间再重试
+        db.rollback()
+        will_retry = self.request.retries < self.max_retries
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is not None:
+            _update_document_status(
+                db,
+                document,
+                DocumentStatus.PENDING if will_retry else DocumentStatus.FAILED,
+                str(exc),
+            )
+
+        if will_retry:
+            # 文档索引失败后，等待更长时间再重试
             wait_time = 120 * (self.request.retries + 1)
             logger.info(f"正在重试任务: retry_count={self.request.retries + 1}, wait={wait_time}s")
             raise self.retry(exc=exc, countdown=wait_time)
         else:
             raise
 
+    finally:
+        db.close()
+
 
 @celery_app.task(
     name="app.tasks.knowledge_tasks.update_knowledge_base",
     base=BaseTaskWithRetry,
     bind=True,
     max_retries=2,
-    soft_time_limit=180,  # 3 分钟软超时
-    time_limit=300,  # 5 分钟硬超时
+    soft_time_limit=1800,  # 30 分钟软超时（逐文档重新索引）
+    time_limit=2100,  # 35 分钟硬超时
 )
 def update_knowledge_base(
     self,
@@ -141,6 +182,9 @@ def update_knowledge_base(
     """
     异步更新知识库
 
+    full / incremental 按块内容哈希比对新旧块，只为新增的块生成向量并删除
+    已移除的块；rebuild 先清空知识库向量再全部重新生成。
+
     Args:
         self: 任务实例（用于重试）
         knowledge_base_id: 知识库 ID
@@ -154,6 +198,7 @@ def update_knowledge_base(
     Raises:
         Exception: 更新失败时抛出异常
     """
+    db = SessionLocal()
     try:
         logger.info(
             f"开始更新知识库: knowledge_base_id={knowledge_base_id}, "
@@ -164,36 +209,68 @@ def update_knowledge_base(
 
         updated_documents = []
         failed_documents = []
+        embedded_count = 0
+        reused_count = 0
+        deleted_count = 0
+
+        query = db.query(Document).filter(Document.knowledge_base_id == int(knowledge_base_id))
 
         if update_type == "incremental" and document_ids:
             # 增量更新：仅更新指定的文档
             logger.info(f"增量更新: document_count={len(document_ids)}")
-
-            for doc_id in document_ids:
-                try:
-                    # 这里应该调用文档向量化的逻辑
-                    # 模拟文档更新
-                    updated_documents.append(doc_id)
-                    logger.info(f"文档更新成功: document_id={doc_id}")
-                except Exception as e:
-                    logger.error(f"文档更新失败: document_id={doc_id}, error={e}")
-                    failed_documents.append({"document_id": doc_id, "error": str(e)})
+            query = query.filter(Document.id.in_([int(doc_id) for doc_id in document_ids]))
 
         elif update_type == "full" or update_type == "rebuild":
-            # 全量更新或重建：重新索引所有文档
+            # 全量更新：逐文档按内容哈希增量索引，只为变化的块生成向量
+            # 重建：先清空知识库的全部向量，再重新索引
             logger.info(f"全量更新: update_type={update_type}")
-
-            # 这里应该从数据库获取知识库中的所有文档
-            # 然后对每个文档进行向量化
-            # 模拟更新 10 个文档
-            for i in range(10):
-                doc_id = f"doc_{i}"
-                updated_documents.append(doc_id)
-                logger.info(f"文档更新成功: document_id={doc_id}")
+            if update_type == "rebuild":
+                # 保留专属集合（及其配置），只删除其中的点
+                asyncio.run(get_vector_service().delete_knowledge_base_chunks(
+                    int(knowledge_base_id), keep_collection=True
+                ))
 
         else:
             raise ValueError(f"不支持的更新类型: {update_type}")
 
+        # 先只取文档 ID，再逐个加载正文，避免一次性把整个知识库的正文读入内存
+        pending_ids = [row.id for row in query.with_entities(Document.id).order_by(Document.id)]
+
+        for document_id in pending_ids:
+            document = db.get(Document, document_id)
+            if document is None:
+                continue
+            try:
+                if not document.content:
+                    continue
+
+                result = asyncio.run(get_vector_service().add_document_stream(
+                    knowledge_base_id=document.knowledge_base_id,
+                    document_id=document_id,
+                    blocks=_single_block(document.content),
+                    is_current=lambda: _document_exists(document_id),
+                ))
+                if result.get("removed"):
+                    continue
+                if not result["success"]:
+                    raise Exception(result.get("error"))
+
+                document.chunk_count = result["chunk_count"]
+                _update_document_status(db, document, DocumentStatus.COMPLETED)
+
+                embedded_count += result["embedded_count"]
+                reused_count += result["reused_count"]
+                deleted_count += result["deleted_count"]
+                updated_documents.append(document_id)
+                logger.info(f"文档更新成功: document_id={document_id}")
+            except Exception as e:
+                db.rollback()
+                logger.error(f"文档更新失败: document_id={document_id}, error={e}")
+                failed_documents.append({"document_id": document_id, "error": str(e)})
+            finally:
+                # 释放已处理文档的正文
+                db.expunge(document)
+
         end_time = datetime.utcnow()
         processing_time = (end_time - start_time).total_seconds()
 
@@ -203,6 +280,9 @@ def update_knowledge_base(
             "user_id": user_id,
             "updated_count": len(updated_documents),
             "failed_count": len(failed_documents),
+            "embedded_count": embedded_count,
+            "reused_count": reused_count,
+            "deleted_count": deleted_count,
             "updated_documents": updated_documents[:10],  # 只返回前 10 个
             "failed_documents": failed_documents,
             "processing_time": processing_time,
@@ -213,7 +293,8 @@ def update_knowledge_base(
 
         logger.info(
             f"知识库更新完成: knowledge_base_id={knowledge_base_id}, "
-            f"updated={len(updated_documents)}, failed={len(failed_documents)}"
+            f"updated={len(updated_documents)}, failed={len(failed_documents)}, "
+            f"embedded={embedded_count}, reused={reused_count}, deleted={deleted_count}"
         )
 
         return result
@@ -232,6 +313,9 @@ def update_knowledge_base(
         else:
             raise
 
+    finally:
+        db.close()
+
 
 @celery_app.task(
     name="app.tasks.knowledge_tasks.delete_knowledge_vectors",
@@ -293,91 +377,211 @@ def delete_knowledge_vectors(
             raise
 
 
-# ==================== 辅助函数 ====================
-
-def _split_text(
-    text: str,
-    chunk_size: int = 512,
-    chunk_overlap: int = 50,
-) -> List[str]:
+@celery_app.task(
+    name="app.tasks.knowledge_tasks.migrate_knowledge_base_collection",
+    base=BaseTaskWithRetry,
+    bind=True,
+    max_retries=2,
+    soft_time_limit=3300,  # 55 分钟软超时（大知识库复制）
+    time_limit=3500,  # 硬超时须低于 broker visibility_timeout（3600 秒），否则未完成的任务会被重复投递
+)
+def migrate_knowledge_base_collection(
+    self,
+    knowledge_base_id: int,
+    dedicated: bool = True,
+) -> Dict[str, Any]:
     """
-    文本分块
+    在共享集合与专属集合之间迁移知识库
+
+    复制完成并切换路由后，延迟清理源集合中的旧点，
+    等待其他进程的路由缓存过期，迁移期间检索不中断。
+    迁移开始到清理完成之间暂停向该知识库写入，写入任务会失败并重试。
 
     Args:
-        text: 输入文本
-        chunk_size: 分块大小
-        chunk_overlap: 分块重叠大小
+        self: 任务实例（用于重试）
+        knowledge_base_id: 知识库 ID
+        dedicated: True 迁入专属集合，False 迁回共享集合
 
     Returns:
-        list: 分块后的文本列表
+        dict: 迁移结果，包含源集合、目标集合和复制的点数
     """
-    # 简单实现：按字符分割
-    # 实际实现应该使用 LangChain 的文本分割器
-    chunks = []
-    start = 0
-    text_length = len(text)
+    try:
+        logger.info(f"开始迁移知识库集合: knowledge_base_id={knowledge_base_id}, dedicated={dedicated}")
+
+        result = asyncio.run(get_vector_service().migrate_knowledge_base(knowledge_base_id, dedicated))
 
-    while start < text_length:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start = end - chunk_overlap
+        if result["source"] != result["target"]:
+            purge_knowledge_base_points.apply_async(
+                args=[knowledge_base_id, result["source"]],
+                countdown=settings.QDRANT_ROUTE_CACHE_TTL * 2,
+            )
 
-        if chunk_overlap >= chunk_size:
-            break
+        return {
+            "knowledge_base_id": knowledge_base_id,
+            **result,
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "SUCCESS",
+        }
+
+    except Exception as exc:
+        logger.error(
+            f"迁移知识库集合失败: knowledge_base_id={knowledge_base_id}, "
+            f"error={exc}, traceback={traceback.format_exc()}"
+        )
 
-    return chunks
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=60 * (self.request.retries + 1))
+        else:
+            raise
 
 
-def _generate_vectors(chunks: List[str]) -> List[Dict[str, Any]]:
+@celery_app.task(
+    name="app.tasks.knowledge_tasks.purge_knowledge_base_points",
+    base=BaseTaskWithRetry,
+    bind=True,
+    max_retries=2,
+)
+def purge_knowledge_base_points(
+    self,
+    knowledge_base_id: int,
+    collection_name: str,
+) -> Dict[str, Any]:
     """
-    生成向量
+    清理知识库迁移后源集合中的旧点
 
     Args:
-        chunks: 文本块列表
+        self: 任务实例（用于重试）
+        knowledge_base_id: 知识库 ID
+        collection_name: 源集合名称
 
     Returns:
-        list: 向量列表
+        dict: 清理结果
     """
-    # 模拟向量生成
-    # 实际实现应该调用 sentence-transformers 或其他向量模型
-    vectors = []
-    for i, chunk in enumerate(chunks):
-        # 模拟 768 维向量
-        import random
-        vector = [random.random() for _ in range(768)]
-        vectors.append({
-            "id": f"chunk_{i}",
-            "text": chunk[:100],  # 只保留前 100 个字符
-            "vector": vector,
-        })
-
-    return vectors
-
-
-def _store_vectors(
-    document_id: str,
-    vectors: List[Dict[str, Any]],
-    knowledge_base_id: Optional[str] = None,
+    try:
+        purged = asyncio.run(get_vector_service().purge_knowledge_base_points(knowledge_base_id, collection_name))
+        return {
+            "knowledge_base_id": knowledge_base_id,
+            "collection_name": collection_name,
+            "purged": purged,
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "SUCCESS",
+        }
+
+    except Exception as exc:
+        logger.error(
+            f"清理源集合失败: knowledge_base_id={knowledge_base_id}, "
+            f"collection={collection_name}, error={exc}"
+        )
+
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=30 * (self.request.retries + 1))
+        else:
+            raise
+
+
+# ==================== 辅助函数 ====================
+
+def _update_document_status(
+    db: Session,
+    document: Document,
+    status: DocumentStatus,
+    error_message: Optional[str] = None,
+) -> None:
+    """
+    更新文档索引状态
+
+    Args:
+        db: 数据库会话
+        document: 文档
+        status: 新状态
+        error_message: 失败原因（成功或开始处理时清空）
+    """
+    document.status = status
+    document.error_message = error_message
+    db.commit()
+
+
+def _document_exists(document_id: int) -> bool:
+    """文档是否仍存在（使用独立会话，看到其他事务已提交的删除）"""
+    db = SessionLocal()
+    try:
+        return db.query(Document.id).filter(Document.id == document_id).first() is not None
+    finally:
+        db.close()
+
+
+def _write_document_content(document_id: int, text: str) -> None:
+    """一次性写入文档正文，使用独立会话并立即提交"""
+    db = SessionLocal()
+    try:
+        db.execute(update(Document).where(Document.id == document_id).values(content=text))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _single_block(text: str):
+    """把完整文本包装为单块异步迭代器"""
+    yield {"text": text}
+
+
+async def _index_document(
+    task: Task,
+    document: Document,
+    file_path: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    存储向量
+    执行文档的流式索引管道
+
+    文件索引时解析出的正文以换行拼接，暂存到临时文件，索引成功后一次性写入
+    Document.content：内存中不保留整篇正文，重新索引期间读者看到的仍是旧正文。
+    之后从 content 重新索引会得到完全相同的块，可全部复用。
 
     Args:
-        document_id: 文档 ID
-        vectors: 向量列表
-        knowledge_base_id: 知识库 ID
+        task: 当前任务实例（用于上报进度）
+        document: 文档
+        file_path: 上传文件路径（为空时索引 Document.content）
 
     Returns:
-        dict: 存储结果
+        dict: VectorService.add_document_stream 的结果
     """
-    # 模拟向量存储
-    # 实际实现应该调用 Pinecone 或其他向量数据库
-    return {
-        "stored_count": len(vectors),
-        "document_id": document_id,
-        "knowledge_base_id": knowledge_base_id,
-    }
+    document_id = document.id
+    staged = tempfile.TemporaryFile(mode="w+", encoding="utf-8") if file_path else None
+
+    async def blocks():
+        if file_path:
+            separator = ""
+            async for block in document_parser_service.iter_file_blocks(file_path):
+                staged.write(separator + block["text"])
+                separator = "\n"
+                yield block
+        else:
+            async for block in _single_block(document.content):
+                yield block
+
+    def report_progress(chunk_count: int):
+        task.update_state(
+            state="PROGRESS",
+            meta={"document_id": document_id, "stage": "indexing", "chunk_count": chunk_count},
+        )
+
+    try:
+        result = await get_vector_service().add_document_stream(
+            knowledge_base_id=document.knowledge_base_id,
+            document_id=document_id,
+            blocks=blocks(),
+            on_progress=report_progress,
+            is_current=lambda: _document_exists(document_id),
+        )
+
+        if staged is not None and not result.get("removed"):
+            staged.seek(0)
+            await asyncio.to_thread(_write_document_content, document_id, staged.read())
+    finally:
+        if staged is not None:
+            staged.close()
+
+    return result
 
 
 # 导出所有任务
@@ -385,4 +589,6 @@ __all__ = [
     "vectorize_document",
     "update_knowledge_base",
     "delete_knowledge_vectors",
+    "migrate_knowledge_base_collection",
+    "purge_knowledge_base_points",
 ]
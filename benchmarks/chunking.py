@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+文本分块与文档解析基准测试
+
+对合成语料（CJK、英文、超长行、Markdown 密集）测量：
+1. 吞吐量（MB/s，多次运行取最快一次）
+2. 峰值内存（tracemalloc 统计的 Python 分配，不含输入语料本身）
+3. 文本块数量与大小分布（Token 数、字符数的 min / p50 / p95 / max）
+
+结果以 JSON 输出，可与上一次的结果对比，吞吐量下降或峰值内存上升超过阈值时以非零状态退出。
+
+使用方式：
+    python benchmarks/chunking.py --size-mb 50 --output reports/chunking.json
+    python benchmarks/chunking.py --corpora cjk markdown --targets chunker:structured
+    python benchmarks/chunking.py --baseline reports/chunking.json --tolerance 0.2
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.context_packer import estimate_tokens
+from app.services.document_parser import _build_markdown_result, _iter_text_sections, _parse_text_file
+from app.services.text_chunker import StreamingChunker, TextChunker
+
+
+CORPORA = ("cjk", "english", "long_line", "markdown")
+TARGETS = (
+    "chunker:structured",
+    "chunker:lines",
+    "parser:txt",
+    "parser:markdown",
+    "parser:stream_sections",
+)
+
+_CJK_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+)
+_CJK_PUNCTUATION = "，，，、；"
+_CJK_ENDINGS = "。。。！？"
+_ENGLISH_WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but have an they "
+    "you were her all she there would their we him been has when who will no more if out so up said what its about "
+    "than into them can only other time new some could these two may first then do any like my now over such our "
+    "man me even most made after also did many before must through back years where much your way well down should "
+    "because each just those people how too little state good very make world still own see men work long get here "
+    "between both life being under never day same another know while last might us great old year off come since "
+    "against go came right used take three vector index query chunk token embedding retrieval knowledge document"
+).split()
+
+
+# ====================
+# 合成语料
+# ====================
+
+
+def _cjk_sentence(rng: random.Random) -> str:
+    clauses = [
+        "".join(rng.choices(_CJK_CHARS, k=rng.randint(4, 14)))
+        for _ in range(rng.randint(1, 4))
+    ]
+    return rng.choice(_CJK_PUNCTUATION).join(clauses) + rng.choice(_CJK_ENDINGS)
+
+
+def _english_sentence(rng: random.Random) -> str:
+    words = rng.choices(_ENGLISH_WORDS, k=rng.randint(6, 24))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), str(rng.randint(1, 100000)))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + rng.choice("...?!")
+
+
+def _cjk_parts(rng: random.Random) -> Iterable[str]:
+    while True:
+        yield "".join(_cjk_sentence(rng) for _ in range(rng.randint(2, 8))) + "\n"
+        if rng.random() < 0.3:
+            yield "\n"
+
+
+def _english_parts(rng: random.Random) -> Iterable[str]:
+    while True:
+        yield " ".join(_english_sentence(rng) for _ in range(rng.randint(2, 8))) + "\n"
+        if rng.random() < 0.3:
+            yield "\n"
+
+
+def _long_line_parts(rng: random.Random) -> Iterable[str]:
+    # 日志 / 压缩后的导出文件：单行数百 KB，几乎没有句末标点
+    while True:
+        line_size = rng.randint(100_000, 400_000)
+        size = 0
+        fields = []
+        while size < line_size:
+            field = f"{rng.choice(_ENGLISH_WORDS)}_{rng.randint(0, 99999)}={rng.random():.6f}"
+            fields.append(field)
+            size += len(field) + 1
+        yield ";".join(fields) + "\n"
+
+
+def _markdown_parts(rng: random.Random) -> Iterable[str]:
+    while True:
+        level = rng.choices((1, 2, 3, 4), weights=(1, 4, 6, 3))[0]
+        yield f"{'#' * level} {' '.join(rng.choices(_ENGLISH_WORDS, k=rng.randint(2, 5))).title()}\n\n"
+        for _ in range(rng.randint(1, 4)):
+            kind = rng.random()
+            if kind < 0.45:
+                sentence = _cjk_sentence if rng.random() < 0.5 else _english_sentence
+                yield " ".join(sentence(rng) for _ in range(rng.randint(1, 5))) + "\n\n"
+            elif kind < 0.7:
+                for _ in range(rng.randint(2, 6)):
+                    word = rng.choice(_ENGLISH_WORDS)
+                    yield f"- [{word}](https://example.com/{word}) {_english_sentence(rng)}\n"
+                yield "\n"
+            elif kind < 0.85:
+                yield "```python\n"
+                for _ in range(rng.randint(3, 12)):
+                    yield f"# {rng.choice(_ENGLISH_WORDS)}\nvalue_{rng.randint(0, 999)} = compute({rng.randint(0, 99)})\n"
+                yield "```\n\n"
+            else:
+                yield "| key | value |\n| --- | --- |\n"
+                for _ in range(rng.randint(2, 6)):
+                    yield f"| {rng.choice(_ENGLISH_WORDS)} | {rng.randint(0, 10 ** 6)} |\n"
+                yield "\n"
+
+
+_GENERATORS: Dict[str, Callable[[random.Random], Iterable[str]]] = {
+    "cjk": _cjk_parts,
+    "english": _english_parts,
+    "long_line": _long_line_parts,
+    "markdown": _markdown_parts,
+}
+
+
+def generate_corpus(kind: str, size_bytes: int, seed: int = 42) -> str:
+    """
+    生成确定性的合成语料
+
+    Args:
+        kind: 语料类型（cjk, english, long_line, markdown）
+        size_bytes: 目标大小（UTF-8 字节数，按整段截止）
+        seed: 随机种子
+
+    Returns:
+        str: 语料文本
+    """
+    rng = random.Random(f"{kind}:{seed}")
+    parts = []
+    size = 0
+    for part in _GENERATORS[kind](rng):
+        parts.append(part)
+        size += len(part.encode("utf-8"))
+        if size >= size_bytes:
+            break
+    return "".join(parts)
+
+
+# ====================
+# 基准目标
+# ====================
+
+
+def _run_chunker(chunker, text: str, block_size: int) -> List[Dict[str, Any]]:
+    """按流式索引管道的方式，以 block_size 为单位在行边界喂入文本"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + block_size)
+        end = len(text) if end == -1 else end
+        chunks.extend(chunker.feed(text[start:end]))
+        start = end + 1
+    chunks.extend(chunker.flush())
+    return chunks
+
+
+def _target_structured(text: str, path: str, kind: str):
+    return _run_chunker(TextChunker(), text, settings.DOCUMENT_STREAM_BLOCK_SIZE)
+
+
+def _target_lines(text: str, path: str, kind: str):
+    return _run_chunker(StreamingChunker(), text, settings.DOCUMENT_STREAM_BLOCK_SIZE)
+
+
+def _target_parse_txt(text: str, path: str, kind: str):
+    _parse_text_file(path)
+
+
+def _target_parse_markdown(text: str, path: str, kind: str):
+    _build_markdown_result(text)
+
+
+def _target_stream_sections(text: str, path: str, kind: str):
+    sections = _iter_text_sections(
+        path,
+        "utf-8",
+        settings.DOCUMENT_STREAM_BLOCK_SIZE,
+        split_on_headings=kind == "markdown",
+    )
+    for _ in sections:
+        pass
+
+
+_TARGETS: Dict[str, Callable[[str, str, str], Optional[List[Dict[str, Any]]]]] = {
+    "chunker:structured": _target_structured,
+    "chunker:lines": _target_lines,
+    "parser:txt": _target_parse_txt,
+    "parser:markdown": _target_parse_markdown,
+    "parser:stream_sections": _target_stream_sections,
+}
+
+
+# ====================
+# 测量
+# ====================
+
+
+def _distribution(values: List[int]) -> Dict[str, float]:
+    """min / p50 / p95 / max / mean"""
+    if not values:
+        return {}
+    array = np.asarray(values)
+    return {
+        "min": int(array.min()),
+        "p50": float(np.percentile(array, 50)),
+        "p95": float(np.percentile(array, 95)),
+        "max": int(array.max()),
+        "mean": round(float(array.mean()), 2),
+    }
+
+
+def measure(
+    target: Callable[[str, str, str], Optional[List[Dict[str, Any]]]],
+    text: str,
+    path: str,
+    kind: str,
+    repeat: int = 3,
+    trace_memory: bool = True,
+) -> Tuple[float, Optional[float], Optional[List[Dict[str, Any]]]]:
+    """
+    测量一个目标的耗时与峰值内存
+
+    计时与内存分开运行（tracemalloc 会显著拖慢执行）。
+
+    Returns:
+        Tuple: (最快一次的秒数, 峰值内存 MB, 目标返回的文本块)
+    """
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = target(text, path, kind)
+        best = min(best, time.perf_counter() - start)
+
+    peak_mb = None
+    if trace_memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = target(text, path, kind)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_mb = round(peak / (1024 * 1024), 2)
+
+    return best, peak_mb, result
+
+
+def run_benchmarks(
+    corpora: Iterable[str] = CORPORA,
+    targets: Iterable[str] = TARGETS,
+    size_mb: float = 10.0,
+    repeat: int = 3,
+    trace_memory: bool = True,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        corpora: 语料类型
+        targets: 基准目标（chunker:* 为分块器，parser:* 为解析器）
+        size_mb: 每种语料的大小（MB）
+        repeat: 计时重复次数（取最快一次）
+        trace_memory: 是否测量峰值内存
+        seed: 语料随机种子
+
+    Returns:
+        Dict: 可 JSON 序列化的报告
+    """
+    targets = list(targets)
+    results = []
+    for kind in corpora:
+        text = generate_corpus(kind, int(size_mb * 1024 * 1024), seed)
+        size_bytes = len(text.encode("utf-8"))
+
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False) as f:
+            f.write(text)
+            path = f.name
+        try:
+            for name in targets:
+                seconds, peak_mb, chunks = measure(_TARGETS[name], text, path, kind, repeat, trace_memory)
+                row = {
+                    "corpus": kind,
+                    "target": name,
+                    "bytes": size_bytes,
+                    "seconds": round(seconds, 4),
+                    "mb_per_s": round(size_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+                    "peak_memory_mb": peak_mb,
+                }
+                if chunks is not None:
+                    row["chunks"] = {
+                        "count": len(chunks),
+                        "tokens": _distribution([
+                            c.get("tokens") or estimate_tokens(c["text"]) for c in chunks
+                        ]),
+                        "chars": _distribution([c["length"] for c in chunks]),
+                    }
+                results.append(row)
+                print(
+                    f"{kind:<10}{name:<24}{row['mb_per_s'] or 0:>10.2f} MB/s"
+                    f"{peak_mb if peak_mb is not None else '-':>10} MB"
+                    f"{row.get('chunks', {}).get('count', ''):>10}"
+                )
+        finally:
+            os.unlink(path)
+        del text
+
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size_mb": size_mb,
+        "repeat": repeat,
+        "seed": seed,
+        "settings": {
+            "RAG_CHUNK_TOKENS": settings.RAG_CHUNK_TOKENS,
+            "RAG_CHUNK_OVERLAP_TOKENS": settings.RAG_CHUNK_OVERLAP_TOKENS,
+            "RAG_CHUNK_SIZE": settings.RAG_CHUNK_SIZE,
+            "RAG_CHUNK_OVERLAP": settings.RAG_CHUNK_OVERLAP,
+            "DOCUMENT_STREAM_BLOCK_SIZE": settings.DOCUMENT_STREAM_BLOCK_SIZE,
+        },
+        "results": results,
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    与基线报告对比
+
+    Args:
+        current: 本次报告
+        baseline: 基线报告
+        tolerance: 允许的相对退化（0.2 表示吞吐量下降或峰值内存上升 20%）
+
+    Returns:
+        List[str]: 退化项描述
+    """
+    previous = {(row["corpus"], row["target"]): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in current["results"]:
+        old = previous.get((row["corpus"], row["target"]))
+        if not old:
+            continue
+        label = f"{row['corpus']} / {row['target']}"
+        if old.get("mb_per_s") and row.get("mb_per_s") and row["mb_per_s"] < old["mb_per_s"] * (1 - tolerance):
+            regressions.append(f"{label}: 吞吐量 {old['mb_per_s']} → {row['mb_per_s']} MB/s")
+        if (
+            old.get("peak_memory_mb") and row.get("peak_memory_mb")
+            and row["peak_memory_mb"] > old["peak_memory_mb"] * (1 + tolerance)
+        ):
+            regressions.append(f"{label}: 峰值内存 {old['peak_memory_mb']} → {row['peak_memory_mb']} MB")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='文本分块与文档解析基准测试')
+    parser.add_argument('--corpora', nargs='+', choices=CORPORA, default=list(CORPORA), help='语料类型')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS), help='基准目标')
+    parser.add_argument('--size-mb', type=float, default=10.0, help='每种语料的大小（MB）')
+    parser.add_argument('--repeat', type=int, default=3, help='计时重复次数（取最快一次）')
+    parser.add_argument('--no-memory', action='store_true', help='不测量峰值内存')
+    parser.add_argument('--seed', type=int, default=42, help='语料随机种子')
+    parser.add_argument('--output', help='报告 JSON 输出路径')
+    parser.add_argument('--baseline', help='对比的基线报告 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的相对退化')
+
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"\n{'语料':<10}{'目标':<24}{'吞吐量':>15}{'峰值内存':>13}{'块数':>10}")
+    print("-" * 72)
+    report = run_benchmarks(
+        corpora=args.corpora,
+        targets=args.targets,
+        size_mb=args.size_mb,
+        repeat=args.repeat,
+        trace_memory=not args.no_memory,
+        seed=args.seed,
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 报告已写入: {args.output}")
+
+    if baseline:
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ 性能退化:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ 与基线相比无超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
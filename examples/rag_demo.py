@@ -7,7 +7,7 @@ import asyncio
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.services.rag_service import create_rag_service
-from app.services.vector_service import vector_service
+from app.services.vector_service import get_vector_service
 from app.models import KnowledgeBase, Document, User
 
 
@@ -357,7 +357,7 @@ async def demo_rag_service():
         test_query = "产品功能有哪些？"
         print(f"查询: {test_query}")
 
-        search_results = await vector_service.search(
+        search_results = await get_vector_service().search(
             query=test_query,
             knowledge_base_id=knowledge_base.id,
             top_k=3,
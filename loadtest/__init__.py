@@ -0,0 +1,4 @@
+"""
+离线压测工具
+Zhipu AI 模拟服务（fake_zhipu）、带本地替身的应用启动器（serve）与场景回放驱动（run）
+"""
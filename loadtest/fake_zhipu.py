@@ -0,0 +1,223 @@
+"""
+Zhipu AI 模拟服务
+
+实现压测用到的两个 v4 接口，响应格式与官方 SDK 解析的结构一致：
+- POST /api/paas/v4/chat/completions（支持 stream=True 的 SSE 流式输出）
+- POST /api/paas/v4/embeddings（按文本哈希生成确定性的单位向量，相同文本得到相同向量）
+
+延迟可配置：请求固定延迟 + 抖动、首 Token 延迟（TTFT）、生成速率（tokens/s）、错误率。
+
+使用方式：
+    python -m loadtest.fake_zhipu --port 8900 --ttft-ms 400 --tokens-per-second 40
+    ZHIPUAI_BASE_URL=http://127.0.0.1:8900/api/paas/v4 ZHIPUAI_API_KEY=loadtest.secret uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+_REPLY_WORDS = (
+    "根据 知识库 中的 资料 ， 该 问题 的 答案 如下 ： 系统 支持 文档 上传 、 检索 与 对话 ，"
+    " 并 提供 实时 消息 推送 。 如 需 进一步 帮助 ， 请 联系 客服 。"
+).split()
+
+
+@dataclass
+class FakeZhipuConfig:
+    """模拟服务配置"""
+
+    latency_ms: float = 50.0  # 请求固定延迟（非流式对话与向量化）
+    jitter_ms: float = 20.0  # 延迟抖动（均匀分布 0 ~ jitter_ms）
+    ttft_ms: float = 300.0  # 对话首 Token 延迟
+    tokens_per_second: float = 50.0  # 对话生成速率
+    completion_tokens: int = 120  # 每次回答的 Token 数
+    embedding_latency_ms: float = 30.0  # 向量化请求延迟
+    vector_size: int = 1024  # 向量维度
+    error_rate: float = 0.0  # 返回 500 的比例
+    seed: int = 42
+
+
+def _delay(base_ms: float, jitter_ms: float, rng: random.Random) -> float:
+    return max(0.0, base_ms + rng.uniform(0, jitter_ms)) / 1000
+
+
+def _fake_embedding(text: str, size: int) -> List[float]:
+    """按文本哈希生成确定性的单位向量"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(size).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages) // 2 + 1
+
+
+def create_fake_zhipu_app(config: FakeZhipuConfig) -> FastAPI:
+    """
+    创建模拟服务应用
+
+    Args:
+        config: 模拟服务配置
+
+    Returns:
+        FastAPI: ASGI 应用
+    """
+    app = FastAPI(title="Fake Zhipu AI")
+    rng = random.Random(config.seed)
+    stats = {"chat": 0, "chat_stream": 0, "embeddings": 0, "errors": 0}
+
+    def maybe_error():
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"code": "500", "message": "fake upstream error"}},
+            )
+        return None
+
+    @app.post("/api/paas/v4/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = maybe_error()
+        if error:
+            return error
+
+        completion_id = f"fake-{uuid.uuid4().hex[:16]}"
+        created = int(time.time())
+        model = body.get("model", "glm-4")
+        prompt_tokens = _prompt_tokens(body.get("messages", []))
+        completion_tokens = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        words = [_REPLY_WORDS[i % len(_REPLY_WORDS)] for i in range(completion_tokens)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if not body.get("stream"):
+            stats["chat"] += 1
+            generation = completion_tokens / max(config.tokens_per_second, 1e-6)
+            await asyncio.sleep(
+                _delay(config.latency_ms, config.jitter_ms, rng) + config.ttft_ms / 1000 + generation
+            )
+            return {
+                "id": completion_id,
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "".join(words)},
+                }],
+                "usage": usage,
+            }
+
+        stats["chat_stream"] += 1
+
+        async def events():
+            await asyncio.sleep(_delay(config.ttft_ms, config.jitter_ms, rng))
+            interval = 1 / max(config.tokens_per_second, 1e-6)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(interval)
+                chunk = {
+                    "id": completion_id,
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": word}}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            final = {
+                "id": completion_id,
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "delta": {"role": "assistant", "content": ""}}],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/api/paas/v4/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = maybe_error()
+        if error:
+            return error
+
+        stats["embeddings"] += 1
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        await asyncio.sleep(_delay(config.embedding_latency_ms, config.jitter_ms, rng))
+        return {
+            "object": "list",
+            "model": body.get("model", "embedding-2"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _fake_embedding(str(text), config.vector_size)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {
+                "prompt_tokens": sum(len(str(text)) for text in inputs),
+                "completion_tokens": 0,
+                "total_tokens": sum(len(str(text)) for text in inputs),
+            },
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"config": asdict(config), "requests": stats}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def main():
+    """主函数"""
+    defaults = FakeZhipuConfig()
+    parser = argparse.ArgumentParser(description='Zhipu AI 模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms, help='请求固定延迟')
+    parser.add_argument('--jitter-ms', type=float, default=defaults.jitter_ms, help='延迟抖动')
+    parser.add_argument('--ttft-ms', type=float, default=defaults.ttft_ms, help='对话首 Token 延迟')
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second, help='生成速率')
+    parser.add_argument('--completion-tokens', type=int, default=defaults.completion_tokens, help='每次回答的 Token 数')
+    parser.add_argument('--embedding-latency-ms', type=float, default=defaults.embedding_latency_ms, help='向量化延迟')
+    parser.add_argument('--vector-size', type=int, default=defaults.vector_size, help='向量维度')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='返回 500 的比例')
+
+    args = parser.parse_args()
+    config = FakeZhipuConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        embedding_latency_ms=args.embedding_latency_ms,
+        vector_size=args.vector_size,
+        error_rate=args.error_rate,
+    )
+
+    import uvicorn
+
+    uvicorn.run(create_fake_zhipu_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+离线端到端压测
+
+启动 Zhipu AI 模拟服务与压测用应用（均为独立进程，见 loadtest.fake_zhipu / loadtest.serve），
+准备用户、知识库、文档与对话后，按权重混合回放以下场景：
+- chat：POST /api/v1/conversations/{id}/chat
+- rag：POST /api/v1/knowledge/{kb_id}/query
+- rag_all：POST /api/v1/knowledge/query
+- upload：POST /api/v1/knowledge/{kb_id}/documents/upload
+- ws：WebSocket 会话（连接 → ping → chat → 关闭）
+
+报告每个接口的 p50 / p95 / p99 延迟、吞吐量、错误数，以及请求期间应用事件循环延迟的 p95 / 最大值。
+
+使用方式：
+    python -m loadtest.run --users 20 --duration 60
+    python -m loadtest.run --mix chat=5,rag=3,ws=2 --ttft-ms 800 --output reports/loadtest.json
+    python -m loadtest.run --app-url http://127.0.0.1:8000 --no-spawn   # 压测已启动的应用
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# 添加项目根目录到路径
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+import numpy as np
+
+
+DEFAULT_MIX = "chat=35,rag=30,rag_all=10,upload=5,ws=20"
+
+_QUESTIONS = [
+    "如何上传文档到知识库？",
+    "系统支持哪些文件格式？",
+    "How do I reset my password?",
+    "对话记录会保存多久？",
+    "What is the rate limit for the API?",
+    "知识库检索的结果如何排序？",
+]
+_DOCUMENT = (
+    "# 使用指南\n\n## 文档上传\n系统支持 PDF、TXT 与 Markdown 格式的文档上传。上传后文档会在后台解析并建立索引。\n\n"
+    "## 对话\n对话记录默认保存 90 天。可以在设置中导出或删除对话。\n\n"
+    "## API\nAPI 默认限流为每分钟 60 次请求。How do I reset my password? Use the account settings page.\n"
+)
+
+
+# ====================
+# 统计
+# ====================
+
+
+class Recorder:
+    """按接口记录请求的起止时间（time.time()）、耗时与结果"""
+
+    def __init__(self):
+        self.records: Dict[str, List[Tuple[float, float, bool]]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, name: str, start: float, end: float, ok: bool, error: Optional[str] = None):
+        self.records[name].append((start, end, ok))
+        if not ok:
+            self.errors[name][error or "error"] += 1
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    array = np.asarray(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(array, 50)), 2),
+        "p95_ms": round(float(np.percentile(array, 95)), 2),
+        "p99_ms": round(float(np.percentile(array, 99)), 2),
+        "max_ms": round(float(array.max()), 2),
+    }
+
+
+def build_report(recorder: Recorder, duration: float, lag: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    汇总报告
+
+    每个请求的事件循环延迟取其时间窗口内（含一个采样间隔）采样到的最大值。
+    """
+    samples = sorted(map(tuple, (lag or {}).get("samples", [])))
+    sample_times = [t for t, _ in samples]
+    interval = (lag or {}).get("interval", 0.0)
+
+    def window_lag(start: float, end: float) -> Optional[float]:
+        lo = bisect.bisect_left(sample_times, start)
+        hi = bisect.bisect_right(sample_times, end + interval)
+        return max((samples[i][1] for i in range(lo, hi)), default=0.0)
+
+    endpoints = {}
+    for name, records in sorted(recorder.records.items()):
+        latencies = [end - start for start, end, _ in records]
+        ok = sum(1 for *_, success in records if success)
+        row = {
+            "requests": len(records),
+            "errors": len(records) - ok,
+            "error_types": dict(recorder.errors.get(name, {})),
+            "throughput_rps": round(len(records) / duration, 2) if duration else None,
+            "latency": _percentiles(latencies),
+        }
+        if samples:
+            lags = [window_lag(start, end) for start, end, _ in records]
+            row["loop_lag"] = {
+                "p95_ms": round(float(np.percentile(lags, 95)) * 1000, 2),
+                "max_ms": round(max(lags) * 1000, 2),
+            }
+        endpoints[name] = row
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "duration_s": round(duration, 2),
+        "total_requests": sum(len(r) for r in recorder.records.values()),
+        "endpoints": endpoints,
+    }
+    if samples:
+        lags = [value for _, value in samples]
+        report["loop_lag"] = {
+            "samples": len(lags),
+            "p50_ms": round(float(np.percentile(lags, 50)) * 1000, 2),
+            "p99_ms": round(float(np.percentile(lags, 99)) * 1000, 2),
+            "max_ms": round(max(lags) * 1000, 2),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'接口':<14}{'请求数':>8}{'错误':>6}{'RPS':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'循环延迟p95':>14}")
+    print("-" * 84)
+    for name, row in report["endpoints"].items():
+        latency = row["latency"]
+        lag = row.get("loop_lag", {}).get("p95_ms", "-")
+        print(
+            f"{name:<14}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps'] or 0:>8.2f}"
+            f"{latency.get('p50_ms', 0):>10.1f}{latency.get('p95_ms', 0):>10.1f}{latency.get('p99_ms', 0):>10.1f}"
+            f"{lag:>14}"
+        )
+    if "loop_lag" in report:
+        lag = report["loop_lag"]
+        print(f"\n事件循环延迟：p50 {lag['p50_ms']} ms，p99 {lag['p99_ms']} ms，最大 {lag['max_ms']} ms")
+
+
+# ====================
+# 虚拟用户
+# ====================
+
+
+class VirtualUser:
+    """一个已登录的用户，拥有一个知识库和一个对话"""
+
+    def __init__(self, client: httpx.AsyncClient, ws_url: str, recorder: Recorder, index: int, run_id: str):
+        self.client = client
+        self.ws_url = ws_url
+        self.recorder = recorder
+        self.email = f"loadtest-{run_id}-{index}@example.com"
+        self.token: Optional[str] = None
+        self.knowledge_base_id: Optional[int] = None
+        self.conversation_id: Optional[int] = None
+        self.rng = random.Random(f"{run_id}:{index}")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def setup(self, documents: int) -> List[int]:
+        """注册、登录，创建知识库、文档与对话，返回文档 ID"""
+        password = "loadtest-password"
+        response = await self.client.post(
+            "/api/v1/auth/register",
+            json={"email": self.email, "password": password, "name": self.email.split("@")[0]},
+        )
+        response.raise_for_status()
+        response = await self.client.post("/api/v1/auth/login", json={"email": self.email, "password": password})
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+        response = await self.client.post(
+            "/api/v1/knowledge/",
+            json={"name": f"压测知识库 {self.email}", "description": "loadtest"},
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        self.knowledge_base_id = response.json()["id"]
+
+        document_ids = []
+        for i in range(documents):
+            response = await self.client.post(
+                f"/api/v1/knowledge/{self.knowledge_base_id}/documents",
+                json={
+                    "title": f"使用指南 {i}",
+                    "content": _DOCUMENT + f"\n\n版本 {i}。\n",
+                    "knowledge_base_id": self.knowledge_base_id,
+                },
+                headers=self.headers,
+            )
+            response.raise_for_status()
+            document_ids.append(response.json()["id"])
+
+        response = await self.client.post(
+            "/api/v1/conversations/",
+            json={"title": "压测对话"},
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        self.conversation_id = response.json()["id"]
+        return document_ids
+
+    async def _timed(self, name: str, request):
+        start = time.time()
+        try:
+            response = await request
+            ok = response.status_code < 400
+            self.recorder.add(name, start, time.time(), ok, None if ok else str(response.status_code))
+        except Exception as e:
+            self.recorder.add(name, start, time.time(), False, type(e).__name__)
+
+    async def chat(self):
+        await self._timed("chat", self.client.post(
+            f"/api/v1/conversations/{self.conversation_id}/chat",
+            params={"user_message": self.rng.choice(_QUESTIONS)},
+            headers=self.headers,
+        ))
+
+    async def rag(self):
+        await self._timed("rag", self.client.post(
+            f"/api/v1/knowledge/{self.knowledge_base_id}/query",
+            params={"question": self.rng.choice(_QUESTIONS), "top_k": 5},
+            headers=self.headers,
+        ))
+
+    async def rag_all(self):
+        await self._timed("rag_all", self.client.post(
+            "/api/v1/knowledge/query",
+            params={"question": self.rng.choice(_QUESTIONS), "top_k": 5},
+            headers=self.headers,
+        ))
+
+    async def upload(self):
+        content = (_DOCUMENT + f"\n\n上传 {uuid.uuid4().hex}\n").encode("utf-8")
+        await self._timed("upload", self.client.post(
+            f"/api/v1/knowledge/{self.knowledge_base_id}/documents/upload",
+            files={"file": ("guide.md", content, "text/markdown")},
+            headers=self.headers,
+        ))
+
+    async def ws(self):
+        """WebSocket 会话：分别记录连接、心跳往返与一次对话"""
+        import websockets
+
+        start = time.time()
+        try:
+            async with websockets.connect(f"{self.ws_url}/api/v1/ws?token={self.token}") as socket:
+                await socket.recv()  # connected
+                self.recorder.add("ws_connect", start, time.time(), True)
+
+                start = time.time()
+                await socket.send(json.dumps({"type": "ping", "timestamp": start}))
+                await socket.recv()
+                self.recorder.add("ws_ping", start, time.time(), True)
+
+                start = time.time()
+                await socket.send(json.dumps({
+                    "type": "chat",
+                    "conversation_id": self.conversation_id,
+                    "message": self.rng.choice(_QUESTIONS),
+                }))
+                reply = json.loads(await socket.recv())
+                ok = reply.get("type") == "chat_response"
+                self.recorder.add("ws_chat", start, time.time(), ok, None if ok else reply.get("type"))
+        except Exception as e:
+            self.recorder.add("ws_session", start, time.time(), False, type(e).__name__)
+
+    async def run(self, mix: List[Tuple[str, float]], deadline: float, think_time: float):
+        names = [name for name, _ in mix]
+        weights = [weight for _, weight in mix]
+        while time.time() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+            if think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / think_time))
+
+
+# ====================
+# 进程管理
+# ====================
+
+
+def _spawn(module: str, arguments: List[str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", module, *arguments],
+        cwd=ROOT_DIR,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def _wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"进程已退出（{process.returncode}）：{url}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"等待服务就绪超时：{url}")
+
+
+async def _wait_documents(client: httpx.AsyncClient, users: List[VirtualUser], documents: Dict[int, List[int]], timeout: float):
+    """等待预置文档索引完成（状态变为 completed / failed）"""
+    deadline = time.time() + timeout
+    pending = {(user.knowledge_base_id, document_id, user) for user in users for document_id in documents[id(user)]}
+    while pending and time.time() < deadline:
+        for knowledge_base_id, document_id, user in list(pending):
+            response = await client.get(
+                f"/api/v1/knowledge/{knowledge_base_id}/documents/{document_id}",
+                headers=user.headers,
+            )
+            if response.status_code == 200 and response.json().get("status") in ("completed", "failed"):
+                pending.discard((knowledge_base_id, document_id, user))
+        if pending:
+            await asyncio.sleep(0.5)
+    if pending:
+        print(f"⚠️ {len(pending)} 个预置文档未在 {timeout:.0f} 秒内完成索引，RAG 结果可能为空")
+
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ("chat", "rag", "rag_all", "upload", "ws"):
+            raise argparse.ArgumentTypeError(f"未知场景: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+async def run_loadtest(args) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    processes = []
+    log_dir = args.log_dir or os.path.join(ROOT_DIR, "logs", "loadtest")
+    os.makedirs(log_dir, exist_ok=True)
+
+    try:
+        if not args.no_spawn:
+            zhipu = _spawn("loadtest.fake_zhipu", [
+                "--port", str(args.zhipu_port),
+                "--latency-ms", str(args.latency_ms),
+                "--ttft-ms", str(args.ttft_ms),
+                "--tokens-per-second", str(args.tokens_per_second),
+                "--completion-tokens", str(args.completion_tokens),
+                "--embedding-latency-ms", str(args.embedding_latency_ms),
+                "--error-rate", str(args.error_rate),
+            ], os.path.join(log_dir, "fake_zhipu.log"))
+            processes.append(zhipu)
+            await _wait_ready(f"http://127.0.0.1:{args.zhipu_port}/health", zhipu)
+
+            serve_args = [
+                "--port", str(args.app_port),
+                "--zhipu-url", f"http://127.0.0.1:{args.zhipu_port}/api/paas/v4",
+                "--vector-store", args.vector_store,
+                "--task-workers", str(args.task_workers),
+            ]
+            if args.redis_url:
+                serve_args += ["--redis-url", args.redis_url]
+            if args.database_url:
+                serve_args += ["--database-url", args.database_url]
+            app_process = _spawn("loadtest.serve", serve_args, os.path.join(log_dir, "app.log"))
+            processes.append(app_process)
+            app_url = f"http://127.0.0.1:{args.app_port}"
+        else:
+            app_process = None
+            app_url = args.app_url
+
+        await _wait_ready(f"{app_url}/health", app_process, timeout=args.startup_timeout)
+        ws_url = app_url.replace("http", "ws", 1)
+
+        limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+        async with httpx.AsyncClient(base_url=app_url, timeout=args.request_timeout, limits=limits) as client:
+            recorder = Recorder()
+            users = [VirtualUser(client, ws_url, recorder, i, run_id) for i in range(args.users)]
+
+            print(f"👥 准备 {len(users)} 个虚拟用户...")
+            documents = {}
+            for user in users:
+                documents[id(user)] = await user.setup(args.documents)
+            await _wait_documents(client, users, documents, args.index_timeout)
+
+            print(f"🔥 压测 {args.duration} 秒，场景权重 {args.mix}")
+            start = time.time()
+            deadline = start + args.duration
+            await asyncio.gather(*[user.run(args.mix, deadline, args.think_time) for user in users])
+            duration = time.time() - start
+
+            lag = None
+            try:
+                response = await client.get("/__loadtest/lag")
+                if response.status_code == 200:
+                    lag = response.json()
+            except httpx.HTTPError:
+                pass
+
+        return build_report(recorder, duration, lag)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='离线端到端压测')
+    parser.add_argument('--users', type=int, default=10, help='并发虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'场景权重（默认 {DEFAULT_MIX}）')
+    parser.add_argument('--think-time', type=float, default=0.0, help='请求间平均思考时间（秒，指数分布）')
+    parser.add_argument('--documents', type=int, default=3, help='每个用户预置的文档数')
+    parser.add_argument('--request-timeout', type=float, default=60.0, help='单个请求超时（秒）')
+    parser.add_argument('--index-timeout', type=float, default=120.0, help='等待预置文档索引的超时（秒）')
+    parser.add_argument('--startup-timeout', type=float, default=60.0, help='等待应用就绪的超时（秒）')
+    # 模拟 Zhipu AI
+    parser.add_argument('--zhipu-port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='模拟服务请求延迟')
+    parser.add_argument('--ttft-ms', type=float, default=300.0, help='模拟服务首 Token 延迟')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0, help='模拟服务生成速率')
+    parser.add_argument('--completion-tokens', type=int, default=120, help='模拟服务每次回答的 Token 数')
+    parser.add_argument('--embedding-latency-ms', type=float, default=30.0, help='模拟服务向量化延迟')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务错误率')
+    # 应用
+    parser.add_argument('--app-port', type=int, default=8800)
+    parser.add_argument('--vector-store', choices=['memory', 'local'], default='memory')
+    parser.add_argument('--redis-url', help='使用本地 Redis（默认使用 fakeredis）')
+    parser.add_argument('--database-url', help='数据库地址（默认为临时 SQLite）')
+    parser.add_argument('--task-workers', type=int, default=2, help='应用进程内执行 Celery 任务的线程数')
+    parser.add_argument('--no-spawn', action='store_true', help='不启动模拟服务与应用，压测 --app-url')
+    parser.add_argument('--app-url', default='http://127.0.0.1:8000', help='--no-spawn 时压测的应用地址')
+    parser.add_argument('--log-dir', help='子进程日志目录（默认 logs/loadtest）')
+    parser.add_argument('--output', help='报告 JSON 输出路径')
+
+    args = parser.parse_args()
+
+    report = asyncio.run(run_loadtest(args))
+    report["config"] = {
+        "users": args.users,
+        "mix": dict(args.mix),
+        "think_time": args.think_time,
+        "ttft_ms": args.ttft_ms,
+        "tokens_per_second": args.tokens_per_second,
+        "vector_store": args.vector_store,
+    }
+    print_report(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 报告已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
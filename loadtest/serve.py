@@ -0,0 +1,220 @@
+"""
+压测用应用启动器
+
+在导入 app.main 之前配置本地替身，然后用 uvicorn 启动应用：
+- Zhipu AI：ZHIPUAI_BASE_URL 指向模拟服务（loadtest.fake_zhipu）
+- Qdrant：qdrant-client 内存模式（QDRANT_LOCATION=:memory:）或嵌入式本地向量存储
+- Redis：fakeredis（同一进程内共享一个 FakeServer），或 --redis-url 指定的本地 Redis
+- Celery：任务在进程内线程池中执行（相当于与 API 同机部署的 worker），0 个线程时只提交不执行
+- 数据库：默认为临时目录下的 SQLite，启动时建表
+
+另外在应用外包一层 ASGI，提供 GET /__loadtest/lag 返回事件循环延迟采样，
+供压测驱动按请求时间窗口统计每个接口期间的事件循环延迟。
+
+使用方式：
+    python -m loadtest.serve --port 8800 --zhipu-url http://127.0.0.1:8900/api/paas/v4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟采样
+
+    每隔 interval 秒请求一次唤醒，实际唤醒时间与预期之差即为事件循环被阻塞的时长。
+    采样时间使用 time.time()，可与其他进程的请求时间对齐。
+    """
+
+    def __init__(self, interval: float = 0.01, max_samples: int = 1_000_000):
+        self.interval = interval
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append((time.time(), lag))
+
+
+def configure_environment(args) -> str:
+    """
+    在导入应用之前设置环境变量（settings 在导入时读取环境变量）
+
+    Returns:
+        str: 临时工作目录
+    """
+    workdir = args.workdir or tempfile.mkdtemp(prefix="claw-loadtest-")
+    os.makedirs(workdir, exist_ok=True)
+
+    overrides = {
+        "ZHIPUAI_BASE_URL": args.zhipu_url,
+        "ZHIPUAI_API_KEY": "loadtest.secret",  # SDK 要求 id.secret 格式
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or secrets.token_hex(32),
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "RAG_LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.db"),
+        "LOG_FILE": os.path.join(workdir, "app.log"),
+    }
+    if args.vector_store == "local":
+        overrides["VECTOR_STORE_BACKEND"] = "local"
+        overrides["RAG_LOCAL_VECTOR_PATH"] = os.path.join(workdir, "vectors")
+    else:
+        overrides["QDRANT_LOCATION"] = ":memory:"
+    if args.redis_url:
+        for key in ("REDIS_URL", "RATE_LIMIT_REDIS_URL", "CELERY_BROKER_URL", "CELERY_RESULT_BACKEND"):
+            overrides[key] = args.redis_url
+
+    os.environ.update(overrides)
+    return workdir
+
+
+def install_fake_redis():
+    """所有按 URL 创建的 Redis 连接池改用同一个 fakeredis 服务器"""
+    import fakeredis
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    sync_from_url = redis.ConnectionPool.from_url.__func__
+    async_from_url = redis.asyncio.ConnectionPool.from_url.__func__
+
+    def fake_sync_from_url(cls, url, **kwargs):
+        kwargs.update(connection_class=fakeredis.FakeConnection, server=server)
+        return sync_from_url(cls, url, **kwargs)
+
+    def fake_async_from_url(cls, url, **kwargs):
+        kwargs.update(connection_class=fakeredis.aioredis.FakeConnection, server=server)
+        return async_from_url(cls, url, **kwargs)
+
+    redis.ConnectionPool.from_url = classmethod(fake_sync_from_url)
+    redis.asyncio.ConnectionPool.from_url = classmethod(fake_async_from_url)
+
+
+def install_inline_tasks(workers: int):
+    """
+    Celery 任务改为在进程内线程池中执行
+
+    任务在调用方的事件循环线程之外运行（任务内部使用 asyncio.run），
+    workers 为 0 时只记录提交、不执行。
+    """
+    from celery import uuid as celery_uuid
+    from celery.result import AsyncResult
+    from app.tasks.celery_app import celery_app
+    import app.tasks.ai_tasks  # noqa: F401  注册任务
+    import app.tasks.knowledge_tasks  # noqa: F401
+
+    celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://")
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inline-task") if workers else None
+
+    def make_apply_async(task):
+        def apply_async(args=None, kwargs=None, task_id=None, **options):
+            task_id = task_id or celery_uuid()
+            if executor:
+                executor.submit(task.apply, args=args, kwargs=kwargs, task_id=task_id)
+            return AsyncResult(task_id, app=celery_app)
+        return apply_async
+
+    for name, task in celery_app.tasks.items():
+        if name.startswith("app.tasks."):
+            task.apply_async = make_apply_async(task)
+
+
+def create_schema():
+    """SQLite 等临时数据库按模型建表"""
+    from app.db.base import Base
+    from app.db.database import engine
+    import app.models  # noqa: F401  注册全部模型
+
+    Base.metadata.create_all(bind=engine)
+
+
+def wrap_app(app, monitor: LoopLagMonitor):
+    """在应用外提供 /__loadtest/lag 采样接口"""
+
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/__loadtest/lag":
+            body = json.dumps({
+                "interval": monitor.interval,
+                "samples": list(monitor.samples),
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        await app(scope, receive, send)
+
+    return wrapped
+
+
+async def serve(args):
+    import uvicorn
+
+    from app.main import app
+
+    monitor = LoopLagMonitor(args.lag_interval)
+    config = uvicorn.Config(
+        wrap_app(app, monitor),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        lifespan="on",
+        ws="auto",
+    )
+    monitor_task = asyncio.create_task(monitor.run())
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        monitor_task.cancel()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='压测用应用启动器（本地替身）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--zhipu-url', default='http://127.0.0.1:8900/api/paas/v4', help='Zhipu AI 模拟服务地址')
+    parser.add_argument('--vector-store', choices=['memory', 'local'], default='memory',
+                        help='memory: qdrant-client 内存模式；local: 嵌入式本地向量存储')
+    parser.add_argument('--redis-url', help='使用本地 Redis（默认使用 fakeredis）')
+    parser.add_argument('--database-url', help='数据库地址（默认为临时 SQLite）')
+    parser.add_argument('--no-create-schema', action='store_true', help='不自动建表')
+    parser.add_argument('--task-workers', type=int, default=2, help='进程内执行 Celery 任务的线程数')
+    parser.add_argument('--rate-limit', action='store_true', help='保留限流中间件')
+    parser.add_argument('--lag-interval', type=float, default=0.01, help='事件循环延迟采样间隔（秒）')
+    parser.add_argument('--workdir', help='工作目录（默认为临时目录）')
+
+    args = parser.parse_args()
+
+    workdir = configure_environment(args)
+    if not args.redis_url:
+        install_fake_redis()
+    install_inline_tasks(args.task_workers)
+    if not args.no_create_schema:
+        create_schema()
+
+    print(f"🚀 压测应用启动: http://{args.host}:{args.port}（工作目录 {workdir}）", flush=True)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+词法索引回填工具
+
+从数据库中已完成索引的文档重新生成词法索引（RAG_LEXICAL_INDEX_PATH）：
+按与索引任务相同的方式分块，点 ID 由（文档 ID, 块内容哈希）确定，
+因此回填结果与重新索引一致，不调用 Embedding API，也不改动向量库。
+
+适用场景：
+1. 已有知识库首次开启 RAG_HYBRID_ENABLED
+2. 词法索引文件丢失，或升级后旧版结构被丢弃
+3. 切换了 RAG_CHUNKER 等分块配置后重新索引
+
+使用方式：
+    RAG_LEXICAL_INDEX_PATH=data/lexical_index.db python scripts/backfill_lexical_index.py --all
+    python scripts/backfill_lexical_index.py --knowledge-base-id 12
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import Document, DocumentStatus
+from app.services.lexical_index import LexicalIndex
+from app.services.text_chunker import create_chunker
+from app.services.vector_service import VectorService
+
+
+def backfill(knowledge_base_id=None, page_size=50):
+    """按文档回填词法索引（逐文档覆盖写入，可重复执行）"""
+    print("\n" + "=" * 60)
+    print(f"回填词法索引: {settings.RAG_LEXICAL_INDEX_PATH}")
+    print("=" * 60 + "\n")
+
+    index = LexicalIndex()
+    db = SessionLocal()
+    start = time.time()
+    document_count = 0
+    chunk_count = 0
+    try:
+        query = db.query(Document).filter(Document.status == DocumentStatus.COMPLETED)
+        if knowledge_base_id is not None:
+            query = query.filter(Document.knowledge_base_id == knowledge_base_id)
+            index.delete_knowledge_base(knowledge_base_id)
+
+        for document in query.order_by(Document.id).yield_per(page_size):
+            if not document.content:
+                continue
+
+            chunker = create_chunker()
+            chunks = chunker.feed(document.content) + chunker.flush()
+            unique = {}
+            for chunk in chunks:
+                point_id = VectorService.chunk_point_id(document.id, chunk["hash"])
+                unique.setdefault(point_id, {**chunk, "point_id": point_id})
+
+            index.delete_document(document.id)
+            chunk_count += index.add_chunks(document.knowledge_base_id, document.id, unique.values())
+            document_count += 1
+            # 释放已处理文档的正文
+            db.expunge(document)
+
+            if document_count % 100 == 0:
+                print(f"   已处理 {document_count} 个文档，{chunk_count} 个块")
+    finally:
+        db.close()
+
+    print(f"\n✅ 回填完成: {document_count} 个文档，{chunk_count} 个块，耗时 {time.time() - start:.1f}s\n")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='词法索引回填工具')
+    parser.add_argument('--all', action='store_true', help='回填所有知识库')
+    parser.add_argument('--knowledge-base-id', type=int, help='只回填指定知识库（先清空其词法索引）')
+    parser.add_argument('--page-size', type=int, default=50, help='每次从数据库读取的文档数')
+
+    args = parser.parse_args()
+
+    # 如果没有指定任何参数，显示帮助
+    if not args.all and args.knowledge_base_id is None:
+        parser.print_help()
+        return
+
+    backfill(args.knowledge_base_id, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
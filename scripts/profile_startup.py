@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+应用启动耗时分析
+
+在干净的子进程中测量冷启动：
+1. 各模块导入耗时：python -X importtime -c "import app.main"，
+   按累计耗时和自身耗时列出最慢的模块，并按顶层包汇总
+2. 启动各阶段耗时：导入 app.main、执行 lifespan 启动、处理第一个请求（GET /health），
+   取自 app.core.startup_profiler（与 claw_ai_startup_duration_seconds 指标一致）
+
+超出耗时预算时以非零状态退出，可用于 CI 检查冷启动退化。
+
+使用方式：
+    python scripts/profile_startup.py
+    python scripts/profile_startup.py --top 30 --output reports/startup.json
+    python scripts/profile_startup.py --import-budget-ms 1500 --ready-budget-ms 3000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 添加项目根目录到路径
+sys.path.insert(0, PROJECT_ROOT)
+
+# -X importtime 的输出行：import time: self [us] | cumulative | imported package
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    解析 -X importtime 输出
+
+    Returns:
+        List[Dict]: 每个模块的 module、self_ms、cumulative_ms、depth
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        modules.append({
+            "module": module,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(indent) - 1) // 2,
+        })
+    return modules
+
+
+def profile_imports(env: Dict[str, str], top: int) -> Dict[str, Any]:
+    """在子进程中导入 app.main，统计各模块导入耗时"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("导入 app.main 失败:\n" + "\n".join(errors[-20:]))
+
+    modules = parse_importtime(result.stderr)
+    packages: Dict[str, float] = defaultdict(float)
+    for module in modules:
+        packages[module["module"].split(".")[0]] += module["self_ms"]
+
+    return {
+        "process_wall_ms": round(wall_ms, 2),
+        "import_app_main_ms": round(
+            next((m["cumulative_ms"] for m in modules if m["module"] == "app.main"), 0.0), 2
+        ),
+        "module_count": len(modules),
+        "top_cumulative": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:top],
+        "top_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:top],
+        "packages_self_ms": {
+            name: round(ms, 2)
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+    }
+
+
+async def _run_startup() -> Dict[str, Any]:
+    """（子进程内）导入应用、执行 lifespan 启动并处理第一个请求"""
+    from app.core.startup_profiler import startup_profiler
+    from app.main import app
+    from app.core.readiness import service_readiness
+    from httpx import ASGITransport, AsyncClient
+
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://startup") as client:
+            response = await client.get("/health")
+        snapshot = startup_profiler.snapshot()
+        snapshot["first_request_status"] = response.status_code
+        snapshot["readiness"] = service_readiness.snapshot()
+    return snapshot
+
+
+def profile_startup(env: Dict[str, str]) -> Dict[str, Any]:
+    """在子进程中执行完整启动，返回 startup_profiler 记录的各阶段耗时"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError("启动应用失败:\n" + result.stderr[-4000:])
+    # 最后一行是子进程输出的 JSON（之前是应用自身的启动日志）
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_budgets(report: Dict[str, Any], budgets: Dict[str, Optional[float]]) -> List[str]:
+    """
+    检查耗时预算
+
+    Returns:
+        List[str]: 超出预算的描述（为空表示全部通过）
+    """
+    phases = report["startup"]["phases_ms"]
+    actual = {
+        "import": phases.get("import"),
+        "ready": phases.get("ready"),
+        "first_request": phases.get("first_request"),
+    }
+    failures = []
+    for phase, budget in budgets.items():
+        if not budget or actual.get(phase) is None:
+            continue
+        if actual[phase] > budget:
+            failures.append(f"{phase}: {actual[phase]:.0f} ms > 预算 {budget:.0f} ms")
+    return failures
+
+
+def print_report(report: Dict[str, Any], top: int):
+    """打印报告"""
+    imports = report["imports"]
+    print("\n" + "=" * 72)
+    print(f"模块导入耗时（-X importtime，共 {imports['module_count']} 个模块，"
+          f"import app.main {imports['import_app_main_ms']:.0f} ms）")
+    print("=" * 72)
+    print(f"{'累计 (ms)':>10}{'自身 (ms)':>10}  模块")
+    for module in imports["top_cumulative"][:top]:
+        print(f"{module['cumulative_ms']:>10.1f}{module['self_ms']:>10.1f}  {'  ' * module['depth']}{module['module']}")
+
+    print(f"\n{'自身 (ms)':>10}  顶层包")
+    for name, ms in imports["packages_self_ms"].items():
+        print(f"{ms:>10.1f}  {name}")
+
+    startup = report["startup"]
+    print("\n" + "=" * 72)
+    print("启动阶段（从导入 app.main 开始计时）")
+    print("=" * 72)
+    for phase, ms in startup["phases_ms"].items():
+        print(f"{ms:>10.1f}  {phase}")
+    print(f"\n{'耗时 (ms)':>10}  lifespan 步骤")
+    for name, ms in startup["steps_ms"].items():
+        print(f"{ms:>10.1f}  {name}")
+
+    not_ready = [
+        name for name, status in startup.get("readiness", {}).get("services", {}).items()
+        if not status["ready"]
+    ]
+    if not_ready:
+        print(f"\n⚠️  未就绪的服务: {', '.join(not_ready)}（初始化耗时包含连接超时）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='应用启动耗时分析')
+    parser.add_argument('--top', type=int, default=20, help='列出最慢的模块数量')
+    parser.add_argument('--import-budget-ms', type=float, default=3000, help='导入 app.main 的耗时预算（0 表示不检查）')
+    parser.add_argument('--ready-budget-ms', type=float, default=5000, help='启动就绪的耗时预算（0 表示不检查）')
+    parser.add_argument('--first-request-budget-ms', type=float, default=0, help='首个请求完成的耗时预算（0 表示不检查）')
+    parser.add_argument('--service-timeout', type=float, help='覆盖 SERVICE_INIT_TIMEOUT（秒）')
+    parser.add_argument('--output', help='报告 JSON 输出路径')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_run_startup()), ensure_ascii=False))
+        return
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
+    if args.service_timeout is not None:
+        env["SERVICE_INIT_TIMEOUT"] = str(args.service_timeout)
+
+    try:
+        report = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "imports": profile_imports(env, args.top),
+            "startup": profile_startup(env),
+        }
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print_report(report, args.top)
+
+    failures = check_budgets(report, {
+        "import": args.import_budget_ms,
+        "ready": args.ready_budget_ms,
+        "first_request": args.first_request_budget_ms,
+    })
+    report["budget_failures"] = failures
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 报告已写入: {args.output}")
+
+    if failures:
+        print("\n❌ 超出启动耗时预算:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ 启动耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+向量量化工具
+
+功能：
+1. 把 QDRANT_QUANTIZATION 等配置应用到已有集合（共享集合 + 知识库专属集合）
+2. 生成召回率 / 延迟对比报告：以精确检索（exact）为基准，
+   对比 float32 HNSW、量化不重打分、量化 + 原始向量重打分三种方式
+
+使用方式：
+    QDRANT_QUANTIZATION=scalar python scripts/vector_quantization.py --apply
+    python scripts/vector_quantization.py --report --queries 200 --top-k 5
+    python scripts/vector_quantization.py --report --output reports/quantization.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client.models import SearchParams, QuantizationSearchParams
+
+from app.core.config import settings
+from app.services.vector_service import get_vector_service
+
+
+def apply_quantization():
+    """把当前量化配置应用到所有集合"""
+    print("\n" + "=" * 60)
+    print(f"应用量化配置: {settings.QDRANT_QUANTIZATION}")
+    print("=" * 60 + "\n")
+
+    for collection_name in get_vector_service()._all_collections():
+        try:
+            get_vector_service().apply_quantization(collection_name)
+            print(f"✅ {collection_name}")
+        except Exception as e:
+            print(f"❌ {collection_name}: {e}")
+
+    print("\n量化索引由 Qdrant 优化器在后台重建，可通过集合状态（yellow → green）观察进度。\n")
+
+
+def sample_queries(collection_name, count):
+    """从集合中取前 count 个点的向量作为查询"""
+    points, _ = get_vector_service().client.scroll(
+        collection_name=collection_name,
+        limit=count,
+        with_payload=False,
+        with_vectors=True,
+    )
+    return [point.vector for point in points]
+
+
+def run_searches(collection_name, queries, top_k, search_params):
+    """执行检索，返回每个查询的结果 ID 列表与耗时（毫秒）"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = get_vector_service().client.search(
+            collection_name=collection_name,
+            query_vector=query,
+            limit=top_k,
+            search_params=search_params,
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([str(hit.id) for hit in hits])
+    return results, latencies
+
+
+def generate_report(collection_name, query_count, top_k, output):
+    """生成召回率 / 延迟对比报告"""
+    print("\n" + "=" * 60)
+    print(f"量化召回率报告: {collection_name}")
+    print("=" * 60 + "\n")
+
+    queries = sample_queries(collection_name, query_count)
+    if not queries:
+        print("❌ 集合为空，无法生成报告")
+        return
+
+    info = get_vector_service().client.get_collection(collection_name)
+    oversampling = settings.QDRANT_RESCORE_OVERSAMPLING
+    variants = {
+        "exact": SearchParams(exact=True),
+        "float32_hnsw": SearchParams(quantization=QuantizationSearchParams(ignore=True)),
+        "quantized": SearchParams(quantization=QuantizationSearchParams(rescore=False)),
+        "quantized_rescore": SearchParams(
+            quantization=QuantizationSearchParams(rescore=True, oversampling=oversampling)
+        ),
+    }
+
+    baseline, _ = run_searches(collection_name, queries, top_k, variants["exact"])
+    rows = {}
+    for name, params in variants.items():
+        results, latencies = run_searches(collection_name, queries, top_k, params)
+        recall = np.mean([
+            len(set(result) & set(truth)) / max(len(truth), 1)
+            for result, truth in zip(results, baseline)
+        ])
+        rows[name] = {
+            f"recall@{top_k}": round(float(recall), 4),
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        }
+
+    print(f"{'方式':<20}{'召回率':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    print("-" * 54)
+    for name, row in rows.items():
+        print(f"{name:<20}{row[f'recall@{top_k}']:>10.4f}{row['latency_p50_ms']:>12.2f}{row['latency_p95_ms']:>12.2f}")
+
+    report = {
+        "collection": collection_name,
+        "generated_at": datetime.utcnow().isoformat(),
+        "points_count": info.points_count,
+        "vector_size": settings.QDRANT_VECTOR_SIZE,
+        "quantization": settings.QDRANT_QUANTIZATION,
+        "oversampling": oversampling,
+        "queries": len(queries),
+        "top_k": top_k,
+        "results": rows,
+    }
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 报告已写入: {output}")
+
+    print("\n说明：未启用量化的集合中 quantized* 与 float32_hnsw 结果相同。\n")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='向量量化工具')
+    parser.add_argument('--apply', action='store_true', help='把当前量化配置应用到所有集合')
+    parser.add_argument('--report', action='store_true', help='生成召回率 / 延迟对比报告')
+    parser.add_argument('--collection', default=settings.QDRANT_COLLECTION_NAME, help='报告使用的集合')
+    parser.add_argument('--queries', type=int, default=100, help='查询数量')
+    parser.add_argument('--top-k', type=int, default=settings.RAG_TOP_K, help='每次检索返回数量')
+    parser.add_argument('--output', help='报告 JSON 输出路径')
+
+    args = parser.parse_args()
+
+    # 如果没有指定任何参数，显示帮助
+    if len(sys.argv) == 1:
+        parser.print_help()
+        return
+
+    if args.apply:
+        apply_quantization()
+    if args.report:
+        generate_report(args.collection, args.queries, args.top_k, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -412,6 +412,7 @@ class TestKnowledgeBaseAPI:
         with patch("app.api.knowledge.create_rag_service") as mock_rag:
             mock_rag_instance = AsyncMock()
             mock_rag_instance.delete_knowledge_base_index = AsyncMock()
+            mock_rag_instance.invalidate_user_knowledge_bases = MagicMock()
             mock_rag.return_value = mock_rag_instance
             
             response = await client.delete(
@@ -436,6 +437,31 @@ class TestKnowledgeBaseAPI:
         
         assert response.status_code == 404
 
+    @pytest.mark.asyncio
+    async def test_rag_query_all_scoped_to_user(
+        self,
+        client: AsyncClient,
+        auth_headers: dict,
+        test_knowledge_base: KnowledgeBase
+    ):
+        """测试跨知识库查询只检索当前用户的知识库"""
+        with patch("app.api.knowledge.create_rag_service") as mock_rag:
+            mock_rag_instance = MagicMock()
+            mock_rag_instance.get_user_knowledge_base_ids.return_value = [test_knowledge_base.id]
+            mock_rag_instance.query = AsyncMock(return_value={"success": True, "answer": "回答"})
+            mock_rag.return_value = mock_rag_instance
+
+            response = await client.post(
+                "/api/v1/knowledge/query",
+                params={"question": "测试问题"},
+                headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            kwargs = mock_rag_instance.query.call_args.kwargs
+            assert kwargs["knowledge_base_ids"] == [test_knowledge_base.id]
+            assert kwargs.get("knowledge_base_id") is None
+
 
 class TestDocumentAPI:
     """文档 API 测试"""
@@ -454,14 +480,7 @@ class TestDocumentAPI:
             "file_type": "txt"
         }
         
-        with patch("app.api.knowledge.create_rag_service") as mock_rag:
-            mock_rag_instance = AsyncMock()
-            mock_rag_instance.index_document = AsyncMock(return_value={
-                "success": True,
-                "chunk_count": 3
-            })
-            mock_rag.return_value = mock_rag_instance
-            
+        with patch("app.api.knowledge.vectorize_document") as mock_task:
             response = await client.post(
                 f"/api/v1/knowledge/{test_knowledge_base.id}/documents",
                 json=document_data,
@@ -471,6 +490,35 @@ class TestDocumentAPI:
             assert response.status_code == 200
             data = response.json()
             assert data["title"] == document_data["title"]
+            assert data["status"] == "pending"
+            mock_task.delay.assert_called_once()
+            assert mock_task.delay.call_args.kwargs["document_id"] == data["id"]
+
+    @pytest.mark.asyncio
+    async def test_create_document_enqueue_failure(
+        self,
+        client: AsyncClient,
+        auth_headers: dict,
+        test_knowledge_base: KnowledgeBase
+    ):
+        """测试索引任务提交失败时文档标记为 failed"""
+        document_data = {
+            "title": "Test Document",
+            "content": "This is the content of the test document.",
+            "file_type": "txt"
+        }
+
+        with patch("app.api.knowledge.vectorize_document") as mock_task:
+            mock_task.delay.side_effect = Exception("broker unavailable")
+
+            response = await client.post(
+                f"/api/v1/knowledge/{test_knowledge_base.id}/documents",
+                json=document_data,
+                headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            assert response.json()["status"] == "failed"
 
     @pytest.mark.asyncio
     async def test_get_documents(
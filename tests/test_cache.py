@@ -245,6 +245,332 @@ async def test_cache_warmup():
         return False
 
 
+async def test_cache_batch_warmup():
+    """测试批量预热：set_many 批量写入、预热任务按各自间隔执行"""
+    print("\n" + "=" * 60)
+    print("测试 6: 批量预热")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service
+        from app.core.cache import CacheWarmer
+
+        # 批量写入
+        print("\n📝 批量设置缓存...")
+        items = {f"test:batch:{i}": {"index": i} for i in range(20)}
+        count = await cache_service.set_many(items, ttl=60, tags=["test:batch"])
+        values = [await cache_service.get(key) for key in items]
+        if count == len(items) and values == list(items.values()):
+            print(f"✅ 批量设置 {count} 个缓存成功")
+        else:
+            print(f"❌ 批量设置失败: count={count}")
+            return False
+
+        # 周期性预热：间隔短的任务执行次数更多，只执行一次的任务只执行一次
+        print("\n⏰ 测试按任务间隔预热...")
+        runs = {"fast": 0, "slow": 0, "once": 0}
+
+        def make_task(name):
+            async def task():
+                runs[name] += 1
+            return task
+
+        warmer = CacheWarmer(concurrency=2)
+        warmer.register_task("fast", make_task("fast"), interval=0.05)
+        warmer.register_task("slow", make_task("slow"), interval=0.2)
+        warmer.register_task("once", make_task("once"), interval=None)
+        periodic = asyncio.create_task(warmer.start_periodic_warmup())
+        await asyncio.sleep(0.45)
+        periodic.cancel()
+
+        print(f"执行次数: {runs}")
+        if runs["fast"] > runs["slow"] >= 2 and runs["once"] == 1:
+            print("✅ 各任务按自己的间隔执行")
+        else:
+            print("❌ 预热间隔不符合预期")
+            return False
+
+        await cache_service.delete_by_tags(["test:batch"])
+        return True
+
+    except Exception as e:
+        print(f"❌ 测试批量预热失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+async def test_cache_invalidation_bus():
+    """测试跨进程失效广播：一个进程发布的失效键被另一个进程收到"""
+    print("\n" + "=" * 60)
+    print("测试 7: 跨进程失效广播")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service
+        from app.services.cache_invalidation import CacheInvalidationBus
+
+        if not cache_service._async_redis_client:
+            await cache_service.connect()
+        redis_client = cache_service._async_redis_client
+
+        # 两个总线模拟两个 worker 进程
+        received = []
+        flushes = []
+
+        async def on_invalidate(keys):
+            received.extend(keys)
+
+        async def on_flush():
+            flushes.append(True)
+
+        async def ignore(*args):
+            pass
+
+        channel = "test:cache:invalidate"
+        worker_a = CacheInvalidationBus(redis_client, ignore, ignore, channel=channel)
+        worker_b = CacheInvalidationBus(redis_client, on_invalidate, on_flush, channel=channel)
+        await worker_a.start()
+        await worker_b.start()
+
+        try:
+            for _ in range(50):
+                if worker_a.connected and worker_b.connected:
+                    break
+                await asyncio.sleep(0.05)
+            subscribe_flushes = len(flushes)
+
+            print("\n📤 发布失效键...")
+            worker_a.publish(["test:invalidate:1", "test:invalidate:2"])
+            worker_a.publish(["test:invalidate:3"])
+            for _ in range(50):
+                if len(received) >= 3:
+                    break
+                await asyncio.sleep(0.05)
+
+            print("📤 发布清空广播...")
+            worker_a.publish_flush()
+            for _ in range(50):
+                if len(flushes) > subscribe_flushes:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+        print(f"收到的失效键: {sorted(received)}")
+        print(f"发送统计: {worker_a.stats}")
+        if sorted(received) == ["test:invalidate:1", "test:invalidate:2", "test:invalidate:3"] \
+                and len(flushes) > subscribe_flushes:
+            print("✅ 失效键和清空广播已送达其他进程")
+            return True
+
+        print("❌ 未收到完整的失效广播")
+        return False
+
+    except Exception as e:
+        print(f"❌ 测试跨进程失效广播失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+async def test_cache_generations():
+    """测试按版本号整体失效：场景失效后旧键不再命中，其他场景不受影响"""
+    print("\n" + "=" * 60)
+    print("测试 8: 场景版本号失效")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service
+
+        if not cache_service._connected:
+            await cache_service.connect()
+
+        profile_key = cache_service._generate_key("user_profile", "generation-test")
+        document_key = cache_service._generate_key("document_content", "generation-test")
+        await cache_service.set(profile_key, {"name": "old"}, ttl=60)
+        await cache_service.set(document_key, {"content": "doc"}, ttl=60)
+        print(f"\n📝 已设置: {profile_key}, {document_key}")
+
+        print("\n🗑️  失效场景 user_profile...")
+        generation = await cache_service.invalidate_scenario("user_profile")
+        new_profile_key = cache_service._generate_key("user_profile", "generation-test")
+        print(f"新版本: v{generation}，新键: {new_profile_key}")
+
+        if new_profile_key == profile_key or await cache_service.get(new_profile_key) is not None:
+            print("❌ 场景失效后仍命中旧值")
+            return False
+        if await cache_service.get(document_key) != {"content": "doc"}:
+            print("❌ 其他场景的缓存被误失效")
+            return False
+        print("✅ 场景整体失效，其他场景不受影响")
+
+        print("\n🗑️  清空所有缓存...")
+        await cache_service.clear_all()
+        if await cache_service.get(cache_service._generate_key("document_content", "generation-test")) is not None:
+            print("❌ 清空后仍命中旧值")
+            return False
+        print("✅ 清空所有缓存成功")
+        return True
+
+    except Exception as e:
+        print(f"❌ 测试场景版本号失效失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+async def test_cache_tag_compaction():
+    """测试标签索引压缩：已过期的键从标签集合中移除，存活的键保留"""
+    print("\n" + "=" * 60)
+    print("测试 9: 标签索引压缩")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service
+
+        if not cache_service._connected:
+            await cache_service.connect()
+        redis_client = cache_service._async_redis_client
+
+        tag = "test:compaction"
+        keys = [f"test:compaction:{i}" for i in range(10)]
+        for key in keys:
+            await cache_service.set(key, {"key": key}, ttl=60, tags=[tag])
+
+        # 模拟一半的键已过期
+        await redis_client.delete(*keys[:5])
+        tag_key = cache_service._tag_index_key(tag, (await cache_service._tag_generations([tag]))[tag])
+
+        print("\n🧹 压缩标签索引...")
+        stats = await cache_service.compact_tag_indexes()
+        members = await redis_client.smembers(tag_key)
+        print(f"压缩统计: {stats}，剩余成员: {len(members)}")
+
+        await cache_service.delete_by_tags([tag])
+        if members == set(keys[5:]):
+            print("✅ 已过期的键已从标签索引移除")
+            return True
+
+        print("❌ 标签索引压缩结果不符合预期")
+        return False
+
+    except Exception as e:
+        print(f"❌ 测试标签索引压缩失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+async def test_cache_analytics():
+    """测试按场景统计与热点键：区分一级/二级缓存命中，热点键排在前面"""
+    print("\n" + "=" * 60)
+    print("测试 10: 缓存分析")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service, cache_analytics, _memory_cache
+        from app.services.cache_analytics import SpaceSavingSketch
+
+        if not cache_service._connected:
+            await cache_service.connect()
+        cache_service.reset_stats()
+
+        key = cache_service._generate_key("user_profile", "analytics-test")
+        await cache_service.set(key, {"name": "analytics"}, ttl=60)
+        await cache_service.get(key)  # 一级缓存命中
+        _memory_cache.pop(key, None)
+        await cache_service.get(key)  # 二级缓存命中
+        await cache_service.get(cache_service._generate_key("user_profile", "analytics-missing"))
+
+        profile = cache_service.get_stats()["scenarios"].get("user_profile", {})
+        print(f"\n📊 user_profile 统计: {profile}")
+        expected = {"l1_hits": 1, "sets": 1, "misses": 1}
+        if any(profile.get(name) != value for name, value in expected.items()):
+            print("❌ 场景统计不符合预期")
+            return False
+        if cache_service._connected and profile.get("l2_hits") != 1:
+            print("❌ 未统计到二级缓存命中")
+            return False
+        print("✅ 按场景统计一级/二级缓存命中")
+
+        # 热点键：少量热点键与大量冷门键混合
+        print("\n🔥 测试热点键统计...")
+        sketch = SpaceSavingSketch(capacity=20)
+        for i in range(2000):
+            sketch.offer(f"hot:{i % 3}" if i % 2 == 0 else f"cold:{i}")
+        top = [key for key, _, _ in sketch.top(3)]
+        print(f"Top 3: {top}")
+        if sorted(top) != ["hot:0", "hot:1", "hot:2"]:
+            print("❌ 热点键统计不符合预期")
+            return False
+        print("✅ 热点键排在前面")
+
+        print(f"采样热点键: {cache_analytics.top_keys(5)}")
+        await cache_service.delete(key)
+        return True
+
+    except Exception as e:
+        print(f"❌ 测试缓存分析失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+async def test_cache_fill_race():
+    """测试二级缓存回填期间收到失效广播：旧值不会被写回一级缓存"""
+    print("\n" + "=" * 60)
+    print("测试 11: 回填与失效并发")
+    print("=" * 60)
+
+    try:
+        from app.services.cache_service import cache_service, _memory_cache
+
+        if not cache_service._connected:
+            await cache_service.connect()
+        if not cache_service._connected:
+            print("⚠️ Redis 不可用，跳过")
+            return True
+
+        key = cache_service._generate_key("user_profile", "fill-race-test")
+        await cache_service.set(key, {"name": "old"}, ttl=60)
+        _memory_cache.pop(key, None)
+
+        # GET 返回后、回填一级缓存前收到其他进程的失效广播
+        redis_client = cache_service._async_redis_client
+        original_ttl = redis_client.ttl
+
+        async def ttl_with_eviction(name):
+            await cache_service._evict_local([name])
+            return await original_ttl(name)
+
+        redis_client.ttl = ttl_with_eviction
+        try:
+            value = await cache_service.get(key)
+        finally:
+            del redis_client.ttl
+
+        print(f"\n📥 读取结果: {value}，一级缓存中: {key in _memory_cache}")
+        if value != {"name": "old"} or key in _memory_cache:
+            print("❌ 失效广播之后旧值仍被写回一级缓存")
+            return False
+
+        await cache_service.get(key)
+        if key not in _memory_cache:
+            print("❌ 没有并发失效时未回填一级缓存")
+            return False
+        print("✅ 回填期间失效的键不写入一级缓存")
+
+        await cache_service.delete(key)
+        return True
+
+    except Exception as e:
+        print(f"❌ 测试回填与失效并发失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 async def main():
     """运行所有测试"""
     print("\n" + "=" * 60)
@@ -259,6 +585,12 @@ async def main():
     results.append(("所有缓存场景", await test_cache_scenarios()))
     results.append(("缓存标签", await test_cache_tags()))
     results.append(("缓存预热", await test_cache_warmup()))
+    results.append(("批量预热", await test_cache_batch_warmup()))
+    results.append(("跨进程失效广播", await test_cache_invalidation_bus()))
+    results.append(("场景版本号失效", await test_cache_generations()))
+    results.append(("标签索引压缩", await test_cache_tag_compaction()))
+    results.append(("缓存分析", await test_cache_analytics()))
+    results.append(("回填与失效并发", await test_cache_fill_race()))
 
     # 汇总结果
     print("\n" + "=" * 60)
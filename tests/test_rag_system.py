@@ -23,6 +23,7 @@ class TestVectorService:
         with patch('app.services.vector_service.QdrantClient') as mock_client:
             service = VectorService()
             service.client = mock_client.return_value
+            service.client.scroll.return_value = ([], None)
             return service
 
     def test_chunk_text_basic(self, vector_service):
@@ -54,6 +55,143 @@ class TestVectorService:
             assert 'text' in chunk
             assert len(chunk['text']) > 0
 
+    def test_streaming_chunker_matches_chunk_text(self, vector_service):
+        """测试增量分块与整体分块结果一致"""
+        from app.services.text_chunker import TextChunker
+
+        text = "\n".join(f"第 {i} 行内容，用于测试分块。" * (i % 5 + 1) for i in range(200))
+
+        chunker = TextChunker(chunk_size=100, overlap=10)
+        lines = text.split('\n')
+        streamed = []
+        for start in range(0, len(lines), 7):
+            streamed.extend(chunker.feed('\n'.join(lines[start:start + 7])))
+        streamed.extend(chunker.flush())
+
+        assert streamed == vector_service.chunk_text(text, chunk_size=100, overlap=10)
+
+    @pytest.mark.asyncio
+    async def test_add_document_stream_upserts_in_batches(self, vector_service):
+        """测试流式索引按批次写入"""
+        async def blocks():
+            for i in range(10):
+                yield {"text": f"段落 {i}\n" + "".join(f"第 {i} 段第 {j} 句。" for j in range(60))}
+
+        with patch.object(vector_service, 'get_embeddings', new_callable=AsyncMock) as mock_get_embeddings:
+            mock_get_embeddings.side_effect = lambda texts: [[0.1] * 1024 for _ in texts]
+
+            result = await vector_service.add_document_stream(
+                knowledge_base_id=1,
+                document_id=1,
+                blocks=blocks(),
+                batch_size=4,
+            )
+
+        assert result['success']
+        assert result['chunk_count'] == sum(len(c.args[0]) for c in mock_get_embeddings.await_args_list)
+        assert mock_get_embeddings.await_count == -(-result['chunk_count'] // 4)
+        assert vector_service.client.upsert.call_count == -(-result['chunk_count'] // 4)
+
+    @pytest.mark.asyncio
+    async def test_add_document_stream_reuses_unchanged_chunks(self, vector_service):
+        """测试重新索引只为新增块生成向量，并删除已移除的块"""
+        old_text = "".join(f"第 {i} 段内容\n" for i in range(300))
+        new_text = old_text + "新增段落\n" * 10
+        old_chunks = vector_service.chunk_text(old_text)
+        new_chunks = vector_service.chunk_text(new_text)
+        kept_ids = {vector_service.chunk_point_id(1, c['hash']) for c in old_chunks}
+        new_ids = {vector_service.chunk_point_id(1, c['hash']) for c in new_chunks}
+        vector_service.client.scroll.return_value = (
+            [Mock(id=point_id) for point_id in kept_ids | {"stale-id"}],
+            None,
+        )
+
+        async def blocks():
+            yield new_text
+
+        with patch.object(vector_service, 'get_embeddings', new_callable=AsyncMock) as mock_get_embeddings:
+            mock_get_embeddings.side_effect = lambda texts: [[0.1] * 1024 for _ in texts]
+
+            result = await vector_service.add_document_stream(
+                knowledge_base_id=1,
+                document_id=1,
+                blocks=blocks(),
+            )
+
+        assert result['success']
+        assert result['embedded_count'] == len(new_ids - kept_ids)
+        assert result['reused_count'] == len(new_ids & kept_ids)
+        assert result['embedded_count'] < len(new_ids) // 2
+        assert sum(len(c.args[0]) for c in mock_get_embeddings.await_args_list) == result['embedded_count']
+        deleted = vector_service.client.delete.call_args.kwargs['points_selector']
+        assert set(deleted.points) == (kept_ids - new_ids) | {"stale-id"}
+
+    @pytest.mark.asyncio
+    async def test_add_document_stream_recovers_failed_pages(self, vector_service):
+        """测试分页写入：单页重试，重试仍失败时保留其余分页并在下次运行中补写"""
+        from app.core.config import settings
+
+        calls = []
+
+        def flaky_upsert(collection_name, points, wait):
+            calls.append([p.id for p in points])
+            if len(calls) in (2, 3):  # 第二页首次失败，重试一次仍失败
+                raise ConnectionError("qdrant unavailable")
+
+        vector_service.client.upsert.side_effect = flaky_upsert
+        text = "".join(f"第 {i} 段内容\n" for i in range(300))
+
+        async def blocks():
+            yield text
+
+        with patch.object(settings, 'QDRANT_UPSERT_PAGE_SIZE', 2), \
+             patch.object(settings, 'QDRANT_UPSERT_CONCURRENCY', 1), \
+             patch.object(settings, 'QDRANT_UPSERT_MAX_RETRIES', 1), \
+             patch.object(settings, 'QDRANT_UPSERT_RETRY_BACKOFF', 0), \
+             patch.object(vector_service, 'get_embeddings', new_callable=AsyncMock, side_effect=lambda texts: [[0.1] * 4 for _ in texts]):
+            result = await vector_service.add_document_stream(1, 1, blocks(), batch_size=6)
+
+            assert not result['success']
+            assert result['failed_count'] == 2
+            assert result['embedded_count'] == result['chunk_count'] - 2
+            vector_service.client.delete.assert_not_called()
+
+            # 下次运行只补写失败的两个块
+            written = {point_id for page in calls[:1] + calls[3:] for point_id in page}
+            vector_service.client.scroll.return_value = ([Mock(id=i) for i in written], None)
+            calls.clear()
+            retry = await vector_service.add_document_stream(1, 1, blocks(), batch_size=6)
+
+        assert retry['success']
+        assert retry['embedded_count'] == 2
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_add_document_stream_stops_when_document_removed(self, vector_service):
+        """测试索引期间文档被删除：停止写入并按文档清理已写入的点"""
+        async def blocks():
+            for i in range(10):
+                yield {"text": f"段落 {i}\n" + "".join(f"第 {i} 段第 {j} 句。" for j in range(60))}
+
+        checks = iter([True, True, False])
+        vector_service.lexical_index = None
+        with patch.object(vector_service, 'get_embeddings', new_callable=AsyncMock,
+                          side_effect=lambda texts: [[0.1] * 4 for _ in texts]):
+            result = await vector_service.add_document_stream(
+                knowledge_base_id=1,
+                document_id=7,
+                blocks=blocks(),
+                batch_size=4,
+                is_current=lambda: next(checks),
+            )
+
+        assert not result['success']
+        assert result['removed']
+        assert vector_service.client.upsert.call_count == 2
+        selector = vector_service.client.delete.call_args.kwargs['points_selector']
+        assert selector.must[0].key == "document_id"
+        assert selector.must[0].match.value == 7
+
     @pytest.mark.asyncio
     async def test_get_embedding(self, vector_service):
         """测试获取文本向量"""
@@ -91,6 +229,819 @@ class TestVectorService:
             assert results[0]['document_id'] == 1
             assert results[0]['score'] == 0.9
 
+    def test_collection_for_caches_route(self, vector_service):
+        """测试集合路由缓存与读取失败回退"""
+        with patch.object(vector_service, '_lookup_collection', return_value="claw_ai_kb_kb_7") as lookup:
+            assert vector_service.collection_for(7) == "claw_ai_kb_kb_7"
+            assert vector_service.collection_for(7) == "claw_ai_kb_kb_7"
+            assert lookup.call_count == 1
+
+        vector_service.invalidate_route(7)
+        with patch.object(vector_service, '_lookup_collection', side_effect=Exception("db down")):
+            assert vector_service.collection_for(7) == vector_service.collection_name
+
+        assert vector_service.collection_for(None) == vector_service.collection_name
+
+    @pytest.mark.asyncio
+    async def test_search_targets_group_by_collection(self, vector_service):
+        """测试多知识库检索按集合分组：共享集合用 MatchAny，专属集合单独检索"""
+        from qdrant_client.models import MatchAny, MatchValue
+
+        dedicated = vector_service.dedicated_collection_name(3)
+        routes = {1: vector_service.collection_name, 2: vector_service.collection_name, 3: dedicated}
+        with patch.object(vector_service, 'collection_for', side_effect=routes.get):
+            targets = dict(await vector_service._search_targets(knowledge_base_ids=[1, 2, 3, 1]))
+
+        assert set(targets) == {vector_service.collection_name, dedicated}
+        shared_match = targets[vector_service.collection_name].must[0].match
+        assert isinstance(shared_match, MatchAny) and shared_match.any == [1, 2]
+        assert isinstance(targets[dedicated].must[0].match, MatchValue)
+        assert await vector_service._search_targets(knowledge_base_ids=[]) == []
+        # 未指定知识库时不检索任何集合
+        assert await vector_service._search_targets() == []
+
+    @pytest.mark.asyncio
+    async def test_search_fan_out_deadline(self, vector_service):
+        """测试并发检索多个集合，超时的集合被放弃"""
+        import time as time_module
+
+        def fake_search(collection_name, **kwargs):
+            if collection_name == "slow":
+                time_module.sleep(0.5)
+            return [Mock(id=f"{collection_name}-1", score=0.5 if collection_name == "a" else 0.9,
+                         payload={"knowledge_base_id": 1, "document_id": 1, "text": "t"})]
+
+        vector_service.client.search.side_effect = fake_search
+        with patch.object(vector_service, 'get_embedding', new_callable=AsyncMock, return_value=[0.1] * 4), \
+             patch.object(vector_service, 'collection_for', side_effect={1: "a", 2: "b", 3: "slow"}.get):
+            results = await vector_service.search("问题", top_k=5, timeout=0.2, knowledge_base_ids=[1, 2, 3])
+
+        assert [r["point_id"] for r in results] == ["b-1", "a-1"]
+
+    def test_quantization_config(self, vector_service):
+        """测试量化配置与重打分检索参数"""
+        from qdrant_client.models import ScalarQuantization, ProductQuantization
+
+        with patch('app.services.vector_service.settings') as mock_settings:
+            mock_settings.QDRANT_QUANTIZATION = "none"
+            assert vector_service._quantization_config() is None
+            assert vector_service._search_params() is None
+
+            mock_settings.QDRANT_QUANTIZATION = "scalar"
+            mock_settings.QDRANT_SCALAR_QUANTILE = 0.99
+            mock_settings.QDRANT_QUANTIZATION_ALWAYS_RAM = True
+            mock_settings.QDRANT_RESCORE_OVERSAMPLING = 2.0
+            assert isinstance(vector_service._quantization_config(), ScalarQuantization)
+            params = vector_service._search_params()
+            assert params.quantization.rescore is True
+            assert params.quantization.oversampling == 2.0
+
+            mock_settings.QDRANT_QUANTIZATION = "product"
+            mock_settings.QDRANT_PQ_COMPRESSION = "x16"
+            assert isinstance(vector_service._quantization_config(), ProductQuantization)
+
+    def test_ensure_payload_indexes(self, vector_service):
+        """测试只为缺失的过滤字段建立载荷索引"""
+        vector_service.client.get_collection.return_value = Mock(
+            payload_schema={"knowledge_base_id": Mock()}
+        )
+        vector_service.client.create_payload_index.reset_mock()
+
+        vector_service._ensure_payload_indexes("test_collection")
+
+        fields = [c.kwargs["field_name"] for c in vector_service.client.create_payload_index.call_args_list]
+        assert fields == ["document_id"]
+
+    @pytest.mark.asyncio
+    async def test_migrate_knowledge_base(self, vector_service):
+        """测试迁移：标记 → 复制 → 切换路由 → 补复制增量，源集合核对后延后清理"""
+        shared = vector_service.collection_name
+        dedicated = vector_service.dedicated_collection_name(3)
+        routes = {3: None}
+        migrating = {}
+
+        with patch.object(vector_service, '_lookup_collection', side_effect=lambda kb: routes[kb] or shared), \
+             patch.object(vector_service, '_save_route', side_effect=lambda kb, name: routes.__setitem__(kb, name)), \
+             patch.object(vector_service, '_migration_source', side_effect=migrating.get), \
+             patch.object(vector_service, '_set_migration_source', side_effect=migrating.__setitem__), \
+             patch.object(vector_service, '_clear_migration_source',
+                          side_effect=lambda kb, source: migrating.pop(kb, None)), \
+             patch.object(vector_service, '_ensure_collection'), \
+             patch.object(vector_service, '_copy_knowledge_base_points', side_effect=[5, 1]) as copy:
+            result = await vector_service.migrate_knowledge_base(3)
+
+            assert result == {"source": shared, "target": dedicated, "copied_count": 6}
+            assert copy.call_count == 2
+            assert vector_service.collection_for(3) == dedicated
+            assert migrating == {3: shared}
+
+            # 迁移期间暂停写入
+            written = await vector_service.add_document_chunks(3, 30, "迁移期间写入的文本")
+            assert written["success"] is False
+            assert "迁移" in written["error"]
+
+            # 清理完成前不能反方向迁移
+            with pytest.raises(ValueError):
+                await vector_service.migrate_knowledge_base(3, dedicated=False)
+
+            # 清理前双向核对：补复制目标缺少的点，删除目标中源集合已删除的点
+            point_ids = {shared: {"a", "b"}, dedicated: {"a", "gone"}}
+            vector_service.client.retrieve.return_value = [Mock(id="b", vector=[0.1], payload={})]
+            vector_service.client.delete.reset_mock()
+            vector_service.client.upsert.reset_mock()
+            with patch.object(vector_service, '_scroll_point_ids',
+                              side_effect=lambda collection, key, value: set(point_ids[collection])):
+                assert await vector_service.purge_knowledge_base_points(3, shared) is True
+
+            assert vector_service.client.retrieve.call_args.kwargs["ids"] == ["b"]
+            assert vector_service.client.upsert.call_args.kwargs["collection_name"] == dedicated
+            deleted = [c.kwargs["collection_name"] for c in vector_service.client.delete.call_args_list]
+            assert deleted == [dedicated, shared]
+            assert vector_service.client.delete.call_args_list[0].kwargs["points_selector"].points == ["gone"]
+            assert migrating == {}
+
+            # 已在目标集合时不重复迁移
+            again = await vector_service.migrate_knowledge_base(3)
+            assert again["copied_count"] == 0
+            assert await vector_service.purge_knowledge_base_points(3, dedicated) is False
+
+    @pytest.mark.asyncio
+    async def test_rebuild_dedicated_knowledge_base(self, tmp_path):
+        """测试重建专属集合中的知识库：只删除点并重新写入；集合被删除后重新导入时自动创建"""
+        from app.core.config import settings
+
+        with patch.object(settings, 'VECTOR_STORE_BACKEND', 'local'), \
+             patch.object(settings, 'RAG_LOCAL_VECTOR_PATH', str(tmp_path)), \
+             patch.object(settings, 'QDRANT_VECTOR_SIZE', 4):
+            service = VectorService()
+        service.lexical_index = None
+        service.chunk_store = None
+        service.retrieval_cache = None
+        dedicated = service.dedicated_collection_name(5)
+        text = "".join(f"第 {i} 段内容\n" for i in range(100))
+
+        with patch.object(service, '_lookup_collection', return_value=dedicated), \
+             patch.object(service, 'get_embeddings', new_callable=AsyncMock,
+                          side_effect=lambda texts: [[0.1, 0.2, 0.3, 0.4] for _ in texts]):
+            first = await service.add_document_chunks(5, 50, text)
+            assert first['success']
+
+            assert await service.delete_knowledge_base_chunks(5, keep_collection=True)
+            assert service.client.get_collection(dedicated).points_count == 0
+
+            rebuilt = await service.add_document_chunks(5, 50, text)
+            assert rebuilt['success']
+            assert rebuilt['embedded_count'] == first['chunk_count']
+            assert service.client.get_collection(dedicated).points_count == first['chunk_count']
+
+            # 删除知识库时整个专属集合被删除，之后写入会重新创建
+            assert await service.delete_knowledge_base_chunks(5)
+            assert dedicated not in [c.name for c in service.client.get_collections().collections]
+            again = await service.add_document_chunks(5, 50, text)
+            assert again['success']
+            assert service.client.get_collection(dedicated).points_count == first['chunk_count']
+        service.client.close()
+
+
+class TestTextChunker:
+    """结构感知分块测试"""
+
+    def test_heading_paths_and_section_boundaries(self):
+        """测试在标题处开始新块并附带标题路径，代码块中的 # 不是标题"""
+        from app.services.text_chunker import TextChunker
+
+        text = (
+            "# 安装\n准备环境。\n"
+            "## Linux\n执行安装脚本。\n```\n# 注释\n./install.sh\n```\n"
+            "## Windows\n运行安装程序。\n"
+            "# 使用\n启动服务。\n"
+        )
+        chunker = TextChunker(chunk_size=200, overlap=20)
+        chunks = chunker.feed(text) + chunker.flush()
+
+        assert [c['headings'] for c in chunks] == [
+            ["安装"], ["安装", "Linux"], ["安装", "Windows"], ["使用"],
+        ]
+        assert chunks[1]['text'].startswith("## Linux")
+        assert "# 注释" in chunks[1]['text']
+        assert "准备环境" not in chunks[1]['text']
+
+    def test_token_sizes_and_exact_overlap(self):
+        """测试按 Token 切分、句子边界与精确重叠"""
+        from app.services.context_packer import estimate_tokens
+        from app.services.text_chunker import TextChunker
+
+        text = "".join(f"这是第{i}句话。" for i in range(200))
+        chunker = TextChunker(chunk_size=50, overlap=10)
+        chunks = chunker.feed(text) + chunker.flush()
+
+        assert len(chunks) > 1
+        assert all(c['tokens'] <= 50 for c in chunks)
+        assert all(c['tokens'] == estimate_tokens(c['text']) for c in chunks)
+        for previous, current in zip(chunks, chunks[1:]):
+            # 下一块以上一块末尾的 10 个 Token 开头
+            head = current['text'][:len(current['text']) - len(current['text'].lstrip())]
+            assert not head
+            overlap = next(
+                previous['text'][i:] for i in range(len(previous['text']))
+                if estimate_tokens(previous['text'][i:]) == 10
+            )
+            assert current['text'].startswith(overlap.strip())
+
+    def test_long_line_split_on_token_boundaries(self):
+        """测试超长行在 Token 边界切分，不截断单词"""
+        from app.services.text_chunker import TextChunker
+
+        words = [f"word{i:04d}" for i in range(2000)]
+        chunker = TextChunker(chunk_size=64, overlap=0)
+        chunks = chunker.feed(" ".join(words)) + chunker.flush()
+
+        assert len(chunks) > 1
+        rebuilt = " ".join(c['text'] for c in chunks).split()
+        assert rebuilt == words
+        assert all(c['tokens'] <= 64 for c in chunks)
+
+    def test_oversized_token_span_hard_cut(self):
+        """测试没有空白的超长字母/数字串按字符硬切，每块不超过块大小"""
+        from app.services.context_packer import estimate_tokens
+        from app.services.text_chunker import TextChunker
+
+        for text in ("x" * 20000, "7" * 5000):
+            chunker = TextChunker()
+            chunks = chunker.feed(text) + chunker.flush()
+
+            assert len(chunks) > 1
+            assert all(c['tokens'] <= chunker.chunk_size for c in chunks)
+            assert all(estimate_tokens(c['text']) <= chunker.chunk_size for c in chunks)
+
+    def test_pdf_page_markers(self):
+        """测试 PDF 页码标记记录为元数据，不进入文本"""
+        from app.services.text_chunker import TextChunker
+
+        chunker = TextChunker(chunk_size=30, overlap=0)
+        chunks = chunker.feed("[第 1 页]\n" + "第一页内容。" * 8)
+        chunks += chunker.feed("[第 2 页]\n" + "第二页内容。" * 8)
+        chunks += chunker.flush()
+
+        assert all("[第" not in c['text'] for c in chunks)
+        assert chunks[0]['page'] == 1
+        assert chunks[-1]['page'] == 2
+        assert any(c.get('page_end') == 2 for c in chunks)
+
+
+class TestLocalVectorStore:
+    """本地向量存储测试"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """创建本地向量存储和一个 4 维集合"""
+        from qdrant_client.models import VectorParams, Distance, PointStruct
+        from app.services.local_vector_store import LocalVectorStore
+
+        store = LocalVectorStore(str(tmp_path))
+        store.create_collection("test", vectors_config=VectorParams(size=4, distance=Distance.COSINE))
+        store.upsert("test", points=[
+            PointStruct(id=f"p{i}", vector=vector, payload={"knowledge_base_id": kb, "document_id": doc, "text": f"块{i}"})
+            for i, (vector, kb, doc) in enumerate([
+                ([1, 0, 0, 0], 1, 10),
+                ([0.9, 0.1, 0, 0], 1, 11),
+                ([0, 1, 0, 0], 2, 20),
+                ([0.95, 0, 0.05, 0], 2, 21),
+            ])
+        ])
+        yield store
+        store.close()
+
+    def test_search_with_filter(self, store):
+        """测试按知识库过滤的检索"""
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+
+        hits = store.search("test", query_vector=[1, 0, 0, 0], limit=2)
+        assert [h.id for h in hits] == ["p0", "p3"]
+        assert hits[0].score == pytest.approx(1.0)
+
+        hits = store.search(
+            "test",
+            query_vector=[1, 0, 0, 0],
+            limit=5,
+            query_filter=Filter(must=[FieldCondition(key="knowledge_base_id", match=MatchValue(value=2))]),
+            score_threshold=0.5,
+        )
+        assert [h.id for h in hits] == ["p3"]
+        assert hits[0].payload["text"] == "块3"
+
+    def test_delete_scroll_and_persist(self, store, tmp_path):
+        """测试按过滤条件删除、分页遍历和重启后恢复"""
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, PointStruct
+        from app.services.local_vector_store import LocalVectorStore
+
+        store.delete("test", points_selector=Filter(
+            must=[FieldCondition(key="document_id", match=MatchValue(value=10))]
+        ))
+        store.upsert("test", points=[PointStruct(id="p9", vector=[0, 0, 1, 0], payload={"knowledge_base_id": 3})])
+
+        page, offset = store.scroll("test", limit=2)
+        rest, end = store.scroll("test", limit=2, offset=offset)
+        assert [p.id for p in page + rest] == ["p1", "p2", "p3", "p9"]
+        assert end is None
+        store.close()
+
+        reopened = LocalVectorStore(str(tmp_path))
+        assert [c.name for c in reopened.get_collections().collections] == ["test"]
+        assert reopened.get_collection("test").points_count == 4
+        assert reopened.search("test", query_vector=[0, 0, 1, 0], limit=1)[0].id == "p9"
+        reopened.close()
+
+
+    def test_shared_directory_between_processes(self, store, tmp_path):
+        """测试两个实例（模拟 API 与 Worker 进程）共享目录：槽位不冲突，扩展后的向量文件可被另一方读取"""
+        from qdrant_client.models import PointStruct
+        from app.services.local_vector_store import LocalVectorStore
+
+        other = LocalVectorStore(str(tmp_path))
+        other.upsert("test", points=[
+            PointStruct(id=f"w{i}", vector=[0, 0, 0, 1], payload={"knowledge_base_id": 9}) for i in range(1100)
+        ])
+        store.upsert("test", points=[PointStruct(id="api", vector=[0, 0, 1, 0], payload={"knowledge_base_id": 3})])
+
+        assert store.get_collection("test").points_count == 1105
+        hits = store.search("test", query_vector=[0, 0, 0, 1], limit=1, with_vectors=True)
+        assert hits[0].id.startswith("w")
+        assert other.search("test", query_vector=[0, 0, 1, 0], limit=1)[0].id == "api"
+        assert other.retrieve("test", ids=["p0"], with_vectors=True)[0].vector == pytest.approx([1, 0, 0, 0])
+        other.close()
+
+    def test_hnsw_applies_other_process_writes_incrementally(self, store, tmp_path):
+        """测试其他进程写入后只把变化的点增量应用到 HNSW，不整体重建"""
+        import numpy as np
+        from types import SimpleNamespace
+        from qdrant_client.models import PointIdsList, PointStruct
+        from app.core.config import settings
+        from app.services.local_vector_store import LocalVectorStore
+
+        class FakeIndex:
+            """按 hnswlib.Index 接口实现的暴力检索索引，记录每次添加的标签"""
+            instances = []
+
+            def __init__(self, space, dim):
+                self.vectors, self.deleted, self.added = {}, set(), []
+                FakeIndex.instances.append(self)
+
+            def init_index(self, max_elements, **kwargs):
+                self.max_elements = max_elements
+
+            def get_max_elements(self):
+                return self.max_elements
+
+            def resize_index(self, size):
+                self.max_elements = size
+
+            def add_items(self, vectors, labels, replace_deleted=False):
+                self.added.append(list(labels))
+                for vector, label in zip(vectors, labels):
+                    self.vectors[int(label)] = np.asarray(vector)
+                    self.deleted.discard(int(label))
+
+            def mark_deleted(self, label):
+                self.deleted.add(label)
+
+            def unmark_deleted(self, label):
+                self.deleted.discard(label)
+
+            def set_ef(self, ef):
+                pass
+
+            def knn_query(self, query, k, filter=None):
+                labels = [
+                    label for label in self.vectors
+                    if label not in self.deleted and (filter is None or filter(label))
+                ]
+                labels.sort(key=lambda label: -float(self.vectors[label] @ query))
+                labels = labels[:k]
+                return [labels], [[1.0 - float(self.vectors[label] @ query) for label in labels]]
+
+        fake_hnswlib = SimpleNamespace(Index=FakeIndex)
+        other = LocalVectorStore(str(tmp_path))
+        with patch('app.services.local_vector_store.hnswlib', fake_hnswlib), \
+             patch.object(settings, 'RAG_LOCAL_HNSW_THRESHOLD', 1):
+            assert store.search("test", query_vector=[1, 0, 0, 0], limit=1)[0].id == "p0"
+            assert len(FakeIndex.instances) == 1 and len(FakeIndex.instances[0].added[0]) == 4
+
+            other.upsert("test", points=[PointStruct(id="new", vector=[0, 0, 0, 1], payload={"knowledge_base_id": 3})])
+            other.delete("test", points_selector=PointIdsList(points=["p0"]))
+
+            assert store.search("test", query_vector=[0, 0, 0, 1], limit=1)[0].id == "new"
+            assert store.search("test", query_vector=[1, 0, 0, 0], limit=1)[0].id == "p3"
+            assert len(FakeIndex.instances) == 1
+            assert [len(labels) for labels in FakeIndex.instances[0].added] == [4, 1]
+        other.close()
+
+
+class TestLexicalIndex:
+    """词法索引与混合检索测试"""
+
+    @pytest.fixture
+    def index(self):
+        """创建内存词法索引"""
+        from app.services.lexical_index import LexicalIndex
+
+        return LexicalIndex(":memory:")
+
+    def test_tokenize_cjk_bigrams_and_codes(self):
+        """测试 CJK 二元组与编号分词"""
+        from app.services.lexical_index import tokenize
+
+        tokens = tokenize("错误码 ERR-1042 出现")
+
+        assert "err-1042" in tokens
+        assert "1042" in tokens
+        assert "错误" in tokens and "误码" in tokens
+        assert "出现" in tokens
+
+    def test_search_exact_code(self, index):
+        """测试按精确编号检索，并按知识库过滤"""
+        index.add_chunks(1, 10, [
+            {"point_id": "a", "index": 0, "text": "设备报错 ERR-1042 时请重启路由器"},
+            {"point_id": "b", "index": 1, "text": "常见网络问题排查指南"},
+        ])
+        index.add_chunks(2, 20, [
+            {"point_id": "c", "index": 0, "text": "ERR-1042 在另一个知识库中"},
+        ])
+
+        results = index.search("ERR-1042 怎么处理", knowledge_base_id=1)
+
+        assert [r["point_id"] for r in results] == ["a"]
+        assert results[0]["document_id"] == 10
+
+        index.delete_document(10)
+        assert index.search("ERR-1042", knowledge_base_id=1) == []
+
+    def test_search_multiple_knowledge_bases(self, index):
+        """测试按知识库 ID 列表过滤"""
+        for kb_id in (1, 2, 3):
+            index.add_chunks(kb_id, kb_id * 10, [{"point_id": f"p{kb_id}", "index": 0, "text": "退款流程说明"}])
+
+        results = index.search("退款", knowledge_base_ids=[1, 3])
+
+        assert {r["point_id"] for r in results} == {"p1", "p3"}
+        assert index.search("退款", knowledge_base_ids=[]) == []
+
+    def test_overwrite_and_delete_keep_fts_in_sync(self, index):
+        """测试覆盖写入与按点 ID 删除后全文索引与文本块表一致"""
+        index.add_chunks(1, 10, [{"point_id": "a", "index": 0, "text": "旧的退款说明"}])
+        index.add_chunks(1, 10, [{"point_id": "a", "index": 0, "text": "新的发票说明"}])
+
+        assert index.search("退款", knowledge_base_id=1) == []
+        assert [r["text"] for r in index.search("发票", knowledge_base_id=1)] == ["新的发票说明"]
+
+        index.delete_points(["a"])
+        assert index.search("发票", knowledge_base_id=1) == []
+        index._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('integrity-check')")
+        plan = index._conn.execute("EXPLAIN QUERY PLAN DELETE FROM chunks WHERE document_id = 10").fetchall()
+        assert "idx_chunks_document_id" in str(plan)
+
+    def test_reciprocal_rank_fusion(self):
+        """测试 RRF 融合两路排名"""
+        from app.services.lexical_index import reciprocal_rank_fusion
+
+        vector = [{"point_id": "a"}, {"point_id": "b"}, {"point_id": "c"}]
+        lexical = [{"point_id": "c"}, {"point_id": "d"}]
+
+        fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+        assert [r["point_id"] for r in fused][:1] == ["c"]
+        assert {r["point_id"] for r in fused} == {"a", "b", "c", "d"}
+        assert all(0 < r["score"] <= 1 for r in fused)
+
+    @pytest.mark.asyncio
+    async def test_hybrid_search_merges_lexical_hits(self, index):
+        """测试混合检索融合词法命中"""
+        with patch('app.services.vector_service.QdrantClient'):
+            service = VectorService()
+        service.lexical_index = index
+        index.add_chunks(1, 10, [{"point_id": "lex", "index": 0, "text": "型号 XJ-900 的保修条款"}])
+
+        with patch.object(service, 'search', new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = [
+                {"point_id": "vec", "document_id": 11, "chunk_index": 0, "text": "保修政策", "score": 0.8},
+            ]
+
+            results = await service.hybrid_search("XJ-900 保修", knowledge_base_id=1, top_k=5)
+
+        assert {r["point_id"] for r in results} == {"vec", "lex"}
+        lexical_hit = next(r for r in results if r["point_id"] == "lex")
+        assert lexical_hit["vector_score"] is None
+        assert lexical_hit["lexical_score"] > 0
+
+
+class TestReranker:
+    """MMR 重排序测试"""
+
+    def test_mmr_prefers_diverse_results(self):
+        """测试 MMR 在相关性相近时选择不同方向的结果"""
+        from app.services.reranker import mmr_select
+
+        query = [1.0, 1.0, 0.0]
+        candidates = [
+            [1.0, 0.9, 0.0],
+            [1.0, 0.91, 0.0],  # 与第一个几乎重复
+            [0.9, 1.0, 0.4],
+        ]
+
+        assert mmr_select(query, candidates, top_k=2, lambda_mult=1.0) == [1, 0]
+        assert mmr_select(query, candidates, top_k=2, lambda_mult=0.5) == [1, 2]
+
+    def test_mmr_dedup_threshold(self):
+        """测试近重复抑制"""
+        from app.services.reranker import mmr_select
+
+        candidates = [[1.0, 0.0], [0.999, 0.01], [0.0, 1.0]]
+
+        selected = mmr_select([1.0, 0.0], candidates, top_k=3, lambda_mult=1.0, dedup_threshold=0.95)
+
+        assert selected == [0, 2]
+
+    def test_resolve_retrieval_config_overrides(self):
+        """测试知识库配置覆盖全局默认值"""
+        from app.services.reranker import resolve_retrieval_config
+
+        config = resolve_retrieval_config({"rerank": "mmr", "mmr_lambda": 0.5, "unknown": 1})
+
+        assert config["rerank"] == "mmr"
+        assert config["mmr_lambda"] == 0.5
+        assert "unknown" not in config
+        assert config["fetch_multiplier"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_rerank_mmr_fetches_missing_vectors(self):
+        """测试仅词法命中的候选会批量取回向量"""
+        with patch('app.services.vector_service.QdrantClient'):
+            service = VectorService()
+        service.client.retrieve.return_value = [Mock(id="lex", vector=[0.0, 1.0])]
+
+        results = [
+            {"point_id": "a", "text": "A", "vector": [1.0, 0.0]},
+            {"point_id": "b", "text": "B", "vector": [1.0, -0.001]},
+            {"point_id": "lex", "text": "L"},
+        ]
+        with patch.object(service, 'get_embedding', new_callable=AsyncMock) as mock_get_embedding:
+            mock_get_embedding.return_value = [1.0, 0.5]
+
+            reranked = await service.rerank_mmr("查询", results, top_k=2, lambda_mult=0.5)
+
+        assert [r["point_id"] for r in reranked] == ["a", "lex"]
+        assert all("vector" not in r for r in reranked)
+        assert service.client.retrieve.call_args.kwargs["ids"] == ["lex"]
+
+
+class TestRetrievalCache:
+    """检索结果缓存测试"""
+
+    @pytest.fixture
+    def cache(self):
+        """创建基于 fakeredis 的检索缓存"""
+        import fakeredis
+        from app.services.retrieval_cache import RetrievalCache
+
+        return RetrievalCache(fakeredis.FakeRedis(decode_responses=True), ttl=60)
+
+    def test_normalized_query_hits(self, cache):
+        """测试规范化后相同的查询命中同一缓存"""
+        results = [{"point_id": "p1", "score": 0.9, "text": "不缓存文本"}]
+        cache.set(1, "如何 重置密码", 5, results)
+
+        assert cache.get(1, "如何  重置密码 ", 5) == [{"point_id": "p1", "score": 0.9}]
+        assert cache.get(1, "如何 重置密码", 3) is None
+        assert cache.get(2, "如何 重置密码", 5) is None
+
+    def test_bump_invalidates_kb_and_global_scope(self, cache):
+        """测试递增代数使该知识库和全局查询缓存失效"""
+        cache.set(1, "问题", 5, [{"point_id": "p1", "score": 0.9}])
+        cache.set(2, "问题", 5, [{"point_id": "p2", "score": 0.8}])
+        cache.set(None, "问题", 5, [{"point_id": "p1", "score": 0.9}])
+
+        cache.bump(1)
+
+        assert cache.get(1, "问题", 5) is None
+        assert cache.get(None, "问题", 5) is None
+        assert cache.get(2, "问题", 5) is not None
+
+    @pytest.mark.asyncio
+    async def test_rag_search_hydrates_cached_results(self, cache):
+        """测试命中缓存时不再检索，只按点 ID 回填文本"""
+        rag_service = RAGService(Mock())
+        rag_service.db.query.return_value.filter.return_value.first.return_value = None
+        rag_service.vector_service = Mock(retrieval_cache=cache)
+        rag_service.vector_service.hybrid_search = AsyncMock(return_value=[
+            {"point_id": "p1", "document_id": 1, "text": "旧文本", "score": 0.9},
+        ])
+        rag_service.vector_service.get_chunks = AsyncMock(return_value={
+            "p1": {"point_id": "p1", "document_id": 1, "text": "文本", "metadata": {}},
+        })
+        rag_service.vector_service.hydrate_texts = AsyncMock(side_effect=lambda results: results)
+
+        first = await rag_service._vector_search("问题", knowledge_base_id=1, top_k=5)
+        second = await rag_service._vector_search("问题", knowledge_base_id=1, top_k=5)
+
+        assert rag_service.vector_service.hybrid_search.await_count == 1
+        assert first[0]["point_id"] == second[0]["point_id"] == "p1"
+        assert second[0]["score"] == 0.9
+        assert second[0]["text"] == "文本"
+
+    def test_user_knowledge_base_ids_cached(self, cache):
+        """测试用户知识库 ID 列表缓存与失效"""
+        rag_service = RAGService(Mock())
+        rag_service.vector_service = Mock(redis_client=cache.redis_client)
+        rag_service.db.query.return_value.filter.return_value.all.return_value = [Mock(id=1), Mock(id=2)]
+
+        assert rag_service.get_user_knowledge_base_ids(7) == [1, 2]
+        rag_service.db.query.return_value.filter.return_value.all.return_value = [Mock(id=1)]
+        assert rag_service.get_user_knowledge_base_ids(7) == [1, 2]
+
+        rag_service.invalidate_user_knowledge_bases(7)
+        assert rag_service.get_user_knowledge_base_ids(7) == [1]
+
+
+class TestChunkStore:
+    """文本块正文存储（精简载荷）测试"""
+
+    @pytest.fixture
+    def store(self):
+        """创建基于 SQLite 内存库的正文存储"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from app.models.chunk_content import ChunkContent
+        from app.services.chunk_store import ChunkStore
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        ChunkContent.__table__.create(engine)
+        return ChunkStore(session_factory=sessionmaker(bind=engine))
+
+    @pytest.mark.asyncio
+    async def test_put_get_delete(self, store):
+        """测试写入幂等、批量读取与按文档删除"""
+        chunks = [
+            {"point_id": "p1", "index": 0, "text": "第一块", "extra": {"length": 3}},
+            {"point_id": "p2", "index": 1, "text": "第二块"},
+        ]
+        assert await store.put_many(1, 10, chunks) == 2
+        assert await store.put_many(1, 10, chunks) == 0
+        # 部分已存在：只插入新的 ID，不因冲突丢弃整批
+        assert await store.put_many(1, 10, chunks + [{"point_id": "p3", "index": 2, "text": "第三块"}]) == 1
+
+        contents = await store.get_many(["p1", "p2", "missing"])
+        assert contents["p1"]["text"] == "第一块"
+        assert contents["p1"]["extra"] == {"length": 3}
+        assert "missing" not in contents
+
+        assert await store.delete_document(10) == 3
+        assert await store.get_many(["p1"]) == {}
+
+    @pytest.mark.asyncio
+    async def test_slim_payload_indexing_and_hydration(self, store):
+        """测试精简载荷：向量载荷不含正文，检索结果一次回填"""
+        with patch('app.services.vector_service.QdrantClient'):
+            service = VectorService()
+        service.client.scroll.return_value = ([], None)
+        service.chunk_store = store
+        service.lexical_index = None
+
+        with patch.object(service, 'get_embeddings', new_callable=AsyncMock, side_effect=lambda texts: [[0.1] * 4 for _ in texts]):
+            await service.add_document_chunks(
+                knowledge_base_id=1,
+                document_id=10,
+                text="精简载荷测试文本。" * 20,
+                metadata={"title": "测试文档"},
+            )
+
+        points = service.client.upsert.call_args.kwargs["points"]
+        assert all("text" not in p.payload for p in points)
+        assert {"knowledge_base_id", "document_id", "chunk_index"} <= set(points[0].payload)
+
+        results = [
+            {"point_id": p.id, "text": None, "score": 0.9, "metadata": p.payload} for p in points
+        ] + [{"point_id": "deleted", "text": None, "score": 0.1}]
+        with patch.object(store, 'get_many', wraps=store.get_many) as get_many:
+            hydrated = await service.hydrate_texts(results)
+
+        get_many.assert_called_once()
+        assert len(hydrated) == len(points)
+        assert hydrated[0]["text"].startswith("精简载荷测试文本")
+        assert hydrated[0]["metadata"]["title"] == "测试文档"
+
+
+class TestEmbeddingStore:
+    """向量存储测试"""
+
+    @pytest.fixture
+    def store(self):
+        """创建基于 SQLite 内存库的向量存储实例"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from app.models.embedding import EmbeddingCache
+        from app.services.embedding_store import EmbeddingStore
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        EmbeddingCache.__table__.create(engine)
+        store = EmbeddingStore(model="embedding-2", lru_size=2, session_factory=sessionmaker(bind=engine))
+        store._load_many = Mock(wraps=store._load_many)
+        store._save_many = Mock(wraps=store._save_many)
+        return store
+
+    def test_pack_unpack_roundtrip(self):
+        """测试向量 float32 编解码"""
+        from app.services.embedding_store import pack_vector, unpack_vector
+
+        vector = [0.5, -1.25, 3.0]
+        data = pack_vector(vector)
+
+        assert len(data) == 4 * len(vector)
+        assert unpack_vector(data) == vector
+
+    def test_text_hash_normalizes_whitespace_and_width(self):
+        """测试规范化后相同的文本共享同一个哈希"""
+        from app.services.embedding_store import text_hash
+
+        assert text_hash("免责声明：  本文仅供参考\n") == text_hash("免责声明: 本文仅供参考")
+        assert text_hash("ＡＢＣ１２３") == text_hash("ABC123")
+        assert text_hash("第一段") != text_hash("第二段")
+
+    @pytest.mark.asyncio
+    async def test_get_put_and_dedupe_ratio(self, store):
+        """测试 LRU 命中、数据库命中与去重率统计"""
+        assert await store.get("重复的页眉") is None
+
+        await store.put("重复的页眉", [0.5, 0.25])
+        store._save_many.assert_called_once()
+
+        assert await store.get("重复的页眉") == [0.5, 0.25]
+        assert store._load_many.call_count == 1  # LRU 命中不再查库
+
+        # LRU 淘汰后回源数据库
+        await store.put("其他文本 1", [0.375])
+        await store.put("其他文本 2", [0.125])
+        assert await store.get("重复的页眉") == [0.5, 0.25]
+
+        stats = store.get_stats()
+        assert stats["lru"] == 1
+        assert stats["store"] == 1
+        assert stats["api"] == 3
+        assert stats["dedupe_ratio"] == pytest.approx(2 / 5)
+
+    @pytest.mark.asyncio
+    async def test_get_many_put_many_single_round_trip(self, store):
+        """测试批量读写各只访问一次数据库，重复写入同一键时忽略冲突"""
+        await store.put_many(["文本 A", "文本 B", "文本 A"], [[0.5], [0.25], [0.5]])
+        await store.put_many(["文本 B", "文本 C"], [[0.25], [0.75]])
+        assert store._save_many.call_count == 2
+        assert len(store._load_many(["missing"])) == 0
+
+        store._lru.clear()
+        store._load_many.reset_mock()
+        vectors = await store.get_many(["文本 C", "文本 A", "未知文本", "文本 A"])
+
+        assert vectors == [[0.75], [0.5], None, [0.5]]
+        store._load_many.assert_called_once()
+        assert len(store._load_many.call_args.args[0]) == 3
+
+    @pytest.mark.asyncio
+    async def test_get_embedding_skips_api_on_store_hit(self, store):
+        """测试向量存储命中时不调用 Embedding API"""
+        with patch('app.services.vector_service.QdrantClient'):
+            service = VectorService()
+        service.embedding_store = store
+        service.embedding_client = Mock()
+        service.embedding_client.embeddings.create.return_value = Mock(
+            data=[Mock(embedding=[0.1] * 4)]
+        )
+
+        first = await service.get_embedding("通用免责声明")
+        second = await service.get_embedding("通用免责声明 ")
+
+        assert first == second == [0.1] * 4
+        assert service.embedding_client.embeddings.create.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_get_embeddings_batches_store_misses(self, store):
+        """测试批量获取向量：命中的文本不提交，未命中的文本去重后合并为一次 API 调用"""
+        with patch('app.services.vector_service.QdrantClient'):
+            service = VectorService()
+        service.embedding_store = store
+        await store.put("已有文本", [0.9])
+        service.embedding_client = Mock()
+        service.embedding_client.embeddings.create.return_value = Mock(
+            data=[Mock(index=1, embedding=[0.2]), Mock(index=0, embedding=[0.1])]
+        )
+
+        embeddings = await service.get_embeddings(["新文本 A", "已有文本", "新文本 B", "新文本 A"])
+
+        assert embeddings == [[0.1], [0.9], [0.2], [0.1]]
+        service.embedding_client.embeddings.create.assert_called_once()
+        assert service.embedding_client.embeddings.create.call_args.kwargs["input"] == ["新文本 A", "新文本 B"]
+        assert await store.get("新文本 B") == [0.2]
+
 
 class TestDocumentParser:
     """文档解析器测试"""
@@ -163,6 +1114,88 @@ class TestDocumentParser:
         assert result['text'] == content
         assert result['metadata']['file_type'] == 'txt'
 
+    @pytest.mark.asyncio
+    async def test_parse_content_markdown(self, parser_service):
+        """测试解析 Markdown 内容"""
+        content = "# 标题\n\n[链接](https://example.com)"
+        result = await parser_service.parse_content(content, 'md')
+
+        assert result['success']
+        assert result['metadata']['heading_count'] == 1
+        assert result['metadata']['link_count'] == 1
+
+    @pytest.mark.asyncio
+    async def test_parse_pdf_page_ranges_merged_in_order(self, parser_service):
+        """测试 PDF 按页码区间并行提取后按顺序合并"""
+        async def run_inline(func, *args):
+            return func(*args)
+
+        def fake_extract(file_path, start, end):
+            return [f"内容 {page_num + 1}" for page_num in range(start, end)]
+
+        with patch('app.services.document_parser._run_in_pool', side_effect=run_inline), \
+                patch('app.services.document_parser._get_pdf_page_count', return_value=5), \
+                patch('app.services.document_parser._extract_pdf_pages', side_effect=fake_extract), \
+                patch('app.services.document_parser.settings.DOCUMENT_PARSER_PDF_PAGES_PER_TASK', 2):
+            result = await parser_service.parse_file("/tmp/test.pdf")
+
+        assert result['success']
+        assert result['metadata']['page_count'] == 5
+        positions = [result['text'].index(f"[第 {n} 页]\n内容 {n}") for n in range(1, 6)]
+        assert positions == sorted(positions)
+
+    @pytest.mark.asyncio
+    async def test_iter_file_blocks_markdown_sections(self, parser_service):
+        """测试 Markdown 按标题章节流式产出"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
+            f.write("# 第一章\n内容一\n## 第二节\n内容二\n# 第三章\n内容三")
+            temp_path = f.name
+
+        try:
+            blocks = [block async for block in parser_service.iter_file_blocks(temp_path)]
+
+            assert [block['text'].split('\n')[0] for block in blocks] == ["# 第一章", "## 第二节", "# 第三章"]
+        finally:
+            Path(temp_path).unlink()
+
+    def test_iter_file_blocks_unsupported_format(self, parser_service):
+        """测试流式解析不支持的文件格式"""
+        with pytest.raises(ValueError):
+            parser_service.iter_file_blocks("/tmp/test.docx")
+
+    @pytest.mark.asyncio
+    async def test_parse_timeout(self, parser_service):
+        """测试解析超时"""
+        async def slow_parse(file_path):
+            await asyncio.sleep(1)
+
+        parser = parser_service.factory.get_parser('.txt')
+        with patch.object(parser, 'parse', side_effect=slow_parse), \
+                patch('app.services.document_parser.settings.DOCUMENT_PARSER_TIMEOUT', 0.01):
+            result = await parser_service.parse_file("/tmp/test.txt")
+
+        assert not result['success']
+        assert '超时' in result['error']
+
+
+    @pytest.mark.asyncio
+    async def test_iter_file_blocks_timeout(self, parser_service):
+        """测试流式解析单个文本块超时"""
+        async def slow_blocks(file_path):
+            yield {"text": "第一块"}
+            await asyncio.sleep(1)
+            yield {"text": "第二块"}
+
+        parser = parser_service.factory.get_parser('.txt')
+        blocks = []
+        with patch.object(parser, 'iter_blocks', side_effect=slow_blocks), \
+                patch('app.services.document_parser.settings.DOCUMENT_PARSER_TIMEOUT', 0.05):
+            with pytest.raises(TimeoutError):
+                async for block in parser_service.iter_file_blocks("/tmp/test.txt"):
+                    blocks.append(block)
+
+        assert blocks == [{"text": "第一块"}]
+
 
 class TestRAGService:
     """RAG 服务测试"""
@@ -213,6 +1246,38 @@ class TestRAGService:
         assert '第二个文档片段' in context
         assert '来源' in context
 
+    def test_build_context_respects_token_budget(self, rag_service, mock_db):
+        """测试按得分装入并在句子边界截断"""
+        from app.services.context_packer import estimate_tokens
+
+        mock_document = Mock()
+        mock_document.title = "测试文档"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_document
+
+        search_results = [
+            {'text': '低分片段。' * 50, 'score': 0.5, 'document_id': 2},
+            {'text': '高分第一句。高分第二句。' * 40, 'score': 0.9, 'document_id': 1},
+        ]
+
+        context = rag_service._build_context(search_results, max_tokens=200)
+
+        assert estimate_tokens(context) <= 200
+        assert context.split('\n')[2].startswith('高分')
+        assert context.rstrip().endswith('。')
+
+    def test_context_budget_reserves_history(self, rag_service):
+        """测试上下文预算扣除对话历史"""
+        rag_service.ai_service = Mock(model="unknown-model")
+        history = [{"role": "user", "content": "历史消息" * 2000}]
+
+        with patch('app.services.context_packer.settings') as mock_settings:
+            mock_settings.RAG_MODEL_CONTEXT_WINDOWS = {"default": 10000}
+            mock_settings.RAG_MODEL_CONTEXT_BUDGETS = {"default": 3000}
+            mock_settings.RAG_COMPLETION_RESERVE_TOKENS = 1000
+
+            assert rag_service._context_budget("问题") == 3000
+            assert rag_service._context_budget("问题", history=history) < 1000
+
     def test_build_context_empty(self, rag_service):
         """测试空搜索结果的上下文构建"""
         context = rag_service._build_context([])
@@ -255,6 +1320,94 @@ class TestRAGService:
                 assert result['rag_enabled']
 
 
+class TestServiceInitialization:
+    """服务延迟初始化与就绪检查测试"""
+
+    def test_vector_service_connects_on_first_use(self):
+        """测试导入时不连接向量存储，首次获取时才创建且只创建一次"""
+        import app.services.vector_service as vector_module
+
+        with patch.object(vector_module, '_vector_service', None), \
+                patch('app.services.vector_service.QdrantClient') as mock_client:
+            assert mock_client.call_count == 0
+
+            service = vector_module.get_vector_service()
+
+            assert vector_module.get_vector_service() is service
+            assert mock_client.call_count == 1
+
+    def test_rag_service_resolves_services_lazily(self):
+        """测试 RAGService 创建时不初始化向量服务和 AI 服务"""
+        with patch('app.services.rag_service.get_vector_service') as mock_get_vector, \
+                patch('app.services.rag_service.get_ai_service') as mock_get_ai:
+            rag_service = RAGService(Mock())
+            assert not mock_get_vector.called and not mock_get_ai.called
+
+            assert rag_service.vector_service is mock_get_vector.return_value
+            assert rag_service.ai_service is mock_get_ai.return_value
+
+    @pytest.mark.asyncio
+    async def test_readiness_waits_for_required_services(self):
+        """测试必需服务初始化失败时未就绪，后台重试成功后转为就绪"""
+        from app.core.readiness import ServiceReadiness
+
+        attempts = {"vector_store": 0}
+
+        async def flaky_vector_store():
+            attempts["vector_store"] += 1
+            if attempts["vector_store"] < 2:
+                raise ConnectionError("Qdrant 不可用")
+
+        async def failing_cache():
+            raise ConnectionError("Redis 不可用")
+
+        readiness = ServiceReadiness({
+            "database": AsyncMock(),
+            "vector_store": flaky_vector_store,
+            "cache": failing_cache,
+        })
+
+        with patch('app.core.readiness.settings') as mock_settings:
+            mock_settings.READINESS_REQUIRED_SERVICES = ["database", "vector_store"]
+            mock_settings.SERVICE_INIT_TIMEOUT = 1.0
+            mock_settings.SERVICE_INIT_RETRY_INTERVAL = 0.01
+
+            assert not await readiness.initialize()
+            snapshot = readiness.snapshot()
+            assert snapshot["services"]["vector_store"]["error"] == "Qdrant 不可用"
+            assert snapshot["services"]["database"]["ready"]
+
+            for _ in range(100):
+                if readiness.ready:
+                    break
+                await asyncio.sleep(0.01)
+
+            # 非必需服务（缓存）仍未就绪，但不影响就绪状态
+            assert readiness.ready
+            assert not readiness.is_ready("cache")
+            await readiness.shutdown()
+
+
+    def test_startup_profiler_records_phases(self):
+        """测试启动耗时记录：步骤、阶段与首个请求（只记录一次），并导出为指标"""
+        from app.core import metrics
+        from app.core.startup_profiler import StartupProfiler
+
+        profiler = StartupProfiler()
+        with profiler.step("init_services"):
+            pass
+        ready = profiler.mark("ready")
+        profiler.record_first_request()
+        first_request = profiler.phases["first_request"]
+        profiler.record_first_request()
+
+        snapshot = profiler.snapshot()
+        assert set(snapshot["phases_ms"]) == {"ready", "first_request"}
+        assert "init_services" in snapshot["steps_ms"]
+        assert profiler.phases["first_request"] == first_request >= ready
+        gauge = metrics.startup_duration_seconds.labels(phase="ready")
+        assert gauge._value.get() == ready
+
 class TestIntegration:
     """集成测试"""
 